@@ -1,15 +1,40 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, AsyncIterator, Callable, Union
 from datetime import datetime
 import asyncpg
+import importlib
 import json
+import os
+import re
 
 from database.config import get_database
 from api.auth import get_current_user
+from utils.crop_calendar import GROWTH_STAGE_NAMES, growth_stage
+from utils.intents import get_intent_matcher
+from utils.knowledge import hybrid_knowledge, search_knowledge, semantic_knowledge
+from utils.llm import BackendUnavailable, Messages, get_completion_backend
+from utils.response_cache import plot_bucket, response_cache
+from utils.sse import event_stream, sse_event
 
 router = APIRouter(prefix="/api/assistant", tags=["assistant"])
 
+# Knowledge chunks a reply is grounded in, and how much of each one it quotes
+GROUNDING_CHUNKS = 3
+GROUNDING_EXCERPT_CHARS = 400
+
+# Instructions the model answers under (utils/llm.py)
+SYSTEM_PROMPT = (
+    "Bạn là AIRRVie, trợ lý kỹ thuật trồng lúa cho nông dân Việt Nam. Trả lời ngắn gọn, "
+    "cụ thể, bằng ngôn ngữ của câu hỏi, dựa trên tài liệu kỹ thuật và thông tin thửa ruộng "
+    "dưới đây. Nếu tài liệu không đủ, hãy nói rõ và đề nghị nông dân mô tả thêm hoặc gửi ảnh."
+)
+
+# A reply backend is an async generator function (user message, reply context
+# from gather_reply_context) yielding the reply's text piece by piece as it is
+# generated, and dicts to merge into its metadata
+ReplyBackend = Callable[[str, Dict], AsyncIterator[Union[str, Dict]]]
+
 # Pydantic models
 class MessageCreate(BaseModel):
     content: str
@@ -63,9 +88,9 @@ async def create_conversation(conversation: ConversationCreate, current_user_id:
     try:
         conversation_id = await conn.fetchval('''
             INSERT INTO core.conversation (user_id, context)
-            VALUES ($1, $2)
+            VALUES ($1, $2::jsonb)
             RETURNING id
-        ''', current_user_id, conversation.context or {})
+        ''', current_user_id, json.dumps(conversation.context or {}, ensure_ascii=False))
         
         return {"id": str(conversation_id), "message": "Conversation created successfully"}
     except Exception as e:
@@ -114,69 +139,75 @@ async def get_conversation(conversation_id: str, current_user_id: str = Depends(
     finally:
         await conn.close()
 
-@router.post("/conversations/{conversation_id}/messages")
-async def create_message(conversation_id: str, message: MessageCreate, current_user_id: str = Depends(get_current_user)):
-    """Add a message to a conversation and get AI response"""
+async def save_message(conn, conversation_id: str, role: str, content: str, metadata: Dict) -> Dict:
+    """Insert a message; returns it as the API shows it"""
+    row = await conn.fetchrow('''
+        INSERT INTO core.message (conversation_id, role, content, metadata)
+        VALUES ($1, $2, $3, $4::jsonb)
+        RETURNING id, created_at
+    ''', conversation_id, role, content, json.dumps(metadata, ensure_ascii=False))
+    return {
+        "id": str(row["id"]),
+        "role": role,
+        "content": content,
+        "metadata": metadata,
+        "createdAt": row["created_at"].isoformat()
+    }
+
+async def add_user_message(conversation_id: str, message: MessageCreate, user_id: str):
+    """Save the user's message in their conversation; returns it and the conversation context"""
     conn = await get_database()
     try:
         # Check if conversation belongs to user
         conversation = await conn.fetchrow('''
-            SELECT id FROM core.conversation 
+            SELECT id, context FROM core.conversation 
             WHERE id = $1 AND user_id = $2 AND deleted_at IS NULL
-        ''', conversation_id, current_user_id)
+        ''', conversation_id, user_id)
         
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         
-        # Add user message
-        user_message_id = await conn.fetchval('''
-            INSERT INTO core.message (conversation_id, role, content, metadata)
-            VALUES ($1, 'user', $2, $3)
-            RETURNING id
-        ''', conversation_id, message.content, message.metadata or {})
-        
-        # Get conversation context for AI response
-        context = await conn.fetchrow('''
-            SELECT context FROM core.conversation WHERE id = $1
-        ''', conversation_id)
+        user_message = await save_message(conn, conversation_id, "user", message.content, message.metadata or {})
+        return user_message, json.loads(conversation["context"]) if conversation["context"] else {}
+    finally:
+        await conn.close()
+
+@router.post("/conversations/{conversation_id}/messages")
+async def create_message(conversation_id: str, message: MessageCreate, current_user_id: str = Depends(get_current_user)):
+    """Add a message to a conversation and get AI response"""
+    try:
+        user_message, context = await add_user_message(conversation_id, message, current_user_id)
         
-        # Generate AI response (simplified - in real implementation, integrate with AI service)
-        ai_response = await generate_ai_response(
-            message.content, 
-            context["context"] if context else {},
-            message.plot_id,
-            current_user_id
-        )
+        ai_response = await generate_ai_response(message.content, context, message.plot_id, current_user_id)
         
-        # Add AI response
-        ai_message_id = await conn.fetchval('''
-            INSERT INTO core.message (conversation_id, role, content, metadata)
-            VALUES ($1, 'assistant', $2, $3)
-            RETURNING id
-        ''', conversation_id, ai_response["content"], ai_response["metadata"])
+        conn = await get_database()
+        try:
+            assistant_message = await save_message(
+                conn, conversation_id, "assistant", ai_response["content"], ai_response["metadata"]
+            )
+        finally:
+            await conn.close()
         
-        return {
-            "userMessage": {
-                "id": str(user_message_id),
-                "role": "user",
-                "content": message.content,
-                "metadata": message.metadata or {},
-                "createdAt": datetime.now().isoformat()
-            },
-            "assistantMessage": {
-                "id": str(ai_message_id),
-                "role": "assistant",
-                "content": ai_response["content"],
-                "metadata": ai_response["metadata"],
-                "createdAt": datetime.now().isoformat()
-            }
-        }
+        return {"userMessage": user_message, "assistantMessage": assistant_message}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create message: {str(e)}")
-    finally:
-        await conn.close()
+
+@router.post("/conversations/{conversation_id}/messages/stream")
+async def stream_message(conversation_id: str, message: MessageCreate, current_user_id: str = Depends(get_current_user)):
+    """
+    Add a message to a conversation and stream the AI response as Server-Sent
+    Events: "user" (the saved message), "delta" ({"content": piece}) as the
+    reply is generated, then "done" (the saved reply) or "error" ({"detail"})
+    """
+    try:
+        user_message, context = await add_user_message(conversation_id, message, current_user_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create message: {str(e)}")
+    return event_stream(stream_ai_response(conversation_id, user_message, context, message.plot_id, current_user_id))
 
 @router.delete("/conversations/{conversation_id}")
 async def delete_conversation(conversation_id: str, current_user_id: str = Depends(get_current_user)):
@@ -232,58 +263,79 @@ async def get_suggested_questions(current_user_id: str = Depends(get_current_use
         ]
     }
 
-async def generate_ai_response(user_message: str, context: Dict, plot_id: Optional[str], user_id: str) -> Dict:
-    """Generate AI response based on user message and context"""
-    # This is a simplified implementation
-    # In a real application, you would integrate with an AI service like OpenAI, Claude, etc.
-    
-    # Get plot information if available
-    plot_info = {}
-    if plot_id:
-        conn = await get_database()
-        try:
-            plot = await conn.fetchrow('''
-                SELECT p.name, p.variety, p.soil_type, f.name as farm_name
-                FROM core.plot p
-                JOIN core.farm f ON p.farm_id = f.id
-                WHERE p.id = $1 AND f.user_id = $2 AND p.deleted_at IS NULL AND f.deleted_at IS NULL
-            ''', plot_id, user_id)
-            
-            if plot:
-                plot_info = {
-                    "plotName": plot["name"],
-                    "variety": plot["variety"],
-                    "soilType": plot["soil_type"],
-                    "farmName": plot["farm_name"]
-                }
-        except Exception:
-            pass
+async def retrieve_grounding(user_message: str) -> List[Dict]:
+    """The knowledge chunks to ground a reply in; none if retrieval fails, the reply still goes out"""
+    try:
+        return await hybrid_knowledge(user_message, "vi", limit=GROUNDING_CHUNKS)
+    except Exception as e:
+        print(f"Knowledge retrieval failed: {e}")
+        return []
+
+def excerpt(content: str, limit: int = GROUNDING_EXCERPT_CHARS) -> str:
+    """content cut at a word boundary to about limit characters"""
+    if len(content) <= limit:
+        return content
+    return content[:limit].rsplit(" ", 1)[0] + "…"
+
+async def fetch_plot_info(plot_id: Optional[str], user_id: str) -> Dict:
+    """What a reply may use of the user's plot: names, variety, soil type and growth stage (empty without a plot)"""
+    if not plot_id:
+        return {}
+    conn = await get_database()
+    try:
+        plot = await conn.fetchrow('''
+            SELECT p.name, p.variety, p.soil_type, p.planting_date, f.name as farm_name
+            FROM core.plot p
+            JOIN core.farm f ON p.farm_id = f.id
+            WHERE p.id = $1 AND f.user_id = $2 AND p.deleted_at IS NULL AND f.deleted_at IS NULL
+        ''', plot_id, user_id)
+        
+        if plot:
+            return {
+                "plotName": plot["name"],
+                "variety": plot["variety"],
+                "soilType": plot["soil_type"],
+                "growthStage": growth_stage(plot["variety"], plot["planting_date"]),
+                "farmName": plot["farm_name"]
+            }
+    except Exception:
+        pass
+    finally:
+        await conn.close()
+    return {}
+
+async def gather_reply_context(user_message: str, context: Dict, plot_info: Dict) -> Dict:
+    """What a reply draws on: the conversation context, the plot and the grounding chunks"""
+    chunks = await retrieve_grounding(user_message)
+    return {
+        "context": context,
+        "plotInfo": plot_info,
+        "chunks": chunks,
+        "sources": [{"id": chunk["id"], "title": chunk["title"], "source": chunk["source"]} for chunk in chunks]
+    }
+
+def compose_reply(user_message: str, reply_context: Dict) -> Dict:
+    """The rule-based reply: a matching intent, else knowledge base excerpts, else an introduction"""
+    chunks, sources = reply_context["chunks"], reply_context["sources"]
     
-    # Simple response mapping for common questions
-    response_mapping = {
-        "vàng lá": {
-            "content": "Lúa bị vàng lá có thể do nhiều nguyên nhân:\n\n1. **Thiếu dinh dưỡng**: Cần bón phân NPK cân đối\n2. **Ngập úng**: Kiểm tra và điều chỉnh mực nước\n3. **Sâu bệnh**: Quan sát kỹ để xác định loại sâu bệnh cụ thể\n\nBạn có thể chụp ảnh gửi cho tôi để phân tích kỹ hơn.",
-            "metadata": {"suggested_actions": ["kiểm tra mực nước", "bón phân", "chụp ảnh"]}
-        },
-        "bón phân": {
-            "content": "Bón phân cho lúa nên chia làm 3 đợt chính:\n\n• **Đợt 1**: 7-10 ngày sau sạ (bón thúc)\n• **Đợt 2**: 18-22 ngày (bón đón đòng)\n• **Đợt 3**: 40-45 ngày (bón nuôi hạt)\n\nLiều lượng tùy thuộc vào giống lúa và điều kiện đất đai.",
-            "metadata": {"suggested_actions": ["kiểm tra giai đoạn sinh trưởng", "xác định loại phân"]}
-        },
-        "mực nước": {
-            "content": "Quản lý mực nước cho lúa:\n\n• **Giai đoạn mạ**: Giữ ẩm, không ngập\n• **Giai đoạn đẻ nhánh**: Ngập 3-5cm\n• **Giai đoạn làm đòng**: Ngập 5-7cm\n• **Giai đoạn chín**: Rút nước từ từ\n\nLuôn theo dõi thời tiết để điều chỉnh phù hợp.",
-            "metadata": {"suggested_actions": ["kiểm tra giai đoạn", "điều chỉnh mực nước"]}
-        },
-        "sâu cuốn lá": {
-            "content": "Phòng trừ sâu cuốn lá:\n\n• **Biện pháp sinh học**: Bảo vệ thiên địch\n• **Biện pháp hóa học**: Sử dụng thuốc khi mật độ sâu > 20 con/m²\n• **Thời điểm phun**: Sâu tuổi 1-2\n\nNên phun vào sáng sớm hoặc chiều mát.",
-            "metadata": {"suggested_actions": ["kiểm tra mật độ sâu", "chuẩn bị thuốc"]}
+    # Canned replies for common questions (utils/intents.json), all matched in one pass
+    matched = get_intent_matcher().match(user_message)
+    if matched:
+        intent, score = matched
+        return {
+            "content": intent["content"],
+            "metadata": {**intent["metadata"], "intent": intent["id"], "intentScore": score, "sources": sources}
         }
-    }
     
-    # Find matching response
-    user_message_lower = user_message.lower()
-    for keyword, response in response_mapping.items():
-        if keyword in user_message_lower:
-            return response
+    # Answer from the knowledge base when it has something on the question
+    if chunks:
+        excerpts = "\n\n".join(
+            f"**{chunk['title']}**\n{excerpt(chunk['content'])}" for chunk in chunks
+        )
+        return {
+            "content": f"Theo tài liệu kỹ thuật:\n\n{excerpts}\n\nBạn có thể mô tả thêm tình trạng ruộng để tôi tư vấn cụ thể hơn.",
+            "metadata": {"suggested_actions": ["mô tả vấn đề", "chụp ảnh"], "sources": sources}
+        }
     
     # Default response
     return {
@@ -291,42 +343,181 @@ async def generate_ai_response(user_message: str, context: Dict, plot_id: Option
         "metadata": {"suggested_actions": ["mô tả vấn đề", "chụp ảnh", "cung cấp thông tin plot"]}
     }
 
-@router.get("/assistant/knowledge")
-async def get_knowledge_base(search: str = "", lang: str = "vi"):
-    """Get knowledge base content for RAG"""
-    conn = await get_database()
+async def rule_based_reply_stream(user_message: str, reply_context: Dict) -> AsyncIterator[Union[str, Dict]]:
+    """compose_reply's metadata, then its content word by word"""
+    reply = compose_reply(user_message, reply_context)
+    yield reply["metadata"]
+    for piece in re.findall(r"\s*\S+", reply["content"]):
+        yield piece
+
+def build_prompt(user_message: str, reply_context: Dict) -> Messages:
+    """Chat messages for the model: instructions, the plot and the grounding excerpts, then the question"""
+    lines = [SYSTEM_PROMPT]
+    plot_info = reply_context["plotInfo"]
+    if plot_info:
+        # Only what the reply cache buckets by: the reply may be served for other farmers' plots
+        stage = GROWTH_STAGE_NAMES.get(plot_info.get("growthStage"), "chưa rõ")
+        lines.append(
+            f"\nThửa ruộng: giống {plot_info['variety'] or 'chưa rõ'}, "
+            f"đất {plot_info['soilType'] or 'chưa rõ'}, giai đoạn {stage}."
+        )
+    if reply_context["chunks"]:
+        lines.append("\nTài liệu kỹ thuật:")
+        lines += [f"- {chunk['title']}: {excerpt(chunk['content'])}" for chunk in reply_context["chunks"]]
+    return [{"role": "system", "content": "\n".join(lines)}, {"role": "user", "content": user_message}]
+
+def model_metadata(backend_name: str, reply_context: Dict) -> Dict:
+    """Metadata of a reply the model wrote"""
+    return {"model": backend_name, "suggested_actions": ["mô tả vấn đề", "chụp ảnh"], "sources": reply_context["sources"]}
+
+async def assistant_reply_stream(user_message: str, reply_context: Dict) -> AsyncIterator[Union[str, Dict]]:
+    """
+    The default reply backend: the model's reply (utils/llm.py) as it streams,
+    or the rule-based reply when no model is configured or it does not start
+    answering in time. A reply the model breaks off is kept, marked truncated.
+    """
+    backend = get_completion_backend()
+    if backend is None:
+        async for piece in rule_based_reply_stream(user_message, reply_context):
+            yield piece
+        return
+    
+    started = False
+    try:
+        async for piece in backend.stream(build_prompt(user_message, reply_context)):
+            if not started:
+                started = True
+                yield model_metadata(backend.name, reply_context)
+            yield piece
+    except BackendUnavailable as e:
+        print(f"Assistant model unavailable: {e}")
+        if started:
+            yield {"truncated": True}
+            return
+        yield {"fallback": str(e)}
+        async for piece in rule_based_reply_stream(user_message, reply_context):
+            yield piece
+
+async def assistant_reply(user_message: str, reply_context: Dict) -> Dict:
+    """assistant_reply_stream in one piece, with the model's non-streaming call"""
+    backend = get_completion_backend()
+    if backend is not None:
+        try:
+            content = await backend.complete(build_prompt(user_message, reply_context))
+            return {"content": content, "metadata": model_metadata(backend.name, reply_context)}
+        except BackendUnavailable as e:
+            print(f"Assistant model unavailable: {e}")
+            reply = compose_reply(user_message, reply_context)
+            return {"content": reply["content"], "metadata": {"fallback": str(e), **reply["metadata"]}}
+    return compose_reply(user_message, reply_context)
+
+def create_reply_backend() -> ReplyBackend:
+    """The reply backend configured by ASSISTANT_REPLY_BACKEND ("<module>:<async generator function>")"""
+    backend = os.getenv("ASSISTANT_REPLY_BACKEND", "")
+    if not backend:
+        return assistant_reply_stream
+    module_name, _, function = backend.partition(":")
+    if not function:
+        raise ValueError(f"Unknown ASSISTANT_REPLY_BACKEND: {backend}")
+    return getattr(importlib.import_module(module_name), function)
+
+_reply_backend: Optional[ReplyBackend] = None
+
+def get_reply_backend() -> ReplyBackend:
+    """The process-wide reply backend"""
+    global _reply_backend
+    if _reply_backend is None:
+        _reply_backend = create_reply_backend()
+    return _reply_backend
+
+async def collect_reply(pieces: AsyncIterator[Union[str, Dict]]) -> Dict:
+    """A backend's whole reply: its text pieces joined, its metadata merged"""
+    content, metadata = [], {}
+    async for piece in pieces:
+        if isinstance(piece, dict):
+            metadata.update(piece)
+        else:
+            content.append(piece)
+    return {"content": "".join(content), "metadata": metadata}
+
+def cacheable(reply: Dict) -> bool:
+    """Whether a reply may be served again: not one the model failed to give or broke off"""
+    return "fallback" not in reply["metadata"] and "truncated" not in reply["metadata"]
+
+async def generate_ai_response(user_message: str, context: Dict, plot_id: Optional[str], user_id: str) -> Dict:
+    """Generate AI response based on user message and context (cached replies skip retrieval and the model)"""
+    plot_info = await fetch_plot_info(plot_id, user_id)
+    lookup = response_cache.lookup(user_message, plot_bucket(plot_info))
+    if lookup.reply:
+        return lookup.reply
+    
+    reply_context = await gather_reply_context(user_message, context, plot_info)
+    backend = get_reply_backend()
+    if backend is assistant_reply_stream:
+        reply = await assistant_reply(user_message, reply_context)
+    else:
+        reply = await collect_reply(backend(user_message, reply_context))
+    if cacheable(reply):
+        response_cache.store(lookup, reply)
+    return reply
+
+async def stream_ai_response(
+    conversation_id: str, user_message: Dict, context: Dict, plot_id: Optional[str], user_id: str
+) -> AsyncIterator[bytes]:
+    """Server-Sent Events of one reply; the reply is saved once the backend finishes it (not if the client leaves first)"""
+    yield sse_event(user_message, "user")
     try:
-        if search:
-            # Search in knowledge base
-            chunks = await conn.fetch('''
-                SELECT id, source, title, content, lang, tags
-                FROM core.knowledge_chunk 
-                WHERE (lang = $1 OR lang = 'both') AND deleted_at IS NULL
-                AND (to_tsvector('simple', content) @@ plainto_tsquery('simple', $2)
-                     OR to_tsvector('simple', title) @@ plainto_tsquery('simple', $2))
-                ORDER BY ts_rank(to_tsvector('simple', content), plainto_tsquery('simple', $2)) DESC
-                LIMIT 10
-            ''', lang, search)
+        plot_info = await fetch_plot_info(plot_id, user_id)
+        lookup = response_cache.lookup(user_message["content"], plot_bucket(plot_info))
+        if lookup.reply:
+            reply = lookup.reply
+            yield sse_event({"content": reply["content"]}, "delta")
         else:
-            # Get recent knowledge chunks
-            chunks = await conn.fetch('''
-                SELECT id, source, title, content, lang, tags
-                FROM core.knowledge_chunk 
-                WHERE (lang = $1 OR lang = 'both') AND deleted_at IS NULL
-                ORDER BY created_at DESC
-                LIMIT 10
-            ''', lang)
+            reply_context = await gather_reply_context(user_message["content"], context, plot_info)
+            content, metadata = [], {}
+            async for piece in get_reply_backend()(user_message["content"], reply_context):
+                if isinstance(piece, dict):
+                    metadata.update(piece)
+                    continue
+                content.append(piece)
+                yield sse_event({"content": piece}, "delta")
+            reply = {"content": "".join(content), "metadata": metadata}
+            if cacheable(reply):
+                response_cache.store(lookup, reply)
         
-        return [
-            {
-                "id": str(chunk["id"]),
-                "source": chunk["source"],
-                "title": chunk["title"],
-                "content": chunk["content"],
-                "lang": chunk["lang"],
-                "tags": chunk["tags"] or []
-            }
-            for chunk in chunks
-        ]
+        conn = await get_database()
+        try:
+            assistant_message = await save_message(conn, conversation_id, "assistant", reply["content"], reply["metadata"])
+        finally:
+            await conn.close()
+        yield sse_event(assistant_message, "done")
+    except Exception as e:
+        yield sse_event({"detail": f"Failed to generate response: {str(e)}"}, "error")
+
+@router.get("/assistant/cache")
+async def get_reply_cache_stats(current_user_id: str = Depends(get_current_user)):
+    """Hit rate of the assistant's reply cache in this worker (utils/response_cache.py)"""
+    return response_cache.stats()
+
+@router.get("/assistant/knowledge")
+async def get_knowledge_base(
+    search: str = "",
+    lang: str = "vi",
+    mode: str = "text",
+    tags: Optional[List[str]] = Query(default=None),
+):
+    """
+    Get knowledge base content for RAG (mode: "text" matches words, "semantic"
+    compares embeddings, "hybrid" fuses both); tags keeps chunks with any of them
+    """
+    if mode not in ("text", "semantic", "hybrid"):
+        raise HTTPException(status_code=400, detail="mode must be 'text', 'semantic' or 'hybrid'")
+    if mode == "hybrid":
+        return await hybrid_knowledge(search, lang, tags)
+    conn = await get_database()
+    try:
+        if mode == "semantic" and search.strip():
+            return await semantic_knowledge(conn, search, lang, tags=tags)
+        return await search_knowledge(conn, search, lang, tags=tags)
     finally:
         await conn.close()
@@ -0,0 +1,158 @@
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.dependencies.utils import solve_dependencies
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
+from fastapi.routing import APIRoute, serialize_response
+from starlette.routing import Match
+from pydantic import BaseModel
+from typing import Any, List, Optional
+from contextlib import AsyncExitStack
+from types import SimpleNamespace
+import asyncio
+import json
+
+from database.config import get_pool, use_connection
+from api.auth import get_current_user
+
+router = APIRouter(prefix="/api", tags=["batch"])
+
+MAX_BATCH_REQUESTS = 20
+READ_METHODS = {"GET"}
+
+class SubRequest(BaseModel):
+    id: Optional[str] = None
+    method: str = "GET"
+    path: str  # e.g. "/api/tasks/upcoming" or "/api/journal?plot_id=..."
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    requests: List[SubRequest]
+    transactional: bool = False  # required for writes: run in order, in one transaction
+
+class SubRequestFailed(Exception):
+    """Raised inside a transactional batch to roll back after a failed sub-request"""
+
+def sub_response(sub: SubRequest, status: int, body: Any) -> dict:
+    return {"id": sub.id, "status": status, "body": body}
+
+def find_route(request: Request, scope: dict):
+    """The API route handling scope, with its path params; 404/405 like the HTTP stack"""
+    method_mismatch = False
+    for route in request.app.router.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            return route, child_scope
+        if match == Match.PARTIAL:
+            method_mismatch = True
+
+    if method_mismatch:
+        raise HTTPException(status_code=405, detail="Method Not Allowed")
+    raise HTTPException(status_code=404, detail="Not Found")
+
+async def dispatch(request: Request, sub: SubRequest, current_user_id: str) -> dict:
+    """Run one sub-request's endpoint in-process, sharing the batch's authenticated user"""
+    path, _, query_string = sub.path.partition("?")
+    method = sub.method.upper()
+    # Exports stream their body, which cannot be nested in the batch response
+    if not path.startswith("/api/") or path.rstrip("/") == "/api/batch" or path.rstrip("/").endswith("/export"):
+        return sub_response(sub, 400, {"detail": f"Cannot batch {path}"})
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string.encode(),
+        "headers": [(b"content-type", b"application/json")],
+        "app": request.app,
+    }
+    try:
+        route, child_scope = find_route(request, scope)
+        scope.update(child_scope)
+
+        # The user was authenticated once for the whole batch
+        overrides = SimpleNamespace(dependency_overrides={
+            **request.app.dependency_overrides,
+            get_current_user: lambda: current_user_id,
+        })
+        async with AsyncExitStack() as stack:
+            solved = await solve_dependencies(
+                request=Request(scope),
+                dependant=route.dependant,
+                body=sub.body,
+                dependency_overrides_provider=overrides,
+                async_exit_stack=stack,
+                embed_body_fields=route._embed_body_fields,
+            )
+            if solved.errors:
+                raise RequestValidationError(solved.errors)
+            result = await route.dependant.call(**solved.values)
+
+        if isinstance(result, Response):
+            body = result.body.decode()
+            if result.media_type == "application/json":
+                body = json.loads(body)
+            return sub_response(sub, result.status_code, body)
+
+        content = await serialize_response(field=route.response_field, response_content=result)
+        return sub_response(sub, route.status_code or 200, jsonable_encoder(content))
+    except HTTPException as e:
+        return sub_response(sub, e.status_code, {"detail": e.detail})
+    except RequestValidationError as e:
+        return sub_response(sub, 422, {"detail": jsonable_encoder(e.errors())})
+    except Exception as e:
+        return sub_response(sub, 500, {"detail": f"Internal server error: {str(e)}"})
+
+@router.post("/batch")
+async def batch(batch_request: BatchRequest, request: Request, current_user_id: str = Depends(get_current_user)):
+    """Run several API calls in one round trip.
+
+    Reads run concurrently, each on its own pooled connection. Batches containing
+    writes must set transactional=true; they run in order on one connection inside
+    a single transaction, and stop and roll back at the first failing sub-request.
+    """
+    subs = batch_request.requests
+    if not subs:
+        raise HTTPException(status_code=400, detail="Batch contains no requests")
+    if len(subs) > MAX_BATCH_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {MAX_BATCH_REQUESTS} requests")
+
+    writes = [sub for sub in subs if sub.method.upper() not in READ_METHODS]
+    if writes and not batch_request.transactional:
+        raise HTTPException(status_code=400, detail="Batches with writes must set transactional=true")
+
+    pool = await get_pool()
+
+    if not batch_request.transactional:
+        async def run(sub: SubRequest) -> dict:
+            async with pool.acquire() as conn:
+                async with use_connection(conn):
+                    return await dispatch(request, sub, current_user_id)
+
+        responses = await asyncio.gather(*(run(sub) for sub in subs))
+        return {"responses": responses}
+
+    responses = []
+    committed = True
+    async with pool.acquire() as conn:
+        async with use_connection(conn):
+            try:
+                async with conn.transaction():
+                    for sub in subs:
+                        response = await dispatch(request, sub, current_user_id)
+                        responses.append(response)
+                        if response["status"] >= 400:
+                            raise SubRequestFailed()
+            except SubRequestFailed:
+                committed = False
+
+    # Sub-requests after the failing one never ran
+    responses += [
+        sub_response(sub, 424, {"detail": "Not executed: batch rolled back"})
+        for sub in subs[len(responses):]
+    ]
+    return {"responses": responses, "committed": committed}
@@ -0,0 +1,143 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional, Set
+from collections import Counter
+import asyncio
+
+from database.config import get_database
+from api.auth import get_current_user
+from api.farms import format_farm, format_plot
+from api.journal import format_journal_stats
+from api.tasks import format_task, format_task_stats
+from api.users import format_user_stats
+from api.weather import DEFAULT_COORDS, fallback_weather, fetch_cached_weather, get_province_weather, process_weather_data
+from utils.responses import ORJSONResponse
+from utils.user_stats import fetch_user_stats
+
+router = APIRouter(prefix="/api", tags=["dashboard"])
+
+# Sections of the dashboard, each matching the endpoint the app used to call for it
+DASHBOARD_FIELDS = [
+    "farms",          # /api/farms
+    "plots",          # /api/plots
+    "upcomingTasks",  # /api/tasks/upcoming
+    "weather",        # /api/weather/plot/{plot_id} for the newest farm
+    "stats",          # /api/users/stats
+    "taskStats",      # /api/tasks/stats
+    "journalStats",   # /api/journal/stats
+]
+
+def parse_fields(fields: Optional[str]) -> Set[str]:
+    """Sections requested with ?fields=a,b (all of them by default)"""
+    if not fields:
+        return set(DASHBOARD_FIELDS)
+
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected - set(DASHBOARD_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown dashboard fields: {', '.join(sorted(unknown))}. Valid fields: {', '.join(DASHBOARD_FIELDS)}"
+        )
+    return selected
+
+async def get_dashboard_weather(farms) -> dict:
+    """Weather for the user's newest farm (cached), falling back like /api/weather"""
+    try:
+        if farms:
+            return await get_province_weather(farms[0]["province"], farms[0]["district"])
+        current_data, forecast_data = await fetch_cached_weather(*DEFAULT_COORDS)
+        return process_weather_data(current_data, forecast_data, "Mekong Delta, Vietnam")
+    except Exception:
+        return fallback_weather()
+
+@router.get("/dashboard")
+async def get_dashboard(fields: Optional[str] = None, current_user_id: str = Depends(get_current_user)):
+    """Everything the home screen renders in one call; ?fields=farms,weather returns only those sections"""
+    selected = parse_fields(fields)
+
+    conn = await get_database()
+    weather_task = None
+    try:
+        # Resolve the user's farms and plots once; the other sections are scoped by them
+        farms = await conn.fetch('''
+            SELECT id, name, province, district, address_text, created_at
+            FROM core.farm
+            WHERE user_id = $1 AND deleted_at IS NULL
+            ORDER BY created_at DESC
+        ''', current_user_id)
+
+        # The weather API is the slowest part; overlap it with the remaining queries
+        if "weather" in selected:
+            weather_task = asyncio.create_task(get_dashboard_weather(farms))
+
+        plots = []
+        if farms and selected & {"farms", "plots", "upcomingTasks"}:
+            plots = await conn.fetch('''
+                SELECT id, farm_id, name, area_m2, soil_type, variety,
+                       planting_date, harvest_date, irrigation_method,
+                       notes, photos, created_at
+                FROM core.plot
+                WHERE farm_id = ANY($1::uuid[]) AND deleted_at IS NULL
+                ORDER BY created_at DESC
+            ''', [farm["id"] for farm in farms])
+
+        farms_by_id = {farm["id"]: farm for farm in farms}
+        plots_by_id = {plot["id"]: plot for plot in plots}
+        dashboard = {}
+
+        if "farms" in selected:
+            plot_counts = Counter(plot["farm_id"] for plot in plots)
+            dashboard["farms"] = [
+                format_farm({**dict(farm), "plot_count": plot_counts[farm["id"]]})
+                for farm in farms
+            ]
+
+        if "plots" in selected:
+            dashboard["plots"] = [
+                format_plot({
+                    **dict(plot),
+                    "farm_name": farms_by_id[plot["farm_id"]]["name"],
+                    "farm_province": farms_by_id[plot["farm_id"]]["province"],
+                    "farm_district": farms_by_id[plot["farm_id"]]["district"],
+                })
+                for plot in plots
+            ]
+
+        if "upcomingTasks" in selected:
+            tasks = []
+            if plots:
+                tasks = await conn.fetch('''
+                    SELECT id, plot_id, title, description, due_date, priority,
+                           status, type, reminder, completed, created_at
+                    FROM core.task
+                    WHERE user_id = $1 AND plot_id = ANY($2::uuid[]) AND deleted_at IS NULL
+                    AND due_date BETWEEN CURRENT_DATE AND CURRENT_DATE + 7
+                    AND status != 'done'
+                    ORDER BY due_date, priority
+                ''', current_user_id, list(plots_by_id))
+            dashboard["upcomingTasks"] = [
+                format_task({
+                    **dict(task),
+                    "plot_name": plots_by_id[task["plot_id"]]["name"],
+                    "farm_name": farms_by_id[plots_by_id[task["plot_id"]]["farm_id"]]["name"],
+                })
+                for task in tasks
+            ]
+
+        if selected & {"stats", "taskStats", "journalStats"}:
+            stats = await fetch_user_stats(conn, current_user_id)
+            if "stats" in selected:
+                dashboard["stats"] = format_user_stats(stats)
+            if "taskStats" in selected:
+                dashboard["taskStats"] = format_task_stats(stats)
+            if "journalStats" in selected:
+                dashboard["journalStats"] = format_journal_stats(stats)
+
+        if weather_task:
+            dashboard["weather"] = await weather_task
+
+        return ORJSONResponse(dashboard)
+    finally:
+        if weather_task and not weather_task.done():
+            weather_task.cancel()
+        await conn.close()
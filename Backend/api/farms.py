@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import Response
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import date
@@ -7,6 +8,10 @@ import json
 
 from database.config import get_database
 from api.auth import get_current_user
+from utils.crop_calendar import has_calendar, regenerate_plot_calendar
+from utils.ownership import ownership_cache
+from utils.cache import cached
+from utils.responses import ORJSONResponse
 
 router = APIRouter(prefix="/api", tags=["farms and plots"])
 
@@ -47,7 +52,55 @@ class PlotUpdate(BaseModel):
     photos: Optional[List[str]] = None
 
 # Farms endpoints
+def format_farm(farm) -> dict:
+    """API representation of a farm row (with its plot_count)"""
+    return {
+        "id": farm["id"],
+        "name": farm["name"],
+        "province": farm["province"],
+        "district": farm["district"],
+        "addressText": farm["address_text"],
+        "plotCount": farm["plot_count"],
+        "createdAt": farm["created_at"]
+    }
+
+def format_plot(plot) -> dict:
+    """API representation of a plot row joined with its farm's name and location"""
+    return {
+        "id": plot["id"],
+        "farmId": plot["farm_id"],
+        "name": plot["name"],
+        "areaM2": float(plot["area_m2"]),
+        "soilType": plot["soil_type"],
+        "variety": plot["variety"],
+        "plantingDate": plot["planting_date"],
+        "harvestDate": plot["harvest_date"],
+        "irrigationMethod": plot["irrigation_method"],
+        "notes": plot["notes"],
+        "photos": [json.loads(photo) for photo in plot["photos"] or []],
+        "farmName": plot["farm_name"],
+        "farmProvince": plot["farm_province"],
+        "farmDistrict": plot["farm_district"],
+        "createdAt": plot["created_at"]
+    }
+
+# get_plots' response: the JSON array of format_plot objects, encoded by Postgres
+PLOT_LIST_QUERY = '''
+    SELECT convert_to(COALESCE(json_agg(json_build_object(
+        'id', p.id, 'farmId', p.farm_id, 'name', p.name, 'areaM2', p.area_m2,
+        'soilType', p.soil_type, 'variety', p.variety,
+        'plantingDate', p.planting_date, 'harvestDate', p.harvest_date,
+        'irrigationMethod', p.irrigation_method, 'notes', p.notes,
+        'photos', COALESCE(p.photos, '{}'), 'farmName', f.name,
+        'farmProvince', f.province, 'farmDistrict', f.district, 'createdAt', p.created_at
+    ) ORDER BY p.created_at DESC), '[]')::text, 'UTF8')
+    FROM core.plot p
+    JOIN core.farm f ON p.farm_id = f.id
+    WHERE f.user_id = $1 AND p.deleted_at IS NULL AND f.deleted_at IS NULL
+'''
+
 @router.get("/farms")
+@cached(ttl=60)
 async def get_farms(current_user_id: str = Depends(get_current_user)):
     """Get all farms for the current user"""
     conn = await get_database()
@@ -62,18 +115,7 @@ async def get_farms(current_user_id: str = Depends(get_current_user)):
             ORDER BY f.created_at DESC
         ''', current_user_id)
         
-        return [
-            {
-                "id": str(farm["id"]),
-                "name": farm["name"],
-                "province": farm["province"],
-                "district": farm["district"],
-                "addressText": farm["address_text"],
-                "plotCount": farm["plot_count"],
-                "createdAt": farm["created_at"].isoformat()
-            }
-            for farm in farms
-        ]
+        return ORJSONResponse([format_farm(farm) for farm in farms])
     finally:
         await conn.close()
 
@@ -87,6 +129,7 @@ async def create_farm(farm: FarmCreate, current_user_id: str = Depends(get_curre
             VALUES ($1, $2, $3, $4, $5)
             RETURNING id
         ''', current_user_id, farm.name, farm.province, farm.district, farm.address_text)
+        ownership_cache.evict(current_user_id)
         
         return {"id": str(farm_id), "message": "Farm created successfully"}
     except Exception as e:
@@ -100,11 +143,7 @@ async def update_farm(farm_id: str, farm_update: FarmUpdate, current_user_id: st
     conn = await get_database()
     try:
         # Check if farm belongs to user
-        existing_farm = await conn.fetchrow('''
-            SELECT id FROM core.farm WHERE id = $1 AND user_id = $2 AND deleted_at IS NULL
-        ''', farm_id, current_user_id)
-        
-        if not existing_farm:
+        if not await ownership_cache.owns_farm(conn, current_user_id, farm_id):
             raise HTTPException(status_code=404, detail="Farm not found")
         
         # Build update query dynamically
@@ -162,6 +201,7 @@ async def delete_farm(farm_id: str, current_user_id: str = Depends(get_current_u
         
         if result == "UPDATE 0":
             raise HTTPException(status_code=404, detail="Farm not found")
+        ownership_cache.evict(current_user_id)
         
         return {"message": "Farm deleted successfully"}
     except HTTPException:
@@ -173,41 +213,13 @@ async def delete_farm(farm_id: str, current_user_id: str = Depends(get_current_u
 
 # Plots endpoints
 @router.get("/plots")
+@cached(ttl=60)
 async def get_plots(current_user_id: str = Depends(get_current_user)):
     """Get all plots for the current user"""
     conn = await get_database()
     try:
-        plots = await conn.fetch('''
-            SELECT p.id, p.farm_id, p.name, p.area_m2, p.soil_type, p.variety, 
-                   p.planting_date, p.harvest_date, p.irrigation_method,
-                   p.notes, p.photos, p.created_at,
-                   f.name as farm_name, f.province as farm_province, f.district as farm_district
-            FROM core.plot p
-            JOIN core.farm f ON p.farm_id = f.id
-            WHERE f.user_id = $1 AND p.deleted_at IS NULL AND f.deleted_at IS NULL
-            ORDER BY p.created_at DESC
-        ''', current_user_id)
-        
-        return [
-            {
-                "id": str(plot["id"]),
-                "farmId": str(plot["farm_id"]),
-                "name": plot["name"],
-                "areaM2": float(plot["area_m2"]),
-                "soilType": plot["soil_type"],
-                "variety": plot["variety"],
-                "plantingDate": plot["planting_date"].isoformat() if plot["planting_date"] else None,
-                "harvestDate": plot["harvest_date"].isoformat() if plot["harvest_date"] else None,
-                "irrigationMethod": plot["irrigation_method"],
-                "notes": plot["notes"],
-                "photos": plot["photos"] or [],
-                "farmName": plot["farm_name"],
-                "farmProvince": plot["farm_province"],
-                "farmDistrict": plot["farm_district"],
-                "createdAt": plot["created_at"].isoformat()
-            }
-            for plot in plots
-        ]
+        body = await conn.fetchval(PLOT_LIST_QUERY, current_user_id)
+        return Response(content=body, media_type="application/json")
     finally:
         await conn.close()
 
@@ -217,11 +229,7 @@ async def create_plot(plot: PlotCreate, current_user_id: str = Depends(get_curre
     conn = await get_database()
     try:
         # Check if farm belongs to user
-        farm = await conn.fetchrow('''
-            SELECT id FROM core.farm WHERE id = $1 AND user_id = $2 AND deleted_at IS NULL
-        ''', plot.farmId, current_user_id)
-        
-        if not farm:
+        if not await ownership_cache.owns_farm(conn, current_user_id, plot.farmId):
             raise HTTPException(status_code=404, detail="Farm not found")
         
         # Convert dates
@@ -250,6 +258,7 @@ async def create_plot(plot: PlotCreate, current_user_id: str = Depends(get_curre
             RETURNING id
         ''', plot.farmId, plot.name, plot.area_m2, plot.soil_type, plot.variety, planting_date,
             harvest_date, plot.irrigation_method, plot.notes, photos_array)
+        ownership_cache.evict(current_user_id)
         
         return {"id": str(plot_id), "message": "Plot created successfully"}
     except HTTPException:
@@ -265,13 +274,7 @@ async def update_plot(plot_id: str, plot_update: PlotUpdate, current_user_id: st
     conn = await get_database()
     try:
         # Check if plot belongs to user
-        existing_plot = await conn.fetchrow('''
-            SELECT p.id FROM core.plot p
-            JOIN core.farm f ON p.farm_id = f.id
-            WHERE p.id = $1 AND f.user_id = $2 AND p.deleted_at IS NULL AND f.deleted_at IS NULL
-        ''', plot_id, current_user_id)
-        
-        if not existing_plot:
+        if not await ownership_cache.owns_plot(conn, current_user_id, plot_id):
             raise HTTPException(status_code=404, detail="Plot not found")
         
         # Check date validation for planting and harvest dates
@@ -345,10 +348,16 @@ async def update_plot(plot_id: str, plot_update: PlotUpdate, current_user_id: st
         
         update_values.append(plot_id)
         
-        await conn.execute(f'''
-            UPDATE core.plot SET {', '.join(update_fields)}, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ${field_count}
-        ''', *update_values)
+        async with conn.transaction():
+            await conn.execute(f'''
+                UPDATE core.plot SET {', '.join(update_fields)}, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ${field_count}
+            ''', *update_values)
+            
+            # Move the generated season tasks along with a new planting date or variety
+            if (plot_update.planting_date is not None or plot_update.variety is not None) \
+                    and await has_calendar(conn, plot_id):
+                await regenerate_plot_calendar(conn, plot_id)
         
         return {"message": "Plot updated successfully"}
     except HTTPException:
@@ -358,6 +367,33 @@ async def update_plot(plot_id: str, plot_update: PlotUpdate, current_user_id: st
     finally:
         await conn.close()
 
+@router.post("/plots/{plot_id}/calendar")
+async def generate_plot_calendar(plot_id: str, current_user_id: str = Depends(get_current_user)):
+    """Generate (or refresh) the season's crop calendar tasks for a plot"""
+    conn = await get_database()
+    try:
+        plot = await conn.fetchrow('''
+            SELECT p.id, p.planting_date FROM core.plot p
+            JOIN core.farm f ON p.farm_id = f.id
+            WHERE p.id = $1 AND f.user_id = $2 AND p.deleted_at IS NULL AND f.deleted_at IS NULL
+        ''', plot_id, current_user_id)
+        
+        if not plot:
+            raise HTTPException(status_code=404, detail="Plot not found")
+        
+        if not plot["planting_date"]:
+            raise HTTPException(status_code=400, detail="Plot has no planting date")
+        
+        written = await regenerate_plot_calendar(conn, plot_id)
+        
+        return {"tasks": written, "message": "Crop calendar generated successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate crop calendar: {str(e)}")
+    finally:
+        await conn.close()
+
 @router.delete("/plots/{plot_id}")
 async def delete_plot(plot_id: str, current_user_id: str = Depends(get_current_user)):
     """Delete a plot (soft delete)"""
@@ -372,6 +408,7 @@ async def delete_plot(plot_id: str, current_user_id: str = Depends(get_current_u
         
         if result == "UPDATE 0":
             raise HTTPException(status_code=404, detail="Plot not found")
+        ownership_cache.evict(current_user_id)
         
         return {"message": "Plot deleted successfully"}
     except HTTPException:
@@ -1,12 +1,16 @@
 # api/journal.py
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.responses import Response
 from pydantic import BaseModel, Field
-from typing import Optional, List, Any, Dict
+from typing import Optional, List
 from datetime import date, datetime
 import json
 
 from database.config import get_database
 from api.auth import get_current_user
+from utils.user_stats import fetch_user_stats
+from utils.ownership import ownership_cache
+from utils.export import export_response, parse_export_date
 
 router = APIRouter(prefix="/api/journal", tags=["journal"])
 
@@ -24,6 +28,62 @@ def parse_date(d: Optional[str]) -> date:
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date format")
 
+def format_journal_entry(r) -> dict:
+    """API shape of a journal row joined with its plot and farm names.
+    UUIDs, dates and timestamps are left for the JSON encoder (orjson) to format."""
+    return {
+        "id": r["id"],
+        "plotId": r["plot_id"],
+        "date": r["entry_date"],
+        "type": r["type"],
+        "title": r["title"],
+        "content": r["content"],
+        "photos": json.loads(r["photos"]) if r["photos"] else [],
+        "audioNote": r["audio_url"],
+        "plotName": r["plot_name"],
+        "farmName": r["farm_name"],
+        "createdAt": r["created_at"],
+    }
+
+def format_journal_stats(s: dict) -> dict:
+    """API shape of the journal counters from fetch_user_stats."""
+    return {
+        "total": s["journal_entries"],
+        "today": s["journal_today"],
+        "lastWeek": s["journal_last_week"],
+        "byType": {
+            "planting": s["journal_planting"],
+            "fertilizer": s["journal_fertilizer"],
+            "irrigation": s["journal_irrigation"],
+            "pest": s["journal_pest"],
+            "harvest": s["journal_harvest"],
+        },
+    }
+
+# The whole list as one UTF-8 JSON array in format_journal_entry's shape, built
+# by Postgres and returned as bytea so no row or string is decoded in Python
+JOURNAL_LIST_QUERY = """
+    SELECT convert_to(COALESCE(json_agg(json_build_object(
+        'id', j.id, 'plotId', j.plot_id, 'date', j.entry_date, 'type', j.type,
+        'title', j.title, 'content', j.content, 'photos', COALESCE(j.photos, '[]'::jsonb),
+        'audioNote', j.audio_url, 'plotName', p.name, 'farmName', f.name,
+        'createdAt', j.created_at
+    ) ORDER BY j.entry_date DESC, j.created_at DESC), '[]')::text, 'UTF8')
+    FROM core.journal_entry j
+    JOIN core.plot p ON j.plot_id = p.id
+    JOIN core.farm f ON p.farm_id = f.id
+    WHERE j.user_id = $1::uuid {plot_filter}
+      AND j.deleted_at IS NULL
+      AND p.deleted_at IS NULL
+      AND f.deleted_at IS NULL
+"""
+
+JOURNAL_EXPORT_COLUMNS = [
+    ("id", "j.id"), ("plotId", "j.plot_id"), ("plotName", "p.name"), ("farmName", "f.name"),
+    ("date", "j.entry_date"), ("type", "j.type"), ("title", "j.title"), ("content", "j.content"),
+    ("photos", "COALESCE(j.photos, '[]'::jsonb)"), ("audioNote", "j.audio_url"), ("createdAt", "j.created_at"),
+]
+
 # -------- pydantic models --------
 class _CamelAndSnake(BaseModel):
     class Config:
@@ -51,101 +111,68 @@ class JournalEntryUpdate(_CamelAndSnake):
     audio_note: Optional[str] = Field(default=None, alias="audioNote")
 
 # -------- routes --------
-@router.get("/", response_model=List[Dict[str, Any]])
+@router.get("/")
 async def get_journal_entries(current_user_id: str = Depends(get_current_user)):
     conn = await get_database()
     try:
-        rows = await conn.fetch(
-            """
-            SELECT j.id, j.plot_id, j.entry_date, j.type, j.title, j.content,
-                   j.photos, j.audio_url, j.created_at,
-                   p.name AS plot_name, f.name AS farm_name
-            FROM core.journal_entry j
-            JOIN core.plot p ON j.plot_id = p.id
-            JOIN core.farm f ON p.farm_id = f.id
-            WHERE j.user_id = $1::uuid
-              AND j.deleted_at IS NULL
-              AND p.deleted_at IS NULL
-              AND f.deleted_at IS NULL
-            ORDER BY j.entry_date DESC, j.created_at DESC
-            """,
-            current_user_id,
-        )
-        return [
-            {
-                "id": str(r["id"]),
-                "plotId": str(r["plot_id"]),
-                "date": r["entry_date"].isoformat(),
-                "type": r["type"],
-                "title": r["title"],
-                "content": r["content"],
-                "photos": r["photos"] or [],
-                "audioNote": r["audio_url"],
-                "plotName": r["plot_name"],
-                "farmName": r["farm_name"],
-                "createdAt": r["created_at"].isoformat(),
-            }
-            for r in rows
-        ]
+        body = await conn.fetchval(JOURNAL_LIST_QUERY.format(plot_filter=""), current_user_id)
+        return Response(content=body, media_type="application/json")
     finally:
         await conn.close()
 
-@router.get("/plot/{plot_id}", response_model=List[Dict[str, Any]])
+@router.get("/plot/{plot_id}")
 async def get_journal_entries_by_plot(plot_id: str, current_user_id: str = Depends(get_current_user)):
     conn = await get_database()
     try:
         # verify ownership
-        owns = await conn.fetchrow(
-            """
-            SELECT 1
-            FROM core.plot p
-            JOIN core.farm f ON p.farm_id = f.id
-            WHERE p.id = $1::uuid
-              AND f.user_id = $2::uuid
-              AND p.deleted_at IS NULL
-              AND f.deleted_at IS NULL
-            """,
-            plot_id, current_user_id,
-        )
-        if not owns:
+        if not await ownership_cache.owns_plot(conn, current_user_id, plot_id):
             raise HTTPException(status_code=404, detail="Plot not found")
 
-        rows = await conn.fetch(
-            """
-            SELECT j.id, j.plot_id, j.entry_date, j.type, j.title, j.content,
-                   j.photos, j.audio_url, j.created_at,
-                   p.name AS plot_name, f.name AS farm_name
-            FROM core.journal_entry j
-            JOIN core.plot p ON j.plot_id = p.id
-            JOIN core.farm f ON p.farm_id = f.id
-            WHERE j.plot_id = $1::uuid
-              AND j.user_id = $2::uuid
-              AND j.deleted_at IS NULL
-              AND p.deleted_at IS NULL
-              AND f.deleted_at IS NULL
-            ORDER BY j.entry_date DESC, j.created_at DESC
-            """,
-            plot_id, current_user_id,
+        body = await conn.fetchval(
+            JOURNAL_LIST_QUERY.format(plot_filter="AND j.plot_id = $2::uuid"),
+            current_user_id, plot_id,
         )
-        return [
-            {
-                "id": str(r["id"]),
-                "plotId": str(r["plot_id"]),
-                "date": r["entry_date"].isoformat(),
-                "type": r["type"],
-                "title": r["title"],
-                "content": r["content"],
-                "photos": r["photos"] or [],
-                "audioNote": r["audio_url"],
-                "plotName": r["plot_name"],
-                "farmName": r["farm_name"],
-                "createdAt": r["created_at"].isoformat(),
-            }
-            for r in rows
-        ]
+        return Response(content=body, media_type="application/json")
     finally:
         await conn.close()
 
+@router.get("/export")
+async def export_journal_entries(
+    format: str = "ndjson",
+    plot_id: Optional[str] = Query(default=None, alias="plotId"),
+    date_from: Optional[str] = Query(default=None, alias="from"),
+    date_to: Optional[str] = Query(default=None, alias="to"),
+    current_user_id: str = Depends(get_current_user),
+):
+    """Stream the user's journal as NDJSON or CSV, optionally for one plot and an entry date range"""
+    conds, vals, n = [], [current_user_id], 2
+    if plot_id:
+        conn = await get_database()
+        try:
+            if not await ownership_cache.owns_plot(conn, current_user_id, plot_id):
+                raise HTTPException(status_code=404, detail="Plot not found")
+        finally:
+            await conn.close()
+        conds.append(f"AND j.plot_id = ${n}::uuid"); vals.append(plot_id); n += 1
+    start = parse_export_date(date_from, "from")
+    if start:
+        conds.append(f"AND j.entry_date >= ${n}"); vals.append(start); n += 1
+    end = parse_export_date(date_to, "to")
+    if end:
+        conds.append(f"AND j.entry_date <= ${n}"); vals.append(end); n += 1
+
+    source = f"""
+        FROM core.journal_entry j
+        JOIN core.plot p ON j.plot_id = p.id
+        JOIN core.farm f ON p.farm_id = f.id
+        WHERE j.user_id = $1::uuid {" ".join(conds)}
+          AND j.deleted_at IS NULL
+          AND p.deleted_at IS NULL
+          AND f.deleted_at IS NULL
+        ORDER BY j.entry_date, j.created_at
+    """
+    return export_response(JOURNAL_EXPORT_COLUMNS, source, vals, format, f"journal-{date.today().isoformat()}")
+
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_journal_entry(entry: JournalEntryCreate, current_user_id: str = Depends(get_current_user)):
     conn = await get_database()
@@ -155,19 +182,7 @@ async def create_journal_entry(entry: JournalEntryCreate, current_user_id: str =
             raise HTTPException(status_code=400, detail="Plot ID is required")
 
         # verify ownership
-        owns = await conn.fetchrow(
-            """
-            SELECT 1
-            FROM core.plot p
-            JOIN core.farm f ON p.farm_id = f.id
-            WHERE p.id = $1::uuid
-              AND f.user_id = $2::uuid
-              AND p.deleted_at IS NULL
-              AND f.deleted_at IS NULL
-            """,
-            plot_id, current_user_id,
-        )
-        if not owns:
+        if not await ownership_cache.owns_plot(conn, current_user_id, plot_id):
             raise HTTPException(status_code=404, detail="Plot not found")
 
         entry_date = parse_date(entry.date)
@@ -199,20 +214,7 @@ async def create_journal_entry(entry: JournalEntryCreate, current_user_id: str =
             """,
             new_id,
         )
-        return {
-            "id": str(created["id"]),
-            "plotId": str(created["plot_id"]),
-            "date": created["entry_date"].isoformat(),
-            "type": created["type"],
-            "title": created["title"],
-            "content": created["content"],
-            "photos": created["photos"] or [],
-            "audioNote": created["audio_url"],
-            "plotName": created["plot_name"],
-            "farmName": created["farm_name"],
-            "createdAt": created["created_at"].isoformat(),
-            "message": "Journal entry created successfully",
-        }
+        return {**format_journal_entry(created), "message": "Journal entry created successfully"}
     finally:
         await conn.close()
 
@@ -283,33 +285,6 @@ async def delete_journal_entry(entry_id: str, current_user_id: str = Depends(get
 async def get_journal_stats(current_user_id: str = Depends(get_current_user)):
     conn = await get_database()
     try:
-        s = await conn.fetchrow(
-            """
-            SELECT 
-                COUNT(*) AS total,
-                COUNT(*) FILTER (WHERE entry_date = CURRENT_DATE) AS today,
-                COUNT(*) FILTER (WHERE entry_date >= CURRENT_DATE - 7) AS last_week,
-                COUNT(*) FILTER (WHERE type = 'planting') AS planting,
-                COUNT(*) FILTER (WHERE type = 'fertilizer') AS fertilizer,
-                COUNT(*) FILTER (WHERE type = 'irrigation') AS irrigation,
-                COUNT(*) FILTER (WHERE type = 'pest') AS pest,
-                COUNT(*) FILTER (WHERE type = 'harvest') AS harvest
-            FROM core.journal_entry
-            WHERE user_id = $1::uuid AND deleted_at IS NULL
-            """,
-            current_user_id,
-        )
-        return {
-            "total": s["total"],
-            "today": s["today"],
-            "lastWeek": s["last_week"],
-            "byType": {
-                "planting": s["planting"],
-                "fertilizer": s["fertilizer"],
-                "irrigation": s["irrigation"],
-                "pest": s["pest"],
-                "harvest": s["harvest"],
-            },
-        }
+        return format_journal_stats(await fetch_user_stats(conn, current_user_id))
     finally:
         await conn.close()
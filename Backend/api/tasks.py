@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import Response
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import date
@@ -6,6 +7,11 @@ import asyncpg
 
 from database.config import get_database
 from api.auth import get_current_user
+from utils.user_stats import fetch_user_stats
+from utils.ownership import ownership_cache
+from utils.cache import cached
+from utils.export import export_response, parse_export_date
+from utils.responses import ORJSONResponse
 
 router = APIRouter(prefix="/api", tags=["tasks"])
 
@@ -28,56 +34,83 @@ class TaskUpdate(BaseModel):
     type: Optional[str] = None
     reminder: Optional[bool] = None
 
+def format_task(task) -> dict:
+    """API representation of a task row joined with its plot and farm names"""
+    return {
+        "id": task["id"],
+        "plotId": task["plot_id"],
+        "title": task["title"],
+        "description": task["description"],
+        "dueDate": task["due_date"],
+        "priority": task["priority"],
+        "status": task["status"],
+        "type": task["type"],
+        "reminder": task["reminder"],
+        "completed": task["completed"],
+        "plotName": task["plot_name"],
+        "farmName": task["farm_name"],
+        "createdAt": task["created_at"]
+    }
+
+# get_tasks' response, format_task's shape built by Postgres as UTF-8 bytes:
+# pending, then in progress, then done; by priority and due date within each
+TASK_LIST_QUERY = '''
+    SELECT convert_to(COALESCE(json_agg(json_build_object(
+        'id', t.id, 'plotId', t.plot_id, 'title', t.title, 'description', t.description,
+        'dueDate', t.due_date, 'priority', t.priority, 'status', t.status, 'type', t.type,
+        'reminder', t.reminder, 'completed', t.completed,
+        'plotName', p.name, 'farmName', f.name, 'createdAt', t.created_at
+    ) ORDER BY
+        CASE
+            WHEN t.status = 'pending' THEN 1
+            WHEN t.status = 'in_progress' THEN 2
+            ELSE 3
+        END,
+        CASE t.priority
+            WHEN 'high' THEN 1
+            WHEN 'medium' THEN 2
+            ELSE 3
+        END,
+        t.due_date
+    ), '[]')::text, 'UTF8')
+    FROM core.task t
+    JOIN core.plot p ON t.plot_id = p.id
+    JOIN core.farm f ON p.farm_id = f.id
+    WHERE t.user_id = $1 AND t.deleted_at IS NULL
+    AND p.deleted_at IS NULL AND f.deleted_at IS NULL
+'''
+
+TASK_EXPORT_COLUMNS = [
+    ("id", "t.id"), ("plotId", "t.plot_id"), ("plotName", "p.name"), ("farmName", "f.name"),
+    ("title", "t.title"), ("description", "t.description"), ("dueDate", "t.due_date"),
+    ("priority", "t.priority"), ("status", "t.status"), ("type", "t.type"),
+    ("reminder", "t.reminder"), ("completed", "t.completed"), ("createdAt", "t.created_at"),
+]
+
+def format_task_stats(stats: dict) -> dict:
+    """API representation of the task counters from fetch_user_stats"""
+    return {
+        "total": stats["tasks"],
+        "pending": stats["tasks_pending"],
+        "inProgress": stats["tasks_in_progress"],
+        "completed": stats["tasks_done"],
+        "overdue": stats["tasks_overdue"],
+        "dueToday": stats["tasks_due_today"]
+    }
+
 @router.get("/tasks")
+@cached(ttl=60)
 async def get_tasks(current_user_id: str = Depends(get_current_user)):
     """Get all tasks for the current user"""
     conn = await get_database()
     try:
-        tasks = await conn.fetch('''
-            SELECT t.id, t.plot_id, t.title, t.description, t.due_date, t.priority, 
-                   t.status, t.type, t.reminder, t.completed, t.created_at,
-                   p.name as plot_name, f.name as farm_name
-            FROM core.task t
-            JOIN core.plot p ON t.plot_id = p.id
-            JOIN core.farm f ON p.farm_id = f.id
-            WHERE t.user_id = $1 AND t.deleted_at IS NULL 
-            AND p.deleted_at IS NULL AND f.deleted_at IS NULL
-            ORDER BY 
-                CASE 
-                    WHEN t.status = 'pending' THEN 1
-                    WHEN t.status = 'in_progress' THEN 2
-                    ELSE 3
-                END,
-                CASE t.priority
-                    WHEN 'high' THEN 1
-                    WHEN 'medium' THEN 2
-                    ELSE 3
-                END,
-                t.due_date
-        ''', current_user_id)
-        
-        return [
-            {
-                "id": str(task["id"]),
-                "plotId": str(task["plot_id"]),
-                "title": task["title"],
-                "description": task["description"],
-                "dueDate": task["due_date"].isoformat(),
-                "priority": task["priority"],
-                "status": task["status"],
-                "type": task["type"],
-                "reminder": task["reminder"],
-                "completed": task["completed"],
-                "plotName": task["plot_name"],
-                "farmName": task["farm_name"],
-                "createdAt": task["created_at"].isoformat()
-            }
-            for task in tasks
-        ]
+        body = await conn.fetchval(TASK_LIST_QUERY, current_user_id)
+        return Response(content=body, media_type="application/json")
     finally:
         await conn.close()
 
 @router.get("/tasks/upcoming")
+@cached(ttl=60)
 async def get_upcoming_tasks(current_user_id: str = Depends(get_current_user)):
     """Get upcoming tasks (due in next 7 days)"""
     conn = await get_database()
@@ -96,40 +129,57 @@ async def get_upcoming_tasks(current_user_id: str = Depends(get_current_user)):
             ORDER BY t.due_date, t.priority
         ''', current_user_id)
         
-        return [
-            {
-                "id": str(task["id"]),
-                "plotId": str(task["plot_id"]),
-                "title": task["title"],
-                "description": task["description"],
-                "dueDate": task["due_date"].isoformat(),
-                "priority": task["priority"],
-                "status": task["status"],
-                "type": task["type"],
-                "reminder": task["reminder"],
-                "completed": task["completed"],
-                "plotName": task["plot_name"],
-                "farmName": task["farm_name"],
-                "createdAt": task["created_at"].isoformat()
-            }
-            for task in tasks
-        ]
+        return ORJSONResponse([format_task(task) for task in tasks])
     finally:
         await conn.close()
 
+@router.get("/tasks/export")
+async def export_tasks(
+    format: str = "ndjson",
+    plot_id: Optional[str] = Query(default=None, alias="plotId"),
+    date_from: Optional[str] = Query(default=None, alias="from"),
+    date_to: Optional[str] = Query(default=None, alias="to"),
+    current_user_id: str = Depends(get_current_user)
+):
+    """Stream the user's tasks as NDJSON or CSV, optionally for one plot and a due date range"""
+    conditions = []
+    params = [current_user_id]
+    if plot_id:
+        conn = await get_database()
+        try:
+            if not await ownership_cache.owns_plot(conn, current_user_id, plot_id):
+                raise HTTPException(status_code=404, detail="Plot not found")
+        finally:
+            await conn.close()
+        params.append(plot_id)
+        conditions.append(f"AND t.plot_id = ${len(params)}")
+    start = parse_export_date(date_from, "from")
+    if start:
+        params.append(start)
+        conditions.append(f"AND t.due_date >= ${len(params)}")
+    end = parse_export_date(date_to, "to")
+    if end:
+        params.append(end)
+        conditions.append(f"AND t.due_date <= ${len(params)}")
+
+    source = f'''
+        FROM core.task t
+        JOIN core.plot p ON t.plot_id = p.id
+        JOIN core.farm f ON p.farm_id = f.id
+        WHERE t.user_id = $1 AND t.deleted_at IS NULL
+        AND p.deleted_at IS NULL AND f.deleted_at IS NULL
+        {" ".join(conditions)}
+        ORDER BY t.due_date, t.created_at
+    '''
+    return export_response(TASK_EXPORT_COLUMNS, source, params, format, f"tasks-{date.today().isoformat()}")
+
 @router.post("/tasks")
 async def create_task(task: TaskCreate, current_user_id: str = Depends(get_current_user)):
     """Create a new task"""
     conn = await get_database()
     try:
         # Check if plot belongs to user
-        plot = await conn.fetchrow('''
-            SELECT p.id FROM core.plot p
-            JOIN core.farm f ON p.farm_id = f.id
-            WHERE p.id = $1 AND f.user_id = $2 AND p.deleted_at IS NULL AND f.deleted_at IS NULL
-        ''', task.plot_id, current_user_id)
-        
-        if not plot:
+        if not await ownership_cache.owns_plot(conn, current_user_id, task.plot_id):
             raise HTTPException(status_code=404, detail="Plot not found")
         
         # Convert date
@@ -273,25 +323,8 @@ async def get_task_stats(current_user_id: str = Depends(get_current_user)):
     """Get task statistics for the current user"""
     conn = await get_database()
     try:
-        stats = await conn.fetchrow('''
-            SELECT 
-                COUNT(*) as total_tasks,
-                COUNT(*) FILTER (WHERE status = 'pending') as pending_tasks,
-                COUNT(*) FILTER (WHERE status = 'in_progress') as in_progress_tasks,
-                COUNT(*) FILTER (WHERE status = 'done') as completed_tasks,
-                COUNT(*) FILTER (WHERE due_date < CURRENT_DATE AND status != 'done') as overdue_tasks,
-                COUNT(*) FILTER (WHERE due_date = CURRENT_DATE AND status != 'done') as due_today_tasks
-            FROM core.task 
-            WHERE user_id = $1 AND deleted_at IS NULL
-        ''', current_user_id)
+        stats = await fetch_user_stats(conn, current_user_id)
         
-        return {
-            "total": stats["total_tasks"],
-            "pending": stats["pending_tasks"],
-            "inProgress": stats["in_progress_tasks"],
-            "completed": stats["completed_tasks"],
-            "overdue": stats["overdue_tasks"],
-            "dueToday": stats["due_today_tasks"]
-        }
+        return format_task_stats(stats)
     finally:
         await conn.close()
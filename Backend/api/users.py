@@ -1,10 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import Response
 from pydantic import BaseModel
 from typing import Optional
 import asyncpg
 
-from database.config import get_database
+from database.config import get_database, in_transaction
 from api.auth import get_current_user
+from utils.user_stats import fetch_user_stats
+from utils.invalidation import InvalidatedCache
 
 router = APIRouter(prefix="/api", tags=["users"])
 
@@ -118,140 +121,116 @@ async def update_current_user(user_update: UserUpdate, current_user_id: str = De
     finally:
         await conn.close()
 
+def format_user_stats(stats: dict) -> dict:
+    """API representation of the counters from fetch_user_stats"""
+    return {
+        "farms": stats["farms"],
+        "plots": stats["plots"],
+        "tasks": {
+            "total": stats["tasks"],
+            "pending": stats["tasks_pending"],
+            "completed": stats["tasks_done"]
+        },
+        "journal": {
+            "total": stats["journal_entries"],
+            "today": stats["journal_today"]
+        }
+    }
+
 @router.get("/users/stats")
 async def get_user_stats(current_user_id: str = Depends(get_current_user)):
     """Get user statistics (farms, plots, tasks, journal entries)"""
     conn = await get_database()
     try:
-        stats = await conn.fetchrow('''
-            SELECT 
-                -- Farm stats
-                (SELECT COUNT(*) FROM core.farm WHERE user_id = $1 AND deleted_at IS NULL) as farm_count,
-                -- Plot stats
-                (SELECT COUNT(*) FROM core.plot p 
-                 JOIN core.farm f ON p.farm_id = f.id 
-                 WHERE f.user_id = $1 AND p.deleted_at IS NULL AND f.deleted_at IS NULL) as plot_count,
-                -- Task stats
-                (SELECT COUNT(*) FROM core.task WHERE user_id = $1 AND deleted_at IS NULL) as task_count,
-                (SELECT COUNT(*) FROM core.task WHERE user_id = $1 AND status = 'pending' AND deleted_at IS NULL) as pending_tasks,
-                (SELECT COUNT(*) FROM core.task WHERE user_id = $1 AND status = 'done' AND deleted_at IS NULL) as completed_tasks,
-                -- Journal stats
-                (SELECT COUNT(*) FROM core.journal_entry WHERE user_id = $1 AND deleted_at IS NULL) as journal_count,
-                (SELECT COUNT(*) FROM core.journal_entry WHERE user_id = $1 AND entry_date = CURRENT_DATE AND deleted_at IS NULL) as today_journal_entries
-        ''', current_user_id)
+        stats = await fetch_user_stats(conn, current_user_id)
         
-        return {
-            "farms": stats["farm_count"],
-            "plots": stats["plot_count"],
-            "tasks": {
-                "total": stats["task_count"],
-                "pending": stats["pending_tasks"],
-                "completed": stats["completed_tasks"]
-            },
-            "journal": {
-                "total": stats["journal_count"],
-                "today": stats["today_journal_entries"]
-            }
-        }
+        return format_user_stats(stats)
     finally:
         await conn.close()
 
-@router.get("/users/profile")
-async def get_user_profile(current_user_id: str = Depends(get_current_user)):
-    """Get comprehensive user profile with all related data"""
-    conn = await get_database()
-    try:
-        # Get user basic info
-        user = await conn.fetchrow('''
-            SELECT id, phone, email, display_name, locale, font_scale, created_at
-            FROM core.user WHERE id = $1 AND deleted_at IS NULL
-        ''', current_user_id)
-        
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Get farms with plot counts
-        farms = await conn.fetch('''
-            SELECT f.id, f.name, f.province, f.district, f.created_at,
-                   COUNT(p.id) as plot_count
-            FROM core.farm f
-            LEFT JOIN core.plot p ON f.id = p.farm_id AND p.deleted_at IS NULL
-            WHERE f.user_id = $1 AND f.deleted_at IS NULL
-            GROUP BY f.id, f.name, f.province, f.district, f.created_at
-            ORDER BY f.created_at DESC
-        ''', current_user_id)
-        
-        # Get recent tasks
-        recent_tasks = await conn.fetch('''
-            SELECT t.id, t.title, t.due_date, t.priority, t.status, t.type,
+# The whole profile document, assembled by Postgres in one round trip
+PROFILE_QUERY = '''
+SELECT json_build_object(
+    'user', json_build_object(
+        'id', u.id, 'phone', u.phone, 'email', u.email,
+        'displayName', u.display_name, 'locale', u.locale,
+        'fontScale', u.font_scale, 'createdAt', u.created_at
+    ),
+    -- Farms with plot counts
+    'farms', COALESCE((
+        SELECT json_agg(json_build_object(
+            'id', f.id, 'name', f.name, 'province', f.province, 'district', f.district,
+            'plotCount', (SELECT COUNT(*) FROM core.plot p WHERE p.farm_id = f.id AND p.deleted_at IS NULL),
+            'createdAt', f.created_at
+        ) ORDER BY f.created_at DESC)
+        FROM core.farm f
+        WHERE f.user_id = u.id AND f.deleted_at IS NULL
+    ), '[]'),
+    -- Recent tasks
+    'recentTasks', COALESCE((
+        SELECT json_agg(json_build_object(
+            'id', t.id, 'title', t.title, 'dueDate', t.due_date, 'priority', t.priority,
+            'status', t.status, 'type', t.type, 'plotName', t.plot_name, 'farmName', t.farm_name
+        ) ORDER BY t.created_at DESC)
+        FROM (
+            SELECT t.id, t.title, t.due_date, t.priority, t.status, t.type, t.created_at,
                    p.name as plot_name, f.name as farm_name
             FROM core.task t
             JOIN core.plot p ON t.plot_id = p.id
             JOIN core.farm f ON p.farm_id = f.id
-            WHERE t.user_id = $1 AND t.deleted_at IS NULL 
+            WHERE t.user_id = u.id AND t.deleted_at IS NULL
             AND p.deleted_at IS NULL AND f.deleted_at IS NULL
             ORDER BY t.created_at DESC
             LIMIT 5
-        ''', current_user_id)
-        
-        # Get recent journal entries
-        recent_journal = await conn.fetch('''
-            SELECT j.id, j.title, j.entry_date, j.type,
+        ) t
+    ), '[]'),
+    -- Recent journal entries
+    'recentJournal', COALESCE((
+        SELECT json_agg(json_build_object(
+            'id', j.id, 'title', j.title, 'date', j.entry_date, 'type', j.type,
+            'plotName', j.plot_name, 'farmName', j.farm_name
+        ) ORDER BY j.entry_date DESC, j.created_at DESC)
+        FROM (
+            SELECT j.id, j.title, j.entry_date, j.type, j.created_at,
                    p.name as plot_name, f.name as farm_name
             FROM core.journal_entry j
             JOIN core.plot p ON j.plot_id = p.id
             JOIN core.farm f ON p.farm_id = f.id
-            WHERE j.user_id = $1 AND j.deleted_at IS NULL 
+            WHERE j.user_id = u.id AND j.deleted_at IS NULL
             AND p.deleted_at IS NULL AND f.deleted_at IS NULL
             ORDER BY j.entry_date DESC, j.created_at DESC
             LIMIT 5
-        ''', current_user_id)
+        ) j
+    ), '[]')
+)
+FROM core.user u
+WHERE u.id = $1 AND u.deleted_at IS NULL
+'''
+
+# Profile documents per user, dropped on every worker whenever the user's data changes
+PROFILE_CACHE_MAX_ENTRIES = 10000
+profile_cache = InvalidatedCache("user", ttl=300, max_entries=PROFILE_CACHE_MAX_ENTRIES)
+
+@router.get("/users/profile")
+async def get_user_profile(current_user_id: str = Depends(get_current_user)):
+    """Get comprehensive user profile with all related data"""
+    # Inside a transactional batch the profile may include uncommitted writes
+    cacheable = not in_transaction()
+    profile = profile_cache.get(current_user_id) if cacheable else None
+    if profile:
+        return Response(content=profile, media_type="application/json")
+
+    conn = await get_database()
+    try:
+        generation = profile_cache.generation()
+        profile = await conn.fetchval(PROFILE_QUERY, current_user_id)
         
-        return {
-            "user": {
-                "id": str(user["id"]),
-                "phone": user["phone"],
-                "email": user["email"],
-                "displayName": user["display_name"],
-                "locale": user["locale"],
-                "fontScale": user["font_scale"],
-                "createdAt": user["created_at"].isoformat()
-            },
-            "farms": [
-                {
-                    "id": str(farm["id"]),
-                    "name": farm["name"],
-                    "province": farm["province"],
-                    "district": farm["district"],
-                    "plotCount": farm["plot_count"],
-                    "createdAt": farm["created_at"].isoformat()
-                }
-                for farm in farms
-            ],
-            "recentTasks": [
-                {
-                    "id": str(task["id"]),
-                    "title": task["title"],
-                    "dueDate": task["due_date"].isoformat(),
-                    "priority": task["priority"],
-                    "status": task["status"],
-                    "type": task["type"],
-                    "plotName": task["plot_name"],
-                    "farmName": task["farm_name"]
-                }
-                for task in recent_tasks
-            ],
-            "recentJournal": [
-                {
-                    "id": str(entry["id"]),
-                    "title": entry["title"],
-                    "date": entry["entry_date"].isoformat(),
-                    "type": entry["type"],
-                    "plotName": entry["plot_name"],
-                    "farmName": entry["farm_name"]
-                }
-                for entry in recent_journal
-            ]
-        }
+        if not profile:
+            raise HTTPException(status_code=404, detail="User not found")
+        if cacheable:
+            profile_cache.set(current_user_id, profile, generation)
+        
+        # Already JSON; skip decoding and re-encoding it in Python
+        return Response(content=profile, media_type="application/json")
     finally:
         await conn.close()
@@ -1,8 +1,9 @@
 import os
+import time
 import httpx
 from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 from datetime import datetime, timedelta
 import asyncpg
 
@@ -11,6 +12,30 @@ from api.auth import get_current_user
 
 router = APIRouter(prefix="/api", tags=["weather"])
 
+# Mekong Delta fallback location
+DEFAULT_COORDS = (10.0, 106.0)
+
+# For now, use a simple mapping of Vietnamese provinces to coordinates
+# In a real implementation, you'd use a geocoding service
+PROVINCE_COORDS = {
+    "An Giang": (10.5, 105.0),
+    "Đồng Tháp": (10.7, 105.8),
+    "Long An": (10.7, 106.2),
+    "Tiền Giang": (10.4, 106.2),
+    "Vĩnh Long": (10.3, 106.0),
+    "Cần Thơ": (10.0, 105.8),
+    "Hậu Giang": (9.8, 105.8),
+    "Sóc Trăng": (9.6, 105.9),
+    "Bạc Liêu": (9.3, 105.7),
+    "Cà Mau": (9.2, 105.2)
+}
+
+# OpenWeather responses are reused for this long per location, on a 0.1° (~11 km)
+# grid; past the entry limit the oldest location goes first, whatever clients send
+WEATHER_CACHE_TTL_SECONDS = 600
+WEATHER_CACHE_MAX_ENTRIES = 1000
+_weather_cache: Dict[Tuple[float, float], Tuple[float, tuple]] = {}
+
 # Pydantic models
 class WeatherData(BaseModel):
     location: str
@@ -134,6 +159,20 @@ async def fetch_openweather_data(lat: float = 10.0, lon: float = 106.0):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+async def fetch_cached_weather(lat: float = 10.0, lon: float = 106.0):
+    """fetch_openweather_data for the grid point nearest lat/lon, reused for WEATHER_CACHE_TTL_SECONDS"""
+    key = (round(lat, 1), round(lon, 1))
+    cached = _weather_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    data = await fetch_openweather_data(*key)
+    _weather_cache.pop(key, None)
+    while len(_weather_cache) >= WEATHER_CACHE_MAX_ENTRIES:
+        _weather_cache.pop(next(iter(_weather_cache)))  # oldest first
+    _weather_cache[key] = (time.monotonic() + WEATHER_CACHE_TTL_SECONDS, data)
+    return data
+
 def process_weather_data(current_data: dict, forecast_data: dict, location_name: str) -> dict:
     """Process OpenWeather data into our application format"""
     
@@ -221,6 +260,31 @@ def process_weather_data(current_data: dict, forecast_data: dict, location_name:
         "alerts": alerts
     }
 
+def fallback_weather() -> dict:
+    """Typical Mekong Delta weather, served when the weather API is unavailable"""
+    return {
+        "location": "Mekong Delta, Vietnam",
+        "current": {
+            "temperature": 28,
+            "humidity": 78,
+            "rainfall": 0,
+            "windSpeed": 12,
+            "condition": "Partly Cloudy"
+        },
+        "forecast": [
+            {"date": (datetime.now() + timedelta(days=i)).strftime("%Y-%m-%d"), 
+             "high": 32, "low": 24, "rainfall": 0, "condition": "Sunny"}
+            for i in range(5)
+        ],
+        "alerts": []
+    }
+
+async def get_province_weather(province: str, district: str) -> dict:
+    """Weather for a farm's province (cached)"""
+    lat, lon = PROVINCE_COORDS.get(province, DEFAULT_COORDS)
+    current_data, forecast_data = await fetch_cached_weather(lat, lon)
+    return process_weather_data(current_data, forecast_data, f"{district}, {province}")
+
 @router.get("/weather", response_model=WeatherData)
 async def get_weather(request: Request, lat: float = None, lon: float = None, city: str = None):
     """Get real-time weather data from OpenWeather API"""
@@ -239,29 +303,14 @@ async def get_weather(request: Request, lat: float = None, lon: float = None, ci
             lat, lon, location_name = await get_location_from_ip(request)
         
         # Fetch weather data for the location
-        current_data, forecast_data = await fetch_openweather_data(lat, lon)
+        current_data, forecast_data = await fetch_cached_weather(lat, lon)
         weather_data = process_weather_data(current_data, forecast_data, location_name)
         return weather_data
     except HTTPException:
         raise
     except Exception as e:
         # Fallback to mock data if API fails
-        return {
-            "location": "Mekong Delta, Vietnam",
-            "current": {
-                "temperature": 28,
-                "humidity": 78,
-                "rainfall": 0,
-                "windSpeed": 12,
-                "condition": "Partly Cloudy"
-            },
-            "forecast": [
-                {"date": (datetime.now() + timedelta(days=i)).strftime("%Y-%m-%d"), 
-                 "high": 32, "low": 24, "rainfall": 0, "condition": "Sunny"}
-                for i in range(5)
-            ],
-            "alerts": []
-        }
+        return fallback_weather()
 
 @router.get("/weather/plot/{plot_id}")
 async def get_weather_for_plot(plot_id: str, current_user_id: str = Depends(get_current_user)):
@@ -279,30 +328,7 @@ async def get_weather_for_plot(plot_id: str, current_user_id: str = Depends(get_
         if not plot:
             raise HTTPException(status_code=404, detail="Plot not found")
         
-        # For now, use a simple mapping of Vietnamese provinces to coordinates
-        # In a real implementation, you'd use a geocoding service
-        province_coords = {
-            "An Giang": (10.5, 105.0),
-            "Đồng Tháp": (10.7, 105.8),
-            "Long An": (10.7, 106.2),
-            "Tiền Giang": (10.4, 106.2),
-            "Vĩnh Long": (10.3, 106.0),
-            "Cần Thơ": (10.0, 105.8),
-            "Hậu Giang": (9.8, 105.8),
-            "Sóc Trăng": (9.6, 105.9),
-            "Bạc Liêu": (9.3, 105.7),
-            "Cà Mau": (9.2, 105.2)
-        }
-        
-        province = plot["province"]
-        lat, lon = province_coords.get(province, (10.0, 106.0))
-        
-        # Fetch weather data
-        current_data, forecast_data = await fetch_openweather_data(lat, lon)
-        location_name = f"{plot['district']}, {province}"
-        weather_data = process_weather_data(current_data, forecast_data, location_name)
-        
-        return weather_data
+        return await get_province_weather(plot["province"], plot["district"])
         
     except HTTPException:
         raise
@@ -320,7 +346,7 @@ async def get_weather_forecast(request: Request, days: int = 5):
         lat, lon, location_name = await get_location_from_ip(request)
         
         # Fetch weather data
-        current_data, forecast_data = await fetch_openweather_data(lat, lon)
+        current_data, forecast_data = await fetch_cached_weather(lat, lon)
         weather_data = process_weather_data(current_data, forecast_data, location_name)
         
         # Limit forecast to requested number of days
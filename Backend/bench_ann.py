@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Recall and throughput benchmark for the IVF/PQ knowledge index (no database needed)
+
+Builds clustered unit vectors (1,000,000 x EMBEDDING_DIM by default; real
+embeddings are clustered by topic, uniform random ones would make every
+partition equally bad), trains IVF-Flat and IVF-PQ indexes with
+4 * sqrt(n) lists, and reports against an exact VectorIndex scan:
+  - training and add time, and index size
+  - recall@10 and single-query QPS / p50 latency for each nprobe
+  - PQ with and without exact re-ranking of the best ANN_REFINE * 10
+  - the cost of an incremental update (remove + add 1,000 chunks)
+
+Usage:
+    python bench_ann.py [chunks] [queries] [pq_m]
+"""
+
+import math
+import statistics
+import sys
+import time
+import uuid
+
+import numpy as np
+
+from utils.ann import IVFIndex
+from utils.embeddings import EMBEDDING_DIM
+from utils.vector_index import ANN_REFINE, ID_DTYPE, VectorIndex
+
+NPROBES = (1, 4, 8, 16, 32, 64)
+
+def clustered_index(count: int, dim: int, topics: int = 2000) -> VectorIndex:
+    rng = np.random.default_rng(1)
+    # Topics grouped under broader themes, so neighbouring topics overlap
+    themes = rng.standard_normal((topics // 20, dim), dtype=np.float32)
+    centers = themes[rng.integers(0, len(themes), topics)] + 0.8 * rng.standard_normal((topics, dim), dtype=np.float32)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 100_000):
+        rows = min(100_000, count - start)
+        block = centers[rng.integers(0, topics, rows)] + 1.2 * rng.standard_normal((rows, dim), dtype=np.float32)
+        vectors[start:start + rows] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    ids = np.frombuffer(b"".join(uuid.uuid4().bytes for _ in range(count)), dtype=ID_DTYPE)
+    langs = rng.integers(0, 2, count).astype(np.uint8)
+    meta = {"embedder": "clustered", "dim": dim, "count": count, "rows": count, "updatedAt": None}
+    return VectorIndex(vectors, ids, langs, meta)
+
+def recall(results, expected) -> float:
+    return statistics.mean(len({chunk_id for chunk_id, _ in hits} & truth) / len(truth) for hits, truth in zip(results, expected))
+
+def timed_search(search, queries):
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query)[0])
+        timings.append(time.perf_counter() - start)
+    return results, statistics.median(timings) * 1000, len(timings) / sum(timings)
+
+def run_benchmark(count: int, query_count: int, pq_m: int):
+    dim = EMBEDDING_DIM
+    print(f"Building {count:,} x {dim} clustered vectors...")
+    index = clustered_index(count, dim)
+    rng = np.random.default_rng(2)
+    # Queries near (not on) stored chunks, like a question about a topic the knowledge base covers
+    queries = index.vectors[rng.integers(0, count, query_count)] + 0.05 * rng.standard_normal((query_count, dim), dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact, exact_ms, exact_qps = timed_search(lambda query: index.search(query, k=10), queries)
+    expected = [{chunk_id for chunk_id, _ in hits} for hits in exact]
+
+    nlist = int(4 * math.sqrt(count))
+    print(f"\n{'index':<18} {'train s':>8} {'add s':>7} {'MB':>7}")
+    indexes = {}
+    for label, m in (("IVF-Flat", 0), (f"IVF-PQ{pq_m}", pq_m)):
+        start = time.perf_counter()
+        ann = IVFIndex.train(index.vectors, nlist, m)
+        trained = time.perf_counter() - start
+        start = time.perf_counter()
+        ann.add(index.ids, index.vectors, index.langs)
+        added = time.perf_counter() - start
+        size = sum(data.nbytes for data in ann.list_data) + 17 * len(ann)
+        print(f"{label:<18} {trained:>8.1f} {added:>7.1f} {size / 2**20:>7.0f}")
+        indexes[label] = ann
+
+    print(f"\n{'search':<26} {'nprobe':>6} {'recall@10':>9} {'p50 ms':>7} {'QPS':>7}")
+    print(f"{'exact scan':<26} {'-':>6} {1.0:>9.3f} {exact_ms:>7.2f} {exact_qps:>7.0f}")
+    for label, ann in indexes.items():
+        variants = [(label, None)]
+        if ann.pq_m:
+            variants.append((f"{label} + re-rank x{ANN_REFINE}", index.vectors_for))
+        for name, rerank in variants:
+            for nprobe in NPROBES:
+                results, p50, qps = timed_search(
+                    lambda query: ann.search(query, 10, nprobe, exact=rerank, refine=ANN_REFINE), queries
+                )
+                print(f"{name:<26} {nprobe:>6} {recall(results, expected):>9.3f} {p50:>7.2f} {qps:>7.0f}")
+
+    ann = indexes["IVF-Flat"]
+    changed = rng.choice(count, 1000, replace=False)
+    start = time.perf_counter()
+    ann.remove(index.ids[changed])
+    ann.add(index.ids[changed], index.vectors[changed], index.langs[changed])
+    print(f"\nIncremental update of 1,000 chunks: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 32,
+    )
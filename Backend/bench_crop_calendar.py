@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark batch crop calendar generation against the database in DATABASE_URL
+
+Creates a throwaway user with N plots, generates every plot's season tasks in
+one batch and reports the time taken, then removes the data again.
+
+Usage:
+    python bench_crop_calendar.py [plot_count]
+"""
+
+import asyncio
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+from database.config import get_database
+from utils.crop_calendar import generate_calendars, regenerate_plot_calendar
+
+VARIETIES = ["OM 5451", "OM 18", "ST25", "Jasmine 85", None]
+
+async def run_benchmark(plot_count: int):
+    conn = await get_database()
+    user_id = uuid.uuid4()
+    try:
+        await conn.execute('''
+            INSERT INTO core.user (id, email, password_hash, display_name)
+            VALUES ($1, $2, 'x', 'Calendar Benchmark')
+        ''', user_id, f"bench-{user_id}@airrvie.app")
+        farm_id = await conn.fetchval('''
+            INSERT INTO core.farm (user_id, name, province, district)
+            VALUES ($1, 'Benchmark Farm', 'An Giang', 'Châu Thành') RETURNING id
+        ''', user_id)
+        plot_ids = [uuid.uuid4() for _ in range(plot_count)]
+        await conn.copy_records_to_table(
+            "plot", schema_name="core",
+            columns=["id", "farm_id", "name", "area_m2", "variety", "planting_date"],
+            records=[
+                (plot_id, farm_id, f"Plot {n}", 1000, VARIETIES[n % len(VARIETIES)], date.today() + timedelta(days=n % 60))
+                for n, plot_id in enumerate(plot_ids)
+            ],
+        )
+
+        start = time.perf_counter()
+        created = await generate_calendars(conn, plot_ids)
+        elapsed = time.perf_counter() - start
+        print(f"Generated {created} tasks for {plot_count} plots in {elapsed:.2f}s ({created / elapsed:.0f} tasks/sec)")
+
+        start = time.perf_counter()
+        await conn.execute("UPDATE core.plot SET planting_date = planting_date + 3 WHERE id = $1", plot_ids[0])
+        await regenerate_plot_calendar(conn, plot_ids[0])
+        print(f"Regenerated one plot in {(time.perf_counter() - start) * 1000:.1f}ms")
+    finally:
+        await conn.execute("DELETE FROM core.user WHERE id = $1", user_id)
+        await conn.close()
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10000))
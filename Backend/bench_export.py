@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for /api/journal/export against the database in DATABASE_URL
+
+Creates a throwaway user with 1,000,000 journal entries, starts the API in its
+own process and streams the export as NDJSON and then CSV. It samples the
+server's resident memory (VmRSS) while the body is read. The worker's RSS
+should stay flat: rows pass through a server-side cursor, never a list.
+
+Usage:
+    python bench_export.py [entries]
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+import requests
+
+from database.config import get_database
+from test_invalidation import start_instance
+from utils.auth import create_access_token
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+async def create_user(entries: int) -> uuid.UUID:
+    conn = await get_database()
+    try:
+        user_id = uuid.uuid4()
+        await conn.execute('''
+            INSERT INTO core.user (id, email, password_hash, display_name)
+            VALUES ($1, $2, 'x', 'Bench Export')
+        ''', user_id, f"bench-export-{user_id}@airrvie.app")
+        farm_id = await conn.fetchval('''
+            INSERT INTO core.farm (user_id, name, province, district)
+            VALUES ($1, 'Bench Farm', 'An Giang', 'Chợ Mới') RETURNING id
+        ''', user_id)
+        plot_id = await conn.fetchval('''
+            INSERT INTO core.plot (farm_id, name, area_m2) VALUES ($1, 'Bench Plot', 5000) RETURNING id
+        ''', farm_id)
+        start = date(2020, 1, 1)
+        await conn.copy_records_to_table("journal_entry", schema_name="core",
+            columns=["plot_id", "user_id", "title", "content", "entry_date", "type"],
+            records=((plot_id, user_id, f"Entry {n}", "Bón phân đợt 2, ruộng khô ráo, lúa đẻ nhánh tốt.",
+                      start + timedelta(days=n % 2000), "fertilizer") for n in range(entries)))
+        await conn.execute("ANALYZE core.journal_entry")
+        return user_id
+    finally:
+        await conn.close()
+
+async def delete_user(user_id: uuid.UUID):
+    conn = await get_database()
+    try:
+        await conn.execute("DELETE FROM core.user WHERE id = $1", user_id)
+    finally:
+        await conn.close()
+
+def stream(url: str, headers: dict, fmt: str, pid: int):
+    samples = [rss_mb(pid)]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.05):
+            samples.append(rss_mb(pid))
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    size = 0
+    start = time.perf_counter()
+    try:
+        with requests.get(f"{url}/api/journal/export", params={"format": fmt}, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=256 * 1024):
+                size += len(chunk)
+    finally:
+        done.set()
+        sampler.join()
+    elapsed = time.perf_counter() - start
+    print(f"{fmt:<8} {size / 2**20:>9.1f} {elapsed:>8.1f} {samples[0]:>10.1f} {max(samples):>10.1f} {samples[-1]:>10.1f}")
+
+def run_benchmark(entries: int):
+    print(f"Creating {entries:,} journal entries...")
+    user_id = asyncio.run(create_user(entries))
+    process, url = start_instance()
+    try:
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+        # Warm the worker (imports, pool) so the first sample is its steady state
+        requests.get(f"{url}/api/journal/export", params={"to": "2000-01-01"}, headers=headers).raise_for_status()
+        print(f"\n{'format':<8} {'body MB':>9} {'seconds':>8} {'RSS start':>10} {'RSS peak':>10} {'RSS end':>10}")
+        for fmt in ("ndjson", "csv"):
+            stream(url, headers, fmt, process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+        asyncio.run(delete_user(user_id))
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for hybrid knowledge retrieval against the database in DATABASE_URL
+
+Loads the synthetic chunks of bench_knowledge_search.py (120,000 by default),
+embeds them, and times for a mix of assistant-style questions (with and
+without tone marks, common and rare terms):
+  - lexical:  search_knowledge (stored tsvectors, trigram fallback), 30 candidates
+  - semantic: semantic_knowledge (exact vector search), 30 candidates
+  - hybrid:   hybrid_knowledge, both concurrently plus fusion, cache cleared
+  - cached:   hybrid_knowledge repeated for the same normalized question
+The synthetic chunks are removed afterwards.
+
+Usage:
+    python bench_hybrid_retrieval.py [chunks] [iterations]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from bench_knowledge_search import SOURCE, load_chunks
+from database.config import close_pool, get_database, get_pool
+from utils import knowledge, vector_index
+from utils.embeddings import embed_chunks
+from utils.knowledge import hybrid_knowledge, search_knowledge, semantic_knowledge
+
+QUESTIONS = [
+    "Lúa bị vàng lá phải làm sao?",
+    "cach phong tru ray nau",
+    "Bón đạm và kali khi nào?",
+    "đạo ôn cổ bông",
+    "giong1234 có chịu mặn không",
+    "oc buou vang pha hai",
+    "Ruộng bị nhiễm phèn, mặn thì xử lý thế nào?",
+    "chuột cắn phá lúa",
+]
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return statistics.median(timings), timings[max(0, int(len(timings) * 0.95) - 1)]
+
+async def time_calls(call, iterations: int, before=None):
+    timings = []
+    for _ in range(iterations):
+        for question in QUESTIONS:
+            if before:
+                before()
+            start = time.perf_counter()
+            await call(question)
+            timings.append((time.perf_counter() - start) * 1000)
+    return percentiles(timings)
+
+async def run_benchmark(count: int, iterations: int):
+    conn = await get_database()
+    try:
+        print(f"Loading {count:,} chunks...")
+        await load_chunks(conn, count)
+        start = time.perf_counter()
+        await embed_chunks(conn, batch_size=2000)
+        print(f"Embedded in {time.perf_counter() - start:.1f}s")
+        await vector_index.write_snapshot(conn)  # as the knowledge.embed job does
+        vector_index._index = None
+        pool = await get_pool()
+        async with pool.acquire() as pooled:
+            index = await vector_index.get_vector_index(pooled)
+        print(f"Vector index: {len(index):,} chunks, {'IVF' if index.ann is not None else 'exact'} search")
+
+        async def lexical(question):
+            async with pool.acquire() as pooled:
+                return await search_knowledge(pooled, question, "vi", 30)
+
+        async def semantic(question):
+            async with pool.acquire() as pooled:
+                return await semantic_knowledge(pooled, question, "vi", 30)
+
+        def clear():
+            knowledge._retrievals.evict()
+
+        await hybrid_knowledge(QUESTIONS[0])  # warm up connections and the index
+
+        print(f"\n{'retrieval':<12} {'p50 ms':>8} {'p95 ms':>8}")
+        for label, call, before in (
+            ("lexical", lexical, None),
+            ("semantic", semantic, None),
+            ("hybrid", hybrid_knowledge, clear),
+            ("cached", hybrid_knowledge, None),
+        ):
+            p50, p95 = await time_calls(call, iterations, before)
+            print(f"{label:<12} {p50:>8.2f} {p95:>8.2f}")
+
+        print("\nTop results:")
+        for question in QUESTIONS[:3]:
+            titles = [chunk["title"] for chunk in await hybrid_knowledge(question, limit=3)]
+            print(f"  {question!r}: {titles}")
+    finally:
+        await conn.execute("DELETE FROM core.knowledge_chunk WHERE source = $1", SOURCE)
+        await conn.close()
+        await close_pool()
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 120_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+    ))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for bulk knowledge ingestion against the database in DATABASE_URL
+
+Writes synthetic Markdown documents (100,000 chunks by default, 50 sections
+per file, vocabulary from bench_knowledge_search.py) to a temporary
+directory and compares:
+  - row by row: one INSERT per chunk, then embed_chunks() (the only way to
+    load content before), on a 2,000 chunk sample and extrapolated
+  - ingest_directory(): chunking, dedupe, process-pool embeddings, COPY in
+    batches, index refresh and vector snapshot
+The chunks are removed afterwards.
+
+Usage:
+    python bench_ingest.py [chunks] [workers]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bench_knowledge_search import MEDIUM, sentence
+from database.config import get_database
+from utils.embeddings import embed_chunks
+from utils.ingest import ingest_directory, split_document
+
+SOURCE = "bench-ingest"
+SECTIONS_PER_FILE = 50
+SAMPLE = 2000
+
+def write_documents(directory: str, chunks: int) -> None:
+    rng = random.Random(11)
+    os.makedirs(os.path.join(directory, SOURCE))
+    for number in range((chunks + SECTIONS_PER_FILE - 1) // SECTIONS_PER_FILE):
+        sections = min(SECTIONS_PER_FILE, chunks - number * SECTIONS_PER_FILE)
+        body = [f"# Tài liệu {number}"]
+        for section in range(sections):
+            # About 1,000 characters: one chunk per section
+            body.append(f"## {' '.join(rng.choices(MEDIUM, k=3)).capitalize()} {section}")
+            body.append(" ".join(sentence(rng) for _ in range(14)))
+        with open(os.path.join(directory, SOURCE, f"tai_lieu_{number:05d}.md"), "w") as f:
+            f.write("\n\n".join(body))
+
+async def row_by_row(conn, directory: str) -> float:
+    """Seconds for INSERT + embed_chunks of the first SAMPLE chunks"""
+    chunks = []
+    for name in sorted(os.listdir(os.path.join(directory, SOURCE))):
+        with open(os.path.join(directory, SOURCE, name)) as f:
+            chunks += split_document(f.read(), name)
+        if len(chunks) >= SAMPLE:
+            break
+    start = time.perf_counter()
+    ids = []
+    for title, content in chunks[:SAMPLE]:
+        ids.append(await conn.fetchval('''
+            INSERT INTO core.knowledge_chunk (source, title, content, lang) VALUES ($1, $2, $3, 'vi') RETURNING id
+        ''', f"{SOURCE}-rows", title, content))
+    await embed_chunks(conn, [str(chunk_id) for chunk_id in ids])
+    return time.perf_counter() - start
+
+async def run_benchmark(chunks: int, workers: int):
+    conn = await get_database()
+    try:
+        with tempfile.TemporaryDirectory() as directory, tempfile.TemporaryDirectory() as index_directory:
+            write_documents(directory, chunks)
+            print(f"Wrote {chunks:,} sections in {len(os.listdir(os.path.join(directory, SOURCE))):,} Markdown files")
+
+            elapsed = await row_by_row(conn, directory)
+            print(f"\nrow by row:  {SAMPLE:,} chunks in {elapsed:.1f}s ({SAMPLE / elapsed:,.0f}/s), "
+                  f"{chunks:,} would take ~{chunks / SAMPLE * elapsed / 60:.0f} min")
+            await conn.execute("DELETE FROM core.knowledge_chunk WHERE source = $1", f"{SOURCE}-rows")
+
+            start = time.perf_counter()
+            stats = await ingest_directory(conn, directory, workers=workers, index_directory=index_directory)
+            elapsed = time.perf_counter() - start
+            print(f"bulk ingest: {stats['inserted']:,} chunks in {elapsed:.1f}s ({stats['inserted'] / elapsed:,.0f}/s) "
+                  f"with {workers} embedding process(es)")
+            print(f"             load {stats['loadSeconds']}s, refresh {stats['refreshSeconds']}s")
+
+            start = time.perf_counter()
+            stats = await ingest_directory(conn, directory, workers=workers, index_directory=index_directory)
+            print(f"re-run:      {stats['duplicates']:,} duplicates skipped in {time.perf_counter() - start:.1f}s")
+    finally:
+        await conn.execute("DELETE FROM core.knowledge_chunk WHERE source LIKE $1", f"{SOURCE}%")
+        await conn.close()
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1),
+    ))
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for assistant intent matching
+
+Generates intents of 3 Vietnamese phrases each (10 to 1,000 intents) and
+times, per message of a mix of assistant-style questions:
+  - keyword loop: lowercase the message and test `phrase in message` for
+    every phrase, as generate_ai_response did (without rebuilding its dict)
+  - automaton:    IntentMatcher.match (one pass, all intents, scored)
+plus the one-off build time of the automaton.
+
+Usage:
+    python bench_intents.py [iterations]
+"""
+
+import random
+import statistics
+import sys
+import time
+
+from utils.intents import IntentMatcher
+
+QUESTIONS = [
+    "Tôi nên làm gì khi lúa bị vàng lá?",
+    "Khi nào nên bón phân cho lúa giai đoạn đẻ nhánh, ruộng hơi phèn?",
+    "cach phong tru ray nau hieu qua nhat",
+    "Làm thế nào để kiểm soát mực nước trong ruộng khi trời mưa nhiều?",
+    "xin chào",
+]
+
+SYLLABLES = ["lúa", "vàng", "lá", "bón", "phân", "rầy", "nâu", "nước", "sâu", "cuốn", "đạo", "ôn", "bông",
+             "thối", "thân", "đốm", "nâu", "cháy", "bìa", "mặn", "phèn", "đòng", "chuột", "ốc", "bươu", "giống"]
+
+def make_intents(count: int, rng: random.Random):
+    return [
+        {"id": f"intent{number}", "phrases": [" ".join(rng.sample(SYLLABLES, rng.randint(2, 3))) for _ in range(3)]}
+        for number in range(count)
+    ]
+
+def keyword_loop(intents, message: str):
+    lowered = message.lower()
+    for intent in intents:
+        for phrase in intent["phrases"]:
+            if phrase in lowered:
+                return intent
+    return None
+
+def time_per_message(call, iterations: int) -> float:
+    timings = []
+    for _ in range(iterations):
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            call(question)
+            timings.append((time.perf_counter() - start) * 1_000_000)
+    return statistics.median(timings)
+
+def run_benchmark(iterations: int):
+    rng = random.Random(5)
+    print(f"{'intents':>8} {'build ms':>9} {'loop µs':>9} {'automaton µs':>13}")
+    for count in (10, 100, 1000):
+        intents = make_intents(count, rng)
+        start = time.perf_counter()
+        matcher = IntentMatcher(intents)
+        build = (time.perf_counter() - start) * 1000
+        loop = time_per_message(lambda message: keyword_loop(intents, message), iterations)
+        automaton = time_per_message(matcher.match, iterations)
+        print(f"{count:>8} {build:>9.1f} {loop:>9.1f} {automaton:>13.1f}")
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
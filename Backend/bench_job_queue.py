@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for sys.job_queue against the database in DATABASE_URL
+
+Compares single-row enqueue with enqueue_many (multi-row INSERT and COPY), and
+one-at-a-time claim/ack with batched claim/ack, reporting jobs/sec.
+
+Usage:
+    python bench_job_queue.py [job_count]
+"""
+
+import asyncio
+import sys
+import time
+
+from database.config import get_database
+from workers import queue
+
+BENCH_JOB_TYPE = "bench_job_queue"
+WORKER_ID = "bench"
+
+def report(label: str, count: int, elapsed: float):
+    print(f"{label:<40} {count:>8} jobs  {elapsed:>7.2f}s  {count / elapsed:>10.0f} jobs/sec")
+
+async def clear(conn):
+    await conn.execute("DELETE FROM sys.job_queue WHERE job_type = $1", BENCH_JOB_TYPE)
+
+async def drain(conn, batch_size: int) -> int:
+    processed = 0
+    while True:
+        jobs = await queue.claim_jobs(conn, BENCH_JOB_TYPE, WORKER_ID, batch_size)
+        if not jobs:
+            return processed
+        if batch_size == 1:
+            await queue.complete_job(conn, jobs[0]["id"])
+        else:
+            await queue.complete_jobs(conn, [job["id"] for job in jobs])
+        processed += len(jobs)
+
+async def run_benchmark(job_count: int):
+    conn = await get_database()
+    try:
+        await clear(conn)
+        payloads = [{"task_id": n, "kind": "reminder"} for n in range(job_count)]
+
+        print("\n=== Enqueue ===")
+        single_count = min(job_count, 2000)
+        start = time.perf_counter()
+        for payload in payloads[:single_count]:
+            await queue.enqueue(conn, BENCH_JOB_TYPE, payload)
+        report("enqueue (one row per statement)", single_count, time.perf_counter() - start)
+        await clear(conn)
+
+        start = time.perf_counter()
+        await queue.enqueue_many(conn, BENCH_JOB_TYPE, payloads, dedupe_keys=[str(n) for n in range(job_count)])
+        report("enqueue_many (INSERT ... unnest, dedupe)", job_count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        skipped = job_count - await queue.enqueue_many(
+            conn, BENCH_JOB_TYPE, payloads, dedupe_keys=[str(n) for n in range(job_count)]
+        )
+        report(f"enqueue_many re-run ({skipped} deduped)", job_count, time.perf_counter() - start)
+        await clear(conn)
+
+        start = time.perf_counter()
+        await queue.enqueue_many(conn, BENCH_JOB_TYPE, payloads)
+        report("enqueue_many (COPY)", job_count, time.perf_counter() - start)
+
+        print("\n=== Claim + acknowledge ===")
+        for batch_size in (1, 10, 100, 500):
+            await clear(conn)
+            await queue.enqueue_many(conn, BENCH_JOB_TYPE, payloads[:single_count] if batch_size == 1 else payloads)
+            start = time.perf_counter()
+            processed = await drain(conn, batch_size)
+            report(f"claim/ack batch_size={batch_size}", processed, time.perf_counter() - start)
+
+        await clear(conn)
+    finally:
+        await conn.close()
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
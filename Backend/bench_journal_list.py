@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for GET /api/journal/ against the database in DATABASE_URL
+
+Creates a throwaway user with 5,000 journal entries, then compares:
+  - serialization of rows fetched once:
+      legacy:   dicts with str()/isoformat(), the List[Dict[str, Any]] response_model
+                validation pass, then stdlib json
+      orjson:   dicts of the raw row values rendered by ORJSONResponse
+  - query plus encoding:
+      rows:     fetch the rows, then the orjson path above
+      database: JOURNAL_LIST_QUERY, the finished JSON array as bytes (the handler now)
+Reports p50/p95 (and this process's CPU time and peak memory for the second set), checks that all
+variants produce the same list, then times the whole request through the app.
+
+Usage:
+    python bench_journal_list.py [iterations]
+"""
+
+import asyncio
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+import httpx
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from api.journal import JOURNAL_LIST_QUERY, format_journal_entry
+from database.config import close_pool, create_pool
+from main import app
+from utils.auth import create_access_token
+from utils.responses import ORJSONResponse
+
+ENTRIES = 5000
+PLOTS = 10
+
+JOURNAL_QUERY = '''
+    SELECT j.id, j.plot_id, j.entry_date, j.type, j.title, j.content,
+           j.photos, j.audio_url, j.created_at,
+           p.name AS plot_name, f.name AS farm_name
+    FROM core.journal_entry j
+    JOIN core.plot p ON j.plot_id = p.id
+    JOIN core.farm f ON p.farm_id = f.id
+    WHERE j.user_id = $1::uuid AND j.deleted_at IS NULL
+      AND p.deleted_at IS NULL AND f.deleted_at IS NULL
+    ORDER BY j.entry_date DESC, j.created_at DESC
+'''
+
+RESPONSE_FIELD = create_model_field(name="Response", type_=List[Dict[str, Any]], mode="serialization")
+
+def legacy_entry(r) -> dict:
+    return {
+        "id": str(r["id"]),
+        "plotId": str(r["plot_id"]),
+        "date": r["entry_date"].isoformat(),
+        "type": r["type"],
+        "title": r["title"],
+        "content": r["content"],
+        "photos": json.loads(r["photos"]) if r["photos"] else [],
+        "audioNote": r["audio_url"],
+        "plotName": r["plot_name"],
+        "farmName": r["farm_name"],
+        "createdAt": r["created_at"].isoformat(),
+    }
+
+async def legacy_body(rows) -> bytes:
+    content = await serialize_response(field=RESPONSE_FIELD, response_content=[legacy_entry(r) for r in rows])
+    return JSONResponse(content).body
+
+async def orjson_body(rows) -> bytes:
+    return ORJSONResponse([format_journal_entry(r) for r in rows]).body
+
+async def rows_body(conn, user_id) -> bytes:
+    return await orjson_body(await conn.fetch(JOURNAL_QUERY, user_id))
+
+async def database_body(conn, user_id) -> bytes:
+    return await conn.fetchval(JOURNAL_LIST_QUERY.format(plot_filter=""), user_id)
+
+def instants(entries: list) -> list:
+    """Entries with createdAt as an instant (Postgres trims trailing zeros from fractions)"""
+    return [{**entry, "createdAt": datetime.fromisoformat(entry["createdAt"]).timestamp()} for entry in entries]
+
+async def create_user(conn) -> uuid.UUID:
+    user_id = uuid.uuid4()
+    await conn.execute('''
+        INSERT INTO core.user (id, email, password_hash, display_name)
+        VALUES ($1, $2, 'x', 'Bench Journal')
+    ''', user_id, f"bench-journal-{user_id}@airrvie.app")
+    farm_id = await conn.fetchval('''
+        INSERT INTO core.farm (user_id, name, province, district)
+        VALUES ($1, 'Bench Farm', 'An Giang', 'Chợ Mới') RETURNING id
+    ''', user_id)
+    plot_ids = [await conn.fetchval('''
+        INSERT INTO core.plot (farm_id, name, area_m2) VALUES ($1, $2, 5000) RETURNING id
+    ''', farm_id, f"Plot {n}") for n in range(PLOTS)]
+
+    today = date.today()
+    now = datetime.now(timezone.utc)
+    await conn.copy_records_to_table("journal_entry", schema_name="core",
+        columns=["plot_id", "user_id", "title", "content", "entry_date", "type", "created_at"],
+        records=[(plot_ids[n % PLOTS], user_id, f"Entry {n}", "Bón phân đợt 2, ruộng khô ráo, lúa đẻ nhánh tốt.",
+                  today - timedelta(days=n % 365), "fertilizer", now - timedelta(seconds=n, microseconds=n))
+                 for n in range(ENTRIES)])
+    await conn.execute("ANALYZE core.journal_entry")
+    return user_id
+
+def report(label: str, timings: List[float], extra: str = ""):
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<40} {statistics.median(timings):>8.2f} {p95:>8.2f}{extra}")
+
+async def run_benchmark(iterations: int):
+    pool = await create_pool(min_size=1, max_size=1)
+    try:
+        async with pool.acquire() as conn:
+            user_id = await create_user(conn)
+        try:
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(JOURNAL_QUERY, user_id)
+            assert len(rows) == ENTRIES
+
+            variants = [("legacy (response_model + json)", legacy_body), ("orjson (raw values)", orjson_body)]
+            bodies = [json.loads(await variant(rows)) for _, variant in variants]
+            assert bodies[0] == bodies[1], "Serializers disagree"
+            print(f"✅ Both serializers produce the same {ENTRIES}-entry list")
+
+            print(f"\n{'serialization only':<40} {'p50 ms':>8} {'p95 ms':>8}")
+            for label, variant in variants:
+                timings = []
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    await variant(rows)
+                    timings.append((time.perf_counter() - start) * 1000)
+                report(label, timings)
+
+            # CPU is this process only: the API worker's share, not Postgres'
+            print(f"\n{'query + encode':<40} {'p50 ms':>8} {'p95 ms':>8} {'CPU ms':>8} {'peak MB':>8}")
+            for label, variant in [("rows + orjson", rows_body), ("database JSON (json_agg)", database_body)]:
+                async with pool.acquire() as conn:
+                    assert instants(json.loads(await variant(conn, user_id))) == instants(bodies[0]), f"{label} disagrees"
+                    timings, cpu = [], []
+                    for _ in range(iterations):
+                        start, start_cpu = time.perf_counter(), time.process_time()
+                        await variant(conn, user_id)
+                        timings.append((time.perf_counter() - start) * 1000)
+                        cpu.append((time.process_time() - start_cpu) * 1000)
+                    tracemalloc.start()
+                    await variant(conn, user_id)
+                    peak = tracemalloc.get_traced_memory()[1] / 2**20
+                    tracemalloc.stop()
+                report(label, timings, f" {statistics.median(cpu):>8.2f} {peak:>8.1f}")
+
+            headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+                response = await client.get("/api/journal/")
+                assert response.status_code == 200 and instants(response.json()) == instants(bodies[0]), response.text[:200]
+                timings = []
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    await client.get("/api/journal/")
+                    timings.append((time.perf_counter() - start) * 1000)
+            print(f"\n{'whole request (query + encode)':<40} {'p50 ms':>8} {'p95 ms':>8}")
+            report("GET /api/journal/", timings)
+        finally:
+            async with pool.acquire() as conn:
+                await conn.execute("DELETE FROM core.user WHERE id = $1", user_id)
+    finally:
+        await pool.close()
+        await close_pool()
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for knowledge base search against the database in DATABASE_URL
+
+Loads synthetic Vietnamese chunks (120,000 by default) and compares:
+  - per-row:  the previous query, to_tsvector() on title and content of every chunk
+  - stored:   utils.knowledge.SEARCH_QUERY on the generated search_vector and
+              search_vector_unaccented columns and their GIN indexes
+for frequent, medium and rare terms, with and without tone marks, checks the
+stored query finds at least what the per-row query finds, and prints the plan
+the stored query uses for a rare term. The synthetic chunks are
+removed afterwards.
+
+Usage:
+    python bench_knowledge_search.py [chunks] [iterations]
+"""
+
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from database.config import get_database
+from utils.knowledge import SEARCH_QUERY
+
+SOURCE = "bench_knowledge_search"
+
+PER_ROW_QUERY = '''
+    SELECT id, source, title, content, lang, tags
+    FROM core.knowledge_chunk
+    WHERE (lang = $1 OR lang = 'both') AND deleted_at IS NULL
+    AND (to_tsvector('simple', content) @@ plainto_tsquery('simple', $2)
+         OR to_tsvector('simple', title) @@ plainto_tsquery('simple', $2))
+    AND ($4::text[] IS NULL OR tags && $4)
+    ORDER BY ts_rank(to_tsvector('simple', content), plainto_tsquery('simple', $2)) DESC
+    LIMIT $3
+'''
+
+COMMON = ["lúa", "ruộng", "nước", "phân", "bón", "giống", "cây", "lá", "thu", "hoạch", "gieo", "sạ",
+          "đất", "mùa", "vụ", "nông", "dân", "ngày", "tuần", "kỹ", "thuật", "chăm", "sóc", "tưới"]
+MEDIUM = ["đạo", "ôn", "rầy", "nâu", "sâu", "cuốn", "khô", "vằn", "đốm", "nâu", "bạc", "lá", "ốc",
+          "bươu", "vàng", "chuột", "cỏ", "dại", "phèn", "mặn", "hạn", "lũ", "đạm", "lân", "kali", "urê"]
+RARE = [f"giong{n}" for n in range(2000)]  # variety codes: each appears in few chunks
+
+def sentence(rng: random.Random) -> str:
+    words = rng.choices(COMMON, k=8) + rng.choices(MEDIUM, k=3)
+    if rng.random() < 0.2:
+        words.append(rng.choice(RARE))
+    rng.shuffle(words)
+    return " ".join(words).capitalize() + "."
+
+async def load_chunks(conn, count: int):
+    rng = random.Random(7)
+    batch = 10000
+    for offset in range(0, count, batch):
+        await conn.copy_records_to_table("knowledge_chunk", schema_name="core",
+            columns=["source", "title", "content", "lang", "tags"],
+            records=[(SOURCE, " ".join(rng.choices(MEDIUM, k=3)).capitalize(),
+                      " ".join(sentence(rng) for _ in range(rng.randint(5, 15))), "vi", ["bench"])
+                     for _ in range(min(batch, count - offset))])
+    await conn.execute("ANALYZE core.knowledge_chunk")
+
+async def time_query(conn, query: str, term: str, iterations: int):
+    timings, matches = [], 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        matches = len(await conn.fetch(query, "vi", term, 10, None))
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1], matches
+
+async def run_benchmark(count: int, iterations: int):
+    conn = await get_database()
+    try:
+        print(f"Loading {count:,} chunks...")
+        start = time.perf_counter()
+        await load_chunks(conn, count)
+        print(f"Loaded in {time.perf_counter() - start:.1f}s (search_vector is computed on insert)")
+
+        plan = await conn.fetch("EXPLAIN " + SEARCH_QUERY.replace("$1", "'vi'").replace("$2", "'giong1234'").replace("$3", "10").replace("$4", "NULL"))
+        print("\nStored-column plan for a rare term:\n  " + "\n  ".join(row[0] for row in plan))
+
+        terms = [("frequent", "lúa"), ("medium", "rầy nâu"), ("no tone marks", "ray nau"),
+                 ("rare", "giong1234"), ("no match", "xyzabc")]
+        print(f"\n{'term':<28} {'query':<10} {'p50 ms':>8} {'p95 ms':>8} {'rows':>5}")
+        for label, term in terms:
+            results = []
+            for name, query in (("per-row", PER_ROW_QUERY), ("stored", SEARCH_QUERY)):
+                p50, p95, matches = await time_query(conn, query, term, iterations)
+                results.append(matches)
+                print(f"{label + ' (' + term + ')':<28} {name:<10} {p50:>8.2f} {p95:>8.2f} {matches:>5}")
+            assert results[1] >= results[0], f"Stored query misses matches for {term!r}"
+    finally:
+        await conn.execute("DELETE FROM core.knowledge_chunk WHERE source = $1", SOURCE)
+        await conn.close()
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 120_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+    ))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for the assistant's reply cache
+
+Times, per question:
+  - lookup: ResponseCache.lookup in a bucket of 100 to 5,000 cached replies,
+    for an exact hit, a similar question and a miss (the miss embeds the
+    question and scans the whole bucket)
+  - reply:  generate_ai_response against the database in DATABASE_URL
+    without the cache (retrieval and the configured reply backend) and with
+    it warm
+plus the hit rate of a stream of repeated and rephrased questions.
+
+Usage:
+    python bench_response_cache.py [iterations]
+"""
+
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from api.assistant import generate_ai_response
+from database.config import close_pool
+from utils.invalidation import InvalidationBus, invalidation_bus
+from utils.response_cache import ResponseCache, response_cache
+
+# Each question with a rephrasing a farmer might send instead
+QUESTIONS = [
+    ("Lúa bị vàng lá phải làm sao?", "vàng lá lúa phải làm sao"),
+    ("Bón phân cho lúa thế nào", "Cách bón phân cho lúa"),
+    ("Cách phòng trừ rầy nâu hiệu quả", "phòng trừ rầy nâu hiệu quả nhất"),
+    ("Giữ mực nước ruộng bao nhiêu khi lúa đẻ nhánh", "mực nước ruộng khi lúa đẻ nhánh bao nhiêu"),
+]
+REPLY = {"content": "…", "metadata": {}}
+SYLLABLES = ["lúa", "vàng", "lá", "bón", "phân", "rầy", "nâu", "nước", "sâu", "cuốn", "đạo", "ôn", "bông",
+             "thối", "thân", "đốm", "cháy", "bìa", "mặn", "phèn", "đòng", "chuột", "ốc", "bươu", "giống"]
+
+def median_us(call, questions, iterations: int) -> float:
+    timings = []
+    for _ in range(iterations):
+        for question in questions:
+            start = time.perf_counter()
+            call(question)
+            timings.append((time.perf_counter() - start) * 1_000_000)
+    return statistics.median(timings)
+
+def bench_lookup(iterations: int):
+    rng = random.Random(7)
+    print(f"{'entries':>8} {'exact µs':>9} {'similar µs':>11} {'miss µs':>8}")
+    for size in (100, 1000, 5000):
+        cache = ResponseCache(max_entries=size + len(QUESTIONS), bus=InvalidationBus())
+        for _ in range(size):
+            question = " ".join(rng.sample(SYLLABLES, 5))
+            cache.store(cache.lookup(question, "bench"), REPLY)
+        for question, _ in QUESTIONS:
+            cache.store(cache.lookup(question, "bench"), REPLY)
+        exact = median_us(lambda question: cache.lookup(question, "bench"), [q for q, _ in QUESTIONS], iterations)
+        similar = median_us(lambda question: cache.lookup(question, "bench"), [r for _, r in QUESTIONS], iterations)
+        miss = median_us(lambda question: cache.lookup(question, "bench"), ["Giá lúa hôm nay bao nhiêu"], iterations)
+        print(f"{size:>8} {exact:>9.1f} {similar:>11.1f} {miss:>8.1f}")
+
+async def bench_reply(iterations: int):
+    uncached, cached = [], []
+    for _ in range(iterations):
+        for question, _ in QUESTIONS:
+            invalidation_bus.invalidate_locally("knowledge", None)  # the retrieval cache too
+            start = time.perf_counter()
+            await generate_ai_response(question, {}, None, "bench")
+            uncached.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            await generate_ai_response(question, {}, None, "bench")
+            cached.append((time.perf_counter() - start) * 1000)
+    print(f"\nreply without cache: {statistics.median(uncached):.2f} ms, cache hit: {statistics.median(cached):.3f} ms")
+
+    invalidation_bus.invalidate_locally("knowledge", None)
+    before = response_cache.stats()
+    stream = [question for pair in QUESTIONS for question in pair] * 3
+    random.Random(3).shuffle(stream)
+    for question in stream:
+        await generate_ai_response(question, {}, None, "bench")
+    after = response_cache.stats()
+    hits, semantic_hits = after["hits"] - before["hits"], after["semanticHits"] - before["semanticHits"]
+    print(f"{len(stream)} questions ({len(QUESTIONS)} topics, 2 phrasings each): "
+          f"hit rate {(hits + semantic_hits) / len(stream):.0%} ({semantic_hits} by similarity)")
+
+async def main(iterations: int):
+    bench_lookup(iterations)
+    # Warm the vector index and connection pool first
+    await generate_ai_response(QUESTIONS[0][0], {}, None, "bench")
+    try:
+        await bench_reply(max(iterations // 20, 3))
+    finally:
+        await close_pool()
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100))
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for /api/users/profile against the database in DATABASE_URL
+
+Creates a throwaway user with farms, plots, tasks and journal entries, then
+compares three ways of assembling the profile on a warm connection:
+  - sequential: the four independent queries one after another
+  - fan-out:    the same four queries concurrently on pooled connections
+  - single:     PROFILE_QUERY, one statement returning the finished JSON document
+Reports p50/p95 latency per variant and checks that all three agree.
+
+Usage:
+    python bench_user_profile.py [iterations]
+"""
+
+import asyncio
+import json
+import statistics
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+from api.users import PROFILE_QUERY
+from database.config import create_pool
+
+FARMS = 5
+PLOTS_PER_FARM = 8
+TASKS = 3000
+JOURNAL_ENTRIES = 1500
+
+USER_QUERY = '''
+    SELECT id, phone, email, display_name, locale, font_scale, created_at
+    FROM core.user WHERE id = $1 AND deleted_at IS NULL
+'''
+FARMS_QUERY = '''
+    SELECT f.id, f.name, f.province, f.district, f.created_at,
+           COUNT(p.id) as plot_count
+    FROM core.farm f
+    LEFT JOIN core.plot p ON f.id = p.farm_id AND p.deleted_at IS NULL
+    WHERE f.user_id = $1 AND f.deleted_at IS NULL
+    GROUP BY f.id, f.name, f.province, f.district, f.created_at
+    ORDER BY f.created_at DESC
+'''
+TASKS_QUERY = '''
+    SELECT t.id, t.title, t.due_date, t.priority, t.status, t.type,
+           p.name as plot_name, f.name as farm_name
+    FROM core.task t
+    JOIN core.plot p ON t.plot_id = p.id
+    JOIN core.farm f ON p.farm_id = f.id
+    WHERE t.user_id = $1 AND t.deleted_at IS NULL
+    AND p.deleted_at IS NULL AND f.deleted_at IS NULL
+    ORDER BY t.created_at DESC
+    LIMIT 5
+'''
+JOURNAL_QUERY = '''
+    SELECT j.id, j.title, j.entry_date, j.type,
+           p.name as plot_name, f.name as farm_name
+    FROM core.journal_entry j
+    JOIN core.plot p ON j.plot_id = p.id
+    JOIN core.farm f ON p.farm_id = f.id
+    WHERE j.user_id = $1 AND j.deleted_at IS NULL
+    AND p.deleted_at IS NULL AND f.deleted_at IS NULL
+    ORDER BY j.entry_date DESC, j.created_at DESC
+    LIMIT 5
+'''
+
+def build_profile(user, farms, tasks, journal):
+    """The response body the four-query handler built"""
+    return {
+        "user": {
+            "id": str(user["id"]), "phone": user["phone"], "email": user["email"],
+            "displayName": user["display_name"], "locale": user["locale"],
+            "fontScale": user["font_scale"], "createdAt": user["created_at"].isoformat(),
+        },
+        "farms": [
+            {"id": str(farm["id"]), "name": farm["name"], "province": farm["province"],
+             "district": farm["district"], "plotCount": farm["plot_count"],
+             "createdAt": farm["created_at"].isoformat()}
+            for farm in farms
+        ],
+        "recentTasks": [
+            {"id": str(task["id"]), "title": task["title"], "dueDate": task["due_date"].isoformat(),
+             "priority": task["priority"], "status": task["status"], "type": task["type"],
+             "plotName": task["plot_name"], "farmName": task["farm_name"]}
+            for task in tasks
+        ],
+        "recentJournal": [
+            {"id": str(entry["id"]), "title": entry["title"], "date": entry["entry_date"].isoformat(),
+             "type": entry["type"], "plotName": entry["plot_name"], "farmName": entry["farm_name"]}
+            for entry in journal
+        ],
+    }
+
+async def sequential_profile(pool, user_id):
+    async with pool.acquire() as conn:
+        user = await conn.fetchrow(USER_QUERY, user_id)
+        farms = await conn.fetch(FARMS_QUERY, user_id)
+        tasks = await conn.fetch(TASKS_QUERY, user_id)
+        journal = await conn.fetch(JOURNAL_QUERY, user_id)
+    return json.dumps(build_profile(user, farms, tasks, journal))
+
+async def fan_out_profile(pool, user_id):
+    async def run(method, query):
+        async with pool.acquire() as conn:
+            return await getattr(conn, method)(query, user_id)
+
+    user, farms, tasks, journal = await asyncio.gather(
+        run("fetchrow", USER_QUERY), run("fetch", FARMS_QUERY),
+        run("fetch", TASKS_QUERY), run("fetch", JOURNAL_QUERY),
+    )
+    return json.dumps(build_profile(user, farms, tasks, journal))
+
+async def single_statement_profile(pool, user_id):
+    async with pool.acquire() as conn:
+        return await conn.fetchval(PROFILE_QUERY, user_id)
+
+async def create_user(conn) -> uuid.UUID:
+    user_id = uuid.uuid4()
+    await conn.execute('''
+        INSERT INTO core.user (id, email, password_hash, display_name)
+        VALUES ($1, $2, 'x', 'Bench Profile')
+    ''', user_id, f"bench-profile-{user_id}@airrvie.app")
+    farm_ids = [await conn.fetchval('''
+        INSERT INTO core.farm (user_id, name, province, district)
+        VALUES ($1, $2, 'An Giang', 'Chợ Mới') RETURNING id
+    ''', user_id, f"Farm {n}") for n in range(FARMS)]
+    plot_ids = [await conn.fetchval('''
+        INSERT INTO core.plot (farm_id, name, area_m2) VALUES ($1, $2, 5000) RETURNING id
+    ''', farm_id, f"Plot {n}") for farm_id in farm_ids for n in range(PLOTS_PER_FARM)]
+
+    # Distinct created_at values so "most recent five" is well defined
+    today = date.today()
+    now = datetime.now(timezone.utc)
+    await conn.copy_records_to_table("task", schema_name="core",
+        columns=["plot_id", "user_id", "title", "due_date", "type", "created_at"],
+        records=[(plot_ids[n % len(plot_ids)], user_id, f"Task {n}", today + timedelta(days=n % 120), "other",
+                  now - timedelta(seconds=n)) for n in range(TASKS)])
+    await conn.copy_records_to_table("journal_entry", schema_name="core",
+        columns=["plot_id", "user_id", "title", "entry_date", "type", "created_at"],
+        records=[(plot_ids[n % len(plot_ids)], user_id, f"Entry {n}", today - timedelta(days=n % 365), "other",
+                  now - timedelta(seconds=n)) for n in range(JOURNAL_ENTRIES)])
+    await conn.execute("ANALYZE core.farm; ANALYZE core.plot; ANALYZE core.task; ANALYZE core.journal_entry")
+    return user_id
+
+def normalized(document: str):
+    """Parsed profile with timestamps compared as instants (Postgres and Python format them differently)"""
+    profile = json.loads(document)
+    for item in [profile["user"], *profile["farms"]]:
+        item["createdAt"] = datetime.fromisoformat(item["createdAt"]).timestamp()
+    return profile
+
+async def run_benchmark(iterations: int):
+    pool = await create_pool(min_size=4, max_size=4)
+    try:
+        async with pool.acquire() as conn:
+            user_id = await create_user(conn)
+        try:
+            variants = [
+                ("sequential (4 queries, 1 connection)", sequential_profile),
+                ("fan-out (4 queries, 4 pooled connections)", fan_out_profile),
+                ("single statement (json_agg)", single_statement_profile),
+            ]
+
+            documents = [normalized(await variant(pool, user_id)) for _, variant in variants]
+            assert documents[0] == documents[1] == documents[2], "Profile variants disagree"
+            print("✅ All variants return the same profile")
+
+            print(f"\n{'variant':<45} {'p50 ms':>8} {'p95 ms':>8}")
+            for label, variant in variants:
+                timings = []
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    await variant(pool, user_id)
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                p95 = timings[int(len(timings) * 0.95) - 1]
+                print(f"{label:<45} {statistics.median(timings):>8.2f} {p95:>8.2f}")
+        finally:
+            async with pool.acquire() as conn:
+                await conn.execute("DELETE FROM core.user WHERE id = $1", user_id)
+    finally:
+        await pool.close()
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for exact vector search over knowledge chunk embeddings (no database needed)
+
+Builds a VectorIndex of random unit vectors (1,000,000 x EMBEDDING_DIM by
+default), saves it as a snapshot, memory-maps it back the way API workers do,
+and reports:
+  - snapshot save and load time
+  - top-10 latency for single queries, all languages and filtered to one
+  - top-10 latency per query when queries are searched in batches
+  - HashingEmbedder throughput on chunk-sized texts
+
+Usage:
+    python bench_vector_search.py [chunks] [queries]
+"""
+
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from utils.embeddings import EMBEDDING_DIM, HashingEmbedder
+from utils.vector_index import ID_DTYPE, VectorIndex
+
+CHUNK_TEXT = ("Bón thúc đợt 2 khi lúa đẻ nhánh, 18-22 ngày sau sạ. Lá vàng nhạt là dấu hiệu thiếu đạm; "
+              "giữ mực nước 3-5 cm và thăm đồng để phát hiện rầy nâu, sâu cuốn lá. ") * 4
+
+def random_index(count: int, dim: int) -> VectorIndex:
+    rng = np.random.default_rng(1)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 100_000):
+        block = rng.standard_normal((min(100_000, count - start), dim), dtype=np.float32)
+        vectors[start:start + len(block)] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    ids = np.frombuffer(uuid.uuid4().bytes * count, dtype=ID_DTYPE).copy()
+    langs = rng.integers(0, 2, count).astype(np.uint8)
+    meta = {"embedder": "random", "dim": dim, "count": count, "rows": count, "updatedAt": None}
+    return VectorIndex(vectors, ids, langs, meta)
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return statistics.median(timings), timings[max(0, int(len(timings) * 0.95) - 1)]
+
+def run_benchmark(count: int, query_count: int):
+    dim = EMBEDDING_DIM
+    print(f"Building {count:,} x {dim} float32 index ({count * dim * 4 / 2**20:,.0f} MB)...")
+    index = random_index(count, dim)
+    queries = index.vectors[np.random.default_rng(2).integers(0, count, query_count)].copy()
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        index.save(directory)
+        print(f"Snapshot saved in {time.perf_counter() - start:.2f}s")
+        del index
+        start = time.perf_counter()
+        index = VectorIndex.load(directory)
+        print(f"Snapshot memory-mapped in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        index.search(queries[:1], k=10)
+        print(f"First query (pages the matrix in): {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        print(f"\n{'search':<28} {'p50 ms':>8} {'p95 ms':>8} {'ms/query':>9}")
+        for label, lang in (("single, all languages", None), ("single, lang=vi", "vi")):
+            timings = []
+            for query in queries:
+                start = time.perf_counter()
+                index.search(query, k=10, lang=lang)
+                timings.append((time.perf_counter() - start) * 1000)
+            p50, p95 = percentiles(timings)
+            print(f"{label:<28} {p50:>8.1f} {p95:>8.1f} {p50:>9.1f}")
+
+        for batch in (8, 32):
+            timings = []
+            for offset in range(0, query_count - batch + 1, batch):
+                start = time.perf_counter()
+                index.search(queries[offset:offset + batch], k=10)
+                timings.append((time.perf_counter() - start) * 1000)
+            p50, p95 = percentiles(timings)
+            print(f"{f'batch of {batch}':<28} {p50:>8.1f} {p95:>8.1f} {p50 / batch:>9.1f}")
+        del index
+
+    embedder = HashingEmbedder(dim)
+    texts = [CHUNK_TEXT] * 2000
+    start = time.perf_counter()
+    embedder.embed(texts)
+    elapsed = time.perf_counter() - start
+    print(f"\nHashingEmbedder: {len(texts) / elapsed:,.0f} chunks/s ({len(CHUNK_TEXT)} chars each)")
+
+if __name__ == "__main__":
+    run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 64,
+    )
@@ -1,5 +1,8 @@
+import asyncio
 import asyncpg
 import os
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from typing import Optional
 from dotenv import load_dotenv
 
@@ -8,13 +11,79 @@ load_dotenv()
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Shared application pool, created on first use (see get_pool)
+_pool: Optional[asyncpg.Pool] = None
+_pool_lock = asyncio.Lock()
+
+# Connection that get_database() hands out instead of opening a new one (see use_connection)
+_current_connection: ContextVar[Optional[asyncpg.Connection]] = ContextVar("current_connection", default=None)
+
+class BorrowedConnection:
+    """A connection owned by someone else; handlers may close() it without effect"""
+
+    def __init__(self, conn: asyncpg.Connection):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    async def close(self):
+        pass
+
 async def get_database():
     """Get database connection"""
+    borrowed = _current_connection.get()
+    if borrowed is not None:
+        return BorrowedConnection(borrowed)
+
     if not DATABASE_URL:
         raise ValueError("DATABASE_URL environment variable is not set")
-    
+
     return await asyncpg.connect(DATABASE_URL)
 
+def in_transaction() -> bool:
+    """
+    Whether get_database() hands out a connection in the middle of a transaction
+    (a transactional /api/batch). What it reads may include the batch's own
+    uncommitted writes, so it must neither be served from nor written to a cache.
+    """
+    borrowed = _current_connection.get()
+    return borrowed is not None and borrowed.is_in_transaction()
+
+@asynccontextmanager
+async def use_connection(conn: asyncpg.Connection):
+    """Make get_database() return conn for the current task (and tasks it starts)"""
+    token = _current_connection.set(conn)
+    try:
+        yield conn
+    finally:
+        _current_connection.reset(token)
+
 async def close_database(conn):
     """Close database connection"""
     await conn.close()
+
+async def create_pool(min_size: int = 1, max_size: int = 10) -> asyncpg.Pool:
+    """Create a database connection pool"""
+    if not DATABASE_URL:
+        raise ValueError("DATABASE_URL environment variable is not set")
+
+    return await asyncpg.create_pool(DATABASE_URL, min_size=min_size, max_size=max_size)
+
+async def get_pool() -> asyncpg.Pool:
+    """The application's shared connection pool"""
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await create_pool(
+                min_size=int(os.getenv('DATABASE_POOL_MIN_SIZE', 1)),
+                max_size=int(os.getenv('DATABASE_POOL_MAX_SIZE', 10))
+            )
+    return _pool
+
+async def close_pool():
+    """Close the shared pool (on application shutdown)"""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -9,6 +9,13 @@ load_dotenv()
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Body of core.vi_unaccent; init_db rebuilds the columns derived from it when it changes
+VI_UNACCENT_BODY = '''
+    SELECT lower(replace(replace(
+        regexp_replace(normalize(value, NFD), '[\u0300-\u036f]', '', 'g'),
+        'đ', 'd'), 'Đ', 'd'))
+'''
+
 async def init_db():
     """Initialize database tables and demo data"""
     if not DATABASE_URL:
@@ -30,6 +37,26 @@ async def init_db():
         await conn.execute('CREATE SCHEMA IF NOT EXISTS core')
         await conn.execute('CREATE SCHEMA IF NOT EXISTS sys')
         
+        # Lowercase, tone- and mark-free Vietnamese ("Vàng lá" -> "vang la"); IMMUTABLE so
+        # generated columns and indexes can use it. Decomposing and dropping the combining
+        # marks costs half of translate() over every accented letter, paid on each chunk write
+        previous = await conn.fetchval('''
+            SELECT prosrc FROM pg_proc WHERE oid = to_regprocedure('core.vi_unaccent(text)')
+        ''')
+        await conn.execute(f'''
+            CREATE OR REPLACE FUNCTION core.vi_unaccent(value TEXT) RETURNS TEXT
+            LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $${VI_UNACCENT_BODY}$$
+        ''')
+        if previous is not None and previous != VI_UNACCENT_BODY:
+            # Postgres never recomputes stored columns for a replaced function: drop those
+            # built on the old definition (and their indexes) to have them rebuilt below
+            print("core.vi_unaccent changed: rebuilding search_vector_unaccented and search_text")
+            await conn.execute('''
+                ALTER TABLE IF EXISTS core.knowledge_chunk
+                    DROP COLUMN IF EXISTS search_vector_unaccented,
+                    DROP COLUMN IF EXISTS search_text
+            ''')
+        
         # User table with phone/email authentication
         await conn.execute('''
             CREATE TABLE IF NOT EXISTS core.user (
@@ -115,12 +142,19 @@ async def init_db():
                 type TEXT NOT NULL CHECK (type IN ('planting', 'weeding', 'fertilizer', 'irrigation', 'pest', 'harvest', 'other')),
                 source TEXT NOT NULL DEFAULT 'manual' CHECK (source IN ('manual', 'calendar', 'system')),
                 reminder BOOLEAN DEFAULT FALSE,
+                reminder_sent_at TIMESTAMPTZ,
+                calendar_key TEXT,
                 completed BOOLEAN DEFAULT FALSE,
                 created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
                 updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
                 deleted_at TIMESTAMPTZ
             )
         ''')
+        await conn.execute('''
+            ALTER TABLE core.task
+                ADD COLUMN IF NOT EXISTS reminder_sent_at TIMESTAMPTZ,
+                ADD COLUMN IF NOT EXISTS calendar_key TEXT
+        ''')
         
         # Journal entry table for farm activities
         await conn.execute('''
@@ -219,6 +253,37 @@ async def init_db():
                 deleted_at TIMESTAMPTZ
             )
         ''')
+        # Search document kept by Postgres on every write: title terms weigh more (A) than content (B)
+        await conn.execute('''
+            ALTER TABLE core.knowledge_chunk
+                ADD COLUMN IF NOT EXISTS search_vector TSVECTOR GENERATED ALWAYS AS (
+                    setweight(to_tsvector('simple', title), 'A') ||
+                    setweight(to_tsvector('simple', content), 'B')
+                ) STORED
+        ''')
+        # The same search document unaccented, for queries typed without tone marks
+        await conn.execute('''
+            ALTER TABLE core.knowledge_chunk
+                ADD COLUMN IF NOT EXISTS search_vector_unaccented TSVECTOR GENERATED ALWAYS AS (
+                    setweight(to_tsvector('simple', core.vi_unaccent(title)), 'A') ||
+                    setweight(to_tsvector('simple', core.vi_unaccent(content)), 'B')
+                ) STORED
+        ''')
+        # Unaccented title and content for trigram matching of misspelled words
+        await conn.execute('''
+            ALTER TABLE core.knowledge_chunk
+                ADD COLUMN IF NOT EXISTS search_text TEXT GENERATED ALWAYS AS (
+                    core.vi_unaccent(title || ' ' || content)
+                ) STORED
+        ''')
+        # SHA-256 of the content, kept by set_knowledge_content_hash; bulk ingestion dedupes on it
+        await conn.execute('''
+            ALTER TABLE core.knowledge_chunk ADD COLUMN IF NOT EXISTS content_hash BYTEA
+        ''')
+        await conn.execute('''
+            UPDATE core.knowledge_chunk SET content_hash = sha256(convert_to(content, 'UTF8'))
+            WHERE content_hash IS NULL
+        ''')
         
         # Job queue for background processing
         await conn.execute('''
@@ -228,6 +293,10 @@ async def init_db():
                 payload JSONB NOT NULL,
                 status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
                 attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 5,
+                run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                locked_by TEXT,
+                dedupe_key TEXT,
                 error TEXT,
                 created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
                 started_at TIMESTAMPTZ,
@@ -235,12 +304,69 @@ async def init_db():
             )
         ''')
         
+        # Worker columns for databases created before the job worker existed
+        await conn.execute('''
+            ALTER TABLE sys.job_queue
+                ADD COLUMN IF NOT EXISTS max_attempts INTEGER NOT NULL DEFAULT 5,
+                ADD COLUMN IF NOT EXISTS run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                ADD COLUMN IF NOT EXISTS locked_by TEXT,
+                ADD COLUMN IF NOT EXISTS dedupe_key TEXT
+        ''')
+
+        # Periods claimed by periodic jobs, kept after their job finishes
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS sys.job_schedule (
+                job_type TEXT NOT NULL,
+                period BIGINT NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (job_type, period)
+            )
+        ''')
+
+        # Per-user dashboard counters, kept current by the stats triggers
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS core.user_stats (
+                user_id UUID PRIMARY KEY REFERENCES core.user(id) ON DELETE CASCADE,
+                farms INTEGER NOT NULL DEFAULT 0,
+                plots INTEGER NOT NULL DEFAULT 0,
+                tasks INTEGER NOT NULL DEFAULT 0,
+                tasks_pending INTEGER NOT NULL DEFAULT 0,
+                tasks_in_progress INTEGER NOT NULL DEFAULT 0,
+                tasks_done INTEGER NOT NULL DEFAULT 0,
+                journal_entries INTEGER NOT NULL DEFAULT 0,
+                journal_planting INTEGER NOT NULL DEFAULT 0,
+                journal_fertilizer INTEGER NOT NULL DEFAULT 0,
+                journal_irrigation INTEGER NOT NULL DEFAULT 0,
+                journal_pest INTEGER NOT NULL DEFAULT 0,
+                journal_harvest INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        ''')
+
+        # Per-user, per-day counts behind the date-relative stats (overdue, due today, journal today/last week)
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS core.user_stats_daily (
+                user_id UUID NOT NULL REFERENCES core.user(id) ON DELETE CASCADE,
+                day DATE NOT NULL,
+                open_tasks_due INTEGER NOT NULL DEFAULT 0,
+                journal_entries INTEGER NOT NULL DEFAULT 0,
+
+                PRIMARY KEY (user_id, day)
+            )
+        ''')
+
         # Create indexes for performance
         await create_indexes(conn)
         
         # Create triggers for updated_at
         await create_triggers(conn)
-        
+
+        # Create and backfill the per-user stats counters
+        await create_stats_triggers(conn)
+
+        # Publish cache invalidations to the API workers
+        await create_invalidation_triggers(conn)
+
         print("Database initialized successfully - tables created")
         print("Run 'python add_complete_demo_data.py' to add demo data")
         
@@ -270,10 +396,23 @@ async def create_indexes(conn):
     await conn.execute('CREATE INDEX IF NOT EXISTS task_plot_id_status_due_date_idx ON core.task (plot_id, status, due_date) WHERE deleted_at IS NULL')
     await conn.execute('CREATE INDEX IF NOT EXISTS task_user_id_due_date_idx ON core.task (user_id, due_date DESC) WHERE deleted_at IS NULL')
     await conn.execute('CREATE INDEX IF NOT EXISTS task_status_idx ON core.task (status) WHERE deleted_at IS NULL')
+    # Most recent tasks first (profile), read in index order instead of sorting every task
+    await conn.execute('CREATE INDEX IF NOT EXISTS task_user_id_created_at_idx ON core.task (user_id, created_at DESC) WHERE deleted_at IS NULL')
+    # One generated task per crop calendar template per plot (deleted ones included, so they stay deleted)
+    await conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS task_plot_calendar_key_idx ON core.task (plot_id, calendar_key)
+        WHERE calendar_key IS NOT NULL
+    ''')
+    # Only reminders still waiting to be sent, so the dispatcher never scans the whole table
+    await conn.execute('''
+        CREATE INDEX IF NOT EXISTS task_reminder_due_idx ON core.task (due_date)
+        WHERE reminder AND status != 'done' AND deleted_at IS NULL AND reminder_sent_at IS NULL
+    ''')
     
     # Journal entry indexes
     await conn.execute('CREATE INDEX IF NOT EXISTS journal_plot_id_idx ON core.journal_entry (plot_id) WHERE deleted_at IS NULL')
     await conn.execute('CREATE INDEX IF NOT EXISTS journal_user_id_idx ON core.journal_entry (user_id) WHERE deleted_at IS NULL')
+    await conn.execute('CREATE INDEX IF NOT EXISTS journal_user_id_entry_date_idx ON core.journal_entry (user_id, entry_date DESC, created_at DESC) WHERE deleted_at IS NULL')
     
     # Weather indexes
     await conn.execute('CREATE INDEX IF NOT EXISTS weather_plot_id_date_idx ON core.weather_daily (plot_id, for_date)')
@@ -288,10 +427,21 @@ async def create_indexes(conn):
     # Knowledge chunk indexes
     await conn.execute('CREATE INDEX IF NOT EXISTS knowledge_chunk_lang_idx ON core.knowledge_chunk (lang) WHERE deleted_at IS NULL')
     await conn.execute('CREATE INDEX IF NOT EXISTS knowledge_chunk_tags_idx ON core.knowledge_chunk USING GIN (tags) WHERE deleted_at IS NULL')
+    await conn.execute('CREATE INDEX IF NOT EXISTS knowledge_chunk_updated_idx ON core.knowledge_chunk (updated_at)')
+    await conn.execute('CREATE INDEX IF NOT EXISTS knowledge_chunk_content_hash_idx ON core.knowledge_chunk (content_hash) WHERE deleted_at IS NULL')
+    await conn.execute('CREATE INDEX IF NOT EXISTS knowledge_chunk_search_idx ON core.knowledge_chunk USING GIN (search_vector) WHERE deleted_at IS NULL')
+    await conn.execute('CREATE INDEX IF NOT EXISTS knowledge_chunk_search_unaccented_idx ON core.knowledge_chunk USING GIN (search_vector_unaccented) WHERE deleted_at IS NULL')
+    await conn.execute('CREATE INDEX IF NOT EXISTS knowledge_chunk_search_text_trgm_idx ON core.knowledge_chunk USING GIN (search_text gin_trgm_ops) WHERE deleted_at IS NULL')
     
     # Job queue indexes
     await conn.execute('CREATE INDEX IF NOT EXISTS job_queue_status_idx ON sys.job_queue (status)')
     await conn.execute('CREATE INDEX IF NOT EXISTS job_queue_job_type_status_idx ON sys.job_queue (job_type, status)')
+    await conn.execute("CREATE INDEX IF NOT EXISTS job_queue_claim_idx ON sys.job_queue (job_type, run_at) WHERE status = 'queued'")
+    await conn.execute("CREATE INDEX IF NOT EXISTS job_queue_running_idx ON sys.job_queue (started_at) WHERE status = 'running'")
+    await conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS job_queue_dedupe_idx ON sys.job_queue (job_type, dedupe_key)
+        WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running')
+    ''')
 
 async def create_triggers(conn):
     """Create triggers for updated_at timestamps"""
@@ -344,6 +494,454 @@ async def create_triggers(conn):
         BEFORE INSERT OR UPDATE ON core.task
         FOR EACH ROW EXECUTE FUNCTION sync_task_status_completed()
     ''')
+    
+    # Function to re-arm a task reminder when it is rescheduled or switched back on
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION reset_task_reminder()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF NEW.due_date IS DISTINCT FROM OLD.due_date
+               OR (NEW.reminder AND NOT COALESCE(OLD.reminder, FALSE)) THEN
+                NEW.reminder_sent_at = NULL;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ language 'plpgsql'
+    ''')
+    
+    await conn.execute('''
+        DROP TRIGGER IF EXISTS reset_task_reminder_trigger ON core.task;
+        CREATE TRIGGER reset_task_reminder_trigger
+        BEFORE UPDATE ON core.task
+        FOR EACH ROW EXECUTE FUNCTION reset_task_reminder()
+    ''')
+    
+    # Function to drop a knowledge chunk's embedding when the text it was computed from changes
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION reset_knowledge_embedding()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF NEW.title IS DISTINCT FROM OLD.title OR NEW.content IS DISTINCT FROM OLD.content THEN
+                NEW.embedding = NULL;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ language 'plpgsql'
+    ''')
+    
+    await conn.execute('''
+        DROP TRIGGER IF EXISTS reset_knowledge_embedding_trigger ON core.knowledge_chunk;
+        CREATE TRIGGER reset_knowledge_embedding_trigger
+        BEFORE UPDATE ON core.knowledge_chunk
+        FOR EACH ROW EXECUTE FUNCTION reset_knowledge_embedding()
+    ''')
+    
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION set_knowledge_content_hash()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.content_hash = sha256(convert_to(NEW.content, 'UTF8'));
+            RETURN NEW;
+        END;
+        $$ language 'plpgsql'
+    ''')
+    
+    await conn.execute('''
+        DROP TRIGGER IF EXISTS set_knowledge_content_hash_trigger ON core.knowledge_chunk;
+        CREATE TRIGGER set_knowledge_content_hash_trigger
+        BEFORE INSERT OR UPDATE OF content ON core.knowledge_chunk
+        FOR EACH ROW EXECUTE FUNCTION set_knowledge_content_hash()
+    ''')
+    
+    # Wake idle workers when jobs are enqueued (one notification per job type per statement)
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION notify_job_queue()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            PERFORM pg_notify('job_queue', job_type)
+            FROM (SELECT DISTINCT job_type FROM new_jobs) AS queued;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql'
+    ''')
+    
+    await conn.execute('''
+        DROP TRIGGER IF EXISTS notify_job_queue_trigger ON sys.job_queue;
+        CREATE TRIGGER notify_job_queue_trigger
+        AFTER INSERT ON sys.job_queue
+        REFERENCING NEW TABLE AS new_jobs
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_job_queue()
+    ''')
+
+# Users whose cached data a write to each table touches, selected from a transition table ({rows})
+INVALIDATION_USERS = {
+    'core.user': 'SELECT id AS user_id FROM {rows}',
+    'core.farm': 'SELECT user_id FROM {rows}',
+    'core.plot': 'SELECT f.user_id FROM {rows} p JOIN core.farm f ON f.id = p.farm_id',
+    'core.task': 'SELECT user_id FROM {rows}',
+    'core.journal_entry': 'SELECT user_id FROM {rows}',
+}
+
+def invalidation_trigger_function(name: str, table: str) -> str:
+    """Build the statement-level trigger function publishing "user:<user_id>" for each user a write touched"""
+    users = INVALIDATION_USERS[table]
+    users_by_op = {
+        'INSERT': users.format(rows='new_rows'),
+        'DELETE': users.format(rows='old_rows'),
+        'UPDATE': users.format(rows='new_rows') + ' UNION ' + users.format(rows='old_rows'),
+    }
+
+    branches = []
+    for op, changed in users_by_op.items():
+        branches.append(
+            f"{'ELSIF' if branches else 'IF'} TG_OP = '{op}' THEN\n"
+            f"PERFORM pg_notify('cache_invalidate', 'user:' || user_id) FROM ({changed}) AS changed GROUP BY user_id;"
+        )
+
+    return f'''
+        CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            {chr(10).join(branches)}
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql'
+    '''
+
+async def create_invalidation_triggers(conn):
+    """Create the triggers publishing cache invalidations to the API workers (see utils/invalidation.py)"""
+    print("Creating cache invalidation triggers...")
+
+    for table in INVALIDATION_USERS:
+        name = f"notify_{table.split('.')[1]}_changes"
+        await conn.execute(invalidation_trigger_function(name, table))
+
+        for event, referencing in (
+            ('INSERT', 'NEW TABLE AS new_rows'),
+            ('UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+            ('DELETE', 'OLD TABLE AS old_rows'),
+        ):
+            await conn.execute(f'''
+                DROP TRIGGER IF EXISTS {name}_{event.lower()} ON {table};
+                CREATE TRIGGER {name}_{event.lower()}
+                AFTER {event} ON {table}
+                REFERENCING {referencing}
+                FOR EACH STATEMENT EXECUTE FUNCTION {name}()
+            ''')
+
+    # Ownership caches only need to hear when a user loses a farm or plot:
+    # ids missing from a cache are re-checked against the database
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION notify_ownership_change()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' AND TG_TABLE_NAME = 'farm' THEN
+                PERFORM pg_notify('cache_invalidate', 'ownership:' || user_id)
+                FROM (SELECT DISTINCT user_id FROM old_rows) AS owners;
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('cache_invalidate', 'ownership:' || user_id)
+                FROM (SELECT DISTINCT f.user_id FROM old_rows o JOIN core.farm f ON f.id = o.farm_id) AS owners;
+            ELSIF TG_TABLE_NAME = 'farm' THEN
+                PERFORM pg_notify('cache_invalidate', 'ownership:' || user_id)
+                FROM (
+                    SELECT o.user_id FROM old_rows o JOIN new_rows n ON n.id = o.id
+                    WHERE o.deleted_at IS NULL AND (n.deleted_at IS NOT NULL OR n.user_id != o.user_id)
+                    GROUP BY o.user_id
+                ) AS owners;
+            ELSE
+                PERFORM pg_notify('cache_invalidate', 'ownership:' || user_id)
+                FROM (
+                    SELECT f.user_id FROM old_rows o JOIN new_rows n ON n.id = o.id
+                    JOIN core.farm f ON f.id = o.farm_id
+                    WHERE o.deleted_at IS NULL AND (n.deleted_at IS NOT NULL OR n.farm_id != o.farm_id)
+                    GROUP BY f.user_id
+                ) AS owners;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql'
+    ''')
+
+    for table in ('core.farm', 'core.plot'):
+        name = f"notify_{table.split('.')[1]}_ownership"
+        await conn.execute(f'''
+            DROP TRIGGER IF EXISTS {name}_update ON {table};
+            CREATE TRIGGER {name}_update
+            AFTER UPDATE ON {table}
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_ownership_change();
+            DROP TRIGGER IF EXISTS {name}_delete ON {table};
+            CREATE TRIGGER {name}_delete
+            AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_ownership_change()
+        ''')
+
+    # Cached knowledge retrieval depends on every chunk, so any change drops all of it
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION notify_knowledge_chunk_changes()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            PERFORM pg_notify('cache_invalidate', 'knowledge:');
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql'
+    ''')
+    await conn.execute('''
+        DROP TRIGGER IF EXISTS notify_knowledge_chunk_changes_trigger ON core.knowledge_chunk;
+        CREATE TRIGGER notify_knowledge_chunk_changes_trigger
+        AFTER INSERT OR UPDATE OR DELETE ON core.knowledge_chunk
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_knowledge_chunk_changes()
+    ''')
+
+# Row contributions to core.user_stats per table, selected from a transition table ({rows})
+# with {sign} +1 for new rows and -1 for old ones, so an UPDATE nets out to its change
+STATS_CONTRIBUTIONS = {
+    'core.farm': '''
+        SELECT f.user_id, {sign} AS sign,
+               (SELECT COUNT(*) FROM core.plot p WHERE p.farm_id = f.id AND p.deleted_at IS NULL) AS plots
+        FROM {rows} f WHERE f.deleted_at IS NULL
+    ''',
+    'core.plot': '''
+        SELECT f.user_id, {sign} AS sign
+        FROM {rows} p JOIN core.farm f ON f.id = p.farm_id
+        WHERE p.deleted_at IS NULL AND f.deleted_at IS NULL
+    ''',
+    'core.task': '''
+        SELECT user_id, status, due_date AS day, {sign} AS sign
+        FROM {rows} WHERE deleted_at IS NULL
+    ''',
+    'core.journal_entry': '''
+        SELECT user_id, type, entry_date AS day, {sign} AS sign
+        FROM {rows} WHERE deleted_at IS NULL
+    ''',
+}
+
+# Statements applying the net change ({changes}) per table. core.user_stats is always
+# written first so reconcile_user_stats() can hold writers off with a row lock.
+# {user_exists} skips users being deleted, whose rows cascade away with them.
+STATS_USER_EXISTS = 'HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id)'
+
+PRUNE_STATS_DAYS = '''
+    DELETE FROM core.user_stats_daily d
+    USING (SELECT DISTINCT user_id, day FROM ({changes}) c) c
+    WHERE d.user_id = c.user_id AND d.day = c.day
+    AND d.open_tasks_due = 0 AND d.journal_entries = 0
+'''
+
+STATS_STATEMENTS = {
+    'core.farm': ['''
+        INSERT INTO core.user_stats AS s (user_id, farms, plots)
+        SELECT user_id, SUM(sign), SUM(sign * plots) FROM ({changes}) c GROUP BY user_id {user_exists}
+        ON CONFLICT (user_id) DO UPDATE SET
+            farms = s.farms + EXCLUDED.farms, plots = s.plots + EXCLUDED.plots, updated_at = NOW()
+    '''],
+    'core.plot': ['''
+        INSERT INTO core.user_stats AS s (user_id, plots)
+        SELECT user_id, SUM(sign) FROM ({changes}) c GROUP BY user_id {user_exists}
+        ON CONFLICT (user_id) DO UPDATE SET plots = s.plots + EXCLUDED.plots, updated_at = NOW()
+    '''],
+    'core.task': ['''
+        INSERT INTO core.user_stats AS s (user_id, tasks, tasks_pending, tasks_in_progress, tasks_done)
+        SELECT user_id, SUM(sign),
+               COALESCE(SUM(sign) FILTER (WHERE status = 'pending'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE status = 'in_progress'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE status = 'done'), 0)
+        FROM ({changes}) c GROUP BY user_id {user_exists}
+        ON CONFLICT (user_id) DO UPDATE SET
+            tasks = s.tasks + EXCLUDED.tasks,
+            tasks_pending = s.tasks_pending + EXCLUDED.tasks_pending,
+            tasks_in_progress = s.tasks_in_progress + EXCLUDED.tasks_in_progress,
+            tasks_done = s.tasks_done + EXCLUDED.tasks_done,
+            updated_at = NOW()
+    ''', '''
+        INSERT INTO core.user_stats_daily AS d (user_id, day, open_tasks_due)
+        SELECT user_id, day, SUM(sign) FROM ({changes}) c
+        WHERE status != 'done' GROUP BY user_id, day {user_exists} AND SUM(sign) != 0
+        ON CONFLICT (user_id, day) DO UPDATE SET open_tasks_due = d.open_tasks_due + EXCLUDED.open_tasks_due
+    ''', PRUNE_STATS_DAYS],
+    'core.journal_entry': ['''
+        INSERT INTO core.user_stats AS s (user_id, journal_entries, journal_planting, journal_fertilizer,
+                                          journal_irrigation, journal_pest, journal_harvest)
+        SELECT user_id, SUM(sign),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'planting'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'fertilizer'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'irrigation'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'pest'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'harvest'), 0)
+        FROM ({changes}) c GROUP BY user_id {user_exists}
+        ON CONFLICT (user_id) DO UPDATE SET
+            journal_entries = s.journal_entries + EXCLUDED.journal_entries,
+            journal_planting = s.journal_planting + EXCLUDED.journal_planting,
+            journal_fertilizer = s.journal_fertilizer + EXCLUDED.journal_fertilizer,
+            journal_irrigation = s.journal_irrigation + EXCLUDED.journal_irrigation,
+            journal_pest = s.journal_pest + EXCLUDED.journal_pest,
+            journal_harvest = s.journal_harvest + EXCLUDED.journal_harvest,
+            updated_at = NOW()
+    ''', '''
+        INSERT INTO core.user_stats_daily AS d (user_id, day, journal_entries)
+        SELECT user_id, day, SUM(sign) FROM ({changes}) c
+        GROUP BY user_id, day {user_exists} AND SUM(sign) != 0
+        ON CONFLICT (user_id, day) DO UPDATE SET journal_entries = d.journal_entries + EXCLUDED.journal_entries
+    ''', PRUNE_STATS_DAYS],
+}
+
+def stats_trigger_function(name: str, table: str) -> str:
+    """
+    Build the statement-level trigger function keeping core.user_stats in step with a table.
+
+    Transition tables only exist for the event that fired the trigger, so each
+    TG_OP branch gets its own copy of the statements.
+    """
+    contribution = STATS_CONTRIBUTIONS[table]
+    changes_by_op = {
+        'INSERT': contribution.format(rows='new_rows', sign=1),
+        'DELETE': contribution.format(rows='old_rows', sign=-1),
+        'UPDATE': contribution.format(rows='new_rows', sign=1) + ' UNION ALL ' +
+                  contribution.format(rows='old_rows', sign=-1),
+    }
+
+    branches = []
+    for op, changes in changes_by_op.items():
+        statements = ';\n'.join(statement.format(changes=changes, user_exists=STATS_USER_EXISTS) for statement in STATS_STATEMENTS[table])
+        branches.append(f"{'ELSIF' if branches else 'IF'} TG_OP = '{op}' THEN\n{statements};")
+
+    return f'''
+        CREATE OR REPLACE FUNCTION {name}()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            {chr(10).join(branches)}
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql'
+    '''
+
+async def create_stats_triggers(conn):
+    """Create the per-user stats triggers and reconciliation function, then backfill the counters"""
+    print("Creating stats triggers...")
+
+    for table in STATS_CONTRIBUTIONS:
+        name = f"track_{table.split('.')[1]}_stats"
+        await conn.execute(stats_trigger_function(name, table))
+
+        # Statement-level, so bulk writes (crop calendars, imports) update each user's row once
+        for event, referencing in (
+            ('INSERT', 'NEW TABLE AS new_rows'),
+            ('UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+            ('DELETE', 'OLD TABLE AS old_rows'),
+        ):
+            await conn.execute(f'''
+                DROP TRIGGER IF EXISTS {name}_{event.lower()} ON {table};
+                CREATE TRIGGER {name}_{event.lower()}
+                AFTER {event} ON {table}
+                REFERENCING {referencing}
+                FOR EACH STATEMENT EXECUTE FUNCTION {name}()
+            ''')
+
+    # Recount users' stats from the source tables (all users when p_user_ids is NULL).
+    # Counter rows are locked first: a concurrent write blocks in its trigger until the
+    # recount commits and then applies its delta on top. Returns the rows rewritten.
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION reconcile_user_stats(p_user_ids UUID[] DEFAULT NULL)
+        RETURNS INTEGER AS $$
+        DECLARE
+            rewritten INTEGER;
+        BEGIN
+            PERFORM 1 FROM core.user_stats
+            WHERE p_user_ids IS NULL OR user_id = ANY(p_user_ids)
+            FOR UPDATE;
+
+            WITH users AS (
+                SELECT id FROM core.user WHERE p_user_ids IS NULL OR id = ANY(p_user_ids)
+            ), farms AS (
+                SELECT user_id, COUNT(*) AS farms FROM core.farm
+                WHERE deleted_at IS NULL AND user_id IN (SELECT id FROM users)
+                GROUP BY user_id
+            ), plots AS (
+                SELECT f.user_id, COUNT(*) AS plots
+                FROM core.plot p JOIN core.farm f ON f.id = p.farm_id
+                WHERE p.deleted_at IS NULL AND f.deleted_at IS NULL AND f.user_id IN (SELECT id FROM users)
+                GROUP BY f.user_id
+            ), tasks AS (
+                SELECT user_id, COUNT(*) AS tasks,
+                       COUNT(*) FILTER (WHERE status = 'pending') AS tasks_pending,
+                       COUNT(*) FILTER (WHERE status = 'in_progress') AS tasks_in_progress,
+                       COUNT(*) FILTER (WHERE status = 'done') AS tasks_done
+                FROM core.task
+                WHERE deleted_at IS NULL AND user_id IN (SELECT id FROM users)
+                GROUP BY user_id
+            ), journal AS (
+                SELECT user_id, COUNT(*) AS journal_entries,
+                       COUNT(*) FILTER (WHERE type = 'planting') AS journal_planting,
+                       COUNT(*) FILTER (WHERE type = 'fertilizer') AS journal_fertilizer,
+                       COUNT(*) FILTER (WHERE type = 'irrigation') AS journal_irrigation,
+                       COUNT(*) FILTER (WHERE type = 'pest') AS journal_pest,
+                       COUNT(*) FILTER (WHERE type = 'harvest') AS journal_harvest
+                FROM core.journal_entry
+                WHERE deleted_at IS NULL AND user_id IN (SELECT id FROM users)
+                GROUP BY user_id
+            ), rewritten_rows AS (
+                INSERT INTO core.user_stats AS s (
+                    user_id, farms, plots, tasks, tasks_pending, tasks_in_progress, tasks_done,
+                    journal_entries, journal_planting, journal_fertilizer, journal_irrigation,
+                    journal_pest, journal_harvest
+                )
+                SELECT u.id, COALESCE(farms.farms, 0), COALESCE(plots.plots, 0),
+                       COALESCE(tasks.tasks, 0), COALESCE(tasks.tasks_pending, 0),
+                       COALESCE(tasks.tasks_in_progress, 0), COALESCE(tasks.tasks_done, 0),
+                       COALESCE(journal.journal_entries, 0), COALESCE(journal.journal_planting, 0),
+                       COALESCE(journal.journal_fertilizer, 0), COALESCE(journal.journal_irrigation, 0),
+                       COALESCE(journal.journal_pest, 0), COALESCE(journal.journal_harvest, 0)
+                FROM users u
+                LEFT JOIN farms ON farms.user_id = u.id
+                LEFT JOIN plots ON plots.user_id = u.id
+                LEFT JOIN tasks ON tasks.user_id = u.id
+                LEFT JOIN journal ON journal.user_id = u.id
+                ON CONFLICT (user_id) DO UPDATE SET
+                    farms = EXCLUDED.farms, plots = EXCLUDED.plots, tasks = EXCLUDED.tasks,
+                    tasks_pending = EXCLUDED.tasks_pending, tasks_in_progress = EXCLUDED.tasks_in_progress,
+                    tasks_done = EXCLUDED.tasks_done, journal_entries = EXCLUDED.journal_entries,
+                    journal_planting = EXCLUDED.journal_planting, journal_fertilizer = EXCLUDED.journal_fertilizer,
+                    journal_irrigation = EXCLUDED.journal_irrigation, journal_pest = EXCLUDED.journal_pest,
+                    journal_harvest = EXCLUDED.journal_harvest, updated_at = NOW()
+                WHERE (s.farms, s.plots, s.tasks, s.tasks_pending, s.tasks_in_progress, s.tasks_done,
+                       s.journal_entries, s.journal_planting, s.journal_fertilizer, s.journal_irrigation,
+                       s.journal_pest, s.journal_harvest)
+                   IS DISTINCT FROM
+                      (EXCLUDED.farms, EXCLUDED.plots, EXCLUDED.tasks, EXCLUDED.tasks_pending,
+                       EXCLUDED.tasks_in_progress, EXCLUDED.tasks_done, EXCLUDED.journal_entries,
+                       EXCLUDED.journal_planting, EXCLUDED.journal_fertilizer, EXCLUDED.journal_irrigation,
+                       EXCLUDED.journal_pest, EXCLUDED.journal_harvest)
+                RETURNING 1
+            )
+            SELECT COUNT(*) INTO rewritten FROM rewritten_rows;
+
+            DELETE FROM core.user_stats_daily WHERE p_user_ids IS NULL OR user_id = ANY(p_user_ids);
+
+            INSERT INTO core.user_stats_daily (user_id, day, open_tasks_due, journal_entries)
+            SELECT user_id, day, SUM(open_tasks_due), SUM(journal_entries)
+            FROM (
+                SELECT user_id, due_date AS day, COUNT(*) AS open_tasks_due, 0 AS journal_entries
+                FROM core.task
+                WHERE deleted_at IS NULL AND status != 'done'
+                AND (p_user_ids IS NULL OR user_id = ANY(p_user_ids))
+                GROUP BY user_id, due_date
+                UNION ALL
+                SELECT user_id, entry_date, 0, COUNT(*)
+                FROM core.journal_entry
+                WHERE deleted_at IS NULL AND (p_user_ids IS NULL OR user_id = ANY(p_user_ids))
+                GROUP BY user_id, entry_date
+            ) days
+            GROUP BY user_id, day;
+
+            RETURN rewritten;
+        END;
+        $$ language 'plpgsql'
+    ''')
+
+    await conn.execute('SELECT reconcile_user_stats()')
 
 async def seed_demo_data(conn):
     """Insert demo data for testing"""
@@ -29,6 +29,7 @@ async def reset_database():
         
         # Drop tables in reverse order of dependencies
         tables_to_drop = [
+            'sys.job_schedule',
             'sys.job_queue',
             'core.message',
             'core.conversation',
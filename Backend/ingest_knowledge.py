@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Load a directory of Markdown and plain text documents into the knowledge base
+
+Splits every .md/.txt file into overlapping chunks, skips chunks whose content
+is already stored, embeds the rest in a process pool, COPYs them into
+core.knowledge_chunk in batches and refreshes the search indexes and the
+vector index snapshot (see utils/ingest.py). Running it again on the same
+directory only adds what changed; --prune also retires chunks that were
+removed from their file.
+
+To run it in a worker instead, enqueue a "knowledge.ingest" job with
+{"directory": ..., "lang": ..., "tags": [...], "prune": false}.
+
+Usage:
+    python ingest_knowledge.py DIRECTORY [--lang vi|en] [--tag TAG ...] [--prune] [--workers N] [--batch-size N]
+"""
+
+import argparse
+import asyncio
+import time
+
+from database.config import get_database
+from utils.ingest import INGEST_BATCH_SIZE, ingest_directory
+
+async def main(args):
+    conn = await get_database()
+    try:
+        start = time.perf_counter()
+        stats = await ingest_directory(
+            conn, args.directory, args.lang, args.tag, args.prune, args.workers, args.batch_size
+        )
+        print(f"{stats['files']} file(s), {stats['chunks']} chunk(s): {stats['inserted']} added, "
+              f"{stats['duplicates']} already stored ({stats['moved']} moved from another file), {stats['pruned']} pruned")
+        print(f"Loaded in {stats['loadSeconds']}s, indexes refreshed in {stats['refreshSeconds']}s, "
+              f"{time.perf_counter() - start:.1f}s in total")
+    finally:
+        await conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load knowledge base documents")
+    parser.add_argument("directory")
+    parser.add_argument("--lang", default="vi", choices=["vi", "en"])
+    parser.add_argument("--tag", action="append", help="tag every chunk (repeatable)")
+    parser.add_argument("--prune", action="store_true", help="soft-delete chunks no longer in their file")
+    parser.add_argument("--workers", type=int, help="embedding processes (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    asyncio.run(main(parser.parse_args()))
@@ -1,6 +1,5 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 import uvicorn
 import os
 from dotenv import load_dotenv
@@ -19,6 +18,13 @@ from api.assistant import router as assistant_router
 from api.uploads import router as uploads_router
 from api.uploads_no_auth import router as uploads_no_auth_router
 from api.journal_no_auth import router as journal_no_auth_router
+from api.dashboard import router as dashboard_router
+from api.batch import router as batch_router
+from database.config import close_pool
+from utils.compression import CompressionMiddleware, PrecompressedStaticFiles, SinglePageAppFiles
+from utils.intents import get_intent_matcher
+from utils.invalidation import invalidation_bus
+from utils.responses import ORJSONResponse
 
 # Create FastAPI app
 app = FastAPI(
@@ -26,7 +32,9 @@ app = FastAPI(
     description="Backend API for the AIRRVie rice farming assistant application",
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    # orjson encodes datetimes, dates and UUIDs natively and is several times faster than json
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -47,6 +55,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress text responses of 1 KB and more (brotli or gzip); added last so it wraps CORS
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(farms_router)
@@ -58,13 +69,33 @@ app.include_router(assistant_router)
 app.include_router(uploads_router)
 app.include_router(uploads_no_auth_router)
 app.include_router(journal_no_auth_router)
+app.include_router(dashboard_router)
+app.include_router(batch_router)
+
+# Mount static files for uploads (serving .br/.gz variants written by precompress.py)
+app.mount("/uploads", PrecompressedStaticFiles(directory="uploads"), name="uploads")
+
+# The built frontend (npm run build in Frontend, precompressed by its postbuild step), if there is one
+FRONTEND_BUILD_DIR = os.getenv("FRONTEND_BUILD_DIR", "../Frontend/build")
+frontend = SinglePageAppFiles(directory=FRONTEND_BUILD_DIR) if os.path.isdir(FRONTEND_BUILD_DIR) else None
 
-# Mount static files for uploads
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+@app.on_event("startup")
+async def startup():
+    await invalidation_bus.start()
+    # Compile the assistant's intent automaton now rather than on the first message
+    get_intent_matcher()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await invalidation_bus.stop()
+    await close_pool()
 
 # Health check endpoint
 @app.get("/")
-async def root():
+async def root(request: Request):
+    # Browsers get the frontend, API clients the server status
+    if frontend and "text/html" in request.headers.get("accept", ""):
+        return await frontend.get_response("index.html", request.scope)
     return {
         "message": "AIRRVie API Server",
         "version": "1.0.0",
@@ -95,7 +126,9 @@ async def api_status():
             "weather": "/api/weather",
             "users": "/api/users",
             "assistant": "/api/conversations",
-            "uploads": "/api/uploads"
+            "uploads": "/api/uploads",
+            "dashboard": "/api/dashboard",
+            "batch": "/api/batch"
         }
     }
 
@@ -108,6 +141,10 @@ async def not_found_handler(request, exc):
 async def internal_error_handler(request, exc):
     return HTTPException(status_code=500, detail="Internal server error")
 
+# Mounted last, so every API route above matches first; other paths get the frontend's files or index.html
+if frontend:
+    app.mount("/", frontend, name="frontend")
+
 if __name__ == "__main__":
     # Get port from environment or default to 8000
     port = int(os.getenv("PORT", 8000))
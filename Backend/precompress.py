@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Write brotli (.br) and gzip (.gz) variants of static text assets
+
+PrecompressedStaticFiles (and nginx's gzip_static / brotli_static) serve these
+instead of compressing the same file on every request, at the highest levels,
+which would be too slow to use per request. Only compressible types of at
+least MIN_SIZE bytes get variants, and a variant is kept only if it is
+smaller. Variants older than their file are rewritten, so this can run after
+every frontend build.
+
+Needs only the standard library (and the brotli package for .br variants),
+so the frontend build can run it without the backend's dependencies; the
+types and suffixes below must match utils/compression.py.
+
+Usage:
+    python precompress.py [directory ...]    (default: ../Frontend/build and uploads)
+"""
+
+import gzip
+import os
+import sys
+from mimetypes import guess_type
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+MIN_SIZE = 1024
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/x-ndjson", "application/javascript",
+    "application/xml", "application/manifest+json", "image/svg+xml",
+}
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+DEFAULT_DIRECTORIES = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Frontend", "build"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads"),
+]
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    """Text, and the structured types in COMPRESSIBLE_TYPES"""
+    return bool(content_type) and (content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES)
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def precompress_file(path: str) -> list:
+    """Write the file's missing or stale variants; returns (encoding, original size, variant size) per written variant"""
+    written = []
+    stat = os.stat(path)
+    data = None
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        if encoding == "br" and brotli is None:
+            continue
+        variant = path + suffix
+        if os.path.exists(variant) and os.stat(variant).st_mtime >= stat.st_mtime:
+            continue
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        compressed = compress(data, encoding)
+        if len(compressed) >= len(data):
+            if os.path.exists(variant):
+                os.remove(variant)
+            continue
+        with open(variant, "wb") as f:
+            f.write(compressed)
+        written.append((encoding, len(data), len(compressed)))
+    return written
+
+def precompress_directory(directory: str) -> None:
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith(tuple(ENCODING_SUFFIXES.values())) or not is_compressible(guess_type(name)[0]):
+                continue
+            if os.path.getsize(path) < MIN_SIZE:
+                continue
+            for encoding, size, compressed in precompress_file(path):
+                print(f"{os.path.relpath(path, directory)}{ENCODING_SUFFIXES[encoding]}: {size:,} -> {compressed:,} bytes")
+
+if __name__ == "__main__":
+    if brotli is None:
+        print("brotli is not installed; writing .gz variants only")
+    for directory in sys.argv[1:] or DEFAULT_DIRECTORIES:
+        if os.path.isdir(directory):
+            precompress_directory(directory)
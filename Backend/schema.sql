@@ -24,6 +24,18 @@ CREATE EXTENSION IF NOT EXISTS "pg_cron"; -- For scheduled jobs (optional)
 CREATE SCHEMA IF NOT EXISTS core;
 CREATE SCHEMA IF NOT EXISTS sys;
 
+-- Lowercase, tone- and mark-free Vietnamese ("Vàng lá" -> "vang la").
+-- IMMUTABLE (unlike unaccent()), so generated columns and indexes can use it.
+-- Decomposes (NFD) and drops the combining marks: half the cost of translate()
+-- over every accented letter, paid on each chunk write. Stored columns built on it
+-- are not recomputed when it is replaced: init_db.py rebuilds them on a change
+CREATE OR REPLACE FUNCTION core.vi_unaccent(value TEXT) RETURNS TEXT
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT lower(replace(replace(
+        regexp_replace(normalize(value, NFD), '[\u0300-\u036f]', '', 'g'),
+        'đ', 'd'), 'Đ', 'd'))
+$$;
+
 -- Grant permissions
 GRANT USAGE ON SCHEMA core TO rice_assistant;
 GRANT USAGE ON SCHEMA sys TO rice_assistant;
@@ -108,6 +120,8 @@ CREATE TABLE core.task (
     type TEXT NOT NULL CHECK (type IN ('planting', 'weeding', 'fertilizer', 'irrigation', 'pest', 'harvest', 'other')),
     source TEXT NOT NULL DEFAULT 'manual' CHECK (source IN ('manual', 'calendar', 'system')),
     reminder BOOLEAN DEFAULT FALSE,
+    reminder_sent_at TIMESTAMPTZ,
+    calendar_key TEXT,
     completed BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
@@ -195,11 +209,53 @@ CREATE TABLE core.knowledge_chunk (
     lang TEXT NOT NULL DEFAULT 'vi' CHECK (lang IN ('en', 'vi')),
     tags TEXT[] DEFAULT '{}',
     embedding BYTEA,
+    -- Weighted search document: title (A) ranks above content (B)
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title), 'A') ||
+        setweight(to_tsvector('simple', content), 'B')
+    ) STORED,
+    -- The same search document unaccented, for queries typed without tone marks
+    search_vector_unaccented TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', core.vi_unaccent(title)), 'A') ||
+        setweight(to_tsvector('simple', core.vi_unaccent(content)), 'B')
+    ) STORED,
+    -- Unaccented title and content for trigram matching of misspelled words
+    search_text TEXT GENERATED ALWAYS AS (core.vi_unaccent(title || ' ' || content)) STORED,
+    -- SHA-256 of content (set_knowledge_content_hash); bulk ingestion dedupes on it
+    content_hash BYTEA,
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     deleted_at TIMESTAMPTZ
 );
 
+-- Per-user dashboard counters, kept current by the stats triggers
+CREATE TABLE core.user_stats (
+    user_id UUID PRIMARY KEY REFERENCES core.user(id) ON DELETE CASCADE,
+    farms INTEGER NOT NULL DEFAULT 0,
+    plots INTEGER NOT NULL DEFAULT 0,
+    tasks INTEGER NOT NULL DEFAULT 0,
+    tasks_pending INTEGER NOT NULL DEFAULT 0,
+    tasks_in_progress INTEGER NOT NULL DEFAULT 0,
+    tasks_done INTEGER NOT NULL DEFAULT 0,
+    journal_entries INTEGER NOT NULL DEFAULT 0,
+    journal_planting INTEGER NOT NULL DEFAULT 0,
+    journal_fertilizer INTEGER NOT NULL DEFAULT 0,
+    journal_irrigation INTEGER NOT NULL DEFAULT 0,
+    journal_pest INTEGER NOT NULL DEFAULT 0,
+    journal_harvest INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Per-user, per-day counts behind the date-relative stats (overdue, due today, journal today/last week)
+CREATE TABLE core.user_stats_daily (
+    user_id UUID NOT NULL REFERENCES core.user(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    open_tasks_due INTEGER NOT NULL DEFAULT 0,
+    journal_entries INTEGER NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (user_id, day)
+);
+
 -- ========================================
 -- SYS SCHEMA - System Operations
 -- ========================================
@@ -211,12 +267,25 @@ CREATE TABLE sys.job_queue (
     payload JSONB NOT NULL,
     status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
     attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_by TEXT,
+    dedupe_key TEXT,
     error TEXT,
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     started_at TIMESTAMPTZ,
     finished_at TIMESTAMPTZ
 );
 
+-- Periods claimed by periodic jobs, so each period's job is enqueued once
+-- even after it has finished (the job_queue dedupe only covers active jobs)
+CREATE TABLE sys.job_schedule (
+    job_type TEXT NOT NULL,
+    period BIGINT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (job_type, period)
+);
+
 -- ========================================
 -- INDEXES FOR PERFORMANCE
 -- ========================================
@@ -240,13 +309,20 @@ CREATE INDEX plot_harvest_date_idx ON core.plot (harvest_date) WHERE deleted_at
 CREATE INDEX task_plot_id_status_due_date_idx ON core.task (plot_id, status, due_date) WHERE deleted_at IS NULL;
 CREATE INDEX task_user_id_due_date_idx ON core.task (user_id, due_date DESC) WHERE deleted_at IS NULL;
 CREATE INDEX task_status_idx ON core.task (status) WHERE deleted_at IS NULL;
+-- Most recent tasks first (profile), read in index order instead of sorting every task
+CREATE INDEX task_user_id_created_at_idx ON core.task (user_id, created_at DESC) WHERE deleted_at IS NULL;
 CREATE INDEX task_type_idx ON core.task (type) WHERE deleted_at IS NULL;
 CREATE INDEX task_due_date_idx ON core.task (due_date) WHERE deleted_at IS NULL;
 CREATE INDEX task_completed_idx ON core.task (completed) WHERE deleted_at IS NULL;
+CREATE UNIQUE INDEX task_plot_calendar_key_idx ON core.task (plot_id, calendar_key)
+    WHERE calendar_key IS NOT NULL;
+CREATE INDEX task_reminder_due_idx ON core.task (due_date)
+    WHERE reminder AND status != 'done' AND deleted_at IS NULL AND reminder_sent_at IS NULL;
 
 -- Journal entry indexes
 CREATE INDEX journal_plot_id_idx ON core.journal_entry (plot_id) WHERE deleted_at IS NULL;
 CREATE INDEX journal_user_id_idx ON core.journal_entry (user_id) WHERE deleted_at IS NULL;
+CREATE INDEX journal_user_id_entry_date_idx ON core.journal_entry (user_id, entry_date DESC, created_at DESC) WHERE deleted_at IS NULL;
 CREATE INDEX journal_entry_date_idx ON core.journal_entry (entry_date) WHERE deleted_at IS NULL;
 CREATE INDEX journal_type_idx ON core.journal_entry (type) WHERE deleted_at IS NULL;
 
@@ -268,18 +344,23 @@ CREATE INDEX message_role_idx ON core.message (role);
 CREATE INDEX knowledge_chunk_lang_idx ON core.knowledge_chunk (lang) WHERE deleted_at IS NULL;
 CREATE INDEX knowledge_chunk_tags_idx ON core.knowledge_chunk USING GIN (tags) WHERE deleted_at IS NULL;
 CREATE INDEX knowledge_chunk_created_idx ON core.knowledge_chunk (created_at) WHERE deleted_at IS NULL;
+-- Changes since the last IVF index update (deleted chunks included)
+CREATE INDEX knowledge_chunk_updated_idx ON core.knowledge_chunk (updated_at);
+CREATE INDEX knowledge_chunk_content_hash_idx ON core.knowledge_chunk (content_hash) WHERE deleted_at IS NULL;
 
 -- Text search indexes for content
-CREATE INDEX knowledge_chunk_content_gin_idx ON core.knowledge_chunk 
-    USING GIN (to_tsvector('simple', content)) WHERE deleted_at IS NULL;
+CREATE INDEX knowledge_chunk_search_idx ON core.knowledge_chunk 
+    USING GIN (search_vector) WHERE deleted_at IS NULL;
+CREATE INDEX knowledge_chunk_search_unaccented_idx ON core.knowledge_chunk 
+    USING GIN (search_vector_unaccented) WHERE deleted_at IS NULL;
 CREATE INDEX journal_content_gin_idx ON core.journal_entry 
     USING GIN (to_tsvector('simple', content)) WHERE deleted_at IS NULL;
 CREATE INDEX task_description_gin_idx ON core.task 
     USING GIN (to_tsvector('simple', description)) WHERE deleted_at IS NULL;
 
 -- Trigram indexes for fuzzy search
-CREATE INDEX knowledge_chunk_content_trgm_idx ON core.knowledge_chunk 
-    USING GIN (content gin_trgm_ops) WHERE deleted_at IS NULL;
+CREATE INDEX knowledge_chunk_search_text_trgm_idx ON core.knowledge_chunk 
+    USING GIN (search_text gin_trgm_ops) WHERE deleted_at IS NULL;
 CREATE INDEX journal_content_trgm_idx ON core.journal_entry 
     USING GIN (content gin_trgm_ops) WHERE deleted_at IS NULL;
 
@@ -291,6 +372,10 @@ CREATE INDEX journal_content_trgm_idx ON core.journal_entry
 CREATE INDEX job_queue_status_idx ON sys.job_queue (status);
 CREATE INDEX job_queue_job_type_status_idx ON sys.job_queue (job_type, status);
 CREATE INDEX job_queue_created_at_idx ON sys.job_queue (created_at);
+CREATE INDEX job_queue_claim_idx ON sys.job_queue (job_type, run_at) WHERE status = 'queued';
+CREATE INDEX job_queue_running_idx ON sys.job_queue (started_at) WHERE status = 'running';
+CREATE UNIQUE INDEX job_queue_dedupe_idx ON sys.job_queue (job_type, dedupe_key)
+    WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running');
 
 -- ========================================
 -- ROW LEVEL SECURITY (RLS) POLICIES
@@ -398,6 +483,770 @@ CREATE TRIGGER sync_task_status_completed_trigger
     BEFORE INSERT OR UPDATE ON core.task
     FOR EACH ROW EXECUTE FUNCTION sync_task_status_completed();
 
+-- Function to re-arm a task reminder when it is rescheduled or switched back on
+CREATE OR REPLACE FUNCTION reset_task_reminder()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.due_date IS DISTINCT FROM OLD.due_date
+       OR (NEW.reminder AND NOT COALESCE(OLD.reminder, FALSE)) THEN
+        NEW.reminder_sent_at = NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER reset_task_reminder_trigger
+    BEFORE UPDATE ON core.task
+    FOR EACH ROW EXECUTE FUNCTION reset_task_reminder();
+
+-- Function to drop a knowledge chunk's embedding when the text it was computed from changes
+CREATE OR REPLACE FUNCTION reset_knowledge_embedding()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.title IS DISTINCT FROM OLD.title OR NEW.content IS DISTINCT FROM OLD.content THEN
+        NEW.embedding = NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER reset_knowledge_embedding_trigger
+    BEFORE UPDATE ON core.knowledge_chunk
+    FOR EACH ROW EXECUTE FUNCTION reset_knowledge_embedding();
+
+-- Function to keep a knowledge chunk's content hash current
+CREATE OR REPLACE FUNCTION set_knowledge_content_hash()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.content_hash = sha256(convert_to(NEW.content, 'UTF8'));
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER set_knowledge_content_hash_trigger
+    BEFORE INSERT OR UPDATE OF content ON core.knowledge_chunk
+    FOR EACH ROW EXECUTE FUNCTION set_knowledge_content_hash();
+
+-- Function to wake idle workers when jobs are enqueued
+CREATE OR REPLACE FUNCTION notify_job_queue()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('job_queue', job_type)
+    FROM (SELECT DISTINCT job_type FROM new_jobs) AS queued;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_job_queue_trigger
+    AFTER INSERT ON sys.job_queue
+    REFERENCING NEW TABLE AS new_jobs
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_job_queue();
+
+-- Cache invalidation for the API workers (see utils/invalidation.py): every write publishes
+-- 'user:<user_id>' on channel cache_invalidate for each user it touched
+
+CREATE OR REPLACE FUNCTION notify_user_changes()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT id AS user_id FROM new_rows) AS changed GROUP BY user_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT id AS user_id FROM old_rows) AS changed GROUP BY user_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT id AS user_id FROM new_rows UNION SELECT id AS user_id FROM old_rows) AS changed GROUP BY user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_user_changes_insert
+    AFTER INSERT ON core.user
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_user_changes();
+
+CREATE TRIGGER notify_user_changes_update
+    AFTER UPDATE ON core.user
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_user_changes();
+
+CREATE TRIGGER notify_user_changes_delete
+    AFTER DELETE ON core.user
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_user_changes();
+
+CREATE OR REPLACE FUNCTION notify_farm_changes()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT user_id FROM new_rows) AS changed GROUP BY user_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT user_id FROM old_rows) AS changed GROUP BY user_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT user_id FROM new_rows UNION SELECT user_id FROM old_rows) AS changed GROUP BY user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_farm_changes_insert
+    AFTER INSERT ON core.farm
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_farm_changes();
+
+CREATE TRIGGER notify_farm_changes_update
+    AFTER UPDATE ON core.farm
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_farm_changes();
+
+CREATE TRIGGER notify_farm_changes_delete
+    AFTER DELETE ON core.farm
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_farm_changes();
+
+CREATE OR REPLACE FUNCTION notify_plot_changes()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT f.user_id FROM new_rows p JOIN core.farm f ON f.id = p.farm_id) AS changed GROUP BY user_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT f.user_id FROM old_rows p JOIN core.farm f ON f.id = p.farm_id) AS changed GROUP BY user_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT f.user_id FROM new_rows p JOIN core.farm f ON f.id = p.farm_id UNION SELECT f.user_id FROM old_rows p JOIN core.farm f ON f.id = p.farm_id) AS changed GROUP BY user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_plot_changes_insert
+    AFTER INSERT ON core.plot
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_plot_changes();
+
+CREATE TRIGGER notify_plot_changes_update
+    AFTER UPDATE ON core.plot
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_plot_changes();
+
+CREATE TRIGGER notify_plot_changes_delete
+    AFTER DELETE ON core.plot
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_plot_changes();
+
+CREATE OR REPLACE FUNCTION notify_task_changes()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT user_id FROM new_rows) AS changed GROUP BY user_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT user_id FROM old_rows) AS changed GROUP BY user_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT user_id FROM new_rows UNION SELECT user_id FROM old_rows) AS changed GROUP BY user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_task_changes_insert
+    AFTER INSERT ON core.task
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_task_changes();
+
+CREATE TRIGGER notify_task_changes_update
+    AFTER UPDATE ON core.task
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_task_changes();
+
+CREATE TRIGGER notify_task_changes_delete
+    AFTER DELETE ON core.task
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_task_changes();
+
+CREATE OR REPLACE FUNCTION notify_journal_entry_changes()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT user_id FROM new_rows) AS changed GROUP BY user_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT user_id FROM old_rows) AS changed GROUP BY user_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM pg_notify('cache_invalidate', 'user:' || user_id)
+        FROM (SELECT user_id FROM new_rows UNION SELECT user_id FROM old_rows) AS changed GROUP BY user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_journal_entry_changes_insert
+    AFTER INSERT ON core.journal_entry
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_journal_entry_changes();
+
+CREATE TRIGGER notify_journal_entry_changes_update
+    AFTER UPDATE ON core.journal_entry
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_journal_entry_changes();
+
+CREATE TRIGGER notify_journal_entry_changes_delete
+    AFTER DELETE ON core.journal_entry
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_journal_entry_changes();
+
+-- Ownership caches only need to hear when a user loses a farm or plot
+-- (ids missing from a cache are re-checked against the database)
+CREATE OR REPLACE FUNCTION notify_ownership_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' AND TG_TABLE_NAME = 'farm' THEN
+        PERFORM pg_notify('cache_invalidate', 'ownership:' || user_id)
+        FROM (SELECT DISTINCT user_id FROM old_rows) AS owners;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('cache_invalidate', 'ownership:' || user_id)
+        FROM (SELECT DISTINCT f.user_id FROM old_rows o JOIN core.farm f ON f.id = o.farm_id) AS owners;
+    ELSIF TG_TABLE_NAME = 'farm' THEN
+        PERFORM pg_notify('cache_invalidate', 'ownership:' || user_id)
+        FROM (
+            SELECT o.user_id FROM old_rows o JOIN new_rows n ON n.id = o.id
+            WHERE o.deleted_at IS NULL AND (n.deleted_at IS NOT NULL OR n.user_id != o.user_id)
+            GROUP BY o.user_id
+        ) AS owners;
+    ELSE
+        PERFORM pg_notify('cache_invalidate', 'ownership:' || user_id)
+        FROM (
+            SELECT f.user_id FROM old_rows o JOIN new_rows n ON n.id = o.id
+            JOIN core.farm f ON f.id = o.farm_id
+            WHERE o.deleted_at IS NULL AND (n.deleted_at IS NOT NULL OR n.farm_id != o.farm_id)
+            GROUP BY f.user_id
+        ) AS owners;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_farm_ownership_update
+    AFTER UPDATE ON core.farm
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_ownership_change();
+
+CREATE TRIGGER notify_farm_ownership_delete
+    AFTER DELETE ON core.farm
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_ownership_change();
+
+CREATE TRIGGER notify_plot_ownership_update
+    AFTER UPDATE ON core.plot
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_ownership_change();
+
+CREATE TRIGGER notify_plot_ownership_delete
+    AFTER DELETE ON core.plot
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_ownership_change();
+
+-- Cached knowledge retrieval depends on every chunk, so any change drops all of it
+CREATE OR REPLACE FUNCTION notify_knowledge_chunk_changes()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('cache_invalidate', 'knowledge:');
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_knowledge_chunk_changes_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON core.knowledge_chunk
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_knowledge_chunk_changes();
+
+-- Per-user stats counters: statement-level triggers apply each statement's net change
+-- (new rows +1, old rows -1) to core.user_stats and core.user_stats_daily
+
+CREATE OR REPLACE FUNCTION track_farm_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO core.user_stats AS s (user_id, farms, plots)
+        SELECT user_id, SUM(sign), SUM(sign * plots) FROM (
+            SELECT f.user_id, 1 AS sign,
+                   (SELECT COUNT(*) FROM core.plot p WHERE p.farm_id = f.id AND p.deleted_at IS NULL) AS plots
+            FROM new_rows f WHERE f.deleted_at IS NULL
+        ) c GROUP BY user_id HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id)
+        ON CONFLICT (user_id) DO UPDATE SET
+            farms = s.farms + EXCLUDED.farms, plots = s.plots + EXCLUDED.plots, updated_at = NOW();
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO core.user_stats AS s (user_id, farms, plots)
+        SELECT user_id, SUM(sign), SUM(sign * plots) FROM (
+            SELECT f.user_id, -1 AS sign,
+                   (SELECT COUNT(*) FROM core.plot p WHERE p.farm_id = f.id AND p.deleted_at IS NULL) AS plots
+            FROM old_rows f WHERE f.deleted_at IS NULL
+        ) c GROUP BY user_id HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id)
+        ON CONFLICT (user_id) DO UPDATE SET
+            farms = s.farms + EXCLUDED.farms, plots = s.plots + EXCLUDED.plots, updated_at = NOW();
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO core.user_stats AS s (user_id, farms, plots)
+        SELECT user_id, SUM(sign), SUM(sign * plots) FROM (
+            SELECT f.user_id, 1 AS sign,
+                   (SELECT COUNT(*) FROM core.plot p WHERE p.farm_id = f.id AND p.deleted_at IS NULL) AS plots
+            FROM new_rows f WHERE f.deleted_at IS NULL
+            UNION ALL
+            SELECT f.user_id, -1 AS sign,
+                   (SELECT COUNT(*) FROM core.plot p WHERE p.farm_id = f.id AND p.deleted_at IS NULL) AS plots
+            FROM old_rows f WHERE f.deleted_at IS NULL
+        ) c GROUP BY user_id HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id)
+        ON CONFLICT (user_id) DO UPDATE SET
+            farms = s.farms + EXCLUDED.farms, plots = s.plots + EXCLUDED.plots, updated_at = NOW();
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER track_farm_stats_insert
+    AFTER INSERT ON core.farm
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_farm_stats();
+
+CREATE TRIGGER track_farm_stats_update
+    AFTER UPDATE ON core.farm
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_farm_stats();
+
+CREATE TRIGGER track_farm_stats_delete
+    AFTER DELETE ON core.farm
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_farm_stats();
+
+CREATE OR REPLACE FUNCTION track_plot_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO core.user_stats AS s (user_id, plots)
+        SELECT user_id, SUM(sign) FROM (
+            SELECT f.user_id, 1 AS sign
+            FROM new_rows p JOIN core.farm f ON f.id = p.farm_id
+            WHERE p.deleted_at IS NULL AND f.deleted_at IS NULL
+        ) c GROUP BY user_id HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id)
+        ON CONFLICT (user_id) DO UPDATE SET plots = s.plots + EXCLUDED.plots, updated_at = NOW();
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO core.user_stats AS s (user_id, plots)
+        SELECT user_id, SUM(sign) FROM (
+            SELECT f.user_id, -1 AS sign
+            FROM old_rows p JOIN core.farm f ON f.id = p.farm_id
+            WHERE p.deleted_at IS NULL AND f.deleted_at IS NULL
+        ) c GROUP BY user_id HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id)
+        ON CONFLICT (user_id) DO UPDATE SET plots = s.plots + EXCLUDED.plots, updated_at = NOW();
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO core.user_stats AS s (user_id, plots)
+        SELECT user_id, SUM(sign) FROM (
+            SELECT f.user_id, 1 AS sign
+            FROM new_rows p JOIN core.farm f ON f.id = p.farm_id
+            WHERE p.deleted_at IS NULL AND f.deleted_at IS NULL
+            UNION ALL
+            SELECT f.user_id, -1 AS sign
+            FROM old_rows p JOIN core.farm f ON f.id = p.farm_id
+            WHERE p.deleted_at IS NULL AND f.deleted_at IS NULL
+        ) c GROUP BY user_id HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id)
+        ON CONFLICT (user_id) DO UPDATE SET plots = s.plots + EXCLUDED.plots, updated_at = NOW();
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER track_plot_stats_insert
+    AFTER INSERT ON core.plot
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_plot_stats();
+
+CREATE TRIGGER track_plot_stats_update
+    AFTER UPDATE ON core.plot
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_plot_stats();
+
+CREATE TRIGGER track_plot_stats_delete
+    AFTER DELETE ON core.plot
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_plot_stats();
+
+CREATE OR REPLACE FUNCTION track_task_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO core.user_stats AS s (user_id, tasks, tasks_pending, tasks_in_progress, tasks_done)
+        SELECT user_id, SUM(sign),
+               COALESCE(SUM(sign) FILTER (WHERE status = 'pending'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE status = 'in_progress'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE status = 'done'), 0)
+        FROM (
+            SELECT user_id, status, due_date AS day, 1 AS sign
+            FROM new_rows WHERE deleted_at IS NULL
+        ) c GROUP BY user_id HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id)
+        ON CONFLICT (user_id) DO UPDATE SET
+            tasks = s.tasks + EXCLUDED.tasks,
+            tasks_pending = s.tasks_pending + EXCLUDED.tasks_pending,
+            tasks_in_progress = s.tasks_in_progress + EXCLUDED.tasks_in_progress,
+            tasks_done = s.tasks_done + EXCLUDED.tasks_done,
+            updated_at = NOW();
+
+        INSERT INTO core.user_stats_daily AS d (user_id, day, open_tasks_due)
+        SELECT user_id, day, SUM(sign) FROM (
+            SELECT user_id, status, due_date AS day, 1 AS sign
+            FROM new_rows WHERE deleted_at IS NULL
+        ) c
+        WHERE status != 'done' GROUP BY user_id, day HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id) AND SUM(sign) != 0
+        ON CONFLICT (user_id, day) DO UPDATE SET open_tasks_due = d.open_tasks_due + EXCLUDED.open_tasks_due;
+
+        DELETE FROM core.user_stats_daily d
+        USING (SELECT DISTINCT user_id, day FROM (
+            SELECT user_id, status, due_date AS day, 1 AS sign
+            FROM new_rows WHERE deleted_at IS NULL
+        ) c) c
+        WHERE d.user_id = c.user_id AND d.day = c.day
+        AND d.open_tasks_due = 0 AND d.journal_entries = 0;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO core.user_stats AS s (user_id, tasks, tasks_pending, tasks_in_progress, tasks_done)
+        SELECT user_id, SUM(sign),
+               COALESCE(SUM(sign) FILTER (WHERE status = 'pending'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE status = 'in_progress'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE status = 'done'), 0)
+        FROM (
+            SELECT user_id, status, due_date AS day, -1 AS sign
+            FROM old_rows WHERE deleted_at IS NULL
+        ) c GROUP BY user_id HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id)
+        ON CONFLICT (user_id) DO UPDATE SET
+            tasks = s.tasks + EXCLUDED.tasks,
+            tasks_pending = s.tasks_pending + EXCLUDED.tasks_pending,
+            tasks_in_progress = s.tasks_in_progress + EXCLUDED.tasks_in_progress,
+            tasks_done = s.tasks_done + EXCLUDED.tasks_done,
+            updated_at = NOW();
+
+        INSERT INTO core.user_stats_daily AS d (user_id, day, open_tasks_due)
+        SELECT user_id, day, SUM(sign) FROM (
+            SELECT user_id, status, due_date AS day, -1 AS sign
+            FROM old_rows WHERE deleted_at IS NULL
+        ) c
+        WHERE status != 'done' GROUP BY user_id, day HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id) AND SUM(sign) != 0
+        ON CONFLICT (user_id, day) DO UPDATE SET open_tasks_due = d.open_tasks_due + EXCLUDED.open_tasks_due;
+
+        DELETE FROM core.user_stats_daily d
+        USING (SELECT DISTINCT user_id, day FROM (
+            SELECT user_id, status, due_date AS day, -1 AS sign
+            FROM old_rows WHERE deleted_at IS NULL
+        ) c) c
+        WHERE d.user_id = c.user_id AND d.day = c.day
+        AND d.open_tasks_due = 0 AND d.journal_entries = 0;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO core.user_stats AS s (user_id, tasks, tasks_pending, tasks_in_progress, tasks_done)
+        SELECT user_id, SUM(sign),
+               COALESCE(SUM(sign) FILTER (WHERE status = 'pending'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE status = 'in_progress'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE status = 'done'), 0)
+        FROM (
+            SELECT user_id, status, due_date AS day, 1 AS sign
+            FROM new_rows WHERE deleted_at IS NULL
+            UNION ALL
+            SELECT user_id, status, due_date AS day, -1 AS sign
+            FROM old_rows WHERE deleted_at IS NULL
+        ) c GROUP BY user_id HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id)
+        ON CONFLICT (user_id) DO UPDATE SET
+            tasks = s.tasks + EXCLUDED.tasks,
+            tasks_pending = s.tasks_pending + EXCLUDED.tasks_pending,
+            tasks_in_progress = s.tasks_in_progress + EXCLUDED.tasks_in_progress,
+            tasks_done = s.tasks_done + EXCLUDED.tasks_done,
+            updated_at = NOW();
+
+        INSERT INTO core.user_stats_daily AS d (user_id, day, open_tasks_due)
+        SELECT user_id, day, SUM(sign) FROM (
+            SELECT user_id, status, due_date AS day, 1 AS sign
+            FROM new_rows WHERE deleted_at IS NULL
+            UNION ALL
+            SELECT user_id, status, due_date AS day, -1 AS sign
+            FROM old_rows WHERE deleted_at IS NULL
+        ) c
+        WHERE status != 'done' GROUP BY user_id, day HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id) AND SUM(sign) != 0
+        ON CONFLICT (user_id, day) DO UPDATE SET open_tasks_due = d.open_tasks_due + EXCLUDED.open_tasks_due;
+
+        DELETE FROM core.user_stats_daily d
+        USING (SELECT DISTINCT user_id, day FROM (
+            SELECT user_id, status, due_date AS day, 1 AS sign
+            FROM new_rows WHERE deleted_at IS NULL
+            UNION ALL
+            SELECT user_id, status, due_date AS day, -1 AS sign
+            FROM old_rows WHERE deleted_at IS NULL
+        ) c) c
+        WHERE d.user_id = c.user_id AND d.day = c.day
+        AND d.open_tasks_due = 0 AND d.journal_entries = 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER track_task_stats_insert
+    AFTER INSERT ON core.task
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_task_stats();
+
+CREATE TRIGGER track_task_stats_update
+    AFTER UPDATE ON core.task
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_task_stats();
+
+CREATE TRIGGER track_task_stats_delete
+    AFTER DELETE ON core.task
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_task_stats();
+
+CREATE OR REPLACE FUNCTION track_journal_entry_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO core.user_stats AS s (user_id, journal_entries, journal_planting, journal_fertilizer,
+                                          journal_irrigation, journal_pest, journal_harvest)
+        SELECT user_id, SUM(sign),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'planting'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'fertilizer'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'irrigation'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'pest'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'harvest'), 0)
+        FROM (
+            SELECT user_id, type, entry_date AS day, 1 AS sign
+            FROM new_rows WHERE deleted_at IS NULL
+        ) c GROUP BY user_id HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id)
+        ON CONFLICT (user_id) DO UPDATE SET
+            journal_entries = s.journal_entries + EXCLUDED.journal_entries,
+            journal_planting = s.journal_planting + EXCLUDED.journal_planting,
+            journal_fertilizer = s.journal_fertilizer + EXCLUDED.journal_fertilizer,
+            journal_irrigation = s.journal_irrigation + EXCLUDED.journal_irrigation,
+            journal_pest = s.journal_pest + EXCLUDED.journal_pest,
+            journal_harvest = s.journal_harvest + EXCLUDED.journal_harvest,
+            updated_at = NOW();
+
+        INSERT INTO core.user_stats_daily AS d (user_id, day, journal_entries)
+        SELECT user_id, day, SUM(sign) FROM (
+            SELECT user_id, type, entry_date AS day, 1 AS sign
+            FROM new_rows WHERE deleted_at IS NULL
+        ) c
+        GROUP BY user_id, day HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id) AND SUM(sign) != 0
+        ON CONFLICT (user_id, day) DO UPDATE SET journal_entries = d.journal_entries + EXCLUDED.journal_entries;
+
+        DELETE FROM core.user_stats_daily d
+        USING (SELECT DISTINCT user_id, day FROM (
+            SELECT user_id, type, entry_date AS day, 1 AS sign
+            FROM new_rows WHERE deleted_at IS NULL
+        ) c) c
+        WHERE d.user_id = c.user_id AND d.day = c.day
+        AND d.open_tasks_due = 0 AND d.journal_entries = 0;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO core.user_stats AS s (user_id, journal_entries, journal_planting, journal_fertilizer,
+                                          journal_irrigation, journal_pest, journal_harvest)
+        SELECT user_id, SUM(sign),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'planting'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'fertilizer'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'irrigation'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'pest'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'harvest'), 0)
+        FROM (
+            SELECT user_id, type, entry_date AS day, -1 AS sign
+            FROM old_rows WHERE deleted_at IS NULL
+        ) c GROUP BY user_id HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id)
+        ON CONFLICT (user_id) DO UPDATE SET
+            journal_entries = s.journal_entries + EXCLUDED.journal_entries,
+            journal_planting = s.journal_planting + EXCLUDED.journal_planting,
+            journal_fertilizer = s.journal_fertilizer + EXCLUDED.journal_fertilizer,
+            journal_irrigation = s.journal_irrigation + EXCLUDED.journal_irrigation,
+            journal_pest = s.journal_pest + EXCLUDED.journal_pest,
+            journal_harvest = s.journal_harvest + EXCLUDED.journal_harvest,
+            updated_at = NOW();
+
+        INSERT INTO core.user_stats_daily AS d (user_id, day, journal_entries)
+        SELECT user_id, day, SUM(sign) FROM (
+            SELECT user_id, type, entry_date AS day, -1 AS sign
+            FROM old_rows WHERE deleted_at IS NULL
+        ) c
+        GROUP BY user_id, day HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id) AND SUM(sign) != 0
+        ON CONFLICT (user_id, day) DO UPDATE SET journal_entries = d.journal_entries + EXCLUDED.journal_entries;
+
+        DELETE FROM core.user_stats_daily d
+        USING (SELECT DISTINCT user_id, day FROM (
+            SELECT user_id, type, entry_date AS day, -1 AS sign
+            FROM old_rows WHERE deleted_at IS NULL
+        ) c) c
+        WHERE d.user_id = c.user_id AND d.day = c.day
+        AND d.open_tasks_due = 0 AND d.journal_entries = 0;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO core.user_stats AS s (user_id, journal_entries, journal_planting, journal_fertilizer,
+                                          journal_irrigation, journal_pest, journal_harvest)
+        SELECT user_id, SUM(sign),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'planting'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'fertilizer'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'irrigation'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'pest'), 0),
+               COALESCE(SUM(sign) FILTER (WHERE type = 'harvest'), 0)
+        FROM (
+            SELECT user_id, type, entry_date AS day, 1 AS sign
+            FROM new_rows WHERE deleted_at IS NULL
+            UNION ALL
+            SELECT user_id, type, entry_date AS day, -1 AS sign
+            FROM old_rows WHERE deleted_at IS NULL
+        ) c GROUP BY user_id HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id)
+        ON CONFLICT (user_id) DO UPDATE SET
+            journal_entries = s.journal_entries + EXCLUDED.journal_entries,
+            journal_planting = s.journal_planting + EXCLUDED.journal_planting,
+            journal_fertilizer = s.journal_fertilizer + EXCLUDED.journal_fertilizer,
+            journal_irrigation = s.journal_irrigation + EXCLUDED.journal_irrigation,
+            journal_pest = s.journal_pest + EXCLUDED.journal_pest,
+            journal_harvest = s.journal_harvest + EXCLUDED.journal_harvest,
+            updated_at = NOW();
+
+        INSERT INTO core.user_stats_daily AS d (user_id, day, journal_entries)
+        SELECT user_id, day, SUM(sign) FROM (
+            SELECT user_id, type, entry_date AS day, 1 AS sign
+            FROM new_rows WHERE deleted_at IS NULL
+            UNION ALL
+            SELECT user_id, type, entry_date AS day, -1 AS sign
+            FROM old_rows WHERE deleted_at IS NULL
+        ) c
+        GROUP BY user_id, day HAVING EXISTS (SELECT 1 FROM core.user u WHERE u.id = c.user_id) AND SUM(sign) != 0
+        ON CONFLICT (user_id, day) DO UPDATE SET journal_entries = d.journal_entries + EXCLUDED.journal_entries;
+
+        DELETE FROM core.user_stats_daily d
+        USING (SELECT DISTINCT user_id, day FROM (
+            SELECT user_id, type, entry_date AS day, 1 AS sign
+            FROM new_rows WHERE deleted_at IS NULL
+            UNION ALL
+            SELECT user_id, type, entry_date AS day, -1 AS sign
+            FROM old_rows WHERE deleted_at IS NULL
+        ) c) c
+        WHERE d.user_id = c.user_id AND d.day = c.day
+        AND d.open_tasks_due = 0 AND d.journal_entries = 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER track_journal_entry_stats_insert
+    AFTER INSERT ON core.journal_entry
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_journal_entry_stats();
+
+CREATE TRIGGER track_journal_entry_stats_update
+    AFTER UPDATE ON core.journal_entry
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_journal_entry_stats();
+
+CREATE TRIGGER track_journal_entry_stats_delete
+    AFTER DELETE ON core.journal_entry
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_journal_entry_stats();
+
+-- Recount users' stats from the source tables (all users when p_user_ids is NULL).
+-- Counter rows are locked first: a concurrent write blocks in its trigger until the
+-- recount commits and then applies its delta on top. Returns the rows rewritten.
+CREATE OR REPLACE FUNCTION reconcile_user_stats(p_user_ids UUID[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    rewritten INTEGER;
+BEGIN
+    PERFORM 1 FROM core.user_stats
+    WHERE p_user_ids IS NULL OR user_id = ANY(p_user_ids)
+    FOR UPDATE;
+
+    WITH users AS (
+        SELECT id FROM core.user WHERE p_user_ids IS NULL OR id = ANY(p_user_ids)
+    ), farms AS (
+        SELECT user_id, COUNT(*) AS farms FROM core.farm
+        WHERE deleted_at IS NULL AND user_id IN (SELECT id FROM users)
+        GROUP BY user_id
+    ), plots AS (
+        SELECT f.user_id, COUNT(*) AS plots
+        FROM core.plot p JOIN core.farm f ON f.id = p.farm_id
+        WHERE p.deleted_at IS NULL AND f.deleted_at IS NULL AND f.user_id IN (SELECT id FROM users)
+        GROUP BY f.user_id
+    ), tasks AS (
+        SELECT user_id, COUNT(*) AS tasks,
+               COUNT(*) FILTER (WHERE status = 'pending') AS tasks_pending,
+               COUNT(*) FILTER (WHERE status = 'in_progress') AS tasks_in_progress,
+               COUNT(*) FILTER (WHERE status = 'done') AS tasks_done
+        FROM core.task
+        WHERE deleted_at IS NULL AND user_id IN (SELECT id FROM users)
+        GROUP BY user_id
+    ), journal AS (
+        SELECT user_id, COUNT(*) AS journal_entries,
+               COUNT(*) FILTER (WHERE type = 'planting') AS journal_planting,
+               COUNT(*) FILTER (WHERE type = 'fertilizer') AS journal_fertilizer,
+               COUNT(*) FILTER (WHERE type = 'irrigation') AS journal_irrigation,
+               COUNT(*) FILTER (WHERE type = 'pest') AS journal_pest,
+               COUNT(*) FILTER (WHERE type = 'harvest') AS journal_harvest
+        FROM core.journal_entry
+        WHERE deleted_at IS NULL AND user_id IN (SELECT id FROM users)
+        GROUP BY user_id
+    ), rewritten_rows AS (
+        INSERT INTO core.user_stats AS s (
+            user_id, farms, plots, tasks, tasks_pending, tasks_in_progress, tasks_done,
+            journal_entries, journal_planting, journal_fertilizer, journal_irrigation,
+            journal_pest, journal_harvest
+        )
+        SELECT u.id, COALESCE(farms.farms, 0), COALESCE(plots.plots, 0),
+               COALESCE(tasks.tasks, 0), COALESCE(tasks.tasks_pending, 0),
+               COALESCE(tasks.tasks_in_progress, 0), COALESCE(tasks.tasks_done, 0),
+               COALESCE(journal.journal_entries, 0), COALESCE(journal.journal_planting, 0),
+               COALESCE(journal.journal_fertilizer, 0), COALESCE(journal.journal_irrigation, 0),
+               COALESCE(journal.journal_pest, 0), COALESCE(journal.journal_harvest, 0)
+        FROM users u
+        LEFT JOIN farms ON farms.user_id = u.id
+        LEFT JOIN plots ON plots.user_id = u.id
+        LEFT JOIN tasks ON tasks.user_id = u.id
+        LEFT JOIN journal ON journal.user_id = u.id
+        ON CONFLICT (user_id) DO UPDATE SET
+            farms = EXCLUDED.farms, plots = EXCLUDED.plots, tasks = EXCLUDED.tasks,
+            tasks_pending = EXCLUDED.tasks_pending, tasks_in_progress = EXCLUDED.tasks_in_progress,
+            tasks_done = EXCLUDED.tasks_done, journal_entries = EXCLUDED.journal_entries,
+            journal_planting = EXCLUDED.journal_planting, journal_fertilizer = EXCLUDED.journal_fertilizer,
+            journal_irrigation = EXCLUDED.journal_irrigation, journal_pest = EXCLUDED.journal_pest,
+            journal_harvest = EXCLUDED.journal_harvest, updated_at = NOW()
+        WHERE (s.farms, s.plots, s.tasks, s.tasks_pending, s.tasks_in_progress, s.tasks_done,
+               s.journal_entries, s.journal_planting, s.journal_fertilizer, s.journal_irrigation,
+               s.journal_pest, s.journal_harvest)
+           IS DISTINCT FROM
+              (EXCLUDED.farms, EXCLUDED.plots, EXCLUDED.tasks, EXCLUDED.tasks_pending,
+               EXCLUDED.tasks_in_progress, EXCLUDED.tasks_done, EXCLUDED.journal_entries,
+               EXCLUDED.journal_planting, EXCLUDED.journal_fertilizer, EXCLUDED.journal_irrigation,
+               EXCLUDED.journal_pest, EXCLUDED.journal_harvest)
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO rewritten FROM rewritten_rows;
+
+    DELETE FROM core.user_stats_daily WHERE p_user_ids IS NULL OR user_id = ANY(p_user_ids);
+
+    INSERT INTO core.user_stats_daily (user_id, day, open_tasks_due, journal_entries)
+    SELECT user_id, day, SUM(open_tasks_due), SUM(journal_entries)
+    FROM (
+        SELECT user_id, due_date AS day, COUNT(*) AS open_tasks_due, 0 AS journal_entries
+        FROM core.task
+        WHERE deleted_at IS NULL AND status != 'done'
+        AND (p_user_ids IS NULL OR user_id = ANY(p_user_ids))
+        GROUP BY user_id, due_date
+        UNION ALL
+        SELECT user_id, entry_date, 0, COUNT(*)
+        FROM core.journal_entry
+        WHERE deleted_at IS NULL AND (p_user_ids IS NULL OR user_id = ANY(p_user_ids))
+        GROUP BY user_id, entry_date
+    ) days
+    GROUP BY user_id, day;
+
+    RETURN rewritten;
+END;
+$$ language 'plpgsql';
+
 -- ========================================
 -- DEMO DATA SEED
 -- ========================================
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test the IVF/PQ approximate index and its snapshot against the database in DATABASE_URL
+Checks recall against a brute-force scan, in-place add/remove, saving and
+memory-mapping, and the incremental update the knowledge.embed job applies
+"""
+
+import asyncio
+import tempfile
+import uuid
+
+import numpy as np
+
+from database.config import get_database
+from utils import vector_index
+from utils.ann import ID_DTYPE, IVFIndex
+from utils.embeddings import embed_chunks
+from utils.knowledge import semantic_knowledge
+from utils.vector_index import (
+    SNAPSHOT_DEDUPE_KEY, VectorIndex, build_index, get_vector_index, index_state, update_ann_snapshot, write_snapshot,
+)
+
+def clustered(rows: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.standard_normal((50, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), rows)] + 0.6 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def random_ids(rows: int) -> np.ndarray:
+    return np.frombuffer(b"".join(uuid.uuid4().bytes for _ in range(rows)), dtype=ID_DTYPE)
+
+def recall(results, expected) -> float:
+    return np.mean([len({chunk_id for chunk_id, _ in hits} & set(rows)) / len(rows) for hits, rows in zip(results, expected)])
+
+async def run_tests():
+    rng = np.random.default_rng(5)
+    vectors = clustered(20000, 64, rng)
+    ids = random_ids(len(vectors))
+    langs = rng.integers(0, 2, len(vectors)).astype(np.uint8)
+    queries = vectors[rng.integers(0, len(vectors), 50)] + 0.05 * rng.standard_normal((50, 64)).astype(np.float32)
+    exact_rows = np.argsort(-(queries @ vectors.T), axis=1)[:, :10]
+    expected = [[uuid.UUID(bytes=ids[row].tobytes()) for row in rows] for rows in exact_rows]
+
+    print("1. IVF-Flat recall...")
+    flat = IVFIndex.train(vectors, nlist=100)
+    flat.add(ids, vectors, langs)
+    assert len(flat) == len(vectors) and flat.meta["trainedOn"] == len(vectors)
+    low, high = recall(flat.search(queries, 10, nprobe=1), expected), recall(flat.search(queries, 10, nprobe=16), expected)
+    assert low < high and high >= 0.95, (low, high)
+    assert recall(flat.search(queries, 10, nprobe=100), expected) == 1.0, "probing every list should be exact"
+    hits = flat.search(queries, 10, nprobe=16)[0]
+    assert all(a[1] >= b[1] for a, b in zip(hits, hits[1:]))
+    print(f"✅ recall@10 {low:.2f} at nprobe=1, {high:.2f} at nprobe=16, exact with every list")
+
+    print("\n2. PQ codes and exact re-ranking...")
+    by_id = {ids[row].tobytes(): row for row in range(len(ids))}
+    exact = lambda wanted: vectors[[by_id[chunk_id.tobytes()] for chunk_id in wanted]]
+    pq = IVFIndex.train(vectors, nlist=100, pq_m=16)
+    pq.add(ids, vectors, langs)
+    assert pq.list_data[0].dtype == np.uint8 and pq.list_data[0].shape[1] == 16
+    coded = recall(pq.search(queries, 10, nprobe=16), expected)
+    refined = recall(pq.search(queries, 10, nprobe=16, exact=exact, refine=4), expected)
+    assert refined > coded and refined >= 0.85, (coded, refined)
+    print(f"✅ 16 bytes per vector, recall@10 {coded:.2f} from codes, {refined:.2f} re-ranked")
+
+    print("\n3. Language filter, add and remove...")
+    vi_ids = {uuid.UUID(bytes=ids[row].tobytes()) for row in np.flatnonzero(langs == 1)}
+    assert all(chunk_id in vi_ids for hits in flat.search(queries, 10, langs=[1]) for chunk_id, _ in hits)
+    target = expected[0][0]
+    gone = np.frombuffer(target.bytes, dtype=ID_DTYPE)
+    assert flat.remove(gone, vectors[exact_rows[0][:1]]) == 1 and len(flat) == len(vectors) - 1
+    assert target not in {chunk_id for chunk_id, _ in flat.search(queries[:1], 10)[0]}
+    assert flat.remove(gone) == 0
+    flat.add(gone, vectors[exact_rows[0][:1]], langs[exact_rows[0][:1]])
+    assert flat.search(queries[:1], 10)[0][0][0] == target
+    print("✅ Filtered by language; removed and re-added without retraining")
+
+    print("\n4. Save and load...")
+    with tempfile.TemporaryDirectory() as directory:
+        assert IVFIndex.load(directory) is None
+        pq.save(directory)
+        loaded = IVFIndex.load(directory)
+        assert isinstance(loaded.list_data[0], np.memmap) or isinstance(loaded.list_data[0].base, np.memmap)
+        assert len(loaded) == len(pq) and loaded.pq_m == 16 and loaded.meta["trainedOn"] == len(vectors)
+        assert loaded.search(queries, 10, exact=exact) == pq.search(queries, 10, exact=exact)
+        loaded.remove(ids[:10])
+        loaded.save(directory)
+        assert len(IVFIndex.load(directory)) == len(pq) - 10
+    print("✅ Lists memory-mapped on load, same results, re-saved after an update")
+
+    print("\n5. Snapshot updates from the database...")
+    conn = await get_database()
+    source = f"test-ann-{uuid.uuid4()}"
+    insert = '''
+        INSERT INTO core.knowledge_chunk (source, title, content, lang) VALUES ($1, $2, $3, $4) RETURNING id
+    '''
+    chunk_ids = [await conn.fetchval(insert, source, f"Giống lúa {name}", f"Đặc điểm giống {name}: năng suất, thời gian sinh trưởng.", "vi")
+                 for name in ("OM5451", "ST25", "Đài thơm 8", "IR50404", "Jasmine 85", "OM18")]
+    original_min_chunks = vector_index.ANN_MIN_CHUNKS
+    vector_index.ANN_MIN_CHUNKS = 1
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            await embed_chunks(conn)
+            index = await build_index(conn)
+            ann = await update_ann_snapshot(conn, index, directory)
+            assert len(ann) == len(index) and (ann.meta["count"], ann.meta["updatedAt"]) == index.state
+            trained_on = ann.meta["trainedOn"]
+
+            added = await conn.fetchval(insert, source, "Bệnh đạo ôn lá", "Vết bệnh hình thoi, tâm xám, viền nâu trên lá lúa.", "vi")
+            await conn.execute("UPDATE core.knowledge_chunk SET deleted_at = NOW() WHERE id = $1", chunk_ids[0])
+            await embed_chunks(conn)
+            index = await write_snapshot(conn, directory)
+            ann = await update_ann_snapshot(conn, index, directory)
+            assert ann.meta["trainedOn"] == trained_on, "a small change should not retrain"
+            indexed = {chunk_id for ids in ann.list_ids for chunk_id in ids.view("S16")}
+            assert added.bytes in indexed and chunk_ids[0].bytes not in indexed and len(ann) == len(index)
+            print("✅ New and deleted chunks applied incrementally")
+
+            vector_index._index = None
+            assert (await get_vector_index(conn, directory)).ann is not None
+            found = [chunk for chunk in await semantic_knowledge(conn, "dao on la lua", "vi") if chunk["source"] == source]
+            assert found[0]["title"] == "Bệnh đạo ôn lá", found
+            print("✅ Semantic search goes through the IVF index when it matches the snapshot")
+
+            served = await get_vector_index(conn, directory)
+            state = await index_state(conn)
+            pending = await conn.fetchval(insert, source, "Ốc bươu vàng", "Ốc cắn phá mạ non mới sạ.", "vi")
+            assert await index_state(conn) == state, "a chunk waiting for its embedding is not a change"
+            await embed_chunks(conn, [str(pending)])
+            await write_snapshot(conn, directory)
+            vector_index._checked_at = 0
+            assert await get_vector_index(conn, directory) is served, "keeps its IVF index until a matching one exists"
+            await update_ann_snapshot(conn, VectorIndex.load(directory), directory)
+            vector_index._checked_at = 0
+            index = await get_vector_index(conn, directory)
+            assert index is not served and index.ann is not None and len(index) == len(served) + 1
+            print("✅ Unembedded chunks change nothing; a new snapshot is served once its IVF index is written")
+    finally:
+        vector_index.ANN_MIN_CHUNKS = original_min_chunks
+        vector_index._index = None
+        await conn.execute("DELETE FROM core.knowledge_chunk WHERE source = $1", source)
+        await conn.execute("DELETE FROM sys.job_queue WHERE dedupe_key = $1", SNAPSHOT_DEDUPE_KEY)
+        await conn.close()
+
+    print("\n✅ ANN tests passed")
+
+def test_ann():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_ann()
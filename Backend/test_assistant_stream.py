@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test streamed assistant replies against the database in DATABASE_URL
+Creates a throwaway user and conversation, then checks the Server-Sent Events
+of /messages/stream with the default and a slow reply backend (first event
+before the reply is generated, reply saved once complete), backend errors,
+and that /messages returns the same reply in one piece, from the reply cache
+"""
+
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+from fastapi import HTTPException
+
+from api import assistant
+from database.config import close_pool, get_database
+from main import app
+from utils.auth import create_access_token
+from utils.intents import get_intent_matcher
+from utils.response_cache import response_cache
+
+PIECE_DELAY = 0.05
+
+def parse_events(body: str):
+    """(event, data) of each Server-Sent Event in body"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+async def slow_backend(user_message, reply_context):
+    yield {"backend": "slow"}
+    for word in ["Giữ ", "mực ", "nước ", "3-5 cm."]:
+        await asyncio.sleep(PIECE_DELAY)
+        yield word
+
+async def failing_backend(user_message, reply_context):
+    yield "Đang "
+    raise RuntimeError("model unavailable")
+
+async def collect_asgi(path: str, body: bytes, token: str):
+    """(seconds since the request, ASGI message) of everything the app sends"""
+    sent = []
+    scope = {"type": "http", "method": "POST", "path": path, "raw_path": path.encode(), "root_path": "",
+             "query_string": b"", "headers": [(b"authorization", f"Bearer {token}".encode()),
+                                             (b"content-type", b"application/json"),
+                                             (b"accept-encoding", b"gzip")]}
+    requested = False
+    start = time.perf_counter()
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            await asyncio.Event().wait()  # the client never disconnects
+        requested = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append((time.perf_counter() - start, message))
+
+    await (app.middleware_stack or app.build_middleware_stack())(scope, receive, send)
+    return sent
+
+async def run_tests():
+    conn = await get_database()
+    user_id = uuid.uuid4()
+    await conn.execute('''
+        INSERT INTO core.user (id, email, password_hash, display_name)
+        VALUES ($1, $2, 'x', 'Test Stream')
+    ''', user_id, f"test-stream-{user_id}@airrvie.app")
+    token = create_access_token({"sub": str(user_id)})
+    transport = httpx.ASGITransport(app=app)
+    response_cache.clear()
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                     headers={"Authorization": f"Bearer {token}"}) as client:
+            response = await client.post("/api/assistant/conversations", json={"context": {"season": "Đông Xuân"}})
+            assert response.status_code == 200, response.text
+            conversation_id = response.json()["id"]
+            messages = f"/api/assistant/conversations/{conversation_id}/messages"
+
+            print("1. Streaming the default reply...")
+            question = "Lúa bị vàng lá phải làm sao?"
+            response = await client.post(f"{messages}/stream", json={"content": question})
+            assert response.status_code == 200, response.text
+            assert response.headers["content-type"].startswith("text/event-stream")
+            assert response.headers["cache-control"] == "no-cache" and "content-encoding" not in response.headers
+            events = parse_events(response.text)
+            names = [name for name, _ in events]
+            assert names[0] == "user" and names[-1] == "done" and set(names[1:-1]) == {"delta"}, names
+            assert events[0][1]["content"] == question and events[0][1]["role"] == "user"
+            reply = "".join(data["content"] for name, data in events if name == "delta")
+            intent, _ = get_intent_matcher().match(question)
+            done = events[-1][1]
+            assert reply == intent["content"] == done["content"] and done["metadata"]["intent"] == "yellow_leaves"
+            stored = await conn.fetch('''
+                SELECT role, content, metadata FROM core.message WHERE conversation_id = $1 ORDER BY created_at
+            ''', uuid.UUID(conversation_id))
+            assert [(row["role"], row["content"]) for row in stored] == [("user", question), ("assistant", reply)]
+            assert json.loads(stored[1]["metadata"])["intent"] == "yellow_leaves"
+            print(f"✅ user, {len(names) - 2} deltas, done; both messages saved")
+
+            print("\n2. One-piece reply...")
+            response = await client.post(messages, json={"content": question})
+            assert response.status_code == 200, response.text
+            assert response.json()["assistantMessage"]["content"] == reply
+            assert response.json()["assistantMessage"]["metadata"]["cache"] == "exact"
+            events = parse_events((await client.post(f"{messages}/stream", json={"content": "Vàng lá lúa phải làm sao"})).text)
+            assert [name for name, _ in events] == ["user", "delta", "done"], events
+            assert events[-1][1]["content"] == reply and events[-1][1]["metadata"]["cache"] == "semantic"
+            try:
+                await assistant.stream_message(str(uuid.uuid4()), assistant.MessageCreate(content="?"), str(user_id))
+                raise AssertionError("expected 404")
+            except HTTPException as e:
+                assert e.status_code == 404
+            print("✅ /messages returns the same reply and a paraphrase streams it, both cached; unknown conversations are 404 before any event")
+
+            print("\n3. Backend errors...")
+            assistant._reply_backend = failing_backend
+            events = parse_events((await client.post(f"{messages}/stream", json={"content": "mực nước"})).text)
+            assert [name for name, _ in events] == ["user", "delta", "error"], events
+            assert "model unavailable" in events[-1][1]["detail"]
+            count = await conn.fetchval("SELECT count(*) FROM core.message WHERE conversation_id = $1", uuid.UUID(conversation_id))
+            assert count == 7, "the unfinished reply is not saved"
+            print("✅ An error event ends the stream; the partial reply is not saved")
+
+        print("\n4. First byte before the reply...")
+        assistant._reply_backend = slow_backend
+        sent = await collect_asgi(f"{messages}/stream", json.dumps({"content": "mực nước"}).encode(), token)
+        bodies = [(at, message["body"]) for at, message in sent if message["type"] == "http.response.body" and message["body"]]
+        first_at, last_at = bodies[0][0], bodies[-1][0]
+        start = next(message for _, message in sent if message["type"] == "http.response.start")
+        assert b"content-encoding" not in dict(start["headers"]), "event streams are not compressed"
+        assert bodies[0][1].startswith(b"event: user"), bodies[0]
+        assert last_at - first_at >= 4 * PIECE_DELAY * 0.9, (first_at, last_at)
+        events = parse_events(b"".join(body for _, body in bodies).decode())
+        assert events[-1][0] == "done" and events[-1][1]["content"] == "Giữ mực nước 3-5 cm."
+        assert events[-1][1]["metadata"] == {"backend": "slow"}
+        print(f"✅ First event after {first_at * 1000:.0f} ms, reply finished after {last_at * 1000:.0f} ms, uncompressed")
+    finally:
+        assistant._reply_backend = None
+        response_cache.clear()
+        await conn.execute("DELETE FROM core.user WHERE id = $1", user_id)
+        await conn.close()
+        await close_pool()
+
+    print("\n✅ Assistant streaming tests passed")
+
+def test_assistant_stream():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_assistant_stream()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test /api/batch in-process against the database in DATABASE_URL
+Batched reads must match the same calls made one by one, writes need the
+transactional flag, a failing write rolls back the whole batch, and cached
+reads neither hide a batch's own writes nor keep its rolled-back ones
+"""
+
+import asyncio
+
+import httpx
+
+from database.config import close_pool, get_database
+from main import app
+from utils.auth import create_access_token
+from utils.invalidation import invalidation_bus
+
+DEMO_USER_ID = "11111111-1111-1111-1111-111111111111"
+DEMO_PLOT_ID = "33333333-3333-3333-3333-333333333333"
+MISSING_ID = "00000000-0000-0000-0000-000000000000"
+TEST_TITLE = "test_batch"
+
+async def count_test_tasks() -> int:
+    conn = await get_database()
+    try:
+        return await conn.fetchval("SELECT COUNT(*) FROM core.task WHERE title = $1 AND deleted_at IS NULL", TEST_TITLE)
+    finally:
+        await conn.close()
+
+async def run_tests():
+    token = create_access_token({"sub": DEMO_USER_ID})
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    await invalidation_bus.start()  # @cached only caches while listening
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+        print("1. Concurrent reads...")
+        paths = ["/api/farms", "/api/plots", "/api/tasks/upcoming", "/api/journal/stats", "/api/users/profile", "/api/dashboard?fields=stats"]
+        response = await client.post("/api/batch", json={
+            "requests": [{"id": str(n), "path": path} for n, path in enumerate(paths)]
+        })
+        assert response.status_code == 200, response.text
+        batched = response.json()["responses"]
+        for n, path in enumerate(paths):
+            single = await client.get(path)
+            assert batched[n]["id"] == str(n)
+            assert batched[n]["status"] == single.status_code == 200, (path, batched[n])
+            assert batched[n]["body"] == single.json(), f"{path} differs when batched"
+            print(f"✅ {path}")
+
+        response = await client.post("/api/batch", json={"requests": [
+            {"path": "/api/nothing-here"},
+            {"path": f"/api/weather/plot/{MISSING_ID}"},
+            {"path": "/api/batch"},
+        ]})
+        assert [r["status"] for r in response.json()["responses"]] == [404, 404, 400]
+        print("✅ Failing sub-requests report their own status")
+
+        print("\n2. Writes...")
+        create = {"method": "POST", "path": "/api/tasks", "body": {
+            "plot_id": DEMO_PLOT_ID, "title": TEST_TITLE, "due_date": "2030-01-01", "type": "other"
+        }}
+        response = await client.post("/api/batch", json={"requests": [create]})
+        assert response.status_code == 400
+        print("✅ Writes without transactional=true are rejected")
+
+        response = await client.post("/api/batch", json={"transactional": True, "requests": [
+            create,
+            {"method": "DELETE", "path": f"/api/tasks/{MISSING_ID}"},
+            create,
+        ]})
+        result = response.json()
+        assert result["committed"] is False
+        assert [r["status"] for r in result["responses"]] == [200, 404, 424]
+        assert await count_test_tasks() == 0
+        print("✅ A failing write rolls back the batch")
+
+        response = await client.post("/api/batch", json={"transactional": True, "requests": [create, create]})
+        result = response.json()
+        assert result["committed"] is True
+        task_id = result["responses"][0]["body"]["id"]
+        assert await count_test_tasks() == 2
+
+        response = await client.post("/api/batch", json={"transactional": True, "requests": [
+            {"method": "PUT", "path": f"/api/tasks/{task_id}", "body": {"status": "done"}},
+            {"method": "DELETE", "path": f"/api/tasks/{result['responses'][1]['body']['id']}"},
+            {"method": "GET", "path": "/api/tasks/stats"},
+        ]})
+        result = response.json()
+        assert result["committed"] is True and [r["status"] for r in result["responses"]] == [200, 200, 200]
+        assert await count_test_tasks() == 1
+        print("✅ Committed writes are visible to later sub-requests and afterwards")
+
+        response = await client.post("/api/batch", json={"transactional": True, "requests": [
+            {"method": "POST", "path": "/api/tasks", "body": {"title": TEST_TITLE}},
+        ]})
+        assert response.json()["responses"][0]["status"] == 422
+        print("✅ Invalid bodies are rejected with 422")
+
+        print("\n3. Cached reads in a transaction...")
+        def titles(body):
+            return [task["title"] for task in body]
+
+        before = (await client.get("/api/tasks")).json()  # cached outside the batch
+        response = await client.post("/api/batch", json={"transactional": True, "requests": [
+            create,
+            {"method": "GET", "path": "/api/tasks"},
+            {"method": "DELETE", "path": f"/api/tasks/{MISSING_ID}"},
+        ]})
+        result = response.json()
+        assert result["committed"] is False and [r["status"] for r in result["responses"]][:2] == [200, 200]
+        assert titles(result["responses"][1]["body"]).count(TEST_TITLE) == titles(before).count(TEST_TITLE) + 1
+        after = (await client.get("/api/tasks")).json()
+        assert after == before and await count_test_tasks() == 1
+        print("✅ A batch reads its own write; after the rollback the cache still has the committed tasks")
+
+    conn = await get_database()
+    try:
+        await conn.execute("DELETE FROM core.task WHERE title = $1", TEST_TITLE)
+    finally:
+        await conn.close()
+    await invalidation_bus.stop()
+    await close_pool()
+    print("\n✅ Batch tests passed")
+
+def test_batch():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_batch()
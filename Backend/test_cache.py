@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Test the cache backends and the @cached router decorator
+The memory and Redis backends run the same checks (the Redis one against an
+in-process fake RESP server); the decorator test needs DATABASE_URL
+"""
+
+import asyncio
+import fnmatch
+import json
+import time
+
+from database.config import get_database
+import utils.cache as utils_cache
+from utils.cache import MemoryCache, RedisCache, RespClient, cached, get_cache
+from utils.invalidation import invalidation_bus
+
+DEMO_USER_ID = "11111111-1111-1111-1111-111111111111"
+TEST_NAME = "test_cache"
+
+class FakeRespServer:
+    """The subset of Redis the RedisCache uses, served over RESP2"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.commands = []
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"redis://:secret@127.0.0.1:{port}/2"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def alive(self, key):
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    @staticmethod
+    def encode(reply) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if isinstance(reply, bytes):
+            return b"$%d\r\n%s\r\n" % (len(reply), reply)
+        if isinstance(reply, list):
+            return b"*%d\r\n" % len(reply) + b"".join(FakeRespServer.encode(item) for item in reply)
+        return f"+{reply}\r\n".encode()
+
+    def run(self, name: str, args: list):
+        self.commands.append(name)
+        if name in ("PING", "AUTH", "SELECT"):
+            return "OK"
+        if name == "GET":
+            return self.data[args[0]] if self.alive(args[0]) else None
+        if name == "MGET":
+            return [self.data[key] if self.alive(key) else None for key in args]
+        if name == "SET":
+            key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+            if b"NX" in options and self.alive(key):
+                return None
+            self.data[key] = value
+            self.expires.pop(key, None)
+            if b"PX" in options:
+                self.expires[key] = time.monotonic() + int(args[2 + options.index(b"PX") + 1]) / 1000
+            return "OK"
+        if name == "DEL":
+            deleted = sum(1 for key in args if self.alive(key))
+            for key in args:
+                self.data.pop(key, None)
+                self.expires.pop(key, None)
+            return deleted
+        if name == "SADD":
+            if not self.alive(args[0]):
+                self.data[args[0]] = set()
+            self.data[args[0]].update(args[1:])
+            return len(args) - 1
+        if name == "SMEMBERS":
+            return sorted(self.data[args[0]]) if self.alive(args[0]) else []
+        if name == "PEXPIRE":
+            self.expires[args[0]] = time.monotonic() + int(args[1]) / 1000
+            return 1
+        if name == "SCAN":
+            pattern = args[args.index(b"MATCH") + 1].decode()
+            return [b"0", [key for key in list(self.data) if self.alive(key) and fnmatch.fnmatchcase(key.decode(), pattern)]]
+        return Exception(f"unknown command {name}")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                count = int((await reader.readuntil(b"\r\n"))[1:-2])
+                args = []
+                for _ in range(count):
+                    length = int((await reader.readuntil(b"\r\n"))[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                reply = self.run(args[0].decode().upper(), args[1:])
+                writer.write(f"-ERR {reply}\r\n".encode() if isinstance(reply, Exception) else self.encode(reply))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            writer.close()
+
+async def check_backend(cache, label: str):
+    print(f"\n{label}...")
+    await cache.set("a", {"n": 1}, tags=["user:1"])
+    await cache.set_many({"b": [1, 2], "c": "three"}, tags=["user:1", "user:2"])
+    assert await cache.get("a") == {"n": 1}
+    assert await cache.get_many(["a", "b", "c", "missing"]) == {"a": {"n": 1}, "b": [1, 2], "c": "three"}
+    print("✅ get/set/get_many/set_many")
+
+    await cache.delete("a")
+    assert await cache.get("a") is None
+    await cache.invalidate_tags(["user:2"])
+    assert await cache.get_many(["b", "c"]) == {}
+    print("✅ delete and tag invalidation")
+
+    await cache.set("short", 1, ttl=0.05)
+    await cache.set("long", 2, ttl=60)
+    await asyncio.sleep(0.1)
+    assert await cache.get("short") is None and await cache.get("long") == 2
+    print("✅ TTL expiry")
+
+    calls = 0
+    async def slow_loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return {"loaded": True}
+    results = await asyncio.gather(*[cache.get_or_set("hot", slow_loader) for _ in range(50)])
+    assert calls == 1 and all(result == {"loaded": True} for result in results)
+    print("✅ Stampede protection: 50 concurrent misses, 1 load")
+
+    await cache.clear()
+    assert await cache.get("long") is None
+    print("✅ clear")
+
+async def check_eviction():
+    print("\nEviction...")
+    lru = MemoryCache(max_entries=100, policy="lru")
+    tinylfu = MemoryCache(max_entries=100, policy="tinylfu")
+    for cache in (lru, tinylfu):
+        # A hot working set read repeatedly, then one pass over many cold keys
+        for _ in range(5):
+            for n in range(50):
+                if await cache.get(f"hot{n}") is None:
+                    await cache.set(f"hot{n}", n)
+        for n in range(1000):
+            await cache.set(f"cold{n}", n)
+        assert len(cache) <= 100
+    hot_lru = len(await lru.get_many([f"hot{n}" for n in range(50)]))
+    hot_tinylfu = len(await tinylfu.get_many([f"hot{n}" for n in range(50)]))
+    assert hot_lru == 0 and hot_tinylfu >= 45, (hot_lru, hot_tinylfu)
+    print(f"✅ Hot entries surviving a scan: LRU {hot_lru}/50, TinyLFU {hot_tinylfu}/50")
+
+async def check_redis_lock(url: str, server: FakeRespServer):
+    """Two workers (separate clients) missing the same key load it once"""
+    workers = [RedisCache(RespClient(url)), RedisCache(RespClient(url))]
+    calls = 0
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.2)
+        return "value"
+    results = await asyncio.gather(*[worker.get_or_set("shared", loader) for worker in workers])
+    assert results == ["value", "value"] and calls == 1
+    assert server.commands.count("AUTH") >= 2 and server.commands.count("SELECT") >= 2
+    print("✅ Cross-worker stampede lock")
+    for worker in workers:
+        await worker.client.close()
+
+async def check_decorator():
+    """GET /api/farms is cached per user and dropped on a user: invalidation; backend errors fall back to the handler"""
+    print("\nRouter decorator...")
+    from api.farms import get_farms
+
+    await invalidation_bus.start()
+    conn = await get_database()
+    try:
+        first = json.loads((await get_farms(current_user_id=DEMO_USER_ID)).body)
+        hits = get_cache().hits
+        assert json.loads((await get_farms(current_user_id=DEMO_USER_ID)).body) == first
+        assert get_cache().hits == hits + 1
+        print("✅ Second call served from the cache")
+
+        await conn.execute('''
+            INSERT INTO core.farm (user_id, name, province, district) VALUES ($1, $2, 'An Giang', 'Chợ Mới')
+        ''', DEMO_USER_ID, TEST_NAME)
+        deadline = time.monotonic() + 5
+        while len(json.loads((await get_farms(current_user_id=DEMO_USER_ID)).body)) == len(first):
+            assert time.monotonic() < deadline, "cached farms were not invalidated"
+            await asyncio.sleep(0.05)
+        print("✅ A farm written elsewhere invalidates the cached list")
+
+        calls = []
+
+        @cached(ttl=60)
+        async def profile(current_user_id: str, write: bool = False):
+            calls.append(write)
+            if write:  # a write committed while the handler was reading
+                invalidation_bus.invalidate_locally("user", current_user_id)
+            return {"calls": len(calls)}
+
+        assert await profile(current_user_id=DEMO_USER_ID, write=True) == {"calls": 1}
+        assert await profile(current_user_id=DEMO_USER_ID, write=True) == {"calls": 2}
+        assert await profile(current_user_id=DEMO_USER_ID) == await profile(current_user_id=DEMO_USER_ID) == {"calls": 3}
+        print("✅ A response loaded while an invalidation arrived is not cached")
+
+        working, utils_cache._cache = utils_cache._cache, RedisCache(RespClient("redis://127.0.0.1:1", timeout=0.5))
+        try:
+            assert await profile(current_user_id=DEMO_USER_ID) == {"calls": 4}
+            assert await profile(current_user_id=DEMO_USER_ID) == {"calls": 5}
+        finally:
+            utils_cache._cache = working
+        print("✅ The handler still answers when the cache backend is unreachable")
+    finally:
+        await conn.execute("DELETE FROM core.farm WHERE name = $1", TEST_NAME)
+        await conn.close()
+        await invalidation_bus.stop()
+
+async def run_tests():
+    await check_backend(MemoryCache(max_entries=1000), "Memory backend")
+    await check_eviction()
+
+    server = FakeRespServer()
+    url = await server.start()
+    try:
+        redis = RedisCache(RespClient(url), prefix="test:")
+        await check_backend(redis, "Redis backend (fake server)")
+        await redis.client.close()
+        await check_redis_lock(url, server)
+    finally:
+        await server.stop()
+
+    await check_decorator()
+    print("\n✅ Cache tests passed")
+
+def test_cache():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_cache()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Test response compression and precompressed static files
+Runs in-process on a small app with the same middleware; no database needed
+"""
+
+import asyncio
+import gzip
+import os
+import tempfile
+import time
+import zlib
+
+import brotli
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+
+import precompress
+from precompress import precompress_directory
+from utils import compression
+from utils.compression import CompressionMiddleware, PrecompressedStaticFiles, SinglePageAppFiles, accepted_encodings
+
+LARGE = b'{"entries": [' + b",".join(b'{"title": "B\xc3\xb3n ph\xc3\xa2n %d"}' % n for n in range(2000)) + b"]}"
+
+def build_app(static_dir: str) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/large")
+    async def large():
+        return Response(content=LARGE, media_type="application/json")
+
+    @app.get("/image")
+    async def image():
+        return Response(content=os.urandom(4096), media_type="image/jpeg")
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for n in range(100):
+                yield b'{"n": %d}\n' % n
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    app.mount("/static", PrecompressedStaticFiles(directory=static_dir), name="static")
+    return app
+
+async def fetch_raw(client, path: str, accept_encoding: str):
+    """The response and its body as sent, before httpx decodes it"""
+    async with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        raw = b"".join([chunk async for chunk in response.aiter_raw()])
+    return response, raw
+
+async def collect(middleware, path: str, accept_encoding: str):
+    """The ASGI messages the middleware sends for one request"""
+    messages = []
+    scope = {"type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "root_path": "",
+             "query_string": b"", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            await asyncio.Event().wait()  # the client never disconnects
+        requested = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware(scope, receive, send)
+    return messages
+
+async def run_tests():
+    print("1. Accept-Encoding negotiation...")
+    assert accepted_encodings("gzip, deflate, br") == ["br", "gzip"]
+    assert accepted_encodings("br;q=0.5, gzip") == ["gzip", "br"]
+    assert accepted_encodings("br;q=0, *;q=0.1") == ["gzip"]
+    assert accepted_encodings("identity") == []
+    print("✅ Preference order, q-values, wildcard and refusals")
+
+    with tempfile.TemporaryDirectory() as static_dir:
+        app = build_app(static_dir)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            print("\n2. Dynamic responses...")
+            for encoding, decompress in (("br", brotli.decompress), ("gzip", gzip.decompress)):
+                response, raw = await fetch_raw(client, "/large", encoding)
+                assert response.headers["content-encoding"] == encoding
+                assert response.headers["vary"] == "Accept-Encoding"
+                assert int(response.headers["content-length"]) == len(raw)
+                assert decompress(raw) == LARGE
+                print(f"✅ {encoding}: {len(LARGE):,} -> {len(raw):,} bytes")
+
+            response = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+            assert "content-encoding" not in response.headers and response.json() == {"ok": True}
+            response = await client.get("/image", headers={"Accept-Encoding": "gzip"})
+            assert "content-encoding" not in response.headers and len(response.content) == 4096
+            response = await client.get("/large", headers={"Accept-Encoding": "identity"})
+            assert "content-encoding" not in response.headers and response.content == LARGE
+            print("✅ Small bodies, images and identity-only clients are sent as is")
+
+            print("\n3. Streaming...")
+            messages = await collect(app.middleware_stack or app.build_middleware_stack(), "/stream", "gzip")
+            start, bodies = messages[0], [m for m in messages[1:] if m["type"] == "http.response.body"]
+            headers = dict(start["headers"])
+            assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+            decoder = zlib.decompressobj(31)
+            received = b""
+            for n, message in enumerate(bodies[:100]):
+                received += decoder.decompress(message["body"])
+                assert received.endswith(b'{"n": %d}\n' % n), "chunk was held back"
+            print(f"✅ {len(bodies)} chunks, each decodable as soon as it arrives")
+
+            print("\n4. Precompressed static files...")
+            asset = os.path.join(static_dir, "app.js")
+            with open(asset, "wb") as f:
+                f.write(b"console.log('xin ch\xc3\xa0o');\n" * 200)
+            with open(os.path.join(static_dir, "tiny.css"), "wb") as f:
+                f.write(b"body{}")
+            assert precompress.ENCODING_SUFFIXES == compression.ENCODING_SUFFIXES
+            assert precompress.COMPRESSIBLE_TYPES == compression.COMPRESSIBLE_TYPES
+            precompress_directory(static_dir)
+            assert os.path.exists(asset + ".br") and os.path.exists(asset + ".gz")
+            assert not os.path.exists(os.path.join(static_dir, "tiny.css.gz"))
+
+            for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+                response, raw = await fetch_raw(client, "/static/app.js", encoding)
+                with open(asset + suffix, "rb") as f:
+                    assert raw == f.read(), f"{suffix} variant was not served"
+                assert response.headers["content-encoding"] == encoding
+                assert response.headers["content-type"].startswith(("application/javascript", "text/javascript"))
+            response = await client.get("/static/app.js", headers={"Accept-Encoding": "identity"})
+            with open(asset, "rb") as f:
+                assert response.content == f.read()
+
+            # A variant older than its file is ignored until precompress runs again
+            time.sleep(0.01)
+            os.utime(asset)
+            response, raw = await fetch_raw(client, "/static/app.js", "br")
+            with open(asset, "rb") as f:
+                original = f.read()
+            with open(asset + ".br", "rb") as f:
+                assert raw != f.read()
+            assert brotli.decompress(raw) == original
+            print("✅ Fresh variants are served as they are, stale ones are bypassed")
+
+    print("\n5. Single-page app...")
+    with tempfile.TemporaryDirectory() as build_dir:
+        index = b"<!doctype html><div id=root></div>" + b"<!-- xin ch\xc3\xa0o -->" * 100
+        with open(os.path.join(build_dir, "index.html"), "wb") as f:
+            f.write(index)
+        os.mkdir(os.path.join(build_dir, "assets"))
+        with open(os.path.join(build_dir, "assets", "app.js"), "wb") as f:
+            f.write(b"console.log(1);\n" * 200)
+        precompress_directory(build_dir)
+
+        app = FastAPI()
+
+        @app.get("/api/status")
+        async def status():
+            return {"ok": True}
+
+        app.mount("/", SinglePageAppFiles(directory=build_dir), name="frontend")
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            for path in ("/", "/farms/3", "/journal"):
+                response, raw = await fetch_raw(client, path, "br")
+                assert response.status_code == 200 and brotli.decompress(raw) == index, path
+            response, raw = await fetch_raw(client, "/assets/app.js", "gzip")
+            assert response.headers["content-encoding"] == "gzip" and response.headers["content-type"].startswith(("application/javascript", "text/javascript"))
+            assert (await client.get("/api/status")).json() == {"ok": True}
+            assert (await client.get("/assets/missing.js")).status_code == 404
+            assert (await client.get("/api/missing")).status_code == 404
+        print("✅ Client-side routes get index.html, assets their variants, API and asset misses 404")
+
+    import main
+    if main.frontend:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            response = await client.get("/", headers={"Accept": "text/html"})
+            assert response.headers["content-type"].startswith("text/html")
+            assert (await client.get("/")).json()["status"] == "running"
+            assert (await client.get("/farms/3", headers={"Accept": "text/html"})).text == response.text
+        print(f"✅ main serves {main.FRONTEND_BUILD_DIR} to browsers, the status to API clients")
+
+    print("\n✅ Compression tests passed")
+
+def test_compression():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_compression()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test crop calendar generation against the database in DATABASE_URL
+"""
+
+import asyncio
+from datetime import date, timedelta
+
+from database.config import get_database
+from utils.crop_calendar import build_season_tasks, generate_calendars, regenerate_plot_calendar
+
+DEMO_FARM_ID = "22222222-2222-2222-2222-222222222222"
+TEST_PLOT_NAME = "test_crop_calendar"
+
+async def calendar_tasks(conn, plot_id):
+    rows = await conn.fetch('''
+        SELECT calendar_key, due_date, status FROM core.task
+        WHERE plot_id = $1 AND calendar_key IS NOT NULL AND deleted_at IS NULL
+    ''', plot_id)
+    return {row["calendar_key"]: row for row in rows}
+
+async def run_tests():
+    conn = await get_database()
+    try:
+        await conn.execute("DELETE FROM core.plot WHERE name = $1", TEST_PLOT_NAME)
+        planting = date.today()
+
+        print("\n1. Templates...")
+        tasks = build_season_tasks("OM 5451", planting)
+        by_key = {task["key"]: task for task in tasks}
+        assert by_key["fertilizer_1"]["due_date"] == planting + timedelta(days=7)
+        assert by_key["fertilizer_2"]["due_date"] == planting + timedelta(days=18)
+        assert by_key["fertilizer_3"]["due_date"] == planting + timedelta(days=40)
+        assert by_key["harvest"]["due_date"] == planting + timedelta(days=95)
+        assert any(task["type"] == "pest" for task in tasks)
+        print(f"✅ {len(tasks)} season tasks for OM 5451")
+
+        print("\n2. Generating...")
+        plot_id = await conn.fetchval('''
+            INSERT INTO core.plot (farm_id, name, area_m2, variety, planting_date)
+            VALUES ($1, $2, 1000, 'OM 5451', $3) RETURNING id
+        ''', DEMO_FARM_ID, TEST_PLOT_NAME, planting)
+        assert await generate_calendars(conn, [plot_id]) == len(tasks)
+        assert await generate_calendars(conn, [plot_id]) == 0
+        print("✅ Generated once, second run is a no-op")
+
+        print("\n3. Regenerating after the planting date moves...")
+        await conn.execute("UPDATE core.task SET status = 'done' WHERE plot_id = $1 AND calendar_key = 'irrigation_seedling'", plot_id)
+        await conn.execute("UPDATE core.plot SET planting_date = $2, variety = 'ST25' WHERE id = $1", plot_id, planting + timedelta(days=5))
+        await regenerate_plot_calendar(conn, plot_id)
+        current = await calendar_tasks(conn, plot_id)
+        assert current["fertilizer_1"]["due_date"] == planting + timedelta(days=12)
+        assert current["harvest"]["due_date"] == planting + timedelta(days=110)
+        assert current["irrigation_seedling"]["due_date"] == planting + timedelta(days=1), "done tasks keep their date"
+        assert set(current) == {task["key"] for task in build_season_tasks("ST25", planting)}
+        print(f"✅ {len(current)} tasks rescheduled, completed task untouched")
+
+        await conn.execute("DELETE FROM core.plot WHERE id = $1", plot_id)
+        print("\n✅ Crop calendar tests passed")
+    finally:
+        await conn.close()
+
+def test_crop_calendar():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_crop_calendar()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test /api/dashboard against the database in DATABASE_URL
+Every section must match the endpoint it replaces, and ?fields= must return
+only the requested sections
+"""
+
+import asyncio
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from api.dashboard import DASHBOARD_FIELDS, get_dashboard
+from api.farms import get_farms, get_plots
+from api.journal import get_journal_stats
+from api.tasks import get_task_stats, get_upcoming_tasks
+from api.users import get_user_stats
+
+DEMO_USER_ID = "11111111-1111-1111-1111-111111111111"
+
+def instants(value):
+    """createdAt timestamps compared as instants (Postgres trims trailing zeros, Python doesn't)"""
+    if isinstance(value, list):
+        return [instants(item) for item in value]
+    if isinstance(value, dict):
+        return {key: datetime.fromisoformat(item).timestamp() if key == "createdAt" else instants(item) for key, item in value.items()}
+    return value
+
+def decoded(result):
+    """The JSON a handler's result is sent as"""
+    return instants(json.loads(result.body) if isinstance(result, Response) else result)
+
+async def run_tests():
+    print("1. Full dashboard matches the individual endpoints...")
+    dashboard = decoded(await get_dashboard(fields=None, current_user_id=DEMO_USER_ID))
+    assert set(dashboard) == set(DASHBOARD_FIELDS), f"Unexpected sections: {sorted(dashboard)}"
+
+    expected = {
+        "farms": decoded(await get_farms(current_user_id=DEMO_USER_ID)),
+        "plots": decoded(await get_plots(current_user_id=DEMO_USER_ID)),
+        "upcomingTasks": decoded(await get_upcoming_tasks(current_user_id=DEMO_USER_ID)),
+        "stats": decoded(await get_user_stats(current_user_id=DEMO_USER_ID)),
+        "taskStats": decoded(await get_task_stats(current_user_id=DEMO_USER_ID)),
+        "journalStats": decoded(await get_journal_stats(current_user_id=DEMO_USER_ID)),
+    }
+    for field, value in expected.items():
+        assert dashboard[field] == value, f"{field} differs from its endpoint"
+        print(f"✅ {field}")
+
+    weather = dashboard["weather"]
+    assert {"location", "current", "forecast", "alerts"} <= set(weather)
+    print(f"✅ weather ({weather['location']})")
+
+    print("\n2. Field selection...")
+    partial = decoded(await get_dashboard(fields="farms, taskStats", current_user_id=DEMO_USER_ID))
+    assert set(partial) == {"farms", "taskStats"}
+    assert partial["farms"] == expected["farms"]
+    print("✅ Only the requested sections are returned")
+
+    try:
+        await get_dashboard(fields="farms,everything", current_user_id=DEMO_USER_ID)
+        raise AssertionError("Unknown field was accepted")
+    except HTTPException as e:
+        assert e.status_code == 400 and "everything" in e.detail
+    print("✅ Unknown fields are rejected with 400")
+
+    print("\n3. A user without farms...")
+    empty = decoded(await get_dashboard(fields="farms,plots,upcomingTasks,taskStats", current_user_id="00000000-0000-0000-0000-000000000000"))
+    assert empty["farms"] == [] and empty["plots"] == [] and empty["upcomingTasks"] == []
+    assert empty["taskStats"]["total"] == 0
+    print("✅ Empty sections and zero counters")
+
+    print("\n✅ Dashboard tests passed")
+
+def test_dashboard():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_dashboard()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test knowledge chunk embeddings and the vector index against the database in DATABASE_URL
+Checks the hashing embedder, exact top-k search against a brute-force scan,
+snapshots, the embed -> snapshot -> semantic search path on throwaway chunks,
+and that API workers keep serving a stale snapshot and ask the job for a new one
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import uuid
+
+import numpy as np
+
+from database.config import get_database
+from utils import vector_index
+from utils.embeddings import HashingEmbedder, decode_embedding, embed_chunks, encode_embedding
+from utils.knowledge import semantic_knowledge
+from utils.vector_index import ID_DTYPE, SNAPSHOT_DEDUPE_KEY, VectorIndex, get_vector_index, write_snapshot
+
+CHUNKS = [
+    ("Bệnh vàng lá chín sớm", "Lá lúa chuyển vàng từ chóp lá, thường gặp khi thiếu đạm hoặc nhiễm nấm.", "vi"),
+    ("Quản lý rầy nâu", "Rầy nâu chích hút gốc lúa, gây cháy rầy. Thăm đồng thường xuyên, phun thuốc khi mật độ cao.", "vi"),
+    ("Điều chỉnh mực nước", "Giữ mực nước ruộng 3-5 cm khi lúa đẻ nhánh, rút cạn trước thu hoạch.", "vi"),
+    ("Brown planthopper control", "Planthoppers suck sap at the base of rice plants and cause hopper burn.", "en"),
+]
+
+def random_index(rows: int, dim: int, rng: np.random.Generator) -> VectorIndex:
+    vectors = rng.standard_normal((rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = np.frombuffer(b"".join(uuid.uuid4().bytes for _ in range(rows)), dtype=ID_DTYPE)
+    langs = rng.integers(0, 2, rows).astype(np.uint8)
+    meta = {"embedder": "random", "dim": dim, "count": rows, "rows": rows, "updatedAt": None}
+    return VectorIndex(vectors, ids, langs, meta)
+
+async def run_tests():
+    print("1. Hashing embedder...")
+    embedder = HashingEmbedder(dim=256)
+    vectors = embedder.embed(["Lúa vàng lá, đốm nâu", "lua vang la, dom nau", "Cách phòng trừ rầy nâu", ""])
+    assert vectors.dtype == np.float32 and vectors.shape == (4, 256)
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0, atol=1e-5) and not vectors[3].any()
+    assert np.allclose(vectors[0], vectors[1]), "tone marks should not change the embedding"
+    assert np.array_equal(embedder.embed(["Cách phòng trừ rầy nâu"])[0], vectors[2]), "embedding is not deterministic"
+    assert vectors[0] @ embedder.embed_one("vàng lá lúa") > vectors[0] @ embedder.embed_one("rầy nâu hại lúa")
+    stored = encode_embedding(vectors[0])
+    assert len(stored) == 256 * 4 and np.array_equal(decode_embedding(stored), vectors[0])
+    print("✅ Deterministic, unit length, accent-insensitive, 1 KB as float32")
+
+    print("\n2. Exact top-k search...")
+    rng = np.random.default_rng(3)
+    original_block_rows = vector_index.BLOCK_ROWS
+    vector_index.BLOCK_ROWS = 1000  # several blocks, so the running top-k merge is exercised
+    try:
+        index = random_index(5000, 64, rng)
+        queries = index.vectors[[10, 2500, 4999]] + 0.01 * rng.standard_normal((3, 64)).astype(np.float32)
+        results = index.search(queries, k=10)
+        expected = np.argsort(-(queries @ index.vectors.T), axis=1)[:, :10]
+        for hits, rows in zip(results, expected):
+            assert [chunk_id for chunk_id, _ in hits] == [index.chunk_id(row) for row in rows]
+            assert all(a[1] >= b[1] for a, b in zip(hits, hits[1:]))
+        assert results[0][0][0] == index.chunk_id(10)
+
+        vi_rows = set(np.flatnonzero(index.langs == 1))
+        vi_ids = {index.chunk_id(row) for row in vi_rows}
+        assert all(chunk_id in vi_ids for chunk_id, _ in index.search(queries, k=10, lang="vi")[1])
+    finally:
+        vector_index.BLOCK_ROWS = original_block_rows
+    print("✅ Batched block search matches a brute-force scan, language filter applies")
+
+    print("\n3. Snapshots...")
+    with tempfile.TemporaryDirectory() as directory:
+        assert VectorIndex.load(directory) is None
+        index.save(directory)
+        loaded = VectorIndex.load(directory)
+        assert isinstance(loaded.vectors, np.memmap), "matrix should be memory-mapped"
+        assert loaded.state == index.state and len(loaded) == len(index)
+        assert loaded.search(queries, k=5) == index.search(queries, k=5)
+
+        # A newer snapshot replaces every file at once; one already mapped stays readable
+        newer = random_index(100, 64, rng)
+        newer.save(directory)
+        assert len(VectorIndex.load(directory)) == 100
+        with open(os.path.join(directory, "meta.json")) as f:
+            build = json.load(f)["build"]
+        assert sorted(name for name in os.listdir(directory) if name.endswith(".npy")) == \
+            [f"{name}.{build}.npy" for name in ("ids", "langs", "vectors")]
+        assert loaded.search(queries, k=5) == index.search(queries, k=5)
+        # meta.json naming a build whose files are gone (replaced mid-read) is no snapshot
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({**newer.meta, "build": "replaced", "arrays": ["vectors", "ids", "langs"]}, f)
+        assert VectorIndex.load(directory) is None
+        os.remove(os.path.join(directory, "meta.json"))
+        assert VectorIndex.load(directory) is None
+    print("✅ Saved, memory-mapped on load, same results, replaced whole")
+
+    print("\n4. Embedding chunks in the database...")
+    conn = await get_database()
+    original_directory = vector_index.VECTOR_INDEX_DIR
+    source = f"test-embeddings-{uuid.uuid4()}"
+    chunk_ids = [await conn.fetchval('''
+        INSERT INTO core.knowledge_chunk (source, title, content, lang) VALUES ($1, $2, $3, $4) RETURNING id
+    ''', source, title, content, lang) for title, content, lang in CHUNKS]
+    try:
+        assert await embed_chunks(conn, [str(chunk_id) for chunk_id in chunk_ids]) == len(CHUNKS)
+        stored = await conn.fetchval("SELECT embedding FROM core.knowledge_chunk WHERE id = $1", chunk_ids[0])
+        assert np.allclose(decode_embedding(stored), HashingEmbedder().embed_one(f"{CHUNKS[0][0]}\n{CHUNKS[0][1]}"))
+
+        await conn.execute("UPDATE core.knowledge_chunk SET tags = '{lua}' WHERE id = $1", chunk_ids[0])
+        assert await conn.fetchval("SELECT embedding IS NOT NULL FROM core.knowledge_chunk WHERE id = $1", chunk_ids[0])
+        await conn.execute("UPDATE core.knowledge_chunk SET content = content || ' Bón kali.' WHERE id = $1", chunk_ids[0])
+        assert await conn.fetchval("SELECT embedding IS NULL FROM core.knowledge_chunk WHERE id = $1", chunk_ids[0])
+        assert await embed_chunks(conn) >= 1
+        print("✅ Stored as float32, cleared when the text changes, re-embedded")
+
+        print("\n5. Semantic search...")
+        with tempfile.TemporaryDirectory() as directory:
+            vector_index.VECTOR_INDEX_DIR, vector_index._index = directory, None
+            index = await write_snapshot(conn)
+            assert {index.chunk_id(row) for row in range(len(index))} >= set(chunk_ids)
+
+            found = [chunk for chunk in await semantic_knowledge(conn, "lá lúa bị vàng", "vi") if chunk["source"] == source]
+            assert found[0]["title"] == "Bệnh vàng lá chín sớm", found
+            assert 0 < found[0]["score"] <= 1
+            found = [chunk for chunk in await semantic_knowledge(conn, "phong tru ray nau", "vi") if chunk["source"] == source]
+            assert found[0]["title"] == "Quản lý rầy nâu", found
+            assert all(chunk["lang"] == "vi" for chunk in found)
+            assert await semantic_knowledge(conn, "?!", "vi") == []
+            print("✅ Closest chunks come first, with and without tone marks")
+
+            print("\n6. Stale snapshots...")
+            served = await get_vector_index(conn)
+            await conn.execute('''
+                INSERT INTO core.knowledge_chunk (source, title, content, lang) VALUES ($1, 'Ốc bươu vàng', 'Ốc cắn phá mạ non.', 'vi')
+            ''', source)
+            await embed_chunks(conn)
+            vector_index._checked_at = 0
+            assert await get_vector_index(conn) is served, "a stale snapshot is still served, not rebuilt"
+            assert await conn.fetchval('''
+                SELECT count(*) FROM sys.job_queue WHERE job_type = 'knowledge.embed' AND dedupe_key = $1 AND status = 'queued'
+            ''', SNAPSHOT_DEDUPE_KEY) == 1
+            await write_snapshot(conn)
+            vector_index._checked_at = 0
+            assert len(await get_vector_index(conn)) == len(served) + 1
+            print("✅ Served until the job writes a newer snapshot, which is then picked up")
+    finally:
+        await conn.execute("DELETE FROM core.knowledge_chunk WHERE source = $1", source)
+        await conn.execute("DELETE FROM sys.job_queue WHERE dedupe_key = $1", SNAPSHOT_DEDUPE_KEY)
+        await conn.close()
+        vector_index.VECTOR_INDEX_DIR, vector_index._index = original_directory, None
+
+    print("\n✅ Embedding tests passed")
+
+def test_embeddings():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_embeddings()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test /api/journal/export and /api/tasks/export against the database in DATABASE_URL
+Creates a throwaway user, then checks NDJSON and CSV bodies, the plot and date
+filters, and that other users' plots are refused
+"""
+
+import asyncio
+import csv
+import io
+import json
+import uuid
+from datetime import date, timedelta
+
+import httpx
+from fastapi import HTTPException
+
+from api.journal import export_journal_entries
+from database.config import close_pool, get_database
+from main import app
+from utils.auth import create_access_token
+
+DEMO_PLOT_ID = "33333333-3333-3333-3333-333333333333"
+ENTRIES = 3000
+TASKS = 400
+START = date(2025, 1, 1)
+
+async def create_user(conn):
+    user_id = uuid.uuid4()
+    await conn.execute('''
+        INSERT INTO core.user (id, email, password_hash, display_name)
+        VALUES ($1, $2, 'x', 'Test Export')
+    ''', user_id, f"test-export-{user_id}@airrvie.app")
+    farm_id = await conn.fetchval('''
+        INSERT INTO core.farm (user_id, name, province, district)
+        VALUES ($1, 'Ruộng "Đông", xã 3', 'An Giang', 'Chợ Mới') RETURNING id
+    ''', user_id)
+    plot_ids = [await conn.fetchval('''
+        INSERT INTO core.plot (farm_id, name, area_m2) VALUES ($1, $2, 5000) RETURNING id
+    ''', farm_id, f"Plot {n}") for n in range(2)]
+    await conn.copy_records_to_table("journal_entry", schema_name="core",
+        columns=["plot_id", "user_id", "title", "content", "entry_date", "type"],
+        records=[(plot_ids[n % 2], user_id, f"Entry {n}", "Bón phân,\nlần 2", START + timedelta(days=n % 100), "fertilizer")
+                 for n in range(ENTRIES)])
+    await conn.copy_records_to_table("task", schema_name="core",
+        columns=["plot_id", "user_id", "title", "due_date", "type"],
+        records=[(plot_ids[n % 2], user_id, f"Task {n}", START + timedelta(days=n % 100), "other") for n in range(TASKS)])
+    return user_id, plot_ids
+
+async def run_tests():
+    conn = await get_database()
+    user_id, plot_ids = await create_user(conn)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+            print("1. NDJSON...")
+            response = await client.get("/api/journal/export")
+            assert response.status_code == 200, response.text
+            assert response.headers["content-type"] == "application/x-ndjson"
+            assert response.headers["content-disposition"].startswith('attachment; filename="journal-')
+            entries = [json.loads(line) for line in response.text.splitlines()]
+            assert len(entries) == ENTRIES
+            assert list(entries[0]) == ["id", "plotId", "plotName", "farmName", "date", "type", "title",
+                                        "content", "photos", "audioNote", "createdAt"]
+            assert entries[0]["content"] == "Bón phân,\nlần 2" and entries[0]["photos"] == []
+            assert [entry["date"] for entry in entries] == sorted(entry["date"] for entry in entries)
+            print(f"✅ {len(entries)} journal lines, oldest first")
+
+            print("\n2. CSV...")
+            response = await client.get("/api/tasks/export", params={"format": "csv"})
+            assert response.status_code == 200 and response.headers["content-type"].startswith("text/csv")
+            assert response.content.startswith(b"\xef\xbb\xbf")
+            rows = list(csv.DictReader(io.StringIO(response.content.decode("utf-8-sig"))))
+            assert len(rows) == TASKS
+            assert rows[0]["farmName"] == 'Ruộng "Đông", xã 3' and rows[0]["completed"] == "False"
+            print(f"✅ {len(rows)} task rows with quoted fields intact")
+
+            print("\n3. Filters...")
+            params = {"plotId": str(plot_ids[0]), "from": "2025-01-11", "to": "2025-01-20"}
+            journal = (await client.get("/api/journal/export", params=params)).text.splitlines()
+            assert len(journal) == ENTRIES // 100 * 10 // 2
+            assert all(json.loads(line)["plotId"] == str(plot_ids[0]) for line in journal)
+            tasks = (await client.get("/api/tasks/export", params={**params, "format": "csv"})).text.splitlines()
+            assert len(tasks) - 1 == TASKS // 100 * 10 // 2
+            print(f"✅ One plot and ten days: {len(journal)} entries, {len(tasks) - 1} tasks")
+
+            print("\n4. Bad requests...")
+            assert (await client.get("/api/journal/export", params={"format": "xml"})).status_code == 400
+            assert (await client.get("/api/tasks/export", params={"from": "yesterday"})).status_code == 400
+            try:
+                await export_journal_entries(format="ndjson", plot_id=DEMO_PLOT_ID, date_from=None, date_to=None,
+                                             current_user_id=str(user_id))
+                raise AssertionError("Another user's plot was exported")
+            except HTTPException as e:
+                assert e.status_code == 404
+            print("✅ Unknown formats and dates are rejected, other users' plots are not found")
+    finally:
+        await conn.execute("DELETE FROM core.user WHERE id = $1", user_id)
+        await conn.close()
+        await close_pool()
+
+    print("\n✅ Export tests passed")
+
+def test_export():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_export()
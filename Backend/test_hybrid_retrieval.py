@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test hybrid knowledge retrieval against the database in DATABASE_URL
+Checks reciprocal rank fusion, the language and tag filters, the per-query
+cache and its invalidation, the word search's timeout, and assistant replies grounded in the results
+"""
+
+import asyncio
+import tempfile
+import uuid
+
+from api.assistant import generate_ai_response
+from database.config import close_pool, get_database
+from utils import knowledge, vector_index
+from utils.embeddings import embed_chunks
+from utils.invalidation import invalidation_bus
+from utils.knowledge import fuse, hybrid_knowledge
+
+CHUNKS = [
+    ("Bệnh vàng lá chín sớm", "Lá lúa chuyển vàng từ chóp lá, thường gặp khi thiếu đạm hoặc nhiễm nấm.", "vi", ["sau-benh"]),
+    ("Bón phân đợt 2", "Bón thúc khi lúa đẻ nhánh; lá vàng nhạt là dấu hiệu thiếu đạm.", "vi", ["phan-bon"]),
+    ("Quản lý rầy nâu", "Rầy nâu chích hút gốc lúa, gây cháy rầy. Thăm đồng thường xuyên, phun thuốc khi mật độ cao.", "vi", ["sau-benh"]),
+    ("Brown planthopper", "Planthoppers feed at the base of rice plants and cause hopper burn.", "en", ["sau-benh"]),
+]
+
+async def run_tests():
+    print("1. Reciprocal rank fusion...")
+    fused = fuse([["a", "b", "c"], ["c", "a", "d"]], k=60)
+    assert [chunk_id for chunk_id, _ in fused] == ["a", "c", "b", "d"], fused
+    assert abs(fused[0][1] - (1 / 61 + 1 / 62)) < 1e-12
+    assert fuse([]) == []
+    print("✅ Chunks both rankings agree on come first")
+
+    conn = await get_database()
+    source = f"test-hybrid-{uuid.uuid4()}"
+    await conn.executemany('''
+        INSERT INTO core.knowledge_chunk (source, title, content, lang, tags) VALUES ($1, $2, $3, $4, $5)
+    ''', [(source, *chunk) for chunk in CHUNKS])
+    await embed_chunks(conn)
+    original_directory = vector_index.VECTOR_INDEX_DIR
+    snapshot_directory = tempfile.TemporaryDirectory()
+    vector_index.VECTOR_INDEX_DIR, vector_index._index = snapshot_directory.name, None
+    await vector_index.write_snapshot(conn)
+
+    async def titles(search, lang="vi", tags=None):
+        return [chunk["title"] for chunk in await hybrid_knowledge(search, lang, tags, limit=50) if chunk["source"] == source]
+
+    try:
+        print("\n2. Hybrid search...")
+        found = await titles("lá lúa bị vàng")
+        assert found[0] == "Bệnh vàng lá chín sớm", found
+        assert (await titles("phong tru ray nau"))[0] == "Quản lý rầy nâu"
+        assert await titles("planthopper", "en") == ["Brown planthopper"]
+        assert "Brown planthopper" not in await titles("planthopper")
+        found = await titles("vàng lá", tags=["phan-bon"])
+        assert found == ["Bón phân đợt 2"], found
+        scores = [chunk["score"] for chunk in await hybrid_knowledge("vàng lá", limit=50)]
+        assert scores == sorted(scores, reverse=True)
+        print("✅ Found by words and by meaning, filtered by language and tags")
+
+        print("\n3. Per-query cache...")
+        first = await hybrid_knowledge("Rầy nâu?")
+        assert await hybrid_knowledge("  rầy   NÂU ") is first, "the same normalized question should hit the cache"
+        assert await hybrid_knowledge("rầy nâu", tags=["sau-benh"]) is not first
+        invalidation_bus.invalidate_locally("knowledge", None)
+        assert await hybrid_knowledge("rầy nâu") is not first
+
+        await invalidation_bus.start()
+        try:
+            cached = await hybrid_knowledge("rầy nâu")
+            await conn.execute("UPDATE core.knowledge_chunk SET tags = tags || '{lua}' WHERE source = $1", source)
+            for _ in range(50):
+                if await hybrid_knowledge("rầy nâu") is not cached:
+                    break
+                await asyncio.sleep(0.05)
+            else:
+                raise AssertionError("a chunk write should drop cached retrievals")
+        finally:
+            await invalidation_bus.stop()
+        print("✅ Cached per normalized question, dropped when chunks change")
+
+        print("\n4. Word search timeout...")
+        search_words, timeout = knowledge.search_knowledge_words, knowledge.KNOWLEDGE_LEXICAL_TIMEOUT
+
+        async def slow_search(conn, *args):
+            await conn.execute("SELECT pg_sleep(5)")
+            return await search_words(conn, *args)
+
+        try:
+            knowledge.search_knowledge_words, knowledge.KNOWLEDGE_LEXICAL_TIMEOUT = slow_search, 0.05
+            start = asyncio.get_running_loop().time()
+            semantic_only = await hybrid_knowledge("vàng lá lúa")
+            assert asyncio.get_running_loop().time() - start < 2, "the server should cancel the word search"
+            assert "Bệnh vàng lá chín sớm" in [chunk["title"] for chunk in semantic_only]
+            assert await hybrid_knowledge("vàng lá lúa") is not semantic_only, "results without word matches are not cached"
+        finally:
+            knowledge.search_knowledge_words, knowledge.KNOWLEDGE_LEXICAL_TIMEOUT = search_words, timeout
+        both = await hybrid_knowledge("vàng lá lúa")
+        assert await hybrid_knowledge("vàng lá lúa") is both
+        print("✅ Semantic results served on their own and not cached; the next search caches again")
+
+        print("\n5. Grounded replies...")
+        # Other chunks in the database (the demo data, say) may be grounded in too: only the order of ours is checked
+        def own_sources(reply):
+            return [item["title"] for item in reply["metadata"]["sources"] if item["source"] == source]
+
+        reply = await generate_ai_response("Cách phòng trừ rầy nâu hại lúa?", {}, None, str(uuid.uuid4()))
+        assert "Quản lý rầy nâu" in own_sources(reply), reply
+        assert all(item["title"] in reply["content"] for item in reply["metadata"]["sources"]), reply
+        reply = await generate_ai_response("Lúa bị vàng lá phải làm sao?", {}, None, str(uuid.uuid4()))
+        assert reply["content"].startswith("Lúa bị vàng lá") and reply["metadata"]["suggested_actions"]
+        assert own_sources(reply)[0] == "Bệnh vàng lá chín sớm", reply
+        print("✅ Replies quote the top chunks and list them as sources")
+    finally:
+        await conn.execute("DELETE FROM core.knowledge_chunk WHERE source = $1", source)
+        await conn.close()
+        await close_pool()
+        vector_index.VECTOR_INDEX_DIR, vector_index._index = original_directory, None
+        snapshot_directory.cleanup()
+
+    print("\n✅ Hybrid retrieval tests passed")
+
+def test_hybrid_retrieval():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_hybrid_retrieval()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test bulk knowledge ingestion against the database in DATABASE_URL
+Checks overlapping chunking, Markdown sections and PDF-extracted text, then
+ingests a throwaway directory twice (dedupe), once more after an edit (prune)
+and after moving a section to another file
+"""
+
+import asyncio
+import os
+import tempfile
+import uuid
+
+import numpy as np
+
+from database.config import get_database
+from utils.embeddings import HashingEmbedder, chunk_text, decode_embedding
+from utils.ingest import content_hash, ingest_directory, split_document, split_text
+from utils.vector_index import VectorIndex
+
+PARAGRAPH = ("Bón thúc đợt 2 khi lúa đẻ nhánh, 18-22 ngày sau sạ. Lá vàng nhạt là dấu hiệu thiếu đạm. "
+             "Giữ mực nước 3-5 cm và thăm đồng để phát hiện rầy nâu, sâu cuốn lá. ")
+
+GUIDE = f"""# Kỹ thuật bón phân
+
+## Bón lót
+Bón lót trước khi sạ với phân chuồng hoai mục và lân.
+
+## Bón thúc
+{PARAGRAPH * 20}
+"""
+
+PESTS = """# Sâu bệnh
+
+## Rầy nâu
+Rầy nâu chích hút gốc lúa, gây cháy rầy thành từng chòm.
+
+## Bón lót
+Bón lót trước khi sạ với phân chuồng hoai mục và lân.
+"""
+
+EXTRACTED = "Quản lý nước\n\nRút nước phơi ruộng khi lúa đạt số chồi hữu hiệu; ruộng phèn cần thay nư-\nớc thường xuyên để rửa phèn.\f"
+
+async def run_tests():
+    print("1. Chunking...")
+    text = PARAGRAPH * 40
+    chunks = split_text(text, size=500, overlap=100)
+    assert len(chunks) > 1 and all(len(chunk) <= 500 for chunk in chunks)
+    for previous, following in zip(chunks, chunks[1:]):
+        assert previous[-50:].split()[-1] in following[:150], "consecutive chunks should overlap"
+    assert set(text.split()) == set(" ".join(chunks).split())
+    assert split_text("") == [] and split_text("ngắn") == ["ngắn"]
+
+    sections = split_document(GUIDE, "Huong dan")
+    assert [title for title, _ in sections][:2] == ["Bón lót", "Bón thúc"], sections
+    assert all(title == "Bón thúc" for title, _ in sections[1:]) and len(sections) > 2
+    (title, content), = split_document(EXTRACTED, "Quan ly nuoc", markdown=False)
+    assert title == "Quan ly nuoc" and "thay nước thường xuyên" in content and "\n" not in content.split("\n\n")[-1]
+    print("✅ Overlapping windows cut at breaks, titled by section; wrapped PDF text rejoined")
+
+    print("\n2. Ingesting a directory...")
+    conn = await get_database()
+    prefix = f"test-ingest-{uuid.uuid4()}"
+    with tempfile.TemporaryDirectory() as directory, tempfile.TemporaryDirectory() as index_directory:
+        os.makedirs(os.path.join(directory, prefix))
+        for name, body in (("phan_bon.md", GUIDE), ("sau_benh.md", PESTS), ("quan-ly-nuoc.txt", EXTRACTED), ("anh.png", "")):
+            with open(os.path.join(directory, prefix, name), "w") as f:
+                f.write(body)
+
+        try:
+            stats = await ingest_directory(conn, directory, "vi", ["ingest"], workers=2, batch_size=3, index_directory=index_directory)
+            expected = len(split_document(GUIDE, "")) + len(split_document(PESTS, "")) + 1
+            assert stats["files"] == 3 and stats["chunks"] == expected, stats
+            assert stats["duplicates"] == 1 and stats["inserted"] == expected - 1, "the shared 'Bón lót' section is stored once"
+
+            rows = await conn.fetch('''
+                SELECT source, title, content, tags, content_hash, embedding FROM core.knowledge_chunk
+                WHERE source LIKE $1 AND deleted_at IS NULL
+            ''', f"{prefix}/%")
+            assert len(rows) == stats["inserted"]
+            assert {row["source"] for row in rows} == {f"{prefix}/{name}" for name in ("phan_bon.md", "sau_benh.md", "quan-ly-nuoc.txt")}
+            embedder = HashingEmbedder()
+            for row in rows:
+                assert bytes(row["content_hash"]) == content_hash(row["content"]) and row["tags"] == ["ingest"]
+                assert np.allclose(decode_embedding(row["embedding"]), embedder.embed_one(chunk_text(row["title"], row["content"])))
+            snapshot = VectorIndex.load(index_directory)
+            assert snapshot is not None and len(snapshot) >= len(rows)
+            print(f"✅ {stats['inserted']} chunks copied with embeddings from a process pool, duplicate skipped, snapshot written")
+
+            print("\n3. Re-running and pruning...")
+            again = await ingest_directory(conn, directory, "vi", ["ingest"], workers=1, index_directory=index_directory)
+            assert again["inserted"] == 0 and again["duplicates"] == again["chunks"], again
+
+            with open(os.path.join(directory, prefix, "sau_benh.md"), "w") as f:
+                f.write(PESTS.replace("thành từng chòm", "thành từng chòm, lúa khô héo"))
+            edited = await ingest_directory(conn, directory, "vi", ["ingest"], prune=True, workers=1, index_directory=index_directory)
+            assert edited["inserted"] == 1 and edited["pruned"] == 1, edited
+            live = await conn.fetchval('''
+                SELECT count(*) FROM core.knowledge_chunk WHERE source = $1 AND deleted_at IS NULL
+            ''', f"{prefix}/sau_benh.md")
+            assert live == 1, "only the edited section should be live ('Bón lót' is stored under phan_bon.md)"
+            print("✅ Unchanged chunks skipped on re-run; an edited section replaces the old one with --prune")
+
+            print("\n4. Moving a section to another file...")
+            (_, moved_content), = [chunk for chunk in split_document(PESTS.replace("thành từng chòm", "thành từng chòm, lúa khô héo"), "")
+                                   if chunk[0] == "Rầy nâu"]
+            with open(os.path.join(directory, prefix, "sau_benh.md"), "w") as f:
+                f.write(PESTS.split("## Rầy nâu")[0])
+            with open(os.path.join(directory, prefix, "ray_nau.md"), "w") as f:
+                f.write(f"## Cháy rầy\n{moved_content}\n")
+            moved = await ingest_directory(conn, directory, "vi", ["ingest"], prune=True, workers=1, index_directory=index_directory)
+            assert moved["inserted"] == 0 and moved["moved"] == 1 and moved["pruned"] == 0, moved
+            row = await conn.fetchrow('''
+                SELECT source, title, embedding FROM core.knowledge_chunk WHERE content = $1 AND deleted_at IS NULL
+            ''', moved_content)
+            assert row["source"] == f"{prefix}/ray_nau.md" and row["title"] == "Cháy rầy", row
+            assert np.allclose(decode_embedding(row["embedding"]), embedder.embed_one(chunk_text("Cháy rầy", moved_content)))
+            print("✅ The stored chunk follows its content to the new file instead of being pruned")
+        finally:
+            await conn.execute("DELETE FROM core.knowledge_chunk WHERE source LIKE $1", f"{prefix}/%")
+            await conn.close()
+
+    print("\n✅ Ingestion tests passed")
+
+def test_ingest():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_ingest()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test the assistant's intent matcher
+Checks normalized whole-word matching, scoring and ties against the bundled
+intents file, and that the automaton finds exactly what a per-phrase scan finds
+"""
+
+import asyncio
+import random
+
+from utils.intents import IntentMatcher, get_intent_matcher, load_intents, normalize_phrase
+
+async def run_tests():
+    print("1. Matching the bundled intents...")
+    matcher = get_intent_matcher()
+    assert {intent["id"] for intent in load_intents()} >= {"yellow_leaves", "fertilizer", "water_level", "leaf_folder"}
+    for message, expected in (
+        ("Tôi nên làm gì khi lúa bị vàng lá?", "yellow_leaves"),
+        ("LUA BI VANG LA", "yellow_leaves"),
+        ("Khi nào nên bón phân cho lúa?", "fertilizer"),
+        ("my rice has yellowing leaves", "yellow_leaves"),
+        ("Làm thế nào để kiểm soát mực nước trong ruộng?", "water_level"),
+        ("Cách phòng trừ sâu cuốn lá hiệu quả?", "leaf_folder"),
+    ):
+        intent, _ = matcher.match(message)
+        assert intent["id"] == expected, (message, intent["id"])
+        assert intent["content"] and "suggested_actions" in intent["metadata"]
+    assert matcher.match("xin chào") is None and matcher.match("") is None
+    assert matcher.match("vang lam") is None, "phrases only match whole words"
+    print("✅ Vietnamese with or without tone marks and English phrases find their intents")
+
+    print("\n2. Scoring...")
+    matcher = IntentMatcher([
+        {"id": "first", "phrases": ["vàng lá"]},
+        {"id": "second", "phrases": ["bón phân", {"text": "phân", "weight": 0.5}]},
+        {"id": "third", "phrases": ["vang"]},
+    ])
+    assert matcher.match("vàng lá, bón phân")[0]["id"] == "second", "two phrases outscore one"
+    assert matcher.match("vang la bon phan")[0]["id"] == "second"
+    assert matcher.match("vang la, bon")[0]["id"] == "first", "longer phrases outweigh their own words"
+    assert matcher.scores("vàng lá") == {0: 2.5, 2: 1.0}
+    homographs = IntentMatcher([{"id": "four parts", "phrases": ["bốn phần"]}, {"id": "fertilize", "phrases": ["bón phân"]}])
+    assert homographs.match("bón phân")[0]["id"] == "fertilize", "tone marks as written break the tie"
+    assert homographs.match("Bốn phần")[0]["id"] == "four parts"
+    assert homographs.match("bon phan")[0]["id"] == "four parts", "without marks the intent listed first wins"
+    print("✅ Phrase weights add up per intent, exact tone marks add a bonus, longer phrases win")
+
+    print("\n3. One pass finds every phrase...")
+    rng = random.Random(7)
+    vocabulary = ["lúa", "vàng", "lá", "bón", "phân", "rầy", "nâu", "nước", "sâu", "cuốn", "đạo", "ôn", "la", "lan"]
+    intents = [
+        {"id": str(number), "phrases": [" ".join(rng.choices(vocabulary, k=rng.randint(1, 3))) for _ in range(3)]}
+        for number in range(300)
+    ]
+    matcher = IntentMatcher(intents)
+    phrases = [normalize_phrase(phrase) for intent in intents for phrase in intent["phrases"]]
+    for _ in range(200):
+        message = " ".join(rng.choices(vocabulary, k=rng.randint(0, 12)))
+        expected = {number for number, phrase in enumerate(phrases) if phrase in normalize_phrase(message)}
+        assert set(matcher.find(message)) == expected, message
+    print(f"✅ {len(matcher.phrases)} phrases in {len(matcher.goto)} states agree with a per-phrase scan")
+
+    print("\n✅ Intent matcher tests passed")
+
+def test_intents():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_intents()
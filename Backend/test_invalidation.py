@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test cross-worker cache invalidation with two API instances on one database
+Starts two uvicorn servers against DATABASE_URL. Writes made through one
+instance must evict what the other has cached.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+from utils.auth import create_access_token
+
+DEMO_USER_ID = "11111111-1111-1111-1111-111111111111"
+DEMO_FARM_ID = "22222222-2222-2222-2222-222222222222"
+TEST_NAME = "test_invalidation"
+HEADERS = {"Authorization": f"Bearer {create_access_token({'sub': DEMO_USER_ID})}"}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_instance():
+    """Run the app in its own process; returns (process, base url) once it serves requests"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=os.environ.copy(),
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 20
+    while True:
+        try:
+            requests.get(f"{url}/health", timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            assert process.poll() is None and time.time() < deadline, "API instance failed to start"
+            time.sleep(0.2)
+
+def eventually(check, step: str, timeout: float = 5.0):
+    """Poll until check() holds: notifications arrive asynchronously"""
+    deadline = time.time() + timeout
+    while not check():
+        assert time.time() < deadline, f"{step}: timed out"
+        time.sleep(0.05)
+    print(f"✅ {step}")
+
+def profile(url: str) -> dict:
+    response = requests.get(f"{url}/api/users/profile", headers=HEADERS)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def create_task(url: str, plot_id: str) -> requests.Response:
+    return requests.post(f"{url}/api/tasks", headers=HEADERS, json={
+        "plot_id": plot_id, "title": TEST_NAME, "due_date": "2030-01-01", "type": "other"
+    })
+
+def run_tests(a: str, b: str):
+    original_name = profile(a)["user"]["displayName"]
+    try:
+        print("1. Profile documents...")
+        assert profile(a) == profile(a)  # second read is served from A's cache
+
+        response = create_task(b, "33333333-3333-3333-3333-333333333333")
+        assert response.status_code == 200, response.text
+        task_id = response.json()["id"]
+        eventually(lambda: profile(a)["recentTasks"][0]["id"] == task_id, "Task created on B shows up on A")
+
+        response = requests.put(f"{b}/api/users/me", headers=HEADERS, json={"display_name": TEST_NAME})
+        assert response.status_code == 200, response.text
+        eventually(lambda: profile(a)["user"]["displayName"] == TEST_NAME, "Profile edited on B shows up on A")
+
+        requests.delete(f"{b}/api/tasks/{task_id}", headers=HEADERS)
+        eventually(lambda: all(task["id"] != task_id for task in profile(a)["recentTasks"]), "Task deleted on B disappears on A")
+
+        print("\n2. Plot ownership...")
+        response = requests.post(f"{a}/api/plots", headers=HEADERS, json={"farmId": DEMO_FARM_ID, "name": TEST_NAME, "area_m2": 1000})
+        assert response.status_code == 200, response.text
+        plot_id = response.json()["id"]
+        assert create_task(a, plot_id).status_code == 200
+        assert create_task(b, plot_id).status_code == 200
+        print("✅ New plot is usable on both instances")
+
+        assert requests.delete(f"{b}/api/plots/{plot_id}", headers=HEADERS).status_code == 200
+        eventually(lambda: create_task(a, plot_id).status_code != 200, "Plot deleted on B is refused by A")
+        print("\n✅ Cross-worker invalidation tests passed")
+    finally:
+        requests.put(f"{a}/api/users/me", headers=HEADERS, json={"display_name": original_name})
+
+def cleanup():
+    import asyncio
+    from database.config import get_database
+
+    async def delete_test_rows():
+        conn = await get_database()
+        try:
+            await conn.execute("DELETE FROM core.task WHERE title = $1", TEST_NAME)
+            await conn.execute("DELETE FROM core.plot WHERE name = $1", TEST_NAME)
+        finally:
+            await conn.close()
+    asyncio.run(delete_test_rows())
+
+def test_invalidation():
+    instances = [start_instance(), start_instance()]
+    try:
+        run_tests(instances[0][1], instances[1][1])
+    finally:
+        for process, _ in instances:
+            process.terminate()
+            process.wait(timeout=10)
+        cleanup()
+
+if __name__ == "__main__":
+    test_invalidation()
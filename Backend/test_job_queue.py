@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Test the sys.job_queue worker against the database in DATABASE_URL
+Covers completion, bulk enqueue with dedupe keys, batch claims, retry with
+backoff, dead-lettering, graceful shutdown and periodic scheduling
+"""
+
+import asyncio
+
+from database.config import get_database
+from workers import queue
+from workers.runtime import JobHandler, Worker
+
+TEST_JOB_PREFIX = "test_job_queue"
+
+async def run_worker_until(worker: Worker, condition, timeout: float = 10.0):
+    """Run a worker until condition() is true, then stop it gracefully"""
+    task = asyncio.create_task(worker.run())
+    try:
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not await condition():
+            if asyncio.get_running_loop().time() > deadline:
+                raise AssertionError("Timed out waiting for worker")
+            await asyncio.sleep(0.1)
+    finally:
+        worker.stop()
+        await task
+
+async def job_statuses(conn, job_type: str):
+    rows = await conn.fetch('''
+        SELECT status, attempts, error FROM sys.job_queue WHERE job_type = $1 ORDER BY id
+    ''', job_type)
+    return [dict(row) for row in rows]
+
+async def run_tests():
+    conn = await get_database()
+    try:
+        await conn.execute("DELETE FROM sys.job_queue WHERE job_type LIKE $1", f"{TEST_JOB_PREFIX}%")
+        await conn.execute("DELETE FROM sys.job_schedule WHERE job_type LIKE $1", f"{TEST_JOB_PREFIX}%")
+
+        # 1. Jobs enqueued after the worker starts are picked up via NOTIFY
+        print("\n1. Completing jobs...")
+        processed = []
+
+        async def record(pool, payload):
+            processed.append(payload["n"])
+
+        ok_type = f"{TEST_JOB_PREFIX}_ok"
+        worker = Worker({ok_type: JobHandler(ok_type, record, concurrency=3)}, idle_timeout=30)
+
+        async def enqueue_later():
+            await asyncio.sleep(0.5)
+            producer = await get_database()
+            try:
+                for n in range(10):
+                    await queue.enqueue(producer, ok_type, {"n": n})
+            finally:
+                await producer.close()
+
+        async def all_done():
+            statuses = await job_statuses(conn, ok_type)
+            return len(statuses) == 10 and all(s["status"] == "done" for s in statuses)
+
+        await asyncio.gather(enqueue_later(), run_worker_until(worker, all_done))
+        assert sorted(processed) == list(range(10)), processed
+        print(f"✅ Processed {len(processed)} jobs")
+
+        # 2. Bulk enqueue skips active duplicates; batch workers claim and ack many at once
+        print("\n2. Bulk enqueue and batch claim...")
+        batch_type = f"{TEST_JOB_PREFIX}_batch"
+        keys = [f"task-{n}" for n in range(50)]
+        inserted = await queue.enqueue_many(conn, batch_type, [{"n": n} for n in range(50)], dedupe_keys=keys)
+        assert inserted == 50, inserted
+        inserted = await queue.enqueue_many(conn, batch_type, [{"n": n} for n in range(50)], dedupe_keys=keys)
+        assert inserted == 0, inserted
+        assert await queue.enqueue(conn, batch_type, {"n": 0}, dedupe_key="task-0") is None
+
+        processed.clear()
+        worker = Worker({batch_type: JobHandler(batch_type, record, concurrency=2, batch_size=20)})
+
+        async def batch_done():
+            statuses = await job_statuses(conn, batch_type)
+            return all(s["status"] == "done" for s in statuses)
+
+        await run_worker_until(worker, batch_done)
+        assert sorted(processed) == list(range(50)), processed
+        # Keys are free again once their jobs have finished
+        assert await queue.enqueue(conn, batch_type, {"n": 0}, dedupe_key="task-0") is not None
+        print(f"✅ Batch-processed {len(processed)} deduplicated jobs")
+
+        # 3. Failing jobs are retried and then dead-lettered
+        print("\n3. Retrying and dead-lettering...")
+        fail_type = f"{TEST_JOB_PREFIX}_fail"
+
+        async def explode(pool, payload):
+            raise RuntimeError("boom")
+
+        job_id = await queue.enqueue(conn, fail_type, {}, max_attempts=3)
+        worker = Worker({fail_type: JobHandler(fail_type, explode)}, idle_timeout=1)
+
+        async def attempted_once():
+            return (await job_statuses(conn, fail_type))[0]["attempts"] >= 1
+
+        await run_worker_until(worker, attempted_once)
+        status = (await job_statuses(conn, fail_type))[0]
+        assert status["status"] == "queued" and "boom" in status["error"], status
+        print(f"✅ Job scheduled for retry: {status}")
+
+        # Skip the backoff delay so the remaining attempts run immediately
+        async def dead_lettered():
+            await conn.execute("UPDATE sys.job_queue SET run_at = NOW() WHERE id = $1 AND status = 'queued'", job_id)
+            return (await job_statuses(conn, fail_type))[0]["status"] == "failed"
+
+        worker = Worker({fail_type: JobHandler(fail_type, explode)}, idle_timeout=0.2)
+        await run_worker_until(worker, dead_lettered)
+        status = (await job_statuses(conn, fail_type))[0]
+        assert status["attempts"] == 3, status
+        print(f"✅ Job dead-lettered: {status}")
+
+        # 4. Jobs still running past the shutdown grace period go back to the queue
+        print("\n4. Graceful shutdown...")
+        slow_type = f"{TEST_JOB_PREFIX}_slow"
+        started = asyncio.Event()
+
+        async def slow(pool, payload):
+            started.set()
+            await asyncio.sleep(60)
+
+        await queue.enqueue(conn, slow_type, {})
+        worker = Worker({slow_type: JobHandler(slow_type, slow)}, shutdown_timeout=0.5)
+        task = asyncio.create_task(worker.run())
+        await asyncio.wait_for(started.wait(), 10)
+        worker.stop()
+        await task
+        status = (await job_statuses(conn, slow_type))[0]
+        assert status["status"] == "queued" and status["attempts"] == 0, status
+        print(f"✅ Interrupted job released: {status}")
+
+        # 5. A periodic job runs once per period, also across worker restarts
+        print("\n5. Periodic jobs...")
+        periodic_type = f"{TEST_JOB_PREFIX}_periodic"
+        assert await queue.enqueue_periodic(conn, periodic_type, 100) is not None
+        await conn.execute("UPDATE sys.job_queue SET status = 'done' WHERE job_type = $1", periodic_type)
+        assert await queue.enqueue_periodic(conn, periodic_type, 100) is None, "a finished period is not enqueued again"
+        assert await queue.enqueue_periodic(conn, periodic_type, 101) is not None
+        claimed = await conn.fetch("SELECT period FROM sys.job_schedule WHERE job_type = $1", periodic_type)
+        assert [row["period"] for row in claimed] == [101], claimed
+        await conn.execute("DELETE FROM sys.job_queue WHERE job_type = $1", periodic_type)
+        await conn.execute("DELETE FROM sys.job_schedule WHERE job_type = $1", periodic_type)
+
+        processed.clear()
+
+        async def record_period(pool, payload):
+            processed.append(payload["period"])
+
+        async def periodic_done():
+            statuses = await job_statuses(conn, periodic_type)
+            return bool(statuses) and all(s["status"] == "done" for s in statuses)
+
+        worker = Worker({periodic_type: JobHandler(periodic_type, record_period, every=3600)})
+        await run_worker_until(worker, periodic_done)
+        # Restart within the same period and give the scheduler time to run
+        restarted_at = asyncio.get_running_loop().time()
+
+        async def ran_a_while():
+            return asyncio.get_running_loop().time() - restarted_at > 1
+
+        worker = Worker({periodic_type: JobHandler(periodic_type, record_period, every=3600)})
+        await run_worker_until(worker, ran_a_while)
+        assert len(processed) == 1 and len(await job_statuses(conn, periodic_type)) == 1, processed
+        print("✅ Restarted worker did not re-run the period's job")
+
+        await conn.execute("DELETE FROM sys.job_queue WHERE job_type LIKE $1", f"{TEST_JOB_PREFIX}%")
+        await conn.execute("DELETE FROM sys.job_schedule WHERE job_type LIKE $1", f"{TEST_JOB_PREFIX}%")
+        print("\n✅ Job queue tests passed")
+    finally:
+        await conn.close()
+
+def test_job_queue():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_job_queue()
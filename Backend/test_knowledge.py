@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test knowledge base search against the database in DATABASE_URL
+Adds a few chunks under a throwaway source, then checks full-text matches,
+title weighting, queries typed without tone marks, the language filter and
+the rebuild of the unaccented columns when core.vi_unaccent changes
+"""
+
+import asyncio
+import unicodedata
+import uuid
+
+from database import init_db
+from database.config import get_database
+from utils.knowledge import search_knowledge
+
+CHUNKS = [
+    ("Bệnh vàng lá chín sớm", "Lá lúa chuyển vàng từ chóp lá, thường gặp khi thiếu đạm hoặc nhiễm nấm.", "vi"),
+    ("Bón phân đợt 2", "Bón thúc khi lúa đẻ nhánh; lá vàng nhạt là dấu hiệu thiếu đạm.", "vi"),
+    ("Rầy nâu", "Rầy nâu chích hút gốc lúa, gây cháy rầy thành từng chòm.", "vi"),
+    ("Brown planthopper", "Planthoppers feed at the base of rice plants and cause hopper burn.", "en"),
+]
+
+async def run_tests():
+    conn = await get_database()
+    source = f"test-knowledge-{uuid.uuid4()}"
+    await conn.executemany('''
+        INSERT INTO core.knowledge_chunk (source, title, content, lang) VALUES ($1, $2, $3, $4)
+    ''', [(source, title, content, lang) for title, content, lang in CHUNKS])
+
+    async def titles(search, lang="vi"):
+        return [chunk["title"] for chunk in await search_knowledge(conn, search, lang, limit=50) if chunk["source"] == source]
+
+    try:
+        print("1. Normalization...")
+        assert await conn.fetchval("SELECT core.vi_unaccent($1)", "Bệnh VÀNG LÁ, Đồng Tháp") == "benh vang la, dong thap"
+        # Decomposed input (base letter + combining marks) normalizes the same way
+        assert await conn.fetchval("SELECT core.vi_unaccent($1)", unicodedata.normalize("NFD", "vàng lá")) == "vang la"
+        assert await conn.fetchval("SELECT search_text FROM core.knowledge_chunk WHERE source = $1 AND title = 'Rầy nâu'", source) \
+            == "ray nau ray nau chich hut goc lua, gay chay ray thanh tung chom."
+        print("✅ core.vi_unaccent strips tone marks and đ, in stored search_text too")
+
+        print("\n2. Full-text search...")
+        found = await titles("vàng lá")
+        assert set(found) == {"Bệnh vàng lá chín sớm", "Bón phân đợt 2"}, found
+        assert found[0] == "Bệnh vàng lá chín sớm", "title match should rank first"
+        assert await titles("rầy nâu") == ["Rầy nâu"]
+        print("✅ Accented queries match and title hits rank first")
+
+        print("\n3. Queries without tone marks...")
+        found = await titles("vang la")
+        assert found and found[0] == "Bệnh vàng lá chín sớm", found
+        assert await titles("ray nau") == ["Rầy nâu"]
+        assert await titles("RAY NAU") == ["Rầy nâu"]
+        print("✅ 'vang la' finds 'vàng lá', 'ray nau' finds 'Rầy nâu'")
+
+        print("\n4. Language filter...")
+        assert await titles("planthopper", "en") == ["Brown planthopper"]
+        assert await titles("planthopper", "vi") == []
+        assert await titles("ray nau", "en") == []
+        print("✅ Only chunks in the requested language are returned")
+
+        print("\n5. Changed normalization...")
+        # As if an older core.vi_unaccent had computed the stored columns
+        await conn.execute("CREATE OR REPLACE FUNCTION core.vi_unaccent(value TEXT) RETURNS TEXT LANGUAGE sql IMMUTABLE AS 'SELECT upper(value)'")
+        await conn.execute("UPDATE core.knowledge_chunk SET title = title WHERE source = $1", source)
+        assert await titles("ray nau") == []
+        await init_db.init_db()
+        assert await conn.fetchval("SELECT search_text FROM core.knowledge_chunk WHERE source = $1 AND title = 'Rầy nâu'", source) \
+            == "ray nau ray nau chich hut goc lua, gay chay ray thanh tung chom."
+        assert await titles("ray nau") == ["Rầy nâu"]
+        print("✅ init_db recomputes the stored unaccented columns when core.vi_unaccent changes")
+    finally:
+        await conn.execute("DELETE FROM core.knowledge_chunk WHERE source = $1", source)
+        await conn.close()
+
+    print("\n✅ Knowledge search tests passed")
+
+def test_knowledge():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_knowledge()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Test the assistant's model backends (utils/llm.py)
+Checks the deterministic local backend, the guard's timeouts, concurrency
+limit and circuit breaker, and that assistant replies fall back to the
+rule-based ones when the model fails or is slow
+"""
+
+import asyncio
+import time
+
+from api.assistant import assistant_reply, assistant_reply_stream, build_prompt, collect_reply
+from utils import llm
+from utils.intents import get_intent_matcher
+from utils.llm import BackendUnavailable, CircuitBreaker, CompletionBackend, GuardedBackend, LocalBackend
+
+REPLY_CONTEXT = {
+    "context": {},
+    "plotInfo": {"plotName": "Ruộng A", "farmName": "Trại 1", "variety": "ST25", "soilType": None},
+    "chunks": [{"id": "1", "title": "Rầy nâu", "source": "test", "content": "Thăm đồng mỗi tuần. Phun thuốc khi mật độ cao."}],
+    "sources": [{"id": "1", "title": "Rầy nâu", "source": "test"}],
+}
+
+class ScriptedBackend(CompletionBackend):
+    """Waits before each piece, optionally fails after some; counts the calls in flight"""
+
+    name = "scripted"
+
+    def __init__(self, pieces=("Giữ ", "nước"), delay: float = 0.0, fail_after=None, release: asyncio.Event = None):
+        self.pieces, self.delay, self.fail_after, self.release = pieces, delay, fail_after, release
+        self.in_flight = self.most_in_flight = 0
+
+    async def stream(self, messages):
+        self.in_flight += 1
+        self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            if self.release:
+                await self.release.wait()
+            for number, piece in enumerate(self.pieces):
+                if number == self.fail_after:
+                    raise RuntimeError("provider error")
+                await asyncio.sleep(self.delay)
+                yield piece
+        finally:
+            self.in_flight -= 1
+
+async def drain(backend, messages=()):
+    return "".join([piece async for piece in backend.stream(list(messages))])
+
+def use_model(backend):
+    llm._backend, llm._configured = backend, True
+
+async def run_tests():
+    print("1. Local backend...")
+    messages = build_prompt("Phòng rầy nâu thế nào?", REPLY_CONTEXT)
+    assert "ST25" in messages[0]["content"] and messages[-1] == {"role": "user", "content": "Phòng rầy nâu thế nào?"}
+    local = LocalBackend()
+    reply = await drain(local, messages)
+    assert reply == await drain(local, messages) == await local.complete(messages)
+    assert "Rầy nâu: Thăm đồng mỗi tuần." in reply and "Phun thuốc" not in reply
+    print("✅ Same reply streamed or whole, every time, from the grounding lines")
+
+    print("\n2. Timeouts...")
+    guarded = GuardedBackend(ScriptedBackend(delay=0.5), first_token_timeout=0.05)
+    start = time.perf_counter()
+    try:
+        await drain(guarded)
+        raise AssertionError("expected BackendUnavailable")
+    except BackendUnavailable as e:
+        assert "first piece" in str(e) and time.perf_counter() - start < 0.3
+    guarded = GuardedBackend(ScriptedBackend(pieces=["a "] * 10, delay=0.03), first_token_timeout=1, timeout=0.1)
+    try:
+        await drain(guarded)
+        raise AssertionError("expected BackendUnavailable")
+    except BackendUnavailable as e:
+        assert "reply" in str(e)
+    try:
+        await GuardedBackend(ScriptedBackend(delay=0.5), timeout=0.05).complete([])
+        raise AssertionError("expected BackendUnavailable")
+    except BackendUnavailable:
+        pass
+    print("✅ A slow first piece, a slow reply and a slow complete() give up on time")
+
+    print("\n3. Concurrency limit...")
+    release = asyncio.Event()
+    scripted = ScriptedBackend(release=release)
+    guarded = GuardedBackend(scripted, max_concurrency=2, queue_timeout=0.05, timeout=5, breaker=CircuitBreaker(failures=10))
+    calls = [asyncio.create_task(drain(guarded)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    try:
+        await drain(guarded)
+        raise AssertionError("expected BackendUnavailable")
+    except BackendUnavailable as e:
+        assert "no free slot" in str(e)
+    release.set()
+    assert await asyncio.gather(*calls) == ["Giữ nước", "Giữ nước"]
+    assert scripted.most_in_flight == 2 and guarded.semaphore._value == 2
+    print("✅ A third concurrent call is turned away instead of queueing; slots are given back")
+
+    print("\n4. Circuit breaker...")
+    now = [0.0]
+    breaker = CircuitBreaker(failures=2, reset_after=10, clock=lambda: now[0])
+    failing = ScriptedBackend(fail_after=0)
+    guarded = GuardedBackend(failing, breaker=breaker)
+    for _ in range(2):
+        try:
+            await drain(guarded)
+        except BackendUnavailable:
+            pass
+    assert breaker.state == "open"
+    try:
+        await drain(guarded)
+        raise AssertionError("expected BackendUnavailable")
+    except BackendUnavailable as e:
+        assert "circuit open" in str(e) and guarded.rejected == 1 and guarded.calls == 2
+    now[0] = 10
+    try:
+        await drain(guarded)
+    except BackendUnavailable:
+        pass
+    assert breaker.state == "open" and breaker.opened_at == 10, "a failed trial opens the circuit again"
+    now[0] = 20
+    failing.fail_after = None
+    assert await drain(guarded) == "Giữ nước" and breaker.state == "closed"
+    print("✅ Opens after 2 failures, fails fast while open, closes after a good trial call")
+
+    # A cancelled trial call, whether running or waiting for a slot, must not leave the breaker half-open
+    breaker = CircuitBreaker(failures=1, reset_after=10, clock=lambda: now[0])
+    guarded = GuardedBackend(ScriptedBackend(delay=1), max_concurrency=2, breaker=breaker)
+    breaker.record_failure()
+    now[0] = 30
+    trial = asyncio.create_task(guarded.complete([]))
+    await asyncio.sleep(0.01)
+    trial.cancel()
+    await asyncio.gather(trial, return_exceptions=True)
+    assert breaker.state == "open" and breaker.opened_at == 30 and guarded.semaphore._value == 2
+
+    release = asyncio.Event()
+    guarded = GuardedBackend(ScriptedBackend(release=release), max_concurrency=1, queue_timeout=5, breaker=breaker)
+    breaker.record_success()
+    holder = asyncio.create_task(drain(guarded))
+    await asyncio.sleep(0.01)
+    breaker.record_failure()
+    now[0] = 40
+    trial = asyncio.create_task(drain(guarded))
+    await asyncio.sleep(0.01)
+    assert breaker.state == "half-open"
+    trial.cancel()
+    await asyncio.gather(trial, return_exceptions=True)
+    assert breaker.state == "open" and breaker.opened_at == 40
+    release.set()
+    assert await holder == "Giữ nước" and guarded.semaphore._value == 1
+    now[0] = 50
+    assert await drain(guarded) == "Giữ nước" and breaker.state == "closed"
+    print("✅ A cancelled trial call reopens the circuit; the next trial can close it")
+
+    print("\n5. Assistant fallback...")
+    question = "Lúa bị vàng lá phải làm sao?"
+    intent, _ = get_intent_matcher().match(question)
+    try:
+        use_model(None)
+        reply = await collect_reply(assistant_reply_stream(question, REPLY_CONTEXT))
+        assert reply["content"] == intent["content"] and "model" not in reply["metadata"]
+
+        use_model(GuardedBackend(LocalBackend()))
+        reply = await collect_reply(assistant_reply_stream(question, REPLY_CONTEXT))
+        assert reply["metadata"]["model"] == "local" and reply["content"] == LocalBackend().reply(build_prompt(question, REPLY_CONTEXT))
+        assert reply["metadata"]["sources"] == REPLY_CONTEXT["sources"]
+        assert await assistant_reply(question, REPLY_CONTEXT) == reply
+
+        use_model(GuardedBackend(ScriptedBackend(delay=1), first_token_timeout=0.05, timeout=0.1))
+        start = time.perf_counter()
+        reply = await collect_reply(assistant_reply_stream(question, REPLY_CONTEXT))
+        assert reply["content"] == intent["content"] and "first piece" in reply["metadata"]["fallback"]
+        assert time.perf_counter() - start < 0.5
+        whole = await assistant_reply(question, REPLY_CONTEXT)
+        assert whole["content"] == intent["content"] and "fallback" in whole["metadata"]
+
+        use_model(GuardedBackend(ScriptedBackend(fail_after=1)))
+        reply = await collect_reply(assistant_reply_stream(question, REPLY_CONTEXT))
+        assert reply["content"] == "Giữ " and reply["metadata"]["truncated"] is True
+    finally:
+        llm._backend, llm._configured = None, False
+    print("✅ Rule-based replies without a model or when it is slow or down; a broken-off reply is marked truncated")
+
+    print("\n✅ Model backend tests passed")
+
+def test_llm():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_llm()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test the plot/farm ownership cache against the database in DATABASE_URL
+Cached answers must follow ownership changes made through any connection:
+revocations arrive by NOTIFY, new farms and plots by re-checking misses
+"""
+
+import asyncio
+
+from database.config import get_database
+from utils.invalidation import invalidation_bus
+from utils.ownership import OwnershipCache
+
+DEMO_USER_ID = "11111111-1111-1111-1111-111111111111"
+DEMO_PLOT_ID = "33333333-3333-3333-3333-333333333333"
+OTHER_USER_ID = "00000000-0000-0000-0000-000000000000"
+TEST_NAME = "test_ownership"
+
+async def eventually(check, step: str, timeout: float = 5.0):
+    """Wait for an asynchronous condition (a notification arriving)"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await check():
+        assert asyncio.get_running_loop().time() < deadline, f"{step}: timed out"
+        await asyncio.sleep(0.05)
+    print(f"✅ {step}")
+
+async def run_tests():
+    conn = await get_database()
+    writer = await get_database()
+    cache = OwnershipCache()
+    await invalidation_bus.start()
+    try:
+        await writer.execute("DELETE FROM core.farm WHERE name = $1", TEST_NAME)
+        assert invalidation_bus.listening
+
+        print("\n1. Reads are served from the cache...")
+        assert await cache.owns_plot(conn, DEMO_USER_ID, DEMO_PLOT_ID)
+        ownership = cache._entries.get(DEMO_USER_ID)
+        assert ownership is not None
+        assert await cache.owns_plot(conn, DEMO_USER_ID, DEMO_PLOT_ID)
+        assert cache._entries.get(DEMO_USER_ID) is ownership
+        assert not await cache.owns_plot(conn, OTHER_USER_ID, DEMO_PLOT_ID)
+        assert not await cache.owns_plot(conn, DEMO_USER_ID, "not-a-uuid")
+        print("✅ One load per user; other users' and malformed ids are refused")
+
+        print("\n2. New farms and plots are found without invalidation...")
+        farm_id = str(await writer.fetchval('''
+            INSERT INTO core.farm (user_id, name, province, district) VALUES ($1, $2, 'An Giang', 'Chợ Mới') RETURNING id
+        ''', DEMO_USER_ID, TEST_NAME))
+        plot_ids = [str(await writer.fetchval('''
+            INSERT INTO core.plot (farm_id, name, area_m2) VALUES ($1, $2, 1000) RETURNING id
+        ''', farm_id, TEST_NAME)) for _ in range(2)]
+        assert await cache.owns_farm(conn, DEMO_USER_ID, farm_id)
+        assert all([await cache.owns_plot(conn, DEMO_USER_ID, plot_id) for plot_id in plot_ids])
+        print("✅ Misses are re-checked against the database")
+
+        print("\n3. Revocations by other connections are picked up...")
+        await writer.execute("UPDATE core.plot SET deleted_at = NOW() WHERE id = $1", plot_ids[0])
+        await eventually(lambda: owns_not(cache, conn, plot_ids[0]), "Soft-deleted plot")
+        assert await cache.owns_plot(conn, DEMO_USER_ID, plot_ids[1])
+
+        await writer.execute("UPDATE core.plot SET name = 'renamed' WHERE id = $1", plot_ids[1])
+        ownership = cache._entries.get(DEMO_USER_ID)
+        assert ownership is not None
+        await asyncio.sleep(0.3)
+        assert cache._entries.get(DEMO_USER_ID) is ownership
+        print("✅ Edits that keep ownership do not evict")
+
+        await writer.execute("UPDATE core.farm SET deleted_at = NOW() WHERE id = $1", farm_id)
+        await eventually(lambda: owns_not(cache, conn, plot_ids[1]), "Soft-deleted farm takes its plots along")
+        assert not await cache.owns_farm(conn, DEMO_USER_ID, farm_id)
+
+        await writer.execute("UPDATE core.farm SET deleted_at = NULL WHERE id = $1", farm_id)
+        assert await cache.owns_plot(conn, DEMO_USER_ID, plot_ids[1])
+        await writer.execute("DELETE FROM core.plot WHERE id = $1", plot_ids[1])
+        await eventually(lambda: owns_not(cache, conn, plot_ids[1]), "Hard-deleted plot")
+
+        assert await cache.owns_plot(conn, DEMO_USER_ID, DEMO_PLOT_ID)
+        print("\n✅ Ownership cache tests passed")
+    finally:
+        await writer.execute("DELETE FROM core.farm WHERE name = $1", TEST_NAME)
+        await invalidation_bus.stop()
+        await writer.close()
+        await conn.close()
+
+async def owns_not(cache, conn, plot_id) -> bool:
+    """True once the cached entry no longer lists plot_id (without reloading it)"""
+    ownership = cache._entries.get(DEMO_USER_ID)
+    if ownership is None or plot_id not in ownership.plot_ids:
+        return not await cache.owns_plot(conn, DEMO_USER_ID, plot_id)
+    return False
+
+def test_ownership():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_ownership()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test the assistant's reply cache (utils/response_cache.py)
+Checks exact and similar-question hits within a plot bucket, the similarity
+threshold, TTL, size limit, invalidation when knowledge changes, the hit-rate
+counters, and that a cached reply skips retrieval and generation
+"""
+
+import asyncio
+from datetime import date, timedelta
+
+from api import assistant
+from utils.crop_calendar import growth_stage
+from utils.invalidation import InvalidationBus
+from utils.response_cache import ResponseCache, plot_bucket, response_cache
+
+REPLY = {"content": "Bón bổ sung đạm và kali.", "metadata": {"intent": "yellow_leaves"}}
+TODAY = date(2026, 10, 19)
+
+def plot(variety="ST25", soil="Đất phèn", days=20):
+    return {"plotName": "Ruộng A", "farmName": "Trại 1", "variety": variety, "soilType": soil,
+            "growthStage": growth_stage(variety, TODAY - timedelta(days=days), TODAY)}
+
+def cache_with(cache, question, bucket, reply=REPLY):
+    cache.store(cache.lookup(question, bucket), reply)
+
+async def run_tests():
+    print("1. Plot buckets...")
+    assert plot_bucket(plot()) == plot_bucket(plot(variety="st 25", soil="đất  PHÈN", days=40)) == "st25|đất phèn|tillering"
+    assert plot_bucket(plot(days=50)) == "st25|đất phèn|panicle" and plot_bucket({}) == "||"
+    assert growth_stage("ST25", None) is None and growth_stage("ST25", TODAY + timedelta(days=3), TODAY) == "not_sown"
+    print("✅ Variety, soil type and growth stage, spelled any way")
+
+    print("\n2. Exact and similar questions...")
+    now = [0.0]
+    bus = InvalidationBus()
+    cache = ResponseCache(ttl=60, threshold=0.8, max_entries=3, bus=bus, clock=lambda: now[0])
+    bucket = plot_bucket(plot())
+    lookup = cache.lookup("Lúa bị vàng lá phải làm sao?", bucket)
+    assert lookup.reply is None
+    cache.store(lookup, REPLY)
+    hit = cache.lookup("  lúa bị VÀNG lá phải làm sao? ", bucket).reply
+    assert hit["content"] == REPLY["content"] and hit["metadata"]["cache"] == "exact"
+    hit = cache.lookup("Vàng lá lúa phải làm sao", bucket).reply
+    assert hit["metadata"]["cache"] == "semantic" and 0.8 <= hit["metadata"]["cacheSimilarity"] < 1
+    assert hit["metadata"]["intent"] == "yellow_leaves" and "cache" not in REPLY["metadata"]
+    assert cache.lookup("Lúa bị vàng lùn", bucket).reply is None, "a different disease sharing words"
+    assert cache.lookup("Lúa bị vàng lá phải làm sao?", plot_bucket(plot(days=50))).reply is None
+    assert cache.lookup("Lúa bị vàng lá phải làm sao?", plot_bucket({})).reply is None
+    print("✅ Paraphrases hit in the same bucket; other diseases and other plots miss")
+
+    print("\n3. TTL and size limit...")
+    now[0] = 61
+    assert cache.lookup("Lúa bị vàng lá phải làm sao?", bucket).reply is None
+    assert cache.lookup("Vàng lá lúa phải làm sao", bucket).reply is None
+    for question in ["Bón phân cho lúa thế nào", "Lúa bị đạo ôn", "Mực nước ruộng bao nhiêu"]:
+        cache_with(cache, question, bucket)
+    assert cache.stats()["entries"] == 3
+    assert cache.lookup("Lúa bị vàng lá phải làm sao?", bucket).reply is None, "the oldest entry went first"
+    assert cache.lookup("Cách bón phân cho lúa", bucket).reply["metadata"]["cache"] == "semantic"
+    print("✅ Expired replies miss; the oldest reply makes room")
+
+    print("\n4. Knowledge changes...")
+    lookup = cache.lookup("Lúa bị cháy bìa lá", bucket)
+    bus.invalidate_locally("knowledge", None)
+    cache.store(lookup, REPLY)
+    stats = cache.stats()
+    assert stats["entries"] == 0 and stats["invalidations"] == 1
+    assert cache.lookup("Lúa bị đạo ôn", bucket).reply is None
+    print("✅ A chunk change drops every reply, including one generated meanwhile")
+
+    print("\n5. Hit rate...")
+    assert stats["hits"] == 1 and stats["semanticHits"] == 2 and stats["lookups"] == 14
+    assert stats["hitRate"] == round(3 / 14, 4)
+    print(f"✅ {stats}")
+
+    print("\n6. Cached replies skip retrieval and generation...")
+    calls = {"retrieval": 0, "backend": 0}
+
+    async def counting_retrieval(user_message):
+        calls["retrieval"] += 1
+        return []
+
+    async def counting_backend(user_message, reply_context):
+        calls["backend"] += 1
+        yield {"backend": "counting"}
+        yield "Giữ mực nước 3-5 cm."
+
+    async def failing_backend(user_message, reply_context):
+        yield {"fallback": "model down"}
+        yield "Xin mô tả thêm."
+
+    retrieve_grounding = assistant.retrieve_grounding
+    response_cache.clear()
+    try:
+        assistant.retrieve_grounding, assistant._reply_backend = counting_retrieval, counting_backend
+        first = await assistant.generate_ai_response("Mực nước ruộng bao nhiêu là đủ?", {}, None, "user")
+        again = await assistant.generate_ai_response("mực nước ruộng bao nhiêu là đủ", {}, None, "user")
+        assert first == {"content": "Giữ mực nước 3-5 cm.", "metadata": {"backend": "counting"}}
+        assert again["content"] == first["content"] and again["metadata"]["cache"] == "exact"
+        assert calls == {"retrieval": 1, "backend": 1}
+
+        assistant._reply_backend = failing_backend
+        for _ in range(2):
+            await assistant.generate_ai_response("Lúa bị đạo ôn", {}, None, "user")
+        assert calls["retrieval"] == 3 and response_cache.stats()["entries"] == 1
+    finally:
+        assistant.retrieve_grounding, assistant._reply_backend = retrieve_grounding, None
+        response_cache.clear()
+    print("✅ A hit neither retrieves nor generates; fallback replies are not cached")
+
+    print("\n✅ Reply cache tests passed")
+
+def test_response_cache():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_response_cache()
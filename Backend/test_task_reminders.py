@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test task reminder dispatch against the database in DATABASE_URL
+Reminders must be enqueued exactly once, even with concurrent dispatchers,
+re-armed when a task is rescheduled, and not held up by jobs already queued
+"""
+
+import asyncio
+from datetime import date, timedelta
+
+from database.config import get_database
+from workers.reminders import NOTIFY_JOB, dispatch_due_reminders
+
+DEMO_USER_ID = "11111111-1111-1111-1111-111111111111"
+DEMO_PLOT_ID = "33333333-3333-3333-3333-333333333333"
+TEST_TITLE = "test_task_reminders"
+
+async def reminder_jobs(conn):
+    return await conn.fetchval('''
+        SELECT COUNT(*) FROM sys.job_queue WHERE job_type = $1 AND payload->>'title' = $2
+    ''', NOTIFY_JOB, TEST_TITLE)
+
+async def cleanup(conn):
+    await conn.execute("DELETE FROM sys.job_queue WHERE job_type = $1 AND payload->>'title' = $2", NOTIFY_JOB, TEST_TITLE)
+    await conn.execute("DELETE FROM core.task WHERE title = $1", TEST_TITLE)
+
+async def run_tests():
+    conn = await get_database()
+    try:
+        await cleanup(conn)
+        # Reminders are sent for other tasks too; only count ours
+        await dispatch_due_reminders(conn)
+
+        print("\n1. Creating tasks...")
+        today = date.today()
+        await conn.executemany('''
+            INSERT INTO core.task (plot_id, user_id, title, due_date, type, reminder)
+            VALUES ($1, $2, $3, $4, 'other', $5)
+        ''', [
+            (DEMO_PLOT_ID, DEMO_USER_ID, TEST_TITLE, today, True),
+            (DEMO_PLOT_ID, DEMO_USER_ID, TEST_TITLE, today + timedelta(days=1), True),
+            (DEMO_PLOT_ID, DEMO_USER_ID, TEST_TITLE, today + timedelta(days=30), True),
+            (DEMO_PLOT_ID, DEMO_USER_ID, TEST_TITLE, today, False),
+        ] + [(DEMO_PLOT_ID, DEMO_USER_ID, TEST_TITLE, today - timedelta(days=1), True)] * 250)
+
+        print("\n2. Dispatching from several connections at once...")
+        connections = [await get_database() for _ in range(4)]
+        try:
+            counts = await asyncio.gather(*(dispatch_due_reminders(c, batch_size=50) for c in connections))
+        finally:
+            for c in connections:
+                await c.close()
+        print(f"Dispatched per connection: {counts}")
+        assert await reminder_jobs(conn) == 252
+        assert await dispatch_due_reminders(conn) == 0
+        print("✅ Each due reminder enqueued exactly once")
+
+        print("\n3. Rescheduling a sent reminder re-arms it...")
+        await conn.execute('''
+            UPDATE core.task SET due_date = due_date + 1
+            WHERE id = (SELECT id FROM core.task WHERE title = $1 AND due_date = $2 AND reminder)
+        ''', TEST_TITLE, today)
+        assert await dispatch_due_reminders(conn) == 1
+        assert await reminder_jobs(conn) == 253
+        print("✅ Rescheduled reminder dispatched again")
+
+        print("\n4. Jobs already queued for a reminder do not stop the walk...")
+        await conn.execute("UPDATE core.task SET reminder_sent_at = NULL WHERE title = $1", TEST_TITLE)
+        assert await dispatch_due_reminders(conn, batch_size=50) >= 252
+        assert await reminder_jobs(conn) == 253
+        assert await conn.fetchval('''
+            SELECT COUNT(*) FROM core.task
+            WHERE title = $1 AND reminder AND due_date <= $2 AND reminder_sent_at IS NULL
+        ''', TEST_TITLE, today + timedelta(days=1)) == 0
+        print("✅ Every due task stamped though its job was still queued")
+
+        await cleanup(conn)
+        print("\n✅ Task reminder tests passed")
+    finally:
+        await conn.close()
+
+def test_task_reminders():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_task_reminders()
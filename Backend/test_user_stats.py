@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test the trigger-maintained user stats against the database in DATABASE_URL
+After every kind of write the counters must match a direct recount, and
+reconciliation must repair counters that were tampered with
+"""
+
+import asyncio
+from datetime import date, timedelta
+
+from database.config import get_database
+from utils.user_stats import fetch_user_stats, reconcile_user_stats
+
+DEMO_USER_ID = "11111111-1111-1111-1111-111111111111"
+DEMO_PLOT_ID = "33333333-3333-3333-3333-333333333333"
+TEST_TITLE = "test_user_stats"
+
+async def recount(conn):
+    """The stats computed straight from the source tables"""
+    row = await conn.fetchrow('''
+        SELECT
+            (SELECT COUNT(*) FROM core.farm WHERE user_id = $1 AND deleted_at IS NULL) AS farms,
+            (SELECT COUNT(*) FROM core.plot p JOIN core.farm f ON p.farm_id = f.id
+             WHERE f.user_id = $1 AND p.deleted_at IS NULL AND f.deleted_at IS NULL) AS plots,
+            (SELECT COUNT(*) FROM core.task WHERE user_id = $1 AND deleted_at IS NULL) AS tasks,
+            (SELECT COUNT(*) FROM core.task WHERE user_id = $1 AND deleted_at IS NULL AND status = 'pending') AS tasks_pending,
+            (SELECT COUNT(*) FROM core.task WHERE user_id = $1 AND deleted_at IS NULL AND status = 'in_progress') AS tasks_in_progress,
+            (SELECT COUNT(*) FROM core.task WHERE user_id = $1 AND deleted_at IS NULL AND status = 'done') AS tasks_done,
+            (SELECT COUNT(*) FROM core.task WHERE user_id = $1 AND deleted_at IS NULL AND status != 'done'
+             AND due_date < CURRENT_DATE) AS tasks_overdue,
+            (SELECT COUNT(*) FROM core.task WHERE user_id = $1 AND deleted_at IS NULL AND status != 'done'
+             AND due_date = CURRENT_DATE) AS tasks_due_today,
+            (SELECT COUNT(*) FROM core.journal_entry WHERE user_id = $1 AND deleted_at IS NULL) AS journal_entries,
+            (SELECT COUNT(*) FROM core.journal_entry WHERE user_id = $1 AND deleted_at IS NULL
+             AND type = 'fertilizer') AS journal_fertilizer,
+            (SELECT COUNT(*) FROM core.journal_entry WHERE user_id = $1 AND deleted_at IS NULL
+             AND entry_date = CURRENT_DATE) AS journal_today,
+            (SELECT COUNT(*) FROM core.journal_entry WHERE user_id = $1 AND deleted_at IS NULL
+             AND entry_date >= CURRENT_DATE - 7) AS journal_last_week
+    ''', DEMO_USER_ID)
+    return dict(row)
+
+async def assert_in_sync(conn, step: str):
+    stats = await fetch_user_stats(conn, DEMO_USER_ID)
+    expected = await recount(conn)
+    mismatched = {key: (stats[key], value) for key, value in expected.items() if stats[key] != value}
+    assert not mismatched, f"{step}: counters out of sync (counter, actual): {mismatched}"
+    print(f"✅ {step}")
+
+async def cleanup(conn):
+    await conn.execute("DELETE FROM core.task WHERE title = $1", TEST_TITLE)
+    await conn.execute("DELETE FROM core.journal_entry WHERE title = $1", TEST_TITLE)
+    await conn.execute("DELETE FROM core.plot WHERE name = $1", TEST_TITLE)
+    await conn.execute("DELETE FROM core.farm WHERE name = $1", TEST_TITLE)
+
+async def run_tests():
+    conn = await get_database()
+    try:
+        await cleanup(conn)
+        await assert_in_sync(conn, "Counters match before any test writes")
+
+        print("\n1. Tasks...")
+        today = date.today()
+        await conn.executemany('''
+            INSERT INTO core.task (plot_id, user_id, title, due_date, type)
+            VALUES ($1, $2, $3, $4, 'other')
+        ''', [(DEMO_PLOT_ID, DEMO_USER_ID, TEST_TITLE, today + timedelta(days=offset)) for offset in range(-5, 5)])
+        await assert_in_sync(conn, "Tasks inserted")
+
+        await conn.execute("UPDATE core.task SET status = 'done' WHERE title = $1 AND due_date < $2", TEST_TITLE, today - timedelta(days=2))
+        await conn.execute("UPDATE core.task SET status = 'in_progress' WHERE title = $1 AND due_date = $2", TEST_TITLE, today)
+        await assert_in_sync(conn, "Task status changed")
+
+        await conn.execute("UPDATE core.task SET due_date = due_date + 3 WHERE title = $1 AND status = 'pending'", TEST_TITLE)
+        await assert_in_sync(conn, "Tasks rescheduled")
+
+        await conn.execute("UPDATE core.task SET deleted_at = NOW() WHERE title = $1 AND due_date > $2", TEST_TITLE, today + timedelta(days=4))
+        await conn.execute("DELETE FROM core.task WHERE title = $1 AND status = 'done'", TEST_TITLE)
+        await assert_in_sync(conn, "Tasks soft and hard deleted")
+
+        print("\n2. Journal entries...")
+        await conn.executemany('''
+            INSERT INTO core.journal_entry (plot_id, user_id, entry_date, type, title)
+            VALUES ($1, $2, $3, $4, $5)
+        ''', [
+            (DEMO_PLOT_ID, DEMO_USER_ID, today - timedelta(days=offset), entry_type, TEST_TITLE)
+            for offset in (0, 3, 10) for entry_type in ("fertilizer", "pest")
+        ])
+        await assert_in_sync(conn, "Journal entries inserted")
+
+        await conn.execute("UPDATE core.journal_entry SET type = 'fertilizer', entry_date = CURRENT_DATE WHERE title = $1 AND type = 'pest'", TEST_TITLE)
+        await conn.execute("UPDATE core.journal_entry SET deleted_at = NOW() WHERE title = $1 AND entry_date < CURRENT_DATE - 7", TEST_TITLE)
+        await assert_in_sync(conn, "Journal entries edited and deleted")
+
+        print("\n3. Farms and plots...")
+        farm_id = await conn.fetchval('''
+            INSERT INTO core.farm (user_id, name, province, district) VALUES ($1, $2, 'An Giang', 'Chợ Mới') RETURNING id
+        ''', DEMO_USER_ID, TEST_TITLE)
+        await conn.executemany('''
+            INSERT INTO core.plot (farm_id, name, area_m2) VALUES ($1, $2, 1000)
+        ''', [(farm_id, TEST_TITLE)] * 3)
+        await assert_in_sync(conn, "Farm and plots created")
+
+        await conn.execute("UPDATE core.plot SET deleted_at = NOW() WHERE id = (SELECT id FROM core.plot WHERE farm_id = $1 LIMIT 1)", farm_id)
+        await assert_in_sync(conn, "Plot deleted")
+
+        await conn.execute("UPDATE core.farm SET deleted_at = NOW() WHERE id = $1", farm_id)
+        await assert_in_sync(conn, "Farm deleted (its plots no longer count)")
+
+        await conn.execute("UPDATE core.farm SET deleted_at = NULL WHERE id = $1", farm_id)
+        await assert_in_sync(conn, "Farm restored")
+
+        print("\n4. Reconciliation...")
+        assert await reconcile_user_stats(conn, [DEMO_USER_ID]) == 0
+        print("✅ Nothing to correct after trigger-maintained writes")
+
+        await conn.execute("UPDATE core.user_stats SET tasks = tasks + 7, plots = 0 WHERE user_id = $1", DEMO_USER_ID)
+        await conn.execute("DELETE FROM core.user_stats_daily WHERE user_id = $1", DEMO_USER_ID)
+        assert await reconcile_user_stats(conn) >= 1
+        await assert_in_sync(conn, "Tampered counters repaired")
+
+        await cleanup(conn)
+        await assert_in_sync(conn, "Counters match after cleanup")
+        print("\n✅ User stats tests passed")
+    finally:
+        await conn.close()
+
+def test_user_stats():
+    asyncio.run(run_tests())
+
+if __name__ == "__main__":
+    test_user_stats()
@@ -0,0 +1,264 @@
+"""
+Approximate nearest-neighbour search over unit-length embeddings (IVF, optional PQ).
+
+IVFIndex partitions vectors with a coarse quantizer: spherical k-means
+centroids, each owning an inverted list of the vectors closest to it. A query
+scores the centroids, then only the vectors in its nprobe best lists, so the
+cost grows with nprobe * (size / nlist) instead of size. nprobe is the
+recall/latency knob: more lists probed, fewer true neighbours missed.
+
+With pq_m > 0 the lists hold product-quantization codes instead of float32
+vectors: each vector's residual from its centroid is split into pq_m
+sub-vectors, and each sub-vector is stored as the index (one byte) of its
+nearest of 256 sub-centroids. A query precomputes its dot product with every
+sub-centroid once, so scoring a vector is pq_m table lookups, and a 256-dim
+vector takes pq_m bytes instead of 1 KB. Scores become approximate, so
+search() can re-score a shortlist with the original vectors when the caller
+has them (the flat snapshot keeps them on disk, memory-mapped).
+
+add() and remove() update the lists in place without retraining, so chunks
+can be indexed as they are embedded; retrain when the data has drifted far
+from what the centroids were trained on. save() writes the lists
+concatenated in list order; load() memory-maps them.
+"""
+
+import uuid
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.snapshot import load_snapshot, save_snapshot
+
+ID_DTYPE = np.dtype("V16")
+PQ_CENTROIDS = 256
+
+Hit = Tuple[uuid.UUID, float]
+
+def kmeans(
+    vectors: np.ndarray,
+    k: int,
+    iterations: int = 12,
+    spherical: bool = True,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """
+    Lloyd's k-means. Spherical k-means assigns by dot product and keeps
+    centroids unit length (the coarse quantizer for cosine similarity);
+    otherwise by Euclidean distance (PQ sub-centroids).
+    """
+    rng = rng or np.random.default_rng(0)
+    centroids = vectors[rng.choice(len(vectors), k, replace=len(vectors) < k)].astype(np.float32)
+    for _ in range(iterations):
+        assignment = assign(vectors, centroids, spherical)
+        counts = np.bincount(assignment, minlength=k)
+        order = np.argsort(assignment, kind="stable")
+        starts = np.searchsorted(assignment[order], np.arange(k))
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(vectors[order], starts[~empty])
+        centroids = np.where(empty[:, None], centroids, sums / np.maximum(counts, 1)[:, None])
+        if empty.any():
+            # Restart empty clusters on random vectors
+            centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        if spherical:
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, spherical: bool = True, block: int = 65536) -> np.ndarray:
+    """Index of each vector's nearest centroid"""
+    half_norms = None if spherical else 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    result = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block):
+        scores = vectors[start:start + block] @ centroids.T
+        if half_norms is not None:
+            scores -= half_norms  # argmax of x.c - |c|^2 / 2 is argmin of |x - c|^2
+        result[start:start + block] = scores.argmax(axis=1)
+    return result
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, highest first"""
+    top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+    return top[np.argsort(-scores[top])]
+
+class IVFIndex:
+    def __init__(self, centroids: np.ndarray, codebooks: Optional[np.ndarray] = None, meta: Optional[Dict] = None):
+        self.centroids = centroids
+        # (pq_m, 256, dim / pq_m) sub-centroids, or None to store vectors as they are
+        self.codebooks = codebooks
+        self.meta = meta or {}
+        nlist = len(centroids)
+        width = self.code_width
+        self.list_data: List[np.ndarray] = [np.zeros((0, width), dtype=self.code_dtype) for _ in range(nlist)]
+        self.list_ids: List[np.ndarray] = [np.zeros(0, dtype=ID_DTYPE) for _ in range(nlist)]
+        self.list_langs: List[np.ndarray] = [np.zeros(0, dtype=np.uint8) for _ in range(nlist)]
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def pq_m(self) -> int:
+        return 0 if self.codebooks is None else len(self.codebooks)
+
+    @property
+    def code_width(self) -> int:
+        return self.pq_m or self.centroids.shape[1]
+
+    @property
+    def code_dtype(self):
+        return np.uint8 if self.pq_m else np.float32
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self.list_ids)
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        nlist: int,
+        pq_m: int = 0,
+        sample_size: int = 100_000,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Train the coarse quantizer (and PQ codebooks) on a sample of vectors; the index starts empty"""
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False))],
+                            dtype=np.float32)
+        nlist = max(1, min(nlist, len(sample)))
+        centroids = kmeans(sample, nlist, rng=rng)
+        codebooks = None
+        if pq_m:
+            dim = sample.shape[1]
+            if dim % pq_m:
+                raise ValueError(f"pq_m must divide the dimension ({dim})")
+            residuals = sample - centroids[assign(sample, centroids)]
+            sub_dim = dim // pq_m
+            codebooks = np.stack([
+                kmeans(residuals[:, j * sub_dim:(j + 1) * sub_dim], PQ_CENTROIDS, iterations=8, spherical=False, rng=rng)
+                for j in range(pq_m)
+            ])
+        return cls(centroids, codebooks, {"nlist": nlist, "pqM": pq_m, "trainedOn": len(vectors)})
+
+    def encode(self, vectors: np.ndarray, lists: np.ndarray) -> np.ndarray:
+        """What the lists store for vectors: themselves, or the PQ codes of their residuals"""
+        if not self.pq_m:
+            return np.asarray(vectors, dtype=np.float32)
+        residuals = vectors - self.centroids[lists]
+        sub_dim = residuals.shape[1] // self.pq_m
+        return np.stack([
+            assign(residuals[:, j * sub_dim:(j + 1) * sub_dim], self.codebooks[j], spherical=False)
+            for j in range(self.pq_m)
+        ], axis=1).astype(np.uint8)
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray, langs: np.ndarray) -> None:
+        """Index vectors under their ids (16-byte UUIDs as ID_DTYPE) and knowledge_chunk language codes"""
+        if not len(ids):
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        lists = assign(vectors, self.centroids)
+        codes = self.encode(vectors, lists)
+        order = np.argsort(lists, kind="stable")
+        boundaries = np.searchsorted(lists[order], np.arange(self.nlist + 1))
+        for list_no in np.flatnonzero(np.diff(boundaries)):
+            rows = order[boundaries[list_no]:boundaries[list_no + 1]]
+            self.list_data[list_no] = np.concatenate([self.list_data[list_no], codes[rows]])
+            self.list_ids[list_no] = np.concatenate([self.list_ids[list_no], ids[rows]])
+            self.list_langs[list_no] = np.concatenate([self.list_langs[list_no], langs[rows]])
+
+    def remove(self, ids: np.ndarray, vectors: Optional[np.ndarray] = None) -> int:
+        """
+        Drop ids from the index; returns how many were found. With their
+        vectors only their own lists are checked, otherwise every list.
+        """
+        if not len(ids):
+            return 0
+        wanted = np.asarray(ids).view("S16")
+        lists = range(self.nlist) if vectors is None else np.unique(assign(np.asarray(vectors, dtype=np.float32), self.centroids))
+        removed = 0
+        for list_no in lists:
+            found = np.isin(self.list_ids[list_no].view("S16"), wanted)
+            if found.any():
+                keep = ~found
+                self.list_data[list_no] = self.list_data[list_no][keep]
+                self.list_ids[list_no] = self.list_ids[list_no][keep]
+                self.list_langs[list_no] = self.list_langs[list_no][keep]
+                removed += int(found.sum())
+        return removed
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        nprobe: int = 16,
+        langs: Optional[Sequence[int]] = None,
+        exact: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+        refine: int = 4,
+    ) -> List[List[Hit]]:
+        """
+        The (approximately) k most similar vectors for each query, best first;
+        langs limits the language codes. For a PQ index, exact(ids) may return
+        the original vectors: the best k * refine candidates by PQ score are
+        then re-scored exactly, which recovers most of the recall PQ loses.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        nprobe = min(nprobe, self.nlist)
+        coarse = queries @ self.centroids.T
+        probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe] if nprobe < self.nlist \
+            else np.broadcast_to(np.arange(self.nlist), coarse.shape)
+
+        results = []
+        for query, query_coarse, lists in zip(queries, coarse, probes):
+            lists = [list_no for list_no in lists if len(self.list_ids[list_no])]
+            if not lists:
+                results.append([])
+                continue
+            ids = np.concatenate([self.list_ids[list_no] for list_no in lists])
+            if self.pq_m:
+                # Dot product of the query with every sub-centroid, then one lookup per sub-vector
+                sub_dim = len(query) // self.pq_m
+                table = np.einsum("jcd,jd->jc", self.codebooks, query.reshape(self.pq_m, sub_dim))
+                codes = np.concatenate([self.list_data[list_no] for list_no in lists])
+                scores = table[np.arange(self.pq_m), codes].sum(axis=1)
+                scores += np.repeat(query_coarse[lists], [len(self.list_ids[list_no]) for list_no in lists])
+            else:
+                scores = np.concatenate([self.list_data[list_no] for list_no in lists]) @ query
+            if langs is not None:
+                scores[~np.isin(np.concatenate([self.list_langs[list_no] for list_no in lists]), langs)] = -np.inf
+            if self.pq_m and exact is not None:
+                candidates = top_k(scores, k * refine)
+                candidates = candidates[np.isfinite(scores[candidates])]
+                ids = ids[candidates]
+                scores = exact(ids) @ query
+            top = top_k(scores, k)
+            results.append([(uuid.UUID(bytes=ids[i].tobytes()), float(scores[i])) for i in top if np.isfinite(scores[i])])
+        return results
+
+    def save(self, directory: str) -> None:
+        """Write the index; readers switch to it whole (see utils/snapshot.py)"""
+        sizes = np.array([len(ids) for ids in self.list_ids], dtype=np.int64)
+        arrays = {
+            "centroids": self.centroids,
+            "offsets": np.concatenate([[0], np.cumsum(sizes)]),
+            "data": np.concatenate(self.list_data),
+            "ids": np.concatenate(self.list_ids),
+            "langs": np.concatenate(self.list_langs),
+        }
+        if self.pq_m:
+            arrays["codebooks"] = self.codebooks
+        save_snapshot(directory, arrays, {**self.meta, "size": int(sizes.sum())})
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["IVFIndex"]:
+        """The index in directory with its lists memory-mapped, or None if there is no complete one"""
+        snapshot = load_snapshot(directory, mmap=("data",))
+        if snapshot is None:
+            return None
+        arrays, meta = snapshot
+        index = cls(arrays["centroids"], arrays.get("codebooks"), meta)
+        offsets, data, ids, langs = arrays["offsets"], arrays["data"], arrays["ids"], arrays["langs"]
+        for list_no in range(index.nlist):
+            start, end = offsets[list_no], offsets[list_no + 1]
+            index.list_data[list_no] = data[start:end]
+            index.list_ids[list_no] = ids[start:end]
+            index.list_langs[list_no] = langs[start:end]
+        return index
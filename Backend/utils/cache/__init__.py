@@ -0,0 +1,128 @@
+"""
+Shared async caching.
+
+get_cache() returns the process-wide backend chosen by CACHE_BACKEND:
+"memory" (default, per worker) or "redis" (shared, at REDIS_URL). Both follow
+the invalidation bus: a "user:<user_id>" message drops every entry tagged
+"user:<user_id>", so cached responses go stale no longer than it takes the
+NOTIFY to arrive. A response loaded while such a message arrived is not
+cached, since it may have been read before the write.
+
+Routers cache GET handlers with @cached(ttl), which keys on the handler, the
+current user and the remaining parameters:
+
+    @router.get("/farms")
+    @cached(ttl=60)
+    async def get_farms(current_user_id: str = Depends(get_current_user)):
+        ...
+"""
+
+import asyncio
+import functools
+import json
+import os
+from typing import Any, Optional, Set
+
+from fastapi.responses import Response
+
+from database.config import in_transaction
+from utils.cache.base import CacheBackend
+from utils.cache.memory import MemoryCache
+from utils.cache.resp import RedisCache, RespClient, RespError
+from utils.invalidation import invalidation_bus
+
+__all__ = [
+    "CacheBackend", "MemoryCache", "RedisCache", "RespClient", "RespError",
+    "cached", "get_cache",
+]
+
+# Errors of an unreachable or failing backend, on which @cached runs the handler uncached
+BACKEND_ERRORS = (OSError, EOFError, asyncio.TimeoutError, RespError)
+
+_cache: Optional[CacheBackend] = None
+_pending: Set[asyncio.Task] = set()
+# User invalidations so far; see InvalidatedCache.generation()
+_evictions = 0
+
+def _on_user_invalidated(user_id: Optional[str]) -> None:
+    global _evictions
+    _evictions += 1
+    cache = _cache
+    if cache is None:
+        return
+    task = asyncio.get_running_loop().create_task(
+        cache.clear() if user_id is None else cache.invalidate_tags([f"user:{user_id}"])
+    )
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+invalidation_bus.subscribe("user", _on_user_invalidated)
+
+def create_cache() -> CacheBackend:
+    """A backend as configured by CACHE_BACKEND, REDIS_URL and CACHE_MAX_ENTRIES"""
+    backend = os.getenv("CACHE_BACKEND", "memory")
+    if backend == "redis":
+        return RedisCache(RespClient(os.getenv("REDIS_URL", "redis://localhost:6379/0")))
+    if backend == "memory":
+        return MemoryCache(max_entries=int(os.getenv("CACHE_MAX_ENTRIES", 10000)))
+    raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+
+def get_cache() -> CacheBackend:
+    """The process-wide cache"""
+    global _cache
+    if _cache is None:
+        _cache = create_cache()
+    return _cache
+
+def _encode(result: Any) -> Any:
+    if isinstance(result, Response):
+        return {"__response__": result.body.decode(), "status": result.status_code, "mediaType": result.media_type}
+    return result
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict) and "__response__" in value:
+        return Response(content=value["__response__"], status_code=value["status"], media_type=value["mediaType"])
+    return value
+
+def cached(ttl: float = 60):
+    """
+    Cache a GET handler's result per user and parameters, tagged "user:<current_user_id>".
+
+    Results are only cached while this worker is listening for invalidations,
+    and never inside a transactional batch (see in_transaction); otherwise the
+    handler runs every time. So does it when the cache backend fails.
+    """
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not invalidation_bus.listening or in_transaction():
+                return await func(*args, **kwargs)
+
+            user_id = kwargs.get("current_user_id")
+            params = {key: value for key, value in kwargs.items() if key != "current_user_id"}
+            key = f"{name}:{user_id}:{json.dumps(params, sort_keys=True, default=str)}"
+
+            generation = _evictions
+            called, result = False, []
+
+            async def load():
+                nonlocal called
+                called = True
+                result.append(await func(*args, **kwargs))
+                return _encode(result[0])
+
+            tags = [f"user:{user_id}"] if user_id else []
+            try:
+                return _decode(await get_cache().get_or_set(key, load, ttl, tags, lambda: _evictions == generation))
+            except BACKEND_ERRORS as e:
+                if called:
+                    if not result:  # the handler's own error
+                        raise
+                    return result[0]  # only storing it failed
+                print(f"Cache unavailable for {name}: {e!r}")
+                return await func(*args, **kwargs)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,103 @@
+"""
+The async cache interface shared by the in-process and Redis backends.
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+Loader = Callable[[], Awaitable[Any]]
+
+class CacheBackend(ABC):
+    """
+    get/set/delete plus batched get_many/set_many, with per-entry TTLs (seconds)
+    and tags: invalidate_tags() drops every entry written with one of the tags,
+    e.g. all cached responses of one user.
+
+    None is not a cacheable value; get() returns None for a miss. Values must be
+    JSON-serializable to work with every backend.
+    """
+
+    def __init__(self, default_ttl: Optional[float] = 300):
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @abstractmethod
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Values of the keys that are cached (missing keys are left out)"""
+
+    @abstractmethod
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        """Cache every item with the same TTL and tags"""
+
+    @abstractmethod
+    async def delete_many(self, keys: Iterable[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def invalidate_tags(self, tags: Iterable[str]) -> None:
+        """Drop every entry written with any of the tags"""
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+    async def get(self, key: str) -> Optional[Any]:
+        return (await self.get_many([key])).get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        await self.set_many({key: value}, ttl, tags)
+
+    async def delete(self, key: str) -> None:
+        await self.delete_many([key])
+
+    def _count(self, requested: List[str], found: Dict[str, Any]) -> None:
+        self.hits += len(found)
+        self.misses += len(requested) - len(found)
+
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Loader,
+        ttl: Optional[float] = None,
+        tags: Iterable[str] = (),
+        fresh: Optional[Callable[[], bool]] = None,
+    ) -> Any:
+        """
+        The cached value, or loader()'s result cached under key.
+
+        Concurrent misses for one key share a single loader call (per process),
+        so an expiring hot key does not send a burst of identical queries. With
+        fresh, the result is only cached if fresh() is still true once loaded
+        (e.g. no invalidation arrived while loading).
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._load(key, loader, ttl, tags, fresh)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # waiters get it; don't warn when there are none
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _load(
+        self, key: str, loader: Loader, ttl: Optional[float], tags: Iterable[str], fresh: Optional[Callable[[], bool]]
+    ) -> Any:
+        value = await loader()
+        if value is not None and (fresh is None or fresh()):
+            await self.set(key, value, ttl, tags)
+        return value
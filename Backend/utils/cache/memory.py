@@ -0,0 +1,153 @@
+"""
+In-process cache with a bounded number of entries.
+
+Eviction is LRU, or W-TinyLFU (the default): new entries land in a small LRU
+window, and an entry leaving the window only displaces the main area's LRU
+victim if it has been used more often recently. Frequencies come from a
+count-min sketch that is halved periodically, so a one-off scan (one user
+paging through a large journal) cannot flush the entries everyone else reads.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from utils.cache.base import CacheBackend
+
+# (value, expires_at, tags)
+Entry = Tuple[Any, Optional[float], Tuple[str, ...]]
+
+class FrequencySketch:
+    """Count-min sketch of recent key frequencies (4 rows, counters capped at 15)"""
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, capacity: int):
+        # About four counters per entry and row keeps collisions from inflating estimates
+        self.width = 1 << max(4, (4 * capacity - 1).bit_length())
+        self.rows = [bytearray(self.width) for _ in range(self.DEPTH)]
+        self.sample_size = 10 * self.width
+        self.additions = 0
+
+    def _slots(self, key: str):
+        mask = self.width - 1
+        for row in range(self.DEPTH):
+            yield row, hash((row, key)) & mask
+
+    def increment(self, key: str) -> None:
+        for row, slot in self._slots(key):
+            if self.rows[row][slot] < self.MAX_COUNT:
+                self.rows[row][slot] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            # Age every count so the sketch follows recent popularity
+            self.rows = [bytearray(count >> 1 for count in row) for row in self.rows]
+            self.additions //= 2
+
+    def estimate(self, key: str) -> int:
+        return min(self.rows[row][slot] for row, slot in self._slots(key))
+
+class MemoryCache(CacheBackend):
+    def __init__(self, max_entries: int = 10000, default_ttl: Optional[float] = 300, policy: str = "tinylfu"):
+        if policy not in ("lru", "tinylfu"):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        super().__init__(default_ttl)
+        self.max_entries = max_entries
+        self.policy = policy
+
+        # LRU order: first entry is the least recently used
+        self._main: "OrderedDict[str, Entry]" = OrderedDict()
+        self._window: "OrderedDict[str, Entry]" = OrderedDict()
+        self._window_size = max(1, max_entries // 100) if policy == "tinylfu" else 0
+        self._sketch = FrequencySketch(max_entries) if policy == "tinylfu" else None
+        self._tags: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._main) + len(self._window)
+
+    def _lookup(self, key: str) -> Optional[Any]:
+        if self._sketch:
+            self._sketch.increment(key)
+        for area in (self._window, self._main):
+            entry = area.get(key)
+            if entry is None:
+                continue
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            area.move_to_end(key)
+            return value
+        return None
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        found = {}
+        for key in keys:
+            value = self._lookup(key)
+            if value is not None:
+                found[key] = value
+        self._count(keys, found)
+        return found
+
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        tags = tuple(tags)
+        for key, value in items.items():
+            self._remove(key)
+            self._insert(key, (value, expires_at, tags))
+
+    def _insert(self, key: str, entry: Entry) -> None:
+        for tag in entry[2]:
+            self._tags.setdefault(tag, set()).add(key)
+
+        if self.policy == "lru":
+            self._main[key] = entry
+            if len(self._main) > self.max_entries:
+                self._remove(next(iter(self._main)))
+            return
+
+        self._window[key] = entry
+        if len(self._window) <= self._window_size:
+            return
+
+        # The window's LRU entry competes with the main area's LRU victim
+        candidate, candidate_entry = self._window.popitem(last=False)
+        if len(self._main) < self.max_entries - self._window_size:
+            self._main[candidate] = candidate_entry
+            return
+        victim = next(iter(self._main), None)
+        if victim is not None and self._sketch.estimate(candidate) > self._sketch.estimate(victim):
+            self._remove(victim)
+            self._main[candidate] = candidate_entry
+        else:
+            self._forget_tags(candidate, candidate_entry[2])
+
+    def _remove(self, key: str) -> None:
+        entry = self._window.pop(key, None) or self._main.pop(key, None)
+        if entry:
+            self._forget_tags(key, entry[2])
+
+    def _forget_tags(self, key: str, tags: Tuple[str, ...]) -> None:
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def delete_many(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._remove(key)
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    async def clear(self) -> None:
+        self._main.clear()
+        self._window.clear()
+        self._tags.clear()
@@ -0,0 +1,207 @@
+"""
+Cache backend for Redis (or anything speaking its RESP protocol: KeyDB, Dragonfly, Valkey).
+
+Talks RESP2 over asyncio streams with a small connection pool, so it needs no
+client library. Entries are JSON strings under "<prefix><key>" with a PX
+expiry. Each tag is a Redis set of the keys written with it, so
+invalidate_tags() reads the set and deletes its members. Cache misses on one
+key are serialized across workers with a short SET NX lock: the lock holder
+loads the value, and the others poll for it until the lock expires.
+"""
+
+import asyncio
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from utils.cache.base import CacheBackend, Loader
+
+class RespError(Exception):
+    """Error reply from the server"""
+
+class RespConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @staticmethod
+    def encode(args: Sequence[Any]) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    async def read_reply(self) -> Any:
+        line = await self.reader.readuntil(b"\r\n")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            return RespError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(body)
+            if length < 0:
+                return None
+            return [await self.read_reply() for _ in range(length)]
+        raise RespError(f"Unexpected reply: {line!r}")
+
+    async def pipeline(self, commands: List[Sequence[Any]]) -> List[Any]:
+        """Send every command, then read every reply (errors are returned, not raised)"""
+        self.writer.write(b"".join(self.encode(command) for command in commands))
+        await self.writer.drain()
+        return [await self.read_reply() for _ in commands]
+
+    def close(self) -> None:
+        self.writer.close()
+
+class RespClient:
+    """A pool of RESP connections to redis://[:password@]host[:port][/db]"""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", pool_size: int = 4, timeout: float = 2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._idle: List[RespConnection] = []
+        self._slots = asyncio.Semaphore(pool_size)
+
+    async def _connect(self) -> RespConnection:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        conn = RespConnection(reader, writer)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            for reply in await conn.pipeline(setup):
+                if isinstance(reply, RespError):
+                    conn.close()
+                    raise reply
+        return conn
+
+    async def pipeline(self, commands: List[Sequence[Any]]) -> List[Any]:
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await self._connect()
+            try:
+                replies = await asyncio.wait_for(conn.pipeline(commands), self.timeout)
+            except BaseException:
+                # The connection may hold unread replies; never reuse it
+                conn.close()
+                raise
+            self._idle.append(conn)
+        return replies
+
+    async def execute(self, *args: Any) -> Any:
+        reply = (await self.pipeline([args]))[0]
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    async def close(self) -> None:
+        while self._idle:
+            self._idle.pop().close()
+
+class RedisCache(CacheBackend):
+    def __init__(
+        self,
+        client: RespClient,
+        prefix: str = "airrvie:cache:",
+        default_ttl: Optional[float] = 300,
+        tag_ttl: float = 24 * 3600,
+        lock_ttl: float = 5.0,
+    ):
+        super().__init__(default_ttl)
+        self.client = client
+        self.prefix = prefix
+        # Tag sets outlive their entries; entries cached for longer than this may outlive their tags
+        self.tag_ttl = tag_ttl
+        self.lock_ttl = lock_ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = await self.client.execute("MGET", *[self._key(key) for key in keys])
+        found = {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+        self._count(keys, found)
+        return found
+
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        if not items:
+            return
+        ttl = self.default_ttl if ttl is None else ttl
+        expiry: Tuple[Any, ...] = ("PX", max(1, int(ttl * 1000))) if ttl is not None else ()
+        commands: List[Sequence[Any]] = [
+            ("SET", self._key(key), json.dumps(value, separators=(",", ":")), *expiry)
+            for key, value in items.items()
+        ]
+        for tag in tags:
+            commands.append(("SADD", self._tag_key(tag), *[self._key(key) for key in items]))
+            commands.append(("PEXPIRE", self._tag_key(tag), int(self.tag_ttl * 1000)))
+        await self._run(commands)
+
+    async def delete_many(self, keys: Iterable[str]) -> None:
+        keys = [self._key(key) for key in keys]
+        if keys:
+            await self.client.execute("DEL", *keys)
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            members = await self.client.execute("SMEMBERS", self._tag_key(tag))
+            await self.client.execute("DEL", self._tag_key(tag), *members)
+
+    async def clear(self) -> None:
+        """Delete every key under this cache's prefix"""
+        cursor = "0"
+        while True:
+            cursor, keys = await self.client.execute("SCAN", cursor, "MATCH", f"{self.prefix}*", "COUNT", 500)
+            cursor = cursor.decode() if isinstance(cursor, bytes) else cursor
+            if keys:
+                await self.client.execute("DEL", *keys)
+            if cursor == "0":
+                return
+
+    async def _run(self, commands: List[Sequence[Any]]) -> None:
+        for reply in await self.client.pipeline(commands):
+            if isinstance(reply, RespError):
+                raise reply
+
+    async def _load(
+        self, key: str, loader: Loader, ttl: Optional[float], tags: Iterable[str], fresh: Optional[Callable[[], bool]]
+    ) -> Any:
+        """Load under a cross-worker lock; other workers wait for the holder's value"""
+        lock_key = f"{self.prefix}lock:{key}"
+        acquired = await self.client.execute("SET", lock_key, 1, "NX", "PX", int(self.lock_ttl * 1000))
+        if not acquired:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.lock_ttl
+            while loop.time() < deadline:
+                await asyncio.sleep(0.05)
+                value = await self.get(key)
+                if value is not None:
+                    return value
+            # The holder failed or is too slow; load it ourselves
+            return await super()._load(key, loader, ttl, tags, fresh)
+
+        try:
+            return await super()._load(key, loader, ttl, tags, fresh)
+        finally:
+            await self.client.execute("DEL", lock_key)
@@ -0,0 +1,223 @@
+"""
+Response compression.
+
+CompressionMiddleware compresses responses with brotli or gzip, whichever the
+client prefers in Accept-Encoding (brotli only if the brotli package is
+installed). It only compresses text-like content types, and only bodies of at
+least `minimum_size` bytes: a small body saves little and costs a round of
+compression. Bodies or chunks of `offload_size` bytes and more are compressed
+in the thread pool so a large list or export does not block the event loop.
+Streamed responses (exports) are compressed chunk by chunk with a flush after
+each chunk, so the client still receives rows as they are produced.
+Server-Sent Events (text/event-stream) are never compressed.
+
+PrecompressedStaticFiles serves "<file>.br" or "<file>.gz" next to a static
+file when the client accepts it. precompress.py writes those files for
+the built frontend and for uploads. SinglePageAppFiles serves the built
+frontend that way, with index.html for the paths of its client-side routes.
+"""
+
+import os
+import zlib
+from mimetypes import guess_type
+from typing import List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/x-ndjson", "application/javascript",
+    "application/xml", "application/manifest+json", "image/svg+xml",
+}
+# File suffix of each encoding's precompressed variant
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# Text types sent as written: Server-Sent Events must not wait on a compressor
+UNCOMPRESSED_TYPES = {"text/event-stream"}
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return False
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in UNCOMPRESSED_TYPES:
+        return False
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """The encodings we can produce that the client accepts, most preferred first (brotli wins ties)"""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+        weights[name.strip()] = quality
+
+    available = ["br", "gzip"] if brotli else ["gzip"]
+    ranked = []
+    for encoding in available:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > 0:
+            ranked.append((-quality, available.index(encoding), encoding))
+    return [encoding for _, _, encoding in sorted(ranked)]
+
+class Compressor:
+    """Incremental brotli or gzip compression of one response body"""
+
+    def __init__(self, encoding: str, gzip_level: int = 6, brotli_quality: int = 5):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, finish: bool = False) -> bytes:
+        """Compress a chunk; everything passed so far can be decoded from the output"""
+        if self.encoding == "br":
+            output = self._brotli.process(data)
+            return output + (self._brotli.finish() if finish else self._brotli.flush())
+        output = self._gzip.compress(data)
+        return output + self._gzip.flush(zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        offload_size: int = 64 * 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encodings = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if not encodings:
+            await self.app(scope, receive, send)
+            return
+        await CompressionResponder(self, encodings[0], send).run(self.app, scope, receive)
+
+class CompressionResponder:
+    """Send wrapper for one response: holds back the start message until the first body chunk"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.compressor: Optional[Compressor] = None
+        self.passthrough = False
+
+    async def run(self, app: ASGIApp, scope: Scope, receive: Receive) -> None:
+        await app(scope, receive, self.wrapped_send)
+
+    async def compress(self, data: bytes, finish: bool) -> bytes:
+        if len(data) >= self.middleware.offload_size:
+            return await run_in_threadpool(self.compressor.compress, data, finish)
+        return self.compressor.compress(data, finish)
+
+    def skip(self, message: Message) -> bool:
+        headers = Headers(raw=self.start["headers"])
+        return (
+            self.start["status"] in (204, 206, 304)
+            or "content-encoding" in headers
+            or not is_compressible(headers.get("content-type"))
+            or (not message.get("more_body", False) and len(message.get("body", b"")) < self.middleware.minimum_size)
+        )
+
+    async def wrapped_send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if self.skip(message):
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+
+            self.compressor = Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            body = await self.compress(body, finish=not more_body)
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # The encoded bytes differ from the ones the strong validator names
+                headers["ETag"] = f"W/{etag}"
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        body = await self.compress(body, finish=not more_body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that prefers an up-to-date .br or .gz sibling the client accepts"""
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        for encoding in accepted_encodings(request_headers.get("accept-encoding", "")):
+            variant = f"{full_path}{ENCODING_SUFFIXES[encoding]}"
+            try:
+                variant_stat = os.stat(variant)
+            except OSError:
+                continue
+            if variant_stat.st_mtime < stat_result.st_mtime:
+                continue  # stale: the original changed after it was compressed
+            response = FileResponse(
+                variant, status_code=status_code, stat_result=variant_stat,
+                media_type=guess_type(str(full_path))[0] or "text/plain",
+                headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+            )
+            if self.is_not_modified(response.headers, request_headers):
+                return NotModifiedResponse(response.headers)
+            return response
+        return super().file_response(full_path, stat_result, scope, status_code)
+
+class SinglePageAppFiles(PrecompressedStaticFiles):
+    """
+    PrecompressedStaticFiles for a single-page app: a path that is no file (a
+    client-side route such as /farms/3) gets index.html. Missing files with an
+    extension and paths under api_prefix are still 404s.
+    """
+
+    def __init__(self, directory: str, api_prefix: str = "api/"):
+        super().__init__(directory=directory, html=True)
+        self.api_prefix = api_prefix
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as e:
+            if e.status_code != 404 or path.startswith(self.api_prefix) or os.path.splitext(path)[1]:
+                raise
+            return await super().get_response("index.html", scope)
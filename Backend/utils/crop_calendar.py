@@ -0,0 +1,206 @@
+"""
+Crop calendar engine: builds a plot's season task set from its variety and
+planting_date and writes it to core.task in one statement.
+
+Generated tasks carry source = 'calendar' and a calendar_key naming their
+template, so regeneration updates them in place instead of duplicating them.
+Tasks the farmer completed or deleted are never touched.
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+# Season length (sowing to harvest, days) for common Mekong Delta varieties
+VARIETY_SEASON_DAYS = {
+    "om5451": 95,
+    "om4900": 100,
+    "om18": 100,
+    "dt8": 95,
+    "ir50404": 95,
+    "jasmine85": 100,
+    "st24": 105,
+    "st25": 105,
+}
+DEFAULT_SEASON_DAYS = 100
+
+# Growth stages by days after sowing; ripening is the last RIPENING_DAYS of the season
+TILLERING_DAY = 15
+PANICLE_DAY = 45
+RIPENING_DAYS = 30
+GROWTH_STAGE_NAMES = {
+    "not_sown": "chưa sạ",
+    "seedling": "mạ",
+    "tillering": "đẻ nhánh",
+    "panicle": "làm đòng - trổ",
+    "ripening": "chín",
+    "harvested": "đã thu hoạch",
+}
+
+PEST_SCOUTING_INTERVAL_DAYS = 10
+
+# Tasks are due "day" days after sowing, or "before_harvest" days before harvest
+SEASON_TEMPLATES = [
+    {"key": "irrigation_seedling", "type": "irrigation", "day": 1, "priority": "medium", "reminder": False,
+     "title": "Giữ ẩm ruộng giai đoạn mạ",
+     "description": "Giữ ẩm, không để ruộng ngập nước trong giai đoạn mạ."},
+    {"key": "fertilizer_1", "type": "fertilizer", "day": 7, "priority": "high", "reminder": True,
+     "title": "Bón phân đợt 1 (bón thúc)",
+     "description": "Bón thúc 7-10 ngày sau sạ. Liều lượng tùy giống lúa và điều kiện đất."},
+    {"key": "weeding_1", "type": "weeding", "day": 12, "priority": "medium", "reminder": False,
+     "title": "Làm cỏ, dặm tỉa",
+     "description": "Làm cỏ và dặm tỉa những chỗ lúa quá dày hoặc quá thưa."},
+    {"key": "irrigation_tillering", "type": "irrigation", "day": 15, "priority": "medium", "reminder": False,
+     "title": "Giữ mực nước 3-5cm (đẻ nhánh)",
+     "description": "Giai đoạn đẻ nhánh: duy trì mực nước ruộng 3-5cm."},
+    {"key": "fertilizer_2", "type": "fertilizer", "day": 18, "priority": "high", "reminder": True,
+     "title": "Bón phân đợt 2 (bón đón đòng)",
+     "description": "Bón đón đòng 18-22 ngày sau sạ."},
+    {"key": "fertilizer_3", "type": "fertilizer", "day": 40, "priority": "high", "reminder": True,
+     "title": "Bón phân đợt 3 (bón nuôi hạt)",
+     "description": "Bón nuôi hạt 40-45 ngày sau sạ."},
+    {"key": "irrigation_panicle", "type": "irrigation", "day": 45, "priority": "medium", "reminder": False,
+     "title": "Giữ mực nước 5-7cm (làm đòng)",
+     "description": "Giai đoạn làm đòng: duy trì mực nước ruộng 5-7cm."},
+    {"key": "irrigation_drain", "type": "irrigation", "before_harvest": 10, "priority": "medium", "reminder": True,
+     "title": "Rút nước chuẩn bị thu hoạch",
+     "description": "Rút nước từ từ khoảng 10 ngày trước khi thu hoạch."},
+    {"key": "harvest", "type": "harvest", "before_harvest": 0, "priority": "high", "reminder": True,
+     "title": "Thu hoạch",
+     "description": "Thu hoạch khi khoảng 85-90% hạt trên bông đã chín vàng."},
+]
+
+def variety_key(variety: Optional[str]) -> str:
+    """A variety name without case, spaces or đ, e.g. OM 5451 -> om5451"""
+    return "".join((variety or "").lower().split()).replace("đ", "d")
+
+def season_days(variety: Optional[str]) -> int:
+    """Days from sowing to harvest for a variety"""
+    return VARIETY_SEASON_DAYS.get(variety_key(variety), DEFAULT_SEASON_DAYS)
+
+def growth_stage(variety: Optional[str], planting_date: Optional[date], today: Optional[date] = None) -> Optional[str]:
+    """The GROWTH_STAGE_NAMES key of a crop sown on planting_date (None without a date)"""
+    if planting_date is None:
+        return None
+    days = ((today or date.today()) - planting_date).days
+    length = season_days(variety)
+    if days < 0:
+        return "not_sown"
+    if days < TILLERING_DAY:
+        return "seedling"
+    if days < PANICLE_DAY:
+        return "tillering"
+    if days < length - RIPENING_DAYS:
+        return "panicle"
+    if days <= length:
+        return "ripening"
+    return "harvested"
+
+def build_season_tasks(variety: Optional[str], planting_date: date) -> List[Dict[str, Any]]:
+    """Expand the season templates into dated tasks for one plot"""
+    length = season_days(variety)
+    tasks = []
+    for template in SEASON_TEMPLATES:
+        day = length - template["before_harvest"] if "before_harvest" in template else template["day"]
+        tasks.append({**template, "due_date": planting_date + timedelta(days=day)})
+
+    # Field scouting for pests and disease through the season
+    for number, day in enumerate(range(PEST_SCOUTING_INTERVAL_DAYS, length - 5, PEST_SCOUTING_INTERVAL_DAYS), 1):
+        tasks.append({
+            "key": f"pest_scouting_{number}", "type": "pest", "priority": "medium", "reminder": False,
+            "title": f"Thăm đồng kiểm tra sâu bệnh (lần {number})",
+            "description": "Kiểm tra mật độ sâu cuốn lá, rầy nâu và dấu hiệu bệnh đạo ôn.",
+            "due_date": planting_date + timedelta(days=day),
+        })
+
+    return sorted(tasks, key=lambda task: task["due_date"])
+
+async def _fetch_plots(conn: asyncpg.Connection, plot_ids: Optional[List[str]]) -> List[asyncpg.Record]:
+    return await conn.fetch('''
+        SELECT p.id, p.variety, p.planting_date, f.user_id
+        FROM core.plot p
+        JOIN core.farm f ON p.farm_id = f.id
+        WHERE p.planting_date IS NOT NULL AND p.deleted_at IS NULL AND f.deleted_at IS NULL
+        AND ($1::uuid[] IS NULL OR p.id = ANY($1::uuid[]))
+    ''', plot_ids)
+
+def _task_columns(plots: List[asyncpg.Record]) -> List[List[Any]]:
+    """Column arrays for an unnest() insert of every plot's season tasks"""
+    columns = [[] for _ in range(9)]
+    today = date.today()
+    for plot in plots:
+        for task in build_season_tasks(plot["variety"], plot["planting_date"]):
+            # Back-filled tasks for an earlier planting date should not flood the farmer with reminders
+            reminder = task["reminder"] and task["due_date"] >= today
+            row = (
+                plot["id"], plot["user_id"], task["title"], task["description"], task["due_date"],
+                task["priority"], task["type"], reminder, task["key"],
+            )
+            for column, value in zip(columns, row):
+                column.append(value)
+    return columns
+
+async def write_calendar_tasks(conn: asyncpg.Connection, plots: List[asyncpg.Record], reschedule: bool) -> int:
+    """
+    Insert the season tasks for the given plots in one statement.
+
+    With reschedule, existing calendar tasks that are not done get the new dates
+    and text; otherwise existing tasks are left alone. Returns rows written.
+    """
+    if not plots:
+        return 0
+
+    conflict_action = '''
+        DO UPDATE SET due_date = EXCLUDED.due_date, title = EXCLUDED.title,
+                      description = EXCLUDED.description, priority = EXCLUDED.priority,
+                      type = EXCLUDED.type
+        WHERE core.task.status != 'done' AND core.task.deleted_at IS NULL
+    ''' if reschedule else 'DO NOTHING'
+
+    result = await conn.execute(f'''
+        INSERT INTO core.task (plot_id, user_id, title, description, due_date, priority,
+                               type, reminder, calendar_key, source)
+        SELECT t.plot_id, t.user_id, t.title, t.description, t.due_date, t.priority,
+               t.type, t.reminder, t.calendar_key, 'calendar'
+        FROM unnest($1::uuid[], $2::uuid[], $3::text[], $4::text[], $5::date[], $6::text[],
+                    $7::text[], $8::boolean[], $9::text[])
+            AS t(plot_id, user_id, title, description, due_date, priority, type, reminder, calendar_key)
+        ON CONFLICT (plot_id, calendar_key) WHERE calendar_key IS NOT NULL
+        {conflict_action}
+    ''', *_task_columns(plots))
+
+    return int(result.split()[-1])
+
+async def generate_calendars(conn: asyncpg.Connection, plot_ids: Optional[List[str]] = None,
+                             chunk_size: int = 2000) -> int:
+    """Create missing season tasks for the given plots (all plots with a planting date by default)"""
+    plots = await _fetch_plots(conn, plot_ids)
+    created = 0
+    for start in range(0, len(plots), chunk_size):
+        created += await write_calendar_tasks(conn, plots[start:start + chunk_size], reschedule=False)
+    return created
+
+async def has_calendar(conn: asyncpg.Connection, plot_id: str) -> bool:
+    """Whether a plot already has generated season tasks"""
+    return await conn.fetchval('''
+        SELECT EXISTS (
+            SELECT 1 FROM core.task
+            WHERE plot_id = $1 AND calendar_key IS NOT NULL AND deleted_at IS NULL
+        )
+    ''', plot_id)
+
+async def regenerate_plot_calendar(conn: asyncpg.Connection, plot_id: str) -> int:
+    """Bring one plot's season tasks in line with its current variety and planting date"""
+    async with conn.transaction():
+        plots = await _fetch_plots(conn, [plot_id])
+        keys = [task["key"] for task in build_season_tasks(plots[0]["variety"], plots[0]["planting_date"])] if plots else []
+
+        # Untouched tasks whose template no longer applies (e.g. a shorter season)
+        await conn.execute('''
+            DELETE FROM core.task
+            WHERE plot_id = $1 AND calendar_key IS NOT NULL AND status = 'pending'
+            AND deleted_at IS NULL AND NOT (calendar_key = ANY($2::text[]))
+        ''', plot_id, keys)
+
+        return await write_calendar_tasks(conn, plots, reschedule=True)
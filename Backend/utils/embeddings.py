@@ -0,0 +1,152 @@
+"""
+Knowledge chunk embeddings.
+
+get_embedder() returns the process-wide Embedder chosen by EMBEDDING_BACKEND:
+"hashing" (default) or "<module>:<factory>" for any callable returning an
+Embedder, e.g. a sentence-transformers wrapper. The default HashingEmbedder
+needs no model files or network: it hashes unaccented words, word pairs and
+character trigrams into EMBEDDING_DIM signed buckets, so texts that share
+vocabulary (with or without tone marks, or with small typos) land close
+together. Every embedder returns L2-normalized float32 rows, so a dot
+product is the cosine similarity.
+
+Vectors are stored in knowledge_chunk.embedding as raw little-endian float32
+(4 bytes per dimension). embed_chunks() fills in chunks whose embedding is
+NULL; a trigger clears the embedding whenever a chunk's title or content
+changes, so the knowledge.embed job picks those up again.
+"""
+
+import importlib
+import math
+import os
+import zlib
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence
+
+import asyncpg
+import numpy as np
+
+from utils.text import words
+
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", 256))
+
+# Function words that say nothing about the topic
+STOP_WORDS = frozenset("""
+    là của và bị có không thì mà như thế nào gì làm sao tôi bạn em anh chị mình
+    cho với để ở tại trong trên được những các một này đó khi nếu vì nên rất đã
+    đang sẽ còn hay hoặc ra vào
+    a an the is are of and or to in on for with what how why when which my i
+    you it be do does can should
+""".split())
+
+class Embedder(ABC):
+    """Maps texts to L2-normalized float32 vectors of a fixed dimension"""
+
+    name: str = "embedder"
+    dim: int = EMBEDDING_DIM
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """A (len(texts), dim) float32 array with unit-length rows (all zero for empty texts)"""
+
+    def embed_one(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
+
+class HashingEmbedder(Embedder):
+    """Signed feature hashing of words, word bigrams and character trigrams"""
+
+    def __init__(self, dim: int = EMBEDDING_DIM, char_weight: float = 0.5):
+        self.dim = dim
+        self.char_weight = char_weight
+        self.name = f"hashing-{dim}"
+
+    def features(self, text: str) -> List[tuple]:
+        """(feature, weight) pairs of one text"""
+        tokens = words(text, STOP_WORDS)
+        features = [(token, 1.0) for token in tokens]
+        features += [(f"{first} {second}", 1.0) for first, second in zip(tokens, tokens[1:])]
+        for token in tokens:
+            padded = f"#{token}#"
+            features += [(padded[i:i + 3], self.char_weight) for i in range(len(padded) - 2)]
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self.features(text)
+            if not features:
+                continue
+            buckets, weights = [], []
+            for feature, weight in features:
+                digest = zlib.crc32(feature.encode())
+                buckets.append(digest % self.dim)
+                weights.append(weight if digest & 0x80000000 else -weight)
+            counts = np.bincount(buckets, weights=weights, minlength=self.dim)
+            # Sublinear term frequency: a word repeated ten times is not ten times as relevant
+            vector = np.sign(counts) * np.log1p(np.abs(counts))
+            norm = math.sqrt(float(vector @ vector))
+            if norm:
+                matrix[row] = vector / norm
+        return matrix
+
+def create_embedder() -> Embedder:
+    """An embedder as configured by EMBEDDING_BACKEND and EMBEDDING_DIM"""
+    backend = os.getenv("EMBEDDING_BACKEND", "hashing")
+    if backend == "hashing":
+        return HashingEmbedder()
+    module_name, _, factory = backend.partition(":")
+    if not factory:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+    return getattr(importlib.import_module(module_name), factory)()
+
+_embedder: Optional[Embedder] = None
+
+def get_embedder() -> Embedder:
+    """The process-wide embedder"""
+    global _embedder
+    if _embedder is None:
+        _embedder = create_embedder()
+    return _embedder
+
+def encode_embedding(vector: np.ndarray) -> bytes:
+    """BYTEA value of a vector: little-endian float32"""
+    return np.asarray(vector, dtype="<f4").tobytes()
+
+def decode_embedding(value: bytes) -> np.ndarray:
+    return np.frombuffer(value, dtype="<f4")
+
+def chunk_text(title: str, content: str) -> str:
+    """The text a chunk is embedded from"""
+    return f"{title}\n{content}"
+
+async def embed_chunks(
+    conn: asyncpg.Connection,
+    chunk_ids: Optional[List[str]] = None,
+    batch_size: int = 500,
+    embedder: Optional[Embedder] = None,
+) -> int:
+    """Compute and store embeddings for the given chunks, or every live chunk without one; returns the count"""
+    embedder = embedder or get_embedder()
+    embedded = 0
+    after = None
+    while True:
+        chunks = await conn.fetch('''
+            SELECT id, title, content
+            FROM core.knowledge_chunk
+            WHERE deleted_at IS NULL
+            AND (CASE WHEN $1::uuid[] IS NULL THEN embedding IS NULL ELSE id = ANY($1) END)
+            AND ($2::uuid IS NULL OR id > $2)
+            ORDER BY id
+            LIMIT $3
+        ''', chunk_ids, after, batch_size)
+        if not chunks:
+            return embedded
+
+        vectors = embedder.embed([chunk_text(chunk["title"], chunk["content"]) for chunk in chunks])
+        await conn.execute('''
+            UPDATE core.knowledge_chunk AS chunk SET embedding = data.embedding
+            FROM unnest($1::uuid[], $2::bytea[]) AS data(id, embedding)
+            WHERE chunk.id = data.id
+        ''', [chunk["id"] for chunk in chunks], [encode_embedding(vector) for vector in vectors])
+        embedded += len(chunks)
+        after = chunks[-1]["id"]
@@ -0,0 +1,270 @@
+"""
+Bulk knowledge base ingestion.
+
+ingest_directory() loads every Markdown (.md) and plain text (.txt, e.g.
+extracted from PDFs) file under a directory:
+
+  1. split: each file into sections at Markdown headings, each section into
+     windows of about CHUNK_CHARS characters that overlap by CHUNK_OVERLAP,
+     cut at paragraph, sentence or word boundaries. A chunk's title is its
+     section heading, or the file name for text without headings.
+  2. dedupe: by the SHA-256 of the chunk content, against the live chunks
+     already stored and within the run, so re-running on the same directory
+     (or resuming an interrupted run) only adds what is new.
+  3. embed: batches go to a process pool, so embedding uses every core
+     while the event loop keeps loading finished batches.
+  4. load: each batch is one COPY (copy_records_to_table) with its
+     embeddings, instead of one INSERT and a later UPDATE per chunk;
+     content_hash is filled in by the set_knowledge_content_hash trigger.
+  5. refresh: flush the GIN indexes' pending lists, ANALYZE, and write the
+     vector index snapshot (and IVF index) so searches see the new chunks.
+
+With prune, chunks of an ingested file that are no longer in it are
+soft-deleted, so editing a document and re-ingesting replaces its chunks.
+A chunk skipped as a duplicate of one stored under another file survives
+that: if no file still holding the stored chunk keeps it, the stored row is
+moved to the file it was found in (and re-embedded under its new title)
+before the pruning.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import asyncpg
+
+from utils.embeddings import chunk_text, embed_chunks, encode_embedding, get_embedder
+from utils.vector_index import ANN_MIN_CHUNKS, VECTOR_INDEX_DIR, update_ann_snapshot, write_snapshot
+
+CHUNK_CHARS = 1200
+CHUNK_OVERLAP = 200
+INGEST_BATCH_SIZE = 2000
+DOCUMENT_EXTENSIONS = (".md", ".markdown", ".txt")
+
+COPY_COLUMNS = ["source", "title", "content", "lang", "tags", "embedding"]
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_BREAKS = ("\n\n", ". ", "\n", " ")
+
+def content_hash(content: str) -> bytes:
+    """What duplicates are detected by: knowledge_chunk.content_hash as the database computes it"""
+    return hashlib.sha256(content.encode()).digest()
+
+def split_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Windows of at most size characters, each starting about overlap characters before the previous one ended"""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            # Cut at the last paragraph, sentence or word break in the second half of the window
+            for separator in _BREAKS:
+                cut = text.rfind(separator, start + size // 2, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        # Begin the next window on a word boundary inside the overlap
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else end
+    return chunks
+
+def normalize_document(text: str, markdown: bool) -> str:
+    """NFC, Unix newlines, no trailing spaces; hard-wrapped plain text paragraphs joined into single lines"""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n").replace("\f", "\n\n")
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r" ?\n ?", "\n", text)
+    if not markdown:
+        # PDF extraction breaks lines mid-paragraph and hyphenates words across them
+        text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+        text = re.sub(r"(?<!\n)\n(?!\n)", " ", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+def split_document(text: str, title: str, markdown: bool = True) -> List[Tuple[str, str]]:
+    """(title, content) chunks of one document; Markdown headings start new sections and title their chunks"""
+    sections: List[Tuple[str, List[str]]] = [(title, [])]
+    for line in normalize_document(text, markdown).split("\n"):
+        heading = _HEADING.match(line) if markdown else None
+        if heading:
+            sections.append((heading.group(2), []))
+        else:
+            sections[-1][1].append(line)
+    chunks = []
+    for heading, lines in sections:
+        chunks += [(heading, chunk) for chunk in split_text("\n".join(lines).strip())]
+    return chunks
+
+def iter_documents(directory: str) -> Iterator[Tuple[str, str, bool]]:
+    """(path relative to directory, text, is Markdown) of every document, in path order"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            extension = os.path.splitext(name)[1].lower()
+            if extension not in DOCUMENT_EXTENSIONS:
+                continue
+            path = os.path.join(root, name)
+            with open(path, encoding="utf-8-sig", errors="replace") as f:
+                text = f.read()
+            yield os.path.relpath(path, directory).replace(os.sep, "/"), text, extension != ".txt"
+
+def document_title(path: str) -> str:
+    """Title for chunks before a document's first heading: its file name in words"""
+    return re.sub(r"[_-]+", " ", os.path.splitext(os.path.basename(path))[0]).strip().capitalize()
+
+def embed_texts(texts: Sequence[str]) -> List[bytes]:
+    """Stored embeddings of texts; runs in the pool's processes, each with its own embedder"""
+    return [encode_embedding(vector) for vector in get_embedder().embed(list(texts))]
+
+async def refresh_search_indexes(conn: asyncpg.Connection) -> None:
+    """Merge the GIN indexes' pending entries into the indexes and update planner statistics"""
+    await conn.execute('''
+        SELECT gin_clean_pending_list(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_am a ON a.oid = c.relam
+        WHERE i.indrelid = 'core.knowledge_chunk'::regclass AND a.amname = 'gin'
+    ''')
+    await conn.execute("ANALYZE core.knowledge_chunk")
+
+async def move_duplicates(
+    conn: asyncpg.Connection,
+    stats: Dict[str, Any],
+    stored: Dict[bytes, Set[str]],
+    hashes_by_source: Dict[str, Set[bytes]],
+    found_elsewhere: Dict[bytes, Tuple[str, str]],
+    lang: str,
+    tags: Optional[List[str]],
+) -> None:
+    """
+    Before pruning, move each stored chunk that was skipped as a duplicate
+    under another source, and that every source holding it is about to lose,
+    to the source it was found in; so content moved between files stays live
+    """
+    moves = [
+        (digest, source, title) for digest, (source, title) in found_elsewhere.items()
+        if stored.get(digest) and all(
+            held_by in hashes_by_source and digest not in hashes_by_source[held_by] for held_by in stored[digest]
+        )
+    ]
+    if not moves:
+        return
+    moved = await conn.fetch('''
+        UPDATE core.knowledge_chunk c SET source = moved.source, title = moved.title, lang = $4, tags = $5
+        FROM (
+            SELECT DISTINCT ON (m.content_hash) k.id, m.source, m.title
+            FROM unnest($1::bytea[], $2::text[], $3::text[]) AS m(content_hash, source, title)
+            JOIN core.knowledge_chunk k ON k.content_hash = m.content_hash AND k.deleted_at IS NULL
+            ORDER BY m.content_hash, k.id
+        ) moved
+        WHERE c.id = moved.id
+        RETURNING c.id
+    ''', *map(list, zip(*moves)), lang, tags or [])
+    # A new title clears the embedding (reset_knowledge_embedding trigger)
+    await embed_chunks(conn, [str(row["id"]) for row in moved])
+    stats["moved"] += len(moved)
+
+async def ingest_directory(
+    conn: asyncpg.Connection,
+    directory: str,
+    lang: str = "vi",
+    tags: Optional[List[str]] = None,
+    prune: bool = False,
+    workers: Optional[int] = None,
+    batch_size: int = INGEST_BATCH_SIZE,
+    index_directory: str = VECTOR_INDEX_DIR,
+) -> Dict[str, Any]:
+    """
+    Load the documents under directory as knowledge chunks; returns counts
+    and per-phase seconds. workers is the embedding process count (default:
+    one per CPU; 1 embeds on a thread of this process).
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    stats: Dict[str, Any] = {"files": 0, "chunks": 0, "duplicates": 0, "inserted": 0, "moved": 0, "pruned": 0}
+    # Sources of the live chunks with each content hash
+    stored: Dict[bytes, Set[str]] = {}
+    for row in await conn.fetch('''
+        SELECT content_hash, source FROM core.knowledge_chunk WHERE deleted_at IS NULL AND content_hash IS NOT NULL
+    '''):
+        stored.setdefault(bytes(row["content_hash"]), set()).add(row["source"])
+    seen = set(stored)
+    hashes_by_source: Dict[str, Set[bytes]] = {}
+    # Duplicates of chunks stored under other sources: hash -> (source, title) found in
+    found_elsewhere: Dict[bytes, Tuple[str, str]] = {}
+
+    def batches() -> Iterator[List[Tuple[str, str, str]]]:
+        batch = []
+        for source, text, markdown in iter_documents(directory):
+            stats["files"] += 1
+            hashes = hashes_by_source.setdefault(source, set())
+            for title, content in split_document(text, document_title(source), markdown):
+                stats["chunks"] += 1
+                digest = content_hash(content)
+                hashes.add(digest)
+                if digest in seen:
+                    stats["duplicates"] += 1
+                    if source not in stored.get(digest, ()):
+                        found_elsewhere.setdefault(digest, (source, title))
+                    continue
+                seen.add(digest)
+                batch.append((source, title, content))
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    async def load(batch, embeddings: List[bytes]) -> None:
+        await conn.copy_records_to_table("knowledge_chunk", schema_name="core", columns=COPY_COLUMNS, records=[
+            (source, title, content, lang, tags or [], embedding)
+            for (source, title, content), embedding in zip(batch, embeddings)
+        ])
+        stats["inserted"] += len(batch)
+
+    loop = asyncio.get_running_loop()
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        # Keep every process busy while finished batches are copied in order
+        pending = deque()
+        for batch in batches():
+            texts = [chunk_text(title, content) for _, title, content in batch]
+            pending.append((batch, loop.run_in_executor(executor, embed_texts, texts)))
+            if len(pending) > workers:
+                batch, embeddings = pending.popleft()
+                await load(batch, await embeddings)
+        while pending:
+            batch, embeddings = pending.popleft()
+            await load(batch, await embeddings)
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    stats["loadSeconds"] = round(time.perf_counter() - started, 2)
+
+    if prune:
+        await move_duplicates(conn, stats, stored, hashes_by_source, found_elsewhere, lang, tags)
+        for source, hashes in hashes_by_source.items():
+            result = await conn.execute('''
+                UPDATE core.knowledge_chunk SET deleted_at = CURRENT_TIMESTAMP
+                WHERE source = $1 AND deleted_at IS NULL AND NOT (content_hash = ANY($2::bytea[]))
+            ''', source, list(hashes))
+            stats["pruned"] += int(result.split()[-1])
+
+    refreshed = time.perf_counter()
+    if stats["inserted"] or stats["moved"] or stats["pruned"]:
+        await refresh_search_indexes(conn)
+        index = await write_snapshot(conn, index_directory)
+        if len(index) >= ANN_MIN_CHUNKS:
+            await update_ann_snapshot(conn, index, index_directory)
+    stats["refreshSeconds"] = round(time.perf_counter() - refreshed, 2)
+    return stats
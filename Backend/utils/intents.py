@@ -0,0 +1,147 @@
+"""
+Assistant intent matching.
+
+Intents (utils/intents.json, or the file in INTENTS_FILE) name the phrases
+that trigger a canned reply, in Vietnamese and English. IntentMatcher
+compiles every phrase of every intent into one Aho-Corasick automaton, so a
+message is matched against all of them in a single pass over its
+characters: the cost depends on the message length, not on how many
+intents there are.
+
+Phrases and messages are both normalized with utils.text.unaccent and
+reduced to space-separated words, so "Lúa bị VÀNG LÁ", "lua bi vang la"
+and "vàng  lá!" all find "vàng lá", and a phrase only matches whole words
+("la" does not match inside "lam"). Each intent scores the weights of its
+distinct phrases found (a phrase weighs its word count unless the file
+gives one), plus EXACT_MARKS_BONUS per phrase also typed with its tone
+marks, so a phrase written as in the file outranks one that only matches
+without them ("bốn phần" still finds "bón phân"). The best score wins; ties
+go to the intent listed first.
+"""
+
+import json
+import os
+import re
+import unicodedata
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.text import unaccent
+
+INTENTS_FILE = os.getenv(
+    "INTENTS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents.json"),
+)
+
+# Added per phrase whose tone marks match the message exactly
+EXACT_MARKS_BONUS = 0.5
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+def normalize_phrase(text: str) -> str:
+    """Unaccented words separated and surrounded by single spaces, so matches fall on word boundaries"""
+    words = _NON_WORD.sub(" ", unaccent(text)).split()
+    return f" {' '.join(words)} " if words else ""
+
+def _marked(text: str) -> str:
+    """Lowercase words with their tone marks, separated and surrounded by single spaces"""
+    return f" {' '.join(_NON_WORD.sub(' ', unicodedata.normalize('NFC', text).lower()).split())} "
+
+class IntentMatcher:
+    """
+    Aho-Corasick automaton over the normalized phrases of a list of intents.
+    Each intent is a dict with "id" and "phrases" (strings, or {"text":
+    ..., "weight": ...}); any other keys (the reply) are returned as-is.
+    """
+
+    def __init__(self, intents: List[Dict[str, Any]]):
+        self.intents = intents
+        # Phrase number -> (intent number, weight, marked form)
+        self.phrases: List[Tuple[int, float, str]] = []
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[int]] = [[]]
+        for number, intent in enumerate(intents):
+            for phrase in intent["phrases"]:
+                text, weight = (phrase["text"], phrase.get("weight")) if isinstance(phrase, dict) else (phrase, None)
+                normalized = normalize_phrase(text)
+                if not normalized:
+                    continue
+                words = normalized.count(" ") - 1
+                self._add(normalized, len(self.phrases))
+                self.phrases.append((number, float(weight if weight is not None else words), _marked(text)))
+        self._link()
+
+    def _add(self, pattern: str, phrase: int) -> None:
+        state = 0
+        for char in pattern:
+            following = self.goto[state].get(char)
+            if following is None:
+                following = len(self.goto)
+                self.goto[state][char] = following
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = following
+        self.output[state].append(phrase)
+
+    def _link(self) -> None:
+        """Failure links breadth first; each state's output gains those of its failure state"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[following] = self.goto[fallback].get(char, 0)
+                self.output[following] = self.output[following] + self.output[self.fail[following]]
+
+    def find(self, text: str) -> List[int]:
+        """Numbers of the distinct phrases found in text, in the order they end"""
+        goto, fail, output = self.goto, self.fail, self.output
+        found: Dict[int, None] = {}
+        state = 0
+        for char in normalize_phrase(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for phrase in output[state]:
+                found[phrase] = None
+        return list(found)
+
+    def scores(self, text: str) -> Dict[int, float]:
+        """Score of every intent with at least one phrase in text, by intent number"""
+        marked = None
+        scores: Dict[int, float] = {}
+        for phrase in self.find(text):
+            number, weight, marked_phrase = self.phrases[phrase]
+            if marked is None:
+                marked = _marked(text)
+            if marked_phrase in marked:
+                weight += EXACT_MARKS_BONUS
+            scores[number] = scores.get(number, 0.0) + weight
+        return scores
+
+    def match(self, text: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """The best scoring intent for text and its score, or None when no phrase matches"""
+        scores = self.scores(text)
+        if not scores:
+            return None
+        number = max(scores, key=lambda candidate: (scores[candidate], -candidate))
+        return self.intents[number], scores[number]
+
+def load_intents(path: str = INTENTS_FILE) -> List[Dict[str, Any]]:
+    """The intents of a JSON file: {"intents": [...]}"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["intents"]
+
+_matcher: Optional[IntentMatcher] = None
+
+def get_intent_matcher() -> IntentMatcher:
+    """The process-wide matcher, compiled from INTENTS_FILE on first use"""
+    global _matcher
+    if _matcher is None:
+        _matcher = IntentMatcher(load_intents())
+    return _matcher
@@ -0,0 +1,137 @@
+"""
+Cross-worker cache invalidation over Postgres LISTEN/NOTIFY.
+
+In-process caches go stale once several API workers (or nodes) share one
+database. Writes therefore publish compact "<namespace>:<key>" messages on
+INVALIDATION_CHANNEL, and every worker evicts the matching keys:
+
+  user:<user_id>       anything derived from a user's farms, plots, tasks,
+                       journal or profile row (published by the
+                       notify_*_changes triggers on those tables)
+  ownership:<user_id>  the user lost a farm or plot (notify_ownership_change)
+  knowledge:           knowledge chunks changed (notify_knowledge_chunk_changes);
+                       a message without a key invalidates the whole namespace
+
+Messages come from triggers, so writes made by background jobs or by hand are
+covered too. NOTIFY is transactional: a message is delivered when its write
+commits, and not at all if it rolls back. Each worker listens on one dedicated
+connection. When that connection is (re)established the worker cannot know
+what it missed, so every subscriber is told to drop everything.
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from database.config import DATABASE_URL
+
+INVALIDATION_CHANNEL = "cache_invalidate"
+LISTENER_RETRY_SECONDS = 5
+
+# Called with the invalidated key, or None when everything must go
+Subscriber = Callable[[Optional[str]], None]
+
+class InvalidationBus:
+    def __init__(self):
+        self._subscribers: Dict[str, List[Subscriber]] = defaultdict(list)
+        self._listener: Optional[asyncpg.Connection] = None
+        self._maintenance: Optional[asyncio.Task] = None
+
+    def subscribe(self, namespace: str, subscriber: Subscriber) -> None:
+        self._subscribers[namespace].append(subscriber)
+
+    def invalidate_locally(self, namespace: str, key: Optional[str]) -> None:
+        for subscriber in self._subscribers.get(namespace, []):
+            subscriber(key)
+
+    async def publish(self, conn: asyncpg.Connection, namespace: str, key: str) -> None:
+        """Invalidate a key on every worker (delivered when conn's transaction commits)"""
+        await conn.execute("SELECT pg_notify($1, $2)", INVALIDATION_CHANNEL, f"{namespace}:{key}")
+        self.invalidate_locally(namespace, key)
+
+    @property
+    def listening(self) -> bool:
+        return self._listener is not None and not self._listener.is_closed()
+
+    async def start(self) -> None:
+        """Listen for invalidations (first connection attempt made before returning)"""
+        if self._maintenance is None:
+            await self._listen()
+            self._maintenance = asyncio.create_task(self._keep_listening())
+
+    async def stop(self) -> None:
+        if self._maintenance:
+            self._maintenance.cancel()
+            await asyncio.gather(self._maintenance, return_exceptions=True)
+            self._maintenance = None
+        if self.listening:
+            await self._listener.close()
+        self._listener = None
+
+    async def _listen(self) -> None:
+        """Open the dedicated LISTEN connection (reconnects if it was lost)"""
+        if self.listening:
+            return
+        try:
+            listener = await asyncpg.connect(DATABASE_URL)
+            await listener.add_listener(INVALIDATION_CHANNEL, self._on_notify)
+        except (OSError, asyncpg.PostgresError) as e:
+            print(f"Cache invalidation listener failed: {e}")
+            listener = None
+
+        # Whatever was published while we were not listening went unseen
+        for namespace in self._subscribers:
+            self.invalidate_locally(namespace, None)
+        self._listener = listener
+
+    async def _keep_listening(self) -> None:
+        while True:
+            await asyncio.sleep(LISTENER_RETRY_SECONDS)
+            await self._listen()
+
+    def _on_notify(self, conn, pid, channel, payload: str) -> None:
+        namespace, _, key = payload.partition(":")
+        self.invalidate_locally(namespace, key or None)
+
+invalidation_bus = InvalidationBus()
+
+class InvalidatedCache:
+    """
+    A small in-process TTL cache whose keys are evicted by bus messages in one namespace.
+
+    Readers take generation() before loading a value and hand it to set(), so a
+    value loaded while an invalidation arrived is not cached.
+    """
+
+    def __init__(self, namespace: str, ttl: float, bus: InvalidationBus = invalidation_bus, max_entries: Optional[int] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._evictions = 0
+        bus.subscribe(namespace, self.evict)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(str(key))
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    def generation(self) -> int:
+        return self._evictions
+
+    def set(self, key: str, value: Any, generation: int) -> None:
+        if generation == self._evictions:
+            if self.max_entries and len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))  # oldest first
+            self._entries[str(key)] = (time.monotonic(), value)
+
+    def evict(self, key: Optional[str] = None) -> None:
+        """Forget one key (everything when key is None)"""
+        self._evictions += 1
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(str(key), None)
@@ -0,0 +1,251 @@
+"""
+Knowledge base retrieval for the assistant.
+
+Chunks are matched against the stored, weighted search_vector column
+(title A, content B) through its GIN index, so a search costs an index
+lookup plus ranking of the matching chunks rather than a to_tsvector call
+for every chunk in the table.
+
+Farmers often type without tone marks ("vang la" for "vàng lá"), which
+full-text search on search_vector cannot match. Each chunk also stores
+search_vector_unaccented, the same document passed through core.vi_unaccent,
+and the query is matched against it unaccented too. A chunk is ranked by the
+sum of both ts_ranks, so exact spellings rank first. Each index contributes
+at most LEXICAL_CANDIDATES chunks to the ranking: a query of words found in
+most chunks would otherwise rank a large share of the table.
+
+Misspelled words match neither. Only when the full-text search finds fewer
+chunks than asked for, and the query has at most FUZZY_MAX_WORDS words, the
+rest is filled by word similarity against search_text (the unaccented title
+and content, behind a trigram index), from at most FUZZY_CANDIDATES chunks.
+
+semantic_knowledge() ranks by embedding similarity instead (see
+utils/vector_index.py), which also finds chunks that share few exact words
+with the question.
+
+hybrid_knowledge() is what the assistant grounds its answers in. It runs
+both searches at once on two pooled connections and merges them by
+reciprocal rank fusion: a chunk scores the sum of 1 / (RRF_K + rank) over the
+rankings it appears in, so chunks both searches agree on come first without
+having to compare ts_rank with cosine similarity. The word search gets
+KNOWLEDGE_LEXICAL_TIMEOUT seconds in all, as statement_timeouts set for its
+transactions so the server cancels it. The full-text part takes a few
+milliseconds with 120,000 chunks (see bench_hybrid_retrieval.py); the trigram
+fallback can take longer, and is then cut off and the word matches found so
+far fused on their own. Results are cached per normalized question, language,
+tags and limit for KNOWLEDGE_CACHE_TTL seconds, except those the word search
+was cut off on; any write to knowledge_chunk (and every vector index reload)
+drops the whole cache through the "knowledge" invalidation namespace.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import asyncpg
+
+from database.config import get_pool
+from utils.invalidation import InvalidatedCache
+from utils.text import normalize_query
+from utils.vector_index import semantic_search
+
+KNOWLEDGE_CACHE_TTL = float(os.getenv("KNOWLEDGE_CACHE_TTL", 300))
+KNOWLEDGE_CACHE_MAX_ENTRIES = 10000
+KNOWLEDGE_LEXICAL_TIMEOUT = float(os.getenv("KNOWLEDGE_LEXICAL_TIMEOUT", 0.03))
+# Chunks each full-text index contributes to the ranking, and the trigram fallback's share
+LEXICAL_CANDIDATES = 1000
+FUZZY_CANDIDATES = 200
+FUZZY_MAX_WORDS = 3
+RRF_K = 60
+# Candidates each search contributes to the fusion, per result returned
+CANDIDATES_PER_RESULT = 3
+
+KNOWLEDGE_COLUMNS = "id, source, title, content, lang, tags"
+
+CHUNK_FILTER = "(lang = $1 OR lang = 'both') AND deleted_at IS NULL AND ($4::text[] IS NULL OR tags && $4)"
+
+SEARCH_QUERY = f'''
+    SELECT {KNOWLEDGE_COLUMNS}
+    FROM (
+        (SELECT id FROM core.knowledge_chunk
+         WHERE {CHUNK_FILTER} AND search_vector @@ plainto_tsquery('simple', $2)
+         LIMIT {LEXICAL_CANDIDATES})
+        UNION
+        (SELECT id FROM core.knowledge_chunk
+         WHERE {CHUNK_FILTER} AND search_vector_unaccented @@ plainto_tsquery('simple', core.vi_unaccent($2))
+         LIMIT {LEXICAL_CANDIDATES})
+    ) candidates
+    JOIN core.knowledge_chunk USING (id),
+    plainto_tsquery('simple', $2) query, plainto_tsquery('simple', core.vi_unaccent($2)) unaccented
+    ORDER BY ts_rank(search_vector, query) + ts_rank(search_vector_unaccented, unaccented) DESC
+    LIMIT $3
+'''
+
+FUZZY_QUERY = f'''
+    SELECT {KNOWLEDGE_COLUMNS}
+    FROM (
+        SELECT {KNOWLEDGE_COLUMNS}, search_text
+        FROM core.knowledge_chunk, core.vi_unaccent($2) normalized
+        WHERE {CHUNK_FILTER} AND normalized <% search_text AND NOT (id = ANY($5::uuid[]))
+        LIMIT {FUZZY_CANDIDATES}
+    ) candidates, core.vi_unaccent($2) normalized
+    ORDER BY word_similarity(normalized, search_text) DESC
+    LIMIT $3
+'''
+
+RECENT_QUERY = f'''
+    SELECT {KNOWLEDGE_COLUMNS}
+    FROM core.knowledge_chunk
+    WHERE (lang = $1 OR lang = 'both') AND deleted_at IS NULL
+    AND ($3::text[] IS NULL OR tags && $3)
+    ORDER BY created_at DESC
+    LIMIT $2
+'''
+
+CHUNKS_BY_ID_QUERY = f'''
+    SELECT {KNOWLEDGE_COLUMNS}
+    FROM core.knowledge_chunk
+    WHERE id = ANY($1::uuid[]) AND deleted_at IS NULL
+    AND ($2::text[] IS NULL OR tags && $2)
+'''
+
+def format_chunk(chunk) -> Dict[str, Any]:
+    return {
+        "id": str(chunk["id"]),
+        "source": chunk["source"],
+        "title": chunk["title"],
+        "content": chunk["content"],
+        "lang": chunk["lang"],
+        "tags": chunk["tags"] or [],
+    }
+
+async def search_knowledge_words(
+    conn: asyncpg.Connection,
+    search: str,
+    lang: str,
+    limit: int,
+    tags: Optional[List[str]],
+) -> List[Dict[str, Any]]:
+    """Best-ranked chunks containing every word of search, with or without tone marks"""
+    return [format_chunk(chunk) for chunk in await conn.fetch(SEARCH_QUERY, lang, search, limit, tags)]
+
+def wants_fuzzy(search: str, found: int, limit: int) -> bool:
+    """Whether the trigram fallback should fill up full-text results for search"""
+    return found < limit and len(search.split()) <= FUZZY_MAX_WORDS
+
+async def fuzzy_knowledge(
+    conn: asyncpg.Connection,
+    search: str,
+    lang: str,
+    limit: int,
+    tags: Optional[List[str]],
+    found: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """Up to limit more chunks like search by word similarity, other than those found"""
+    exclude = [chunk["id"] for chunk in found]
+    return [format_chunk(chunk) for chunk in await conn.fetch(FUZZY_QUERY, lang, search, limit, tags, exclude)]
+
+async def search_knowledge(
+    conn: asyncpg.Connection,
+    search: str,
+    lang: str = "vi",
+    limit: int = 10,
+    tags: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Best-ranked chunks matching search with or without tone marks (or, for a
+    few words, misspelled), or the most recent chunks without a search; with
+    tags, only chunks having one of them
+    """
+    if not search.strip():
+        return [format_chunk(chunk) for chunk in await conn.fetch(RECENT_QUERY, lang, limit, tags)]
+    chunks = await search_knowledge_words(conn, search, lang, limit, tags)
+    if wants_fuzzy(search, len(chunks), limit):
+        chunks += await fuzzy_knowledge(conn, search, lang, limit - len(chunks), tags, chunks)
+    return chunks
+
+async def fetch_chunks(conn: asyncpg.Connection, chunk_ids: Sequence, tags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Live chunks by id (with one of tags, if given), in the order given"""
+    chunks = {chunk["id"]: chunk for chunk in await conn.fetch(CHUNKS_BY_ID_QUERY, list(chunk_ids), tags)}
+    return [format_chunk(chunks[chunk_id]) for chunk_id in chunk_ids if chunk_id in chunks]
+
+async def semantic_knowledge(
+    conn: asyncpg.Connection,
+    search: str,
+    lang: str = "vi",
+    limit: int = 10,
+    tags: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Chunks closest in meaning to search, most similar first, each with its cosine similarity as score"""
+    # Tags are applied after the vector search, so ask it for more
+    hits = (await semantic_search(conn, [search], limit * (4 if tags else 1), lang))[0]
+    scores = {str(chunk_id): score for chunk_id, score in hits}
+    chunks = (await fetch_chunks(conn, [chunk_id for chunk_id, _ in hits], tags))[:limit]
+    return [{**chunk, "score": round(scores[chunk["id"]], 4)} for chunk in chunks]
+
+def fuse(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Reciprocal rank fusion of rankings of chunk ids, best first"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, 1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+async def set_statement_timeout(conn: asyncpg.Connection, deadline: float) -> None:
+    """Cancel the statements of the current transaction that run past deadline (time.monotonic())"""
+    remaining = max(int((deadline - time.monotonic()) * 1000), 1)
+    await conn.execute(f"SET LOCAL statement_timeout = {remaining}")
+
+_retrievals = InvalidatedCache("knowledge", KNOWLEDGE_CACHE_TTL, max_entries=KNOWLEDGE_CACHE_MAX_ENTRIES)
+
+async def hybrid_knowledge(
+    search: str,
+    lang: str = "vi",
+    tags: Optional[List[str]] = None,
+    limit: int = 10,
+) -> List[Dict[str, Any]]:
+    """Chunks found by words and by meaning, fused by reciprocal rank, each with its fused score"""
+    query = normalize_query(search)
+    tags = sorted(set(tags)) if tags else None
+    key = json.dumps([query, lang, tags, limit], ensure_ascii=False)
+    cached = _retrievals.get(key)
+    if cached is not None:
+        return cached
+
+    generation = _retrievals.generation()
+    pool = await get_pool()
+    if not query:
+        async with pool.acquire() as conn:
+            return await search_knowledge(conn, "", lang, limit, tags)
+    candidates = limit * CANDIDATES_PER_RESULT
+
+    async def lexical() -> Tuple[List[Dict[str, Any]], bool]:
+        """The word search's chunks, and whether it finished in time"""
+        deadline = time.monotonic() + KNOWLEDGE_LEXICAL_TIMEOUT
+        found: List[Dict[str, Any]] = []
+        async with pool.acquire() as conn:
+            try:
+                async with conn.transaction():
+                    await set_statement_timeout(conn, deadline)
+                    found = await search_knowledge_words(conn, query, lang, candidates, tags)
+                if wants_fuzzy(query, len(found), candidates):
+                    async with conn.transaction():
+                        await set_statement_timeout(conn, deadline)
+                        found += await fuzzy_knowledge(conn, query, lang, candidates - len(found), tags, found)
+            except asyncpg.QueryCanceledError:
+                return found, False
+        return found, True
+
+    async def semantic() -> List[Dict[str, Any]]:
+        async with pool.acquire() as conn:
+            return await semantic_knowledge(conn, query, lang, candidates, tags)
+
+    (by_words, complete), by_meaning = await asyncio.gather(lexical(), semantic())
+    chunks = {chunk["id"]: chunk for chunk in by_meaning + by_words}
+    fused = fuse([[chunk["id"] for chunk in by_words], [chunk["id"] for chunk in by_meaning]])
+    results = [{**chunks[chunk_id], "score": round(score, 4)} for chunk_id, score in fused[:limit]]
+    if complete:  # a later try may get every word match in time
+        _retrievals.set(key, results, generation)
+    return results
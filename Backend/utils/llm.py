@@ -0,0 +1,264 @@
+"""
+Language model backends for assistant replies.
+
+get_completion_backend() returns the process-wide model chosen by
+LLM_BACKEND: unset (no model: replies stay rule-based), "local", or
+"<module>:<factory>" for any callable returning a CompletionBackend, e.g. a
+wrapper around a hosted chat API. A backend takes chat messages ({"role",
+"content"} dicts) and either streams the reply piece by piece (stream) or
+returns it whole (complete). LocalBackend is a deterministic stand-in that
+needs no network: it answers from the grounding lines of the system message,
+the same way every time, so tests and development run without a provider.
+
+The backend is wrapped in a GuardedBackend, one per backend name, so a slow
+or failing provider cannot tie up API workers:
+  - at most LLM_MAX_CONCURRENCY calls run at once; a call waits up to
+    LLM_QUEUE_TIMEOUT seconds for a slot
+  - the first piece must arrive within LLM_FIRST_TOKEN_TIMEOUT and the whole
+    reply within LLM_TIMEOUT seconds
+  - a circuit breaker opens after LLM_BREAKER_FAILURES failures in a row
+    (errors, timeouts, full queue): calls then fail at once for
+    LLM_BREAKER_RESET seconds, after which a single trial call decides
+    whether it closes again (a trial cancelled before answering counts as failed)
+Each of these raises BackendUnavailable; the assistant then answers with its
+rule-based replies instead.
+"""
+
+import asyncio
+import importlib
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 1.0))
+LLM_FIRST_TOKEN_TIMEOUT = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", 5.0))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30.0))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", 30.0))
+
+Messages = List[Dict[str, str]]
+
+class BackendUnavailable(Exception):
+    """The model did not answer: error, timeout, no free slot or open circuit"""
+
+class CompletionBackend(ABC):
+    """Generates an assistant reply for a list of chat messages"""
+
+    name: str = "completion"
+
+    @abstractmethod
+    def stream(self, messages: Messages) -> AsyncIterator[str]:
+        """The reply, piece by piece as it is generated (an async generator)"""
+
+    async def complete(self, messages: Messages) -> str:
+        """The whole reply; backends with a cheaper non-streaming call override this"""
+        return "".join([piece async for piece in self.stream(messages)])
+
+class LocalBackend(CompletionBackend):
+    """
+    Deterministic stand-in for a model: restates the question and the first
+    sentence of each grounding line ("- ...") of the system message, word by
+    word, optionally delay seconds apart
+    """
+
+    name = "local"
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def reply(self, messages: Messages) -> str:
+        question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "").strip()
+        system = "\n".join(m["content"] for m in messages if m["role"] == "system")
+        facts = [re.split(r"(?<=[.!?])\s", line[2:].strip(), 1)[0] for line in system.split("\n") if line.startswith("- ")]
+        if not facts:
+            return f"Về câu hỏi \"{question}\": tôi chưa có tài liệu về vấn đề này."
+        return f"Về câu hỏi \"{question}\":\n\n" + "\n".join(f"• {fact}" for fact in facts)
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        for piece in re.findall(r"\s*\S+", self.reply(messages)):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield piece
+
+    async def complete(self, messages: Messages) -> str:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.reply(messages)
+
+class CircuitBreaker:
+    """closed -> open after `failures` consecutive failures -> half-open after reset_after seconds (one trial call)"""
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, reset_after: float = LLM_BREAKER_RESET,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.clock = clock
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; an open breaker lets one trial through once reset_after has passed"""
+        if self.state == "open" and self.clock() - self.opened_at >= self.reset_after:
+            self.state = "half-open"
+            return True
+        return self.state == "closed"
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == "half-open" or self.consecutive_failures >= self.failures:
+            self.state = "open"
+            self.opened_at = self.clock()
+
+class GuardedBackend(CompletionBackend):
+    """A backend behind a concurrency limit, timeouts and a circuit breaker; failures raise BackendUnavailable"""
+
+    def __init__(
+        self,
+        backend: CompletionBackend,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+        first_token_timeout: float = LLM_FIRST_TOKEN_TIMEOUT,
+        timeout: float = LLM_TIMEOUT,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.backend = backend
+        self.name = backend.name
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.queue_timeout = queue_timeout
+        self.first_token_timeout = first_token_timeout
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+
+    async def _acquire(self) -> bool:
+        """
+        A concurrency slot, unless the circuit is open or none frees up within
+        queue_timeout; returns whether the call is the half-open breaker's trial
+        """
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise BackendUnavailable(f"{self.name}: circuit open")
+        # allow() lets a call through a half-open breaker only as its trial
+        trial = self.breaker.state == "half-open"
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._failed()
+            raise BackendUnavailable(f"{self.name}: no free slot within {self.queue_timeout:g}s")
+        except BaseException:
+            self._abandoned(trial)
+            raise
+        self.calls += 1
+        return trial
+
+    def _failed(self) -> None:
+        self.failures += 1
+        self.breaker.record_failure()
+
+    def _abandoned(self, trial: bool) -> None:
+        """A cancelled trial call cannot close the breaker; it counts as failed so the next trial comes after reset_after"""
+        if trial:
+            self.breaker.record_failure()
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        pieces = None
+        first = True
+        settled = False
+        trial = False
+        try:
+            trial = await self._acquire()
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.timeout
+            pieces = self.backend.stream(messages).__aiter__()
+            while True:
+                remaining = deadline - loop.time()
+                wait = min(self.first_token_timeout, remaining) if first else remaining
+                try:
+                    piece = await asyncio.wait_for(pieces.__anext__(), max(wait, 0))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    settled = True
+                    self._failed()
+                    what = "first piece" if first else "reply"
+                    raise BackendUnavailable(f"{self.name}: no {what} within {wait if first else self.timeout:g}s")
+                except Exception as e:
+                    settled = True
+                    self._failed()
+                    raise BackendUnavailable(f"{self.name}: {e}") from e
+                first = False
+                yield piece
+            settled = True
+            self.breaker.record_success()
+        finally:
+            # Without pieces no slot was taken (_acquire settles a trial it was cancelled in)
+            if pieces is not None:
+                self.semaphore.release()
+                await pieces.aclose()
+                if not settled and trial:
+                    # The caller stopped reading a trial call: judge it by whether it had started answering
+                    if first:
+                        self._abandoned(trial)
+                    else:
+                        self.breaker.record_success()
+
+    async def complete(self, messages: Messages) -> str:
+        trial = await self._acquire()
+        try:
+            reply = await asyncio.wait_for(self.backend.complete(messages), self.timeout)
+        except asyncio.TimeoutError:
+            self._failed()
+            raise BackendUnavailable(f"{self.name}: no reply within {self.timeout:g}s")
+        except Exception as e:
+            self._failed()
+            raise BackendUnavailable(f"{self.name}: {e}") from e
+        except BaseException:
+            self._abandoned(trial)
+            raise
+        finally:
+            self.semaphore.release()
+        self.breaker.record_success()
+        return reply
+
+def create_completion_backend() -> Optional[CompletionBackend]:
+    """A backend as configured by LLM_BACKEND; None when no model is configured"""
+    backend = os.getenv("LLM_BACKEND", "")
+    if not backend:
+        return None
+    if backend == "local":
+        return LocalBackend(float(os.getenv("LLM_LOCAL_DELAY", 0)))
+    module_name, _, factory = backend.partition(":")
+    if not factory:
+        raise ValueError(f"Unknown LLM_BACKEND: {backend}")
+    return getattr(importlib.import_module(module_name), factory)()
+
+# Guards by backend name: the concurrency limit and breaker are shared by every caller of a backend
+_guards: Dict[str, GuardedBackend] = {}
+
+def guard(backend: CompletionBackend) -> GuardedBackend:
+    """The shared GuardedBackend of backend's name"""
+    if backend.name not in _guards:
+        _guards[backend.name] = GuardedBackend(backend)
+    return _guards[backend.name]
+
+_backend: Optional[GuardedBackend] = None
+_configured = False
+
+def get_completion_backend() -> Optional[GuardedBackend]:
+    """The process-wide guarded backend, or None when LLM_BACKEND is unset"""
+    global _backend, _configured
+    if not _configured:
+        backend = create_completion_backend()
+        _backend = guard(backend) if backend else None
+        _configured = True
+    return _backend
@@ -0,0 +1,80 @@
+"""
+Per-user cache of the farms and plots a user owns.
+
+Nearly every task, journal, weather and assistant call starts by checking that
+a plot belongs to the caller. The cache loads a user's active farm and plot ids
+in one query and answers those checks from memory.
+
+A cached "yes" can go stale only when ownership is taken away, i.e. a farm or
+plot is deleted or moved. The farm and plot handlers evict the user locally as
+soon as they make such a change. The notify_ownership_change triggers publish
+"ownership:<user_id>" on the invalidation bus, so every worker evicts the user,
+including for writes that bypass the API. A cached "no" is never trusted: an id
+missing from the cached sets is re-checked against the database, so a plot
+created on another worker is found straight away.
+"""
+
+from typing import FrozenSet, Optional, Tuple
+
+import asyncpg
+
+from database.config import in_transaction
+from utils.invalidation import InvalidatedCache
+
+# Upper bound on staleness if a notification is ever missed
+OWNERSHIP_TTL_SECONDS = 300
+
+class Ownership:
+    """Active farm and plot ids of one user"""
+
+    def __init__(self, farm_ids: FrozenSet[str], plot_ids: FrozenSet[str]):
+        self.farm_ids = farm_ids
+        self.plot_ids = plot_ids
+
+class OwnershipCache:
+    def __init__(self, ttl: float = OWNERSHIP_TTL_SECONDS):
+        self._entries = InvalidatedCache("ownership", ttl)
+
+    async def load(self, conn: asyncpg.Connection, user_id: str) -> Ownership:
+        """Read the user's active farms and plots and cache them (not when read inside a transactional batch)"""
+        generation = self._entries.generation()
+        rows = await conn.fetch('''
+            SELECT f.id AS farm_id, p.id AS plot_id
+            FROM core.farm f
+            LEFT JOIN core.plot p ON p.farm_id = f.id AND p.deleted_at IS NULL
+            WHERE f.user_id = $1::uuid AND f.deleted_at IS NULL
+        ''', user_id)
+        ownership = Ownership(
+            frozenset(str(row["farm_id"]) for row in rows),
+            frozenset(str(row["plot_id"]) for row in rows if row["plot_id"]),
+        )
+        if not in_transaction():
+            self._entries.set(user_id, ownership, generation)
+        return ownership
+
+    async def get(self, conn: asyncpg.Connection, user_id: str) -> Tuple[Ownership, bool]:
+        """The user's ownership and whether it was freshly loaded"""
+        ownership = None if in_transaction() else self._entries.get(user_id)
+        if ownership:
+            return ownership, False
+        return await self.load(conn, user_id), True
+
+    async def owns_plot(self, conn: asyncpg.Connection, user_id: str, plot_id: str) -> bool:
+        """Whether plot_id is an active plot on one of the user's active farms"""
+        ownership, fresh = await self.get(conn, user_id)
+        if str(plot_id) not in ownership.plot_ids and not fresh:
+            ownership = await self.load(conn, user_id)
+        return str(plot_id) in ownership.plot_ids
+
+    async def owns_farm(self, conn: asyncpg.Connection, user_id: str, farm_id: str) -> bool:
+        """Whether farm_id is one of the user's active farms"""
+        ownership, fresh = await self.get(conn, user_id)
+        if str(farm_id) not in ownership.farm_ids and not fresh:
+            ownership = await self.load(conn, user_id)
+        return str(farm_id) in ownership.farm_ids
+
+    def evict(self, user_id: Optional[str] = None) -> None:
+        """Forget one user's ownership (all users when user_id is None)"""
+        self._entries.evict(user_id)
+
+ownership_cache = OwnershipCache()
@@ -0,0 +1,167 @@
+"""
+Semantic cache of assistant replies.
+
+Farmers ask the same things in many words ("lúa bị vàng lá", "vàng lá lúa
+phải làm sao"). A reply is cached under its question, normalized as for
+retrieval (utils.text.normalize_query), within the bucket of the plot it was
+asked about: variety, soil type and growth stage (plot_bucket), the plot
+details a reply depends on. A question then hits the cache when
+  - the same normalized question was answered in its bucket ("exact"), or
+  - the embedding of an answered question in its bucket has a cosine
+    similarity of at least RESPONSE_CACHE_THRESHOLD ("semantic")
+and the reply is younger than RESPONSE_CACHE_TTL seconds. A hit is served
+as it is: no retrieval, no model call.
+
+The threshold suits the default HashingEmbedder, where paraphrases score
+0.8 or more but different diseases sharing words ("vàng lá", "vàng lùn")
+score about 0.75; other embedders need their own. Replies are grounded in
+knowledge chunks, so the whole cache is dropped whenever a chunk changes
+("knowledge:" invalidations, utils/invalidation.py), and a reply generated
+while that happened is not stored.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.crop_calendar import variety_key
+from utils.embeddings import Embedder, get_embedder
+from utils.invalidation import InvalidationBus, invalidation_bus
+from utils.text import normalize_query
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 3600))
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", 0.8))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 5000))
+
+# When a reply was stored, the embedding of its question, and the reply
+Entry = Tuple[float, np.ndarray, Dict]
+
+def plot_bucket(plot_info: Dict) -> str:
+    """The variety, soil type and growth stage of plotInfo as one key ("||" without a plot)"""
+    return "|".join([
+        variety_key(plot_info.get("variety")),
+        normalize_query(plot_info.get("soilType") or ""),
+        plot_info.get("growthStage") or "",
+    ])
+
+class CacheLookup:
+    """A question's place in the cache and what was found there (reply is None on a miss)"""
+
+    def __init__(self, bucket: str, question: str, vector: Optional[np.ndarray], generation: int):
+        self.bucket = bucket
+        self.question = question
+        self.vector = vector
+        self.generation = generation
+        self.reply: Optional[Dict] = None
+
+class ResponseCache:
+    """Replies by (plot bucket, normalized question), found by equal or similar questions"""
+
+    def __init__(
+        self,
+        ttl: float = RESPONSE_CACHE_TTL,
+        threshold: float = RESPONSE_CACHE_THRESHOLD,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        embedder: Optional[Embedder] = None,
+        bus: InvalidationBus = invalidation_bus,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embedder = embedder
+        self.clock = clock
+        # (bucket, question) -> (stored at, vector, reply), oldest first, and the same by bucket
+        self._entries: "OrderedDict[Tuple[str, str], Entry]" = OrderedDict()
+        self._buckets: Dict[str, Dict[str, Entry]] = {}
+        # bucket -> (its questions, their vectors stacked), rebuilt after the bucket changes
+        self._matrices: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self._evictions = 0
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        bus.subscribe("knowledge", self.clear)
+
+    def lookup(self, question: str, bucket: str) -> CacheLookup:
+        """Where question goes in bucket, with the cached reply of it or of a similar question"""
+        lookup = CacheLookup(bucket, normalize_query(question), None, self._evictions)
+        if not lookup.question:
+            self.misses += 1
+            return lookup
+
+        now = self.clock()
+        entry = self._entries.get((bucket, lookup.question))
+        if entry and now - entry[0] < self.ttl:
+            self.hits += 1
+            lookup.reply = self._served(entry[2], "exact", 1.0)
+            return lookup
+
+        lookup.vector = (self.embedder or get_embedder()).embed_one(lookup.question)
+        if lookup.vector.any() and bucket in self._buckets:
+            questions, matrix = self._matrix(bucket)
+            similarities = matrix @ lookup.vector
+            for row in np.argsort(-similarities):
+                if similarities[row] < self.threshold:
+                    break
+                stored_at, _, reply = self._buckets[bucket][questions[row]]
+                if now - stored_at < self.ttl:
+                    self.semantic_hits += 1
+                    lookup.reply = self._served(reply, "semantic", float(similarities[row]))
+                    return lookup
+        self.misses += 1
+        return lookup
+
+    def store(self, lookup: CacheLookup, reply: Dict) -> None:
+        """Cache the reply generated after a miss, unless the knowledge changed in the meantime"""
+        if lookup.reply is not None or not lookup.question or lookup.generation != self._evictions:
+            return
+        self._remove(lookup.bucket, lookup.question)
+        while len(self._entries) >= self.max_entries:
+            self._remove(*next(iter(self._entries)))  # oldest first
+        entry = (self.clock(), lookup.vector, reply)
+        self._entries[(lookup.bucket, lookup.question)] = entry
+        self._buckets.setdefault(lookup.bucket, {})[lookup.question] = entry
+        self._matrices.pop(lookup.bucket, None)
+
+    def clear(self, key: Optional[str] = None) -> None:
+        """Forget every reply (the knowledge they were grounded in changed)"""
+        self._evictions += 1
+        self._entries.clear()
+        self._buckets.clear()
+        self._matrices.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "lookups": lookups,
+            "hits": self.hits,
+            "semanticHits": self.semantic_hits,
+            "misses": self.misses,
+            "hitRate": round((self.hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            "invalidations": self._evictions,
+        }
+
+    def _remove(self, bucket: str, question: str) -> None:
+        if self._entries.pop((bucket, question), None) is not None:
+            del self._buckets[bucket][question]
+            if not self._buckets[bucket]:
+                del self._buckets[bucket]
+            self._matrices.pop(bucket, None)
+
+    def _matrix(self, bucket: str) -> Tuple[List[str], np.ndarray]:
+        if bucket not in self._matrices:
+            entries = self._buckets[bucket]
+            self._matrices[bucket] = (list(entries), np.vstack([entry[1] for entry in entries.values()]))
+        return self._matrices[bucket]
+
+    @staticmethod
+    def _served(reply: Dict, kind: str, similarity: float) -> Dict:
+        """A cached reply, its metadata saying how it was found"""
+        return {"content": reply["content"],
+                "metadata": {**reply["metadata"], "cache": kind, "cacheSimilarity": round(similarity, 4)}}
+
+response_cache = ResponseCache()
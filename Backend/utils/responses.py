@@ -0,0 +1,26 @@
+"""
+The app's JSON response class.
+
+orjson writes datetimes, dates and uuid.UUID itself, but not subclasses:
+asyncpg returns its own UUID type, and NUMERIC columns come back as Decimal.
+Those two go through a fallback, so handlers can return row values as they
+are instead of formatting each one.
+"""
+
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+
+import orjson
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+
+def encode_default(value: Any) -> Any:
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+class ORJSONResponse(_ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,53 @@
+"""
+Sets of numpy arrays saved to a directory and swapped as a whole.
+
+save_snapshot() writes each array to "<name>.<build>.npy" under a new build
+id, then replaces meta.json (which names the build and its arrays) in one
+rename, and only then removes the files of older builds. A reader opens
+meta.json first and then exactly the files it names, so it never combines
+arrays from two builds: if a newer save removed its build in between, a file
+fails to open and load_snapshot() returns None for the caller to retry.
+Arrays already memory-mapped stay readable after their file is removed.
+"""
+
+import json
+import os
+import uuid
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+def save_snapshot(directory: str, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> None:
+    """Write arrays and meta as the directory's current snapshot"""
+    os.makedirs(directory, exist_ok=True)
+    build = uuid.uuid4().hex
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.{build}.npy"), array)
+    temporary = os.path.join(directory, "meta.tmp.json")
+    with open(temporary, "w") as f:
+        json.dump({**meta, "build": build, "arrays": list(arrays)}, f)
+    os.replace(temporary, os.path.join(directory, "meta.json"))
+    for entry in os.listdir(directory):
+        if entry.endswith(".npy") and not entry.endswith(f".{build}.npy"):
+            try:
+                os.remove(os.path.join(directory, entry))
+            except FileNotFoundError:
+                pass
+
+def load_snapshot(directory: str, mmap: Sequence[str] = ()) -> Optional[Tuple[Dict[str, np.ndarray], Dict[str, Any]]]:
+    """
+    The arrays and meta of the directory's current snapshot, those named in
+    mmap memory-mapped, or None if there is none (or it was replaced while
+    being read)
+    """
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        build, names = meta.pop("build"), meta.pop("arrays")
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.{build}.npy"), mmap_mode="r" if name in mmap else None)
+            for name in names
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+    return arrays, meta
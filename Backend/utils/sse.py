@@ -0,0 +1,27 @@
+"""
+Server-Sent Events.
+
+sse_event() formats one event of a text/event-stream body: an optional
+"event:" name and the JSON data on a single "data:" line. event_stream()
+sends an async iterator of events as a StreamingResponse whose headers keep
+browsers and proxies (nginx honours X-Accel-Buffering) from caching or
+buffering it. CompressionMiddleware leaves event streams alone: each event
+is a few bytes and has to reach the client as soon as it is written.
+"""
+
+import json
+from typing import Any, AsyncIterator, Optional
+
+from fastapi.responses import StreamingResponse
+
+SSE_MEDIA_TYPE = "text/event-stream"
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(data: Any, event: Optional[str] = None) -> bytes:
+    """One event; JSON escapes newlines, so the data always fits one line"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {payload}\n\n".encode()
+
+def event_stream(events: AsyncIterator[bytes]) -> StreamingResponse:
+    return StreamingResponse(events, media_type=SSE_MEDIA_TYPE, headers=SSE_HEADERS)
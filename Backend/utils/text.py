@@ -0,0 +1,33 @@
+"""
+Vietnamese text normalization.
+
+unaccent() is the Python twin of core.vi_unaccent in the database: NFD,
+tone and vowel marks removed, đ -> d, lowercase. Anything that
+compares user input with stored search_text (or builds its own index of
+normalized words) goes through it, so "Vàng lá", "vang la" and decomposed
+input all meet on the same form.
+"""
+
+import re
+import unicodedata
+from typing import Collection, List
+
+# Combining diacritics: tone marks and the marks of â, ă, ê, ô, ơ, ư once decomposed (NFD)
+_MARKS = re.compile("[\u0300-\u036f]")
+_WORD = re.compile(r"\w+")
+
+def unaccent(text: str) -> str:
+    """Lowercase text without Vietnamese tone marks, as core.vi_unaccent returns it"""
+    return _MARKS.sub("", unicodedata.normalize("NFD", text)).replace("đ", "d").replace("Đ", "d").lower()
+
+def words(text: str, stop_words: Collection[str] = ()) -> List[str]:
+    """
+    The unaccented words of text, leaving out stop_words. Stop words are given
+    with their accents: "là" is a function word, "lá" (leaf) is not.
+    """
+    tokens = _WORD.findall(unicodedata.normalize("NFC", text).lower())
+    return [unaccent(token) for token in tokens if token not in stop_words]
+
+def normalize_query(text: str) -> str:
+    """NFC, lowercase words joined by single spaces, tone marks kept, so spacing and punctuation do not matter"""
+    return " ".join(_WORD.findall(unicodedata.normalize("NFC", text).lower()))
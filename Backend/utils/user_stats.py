@@ -0,0 +1,44 @@
+"""
+Per-user stats counters for the dashboard endpoints.
+
+core.user_stats holds running totals (farms, plots, tasks by status, journal
+entries by type) and core.user_stats_daily holds per-day counts of open tasks
+due and journal entries, both maintained by statement-level triggers on the
+source tables. Counts relative to today (overdue, due today, journal today and
+last week) are summed from the user's daily rows at read time, so they stay
+correct as the date rolls over. reconcile_user_stats() repairs any drift.
+"""
+
+from typing import Dict, List, Optional
+
+import asyncpg
+
+STATS_COLUMNS = [
+    "farms", "plots", "tasks", "tasks_pending", "tasks_in_progress", "tasks_done",
+    "journal_entries", "journal_planting", "journal_fertilizer", "journal_irrigation",
+    "journal_pest", "journal_harvest",
+    "tasks_overdue", "tasks_due_today", "journal_today", "journal_last_week",
+]
+
+async def fetch_user_stats(conn: asyncpg.Connection, user_id: str) -> Dict[str, int]:
+    """One user's counters: a primary-key lookup plus a range scan of their daily rows"""
+    row = await conn.fetchrow('''
+        SELECT s.*, d.*
+        FROM (SELECT $1::uuid AS user_id) u
+        LEFT JOIN core.user_stats s ON s.user_id = u.user_id
+        CROSS JOIN LATERAL (
+            SELECT SUM(open_tasks_due) FILTER (WHERE day < CURRENT_DATE) AS tasks_overdue,
+                   SUM(open_tasks_due) FILTER (WHERE day = CURRENT_DATE) AS tasks_due_today,
+                   SUM(journal_entries) FILTER (WHERE day = CURRENT_DATE) AS journal_today,
+                   SUM(journal_entries) FILTER (WHERE day >= CURRENT_DATE - 7) AS journal_last_week
+            FROM core.user_stats_daily
+            WHERE user_id = u.user_id
+        ) d
+    ''', user_id)
+
+    # A user without a counter row has not written anything yet
+    return {column: int(row[column] or 0) for column in STATS_COLUMNS}
+
+async def reconcile_user_stats(conn: asyncpg.Connection, user_ids: Optional[List[str]] = None) -> int:
+    """Recount the given users' stats (all users by default). Returns the counter rows rewritten."""
+    return await conn.fetchval('SELECT reconcile_user_stats($1::uuid[])', user_ids)
@@ -0,0 +1,326 @@
+"""
+In-memory vector search over knowledge chunk embeddings.
+
+VectorIndex holds every live chunk's embedding as one contiguous float32
+matrix (rows are unit length, so a matrix product gives cosine similarity)
+plus parallel arrays of chunk ids and language codes. search() scores a batch
+of queries against the matrix a block of rows at a time, keeping the running
+top-k per query, so memory stays bounded and a batch reads the matrix once.
+
+A snapshot is a directory of .npy files plus meta.json, replaced as a whole
+(see utils/snapshot.py). load() memory-maps the matrix instead of reading
+it, so a worker process starts serving immediately and every worker on the
+host shares the same page cache. The snapshot records the chunk count and
+latest updated_at it was built from; get_vector_index() compares that with
+the database at most every VECTOR_INDEX_CHECK_INTERVAL seconds. Only the
+knowledge.embed job writes snapshots: an API worker never reads the
+embeddings itself. When the database has moved on it switches to a newer
+snapshot if the job has written one (and, with an IVF index, its IVF index
+too), and otherwise keeps serving the one it has and enqueues the job.
+Chunks still waiting for an embedding do not count as a change.
+
+Exact search reads the whole matrix per batch of queries. From ANN_MIN_CHUNKS
+chunks on, the job also maintains an IVF index (utils/ann.py) next to the
+snapshot, updated incrementally from the chunks changed since it was last
+written, and searches go through it whenever it matches the snapshot.
+ANN_NPROBE trades recall for latency; ANN_PQ_M > 0 stores PQ codes instead of
+vectors and re-scores the best ANN_REFINE * k candidates exactly.
+"""
+
+import asyncio
+import math
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import asyncpg
+import numpy as np
+
+from utils.ann import IVFIndex
+from utils.embeddings import Embedder, decode_embedding, get_embedder
+from utils.invalidation import invalidation_bus
+from utils.snapshot import load_snapshot, save_snapshot
+
+VECTOR_INDEX_DIR = os.getenv(
+    "VECTOR_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "knowledge_index"),
+)
+VECTOR_INDEX_CHECK_INTERVAL = float(os.getenv("VECTOR_INDEX_CHECK_INTERVAL", 30))
+ANN_MIN_CHUNKS = int(os.getenv("ANN_MIN_CHUNKS", 50_000))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", 16))
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", 0))
+ANN_REFINE = int(os.getenv("ANN_REFINE", 4))
+
+# knowledge_chunk.lang values by code in VectorIndex.langs
+LANGS = ("en", "vi", "both")
+BLOCK_ROWS = 131072
+ID_DTYPE = np.dtype("V16")
+
+Hit = Tuple[uuid.UUID, float]
+
+def lang_filter(lang: Optional[str]) -> Optional[List[int]]:
+    """Language codes a search in lang may return: its own and bilingual chunks"""
+    if lang is None:
+        return None
+    return [LANGS.index(lang), LANGS.index("both")]
+
+class VectorIndex:
+    def __init__(self, vectors: np.ndarray, ids: np.ndarray, langs: np.ndarray, meta: Dict):
+        self.vectors = vectors
+        self.ids = ids
+        self.langs = langs
+        self.meta = meta
+        # IVF index over the same chunks, when there are enough of them (see update_ann_snapshot)
+        self.ann: Optional[IVFIndex] = None
+        self._penalties: Dict[str, np.ndarray] = {}
+        self._id_order: Optional[np.ndarray] = None
+        self._sorted_ids: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def state(self) -> Tuple[int, Optional[str]]:
+        """(chunk count, latest updated_at) of the data the index was built from"""
+        return self.meta["count"], self.meta["updatedAt"]
+
+    def penalty(self, lang: str) -> np.ndarray:
+        """0 for rows a search in lang may return, inf for the rest; subtracted from scores"""
+        if lang not in self._penalties:
+            allowed = np.isin(self.langs, lang_filter(lang))
+            self._penalties[lang] = np.where(allowed, 0, np.inf).astype(np.float32)
+        return self._penalties[lang]
+
+    def chunk_id(self, row: int) -> uuid.UUID:
+        return uuid.UUID(bytes=self.ids[row].tobytes())
+
+    def vectors_for(self, ids: np.ndarray) -> np.ndarray:
+        """The stored vectors of chunk ids (ID_DTYPE), which must all be in the index"""
+        if self._id_order is None:
+            self._id_order = np.argsort(self.ids.view("S16"))
+            self._sorted_ids = self.ids.view("S16")[self._id_order]
+        return self.vectors[self._id_order[np.searchsorted(self._sorted_ids, ids.view("S16"))]]
+
+    def search(self, queries: np.ndarray, k: int = 10, lang: Optional[str] = None) -> List[List[Hit]]:
+        """The k most similar chunks for each query row, best first, as (chunk id, cosine similarity)"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        penalty = self.penalty(lang) if lang is not None else None
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+
+        for start in range(0, len(self), BLOCK_ROWS):
+            block = self.vectors[start:start + BLOCK_ROWS]
+            scores = queries @ block.T
+            if penalty is not None:
+                scores -= penalty[start:start + BLOCK_ROWS]
+            if scores.shape[1] > k:
+                top = np.argpartition(scores, -k, axis=1)[:, -k:]
+                scores = np.take_along_axis(scores, top, axis=1)
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(best_scores, -k, axis=1)[:, -k:]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            results.append([(self.chunk_id(rows[i]), float(scores[i])) for i in order if np.isfinite(scores[i])])
+        return results
+
+    def save(self, directory: str) -> None:
+        """Write a snapshot; readers switch to it whole (see utils/snapshot.py)"""
+        save_snapshot(directory, {"vectors": self.vectors, "ids": self.ids, "langs": self.langs}, self.meta)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["VectorIndex"]:
+        """The snapshot in directory with its matrix memory-mapped, or None if there is no complete one"""
+        snapshot = load_snapshot(directory, mmap=("vectors",))
+        if snapshot is None:
+            return None  # none yet, or replaced while we were reading; the next check retries
+        arrays, meta = snapshot
+        return cls(arrays["vectors"], arrays["ids"], arrays["langs"], meta)
+
+async def index_state(conn: asyncpg.Connection) -> Tuple[int, Optional[str]]:
+    """
+    (live chunks with an embedding, latest updated_at of a chunk with an
+    embedding, deleted ones included so a soft delete counts as a change).
+    Chunks still waiting for their embedding leave it as it is.
+    """
+    row = await conn.fetchrow('''
+        SELECT count(*) FILTER (WHERE deleted_at IS NULL) AS count, max(updated_at) AS updated_at
+        FROM core.knowledge_chunk
+        WHERE embedding IS NOT NULL
+    ''')
+    return row["count"], row["updated_at"].isoformat() if row["updated_at"] else None
+
+async def build_index(conn: asyncpg.Connection, embedder: Optional[Embedder] = None) -> VectorIndex:
+    """Read every live chunk's embedding into a new index"""
+    embedder = embedder or get_embedder()
+    async with conn.transaction(isolation="repeatable_read", readonly=True):
+        count, updated_at = await index_state(conn)
+        vectors = np.zeros((count, embedder.dim), dtype=np.float32)
+        ids = np.zeros(count, dtype=ID_DTYPE)
+        langs = np.zeros(count, dtype=np.uint8)
+        row = 0
+        async for chunk in conn.cursor('''
+            SELECT id, lang, embedding
+            FROM core.knowledge_chunk
+            WHERE deleted_at IS NULL AND embedding IS NOT NULL
+        ''', prefetch=5000):
+            if len(chunk["embedding"]) != embedder.dim * 4:
+                continue  # written by an embedder with another dimension
+            vectors[row] = np.frombuffer(chunk["embedding"], dtype="<f4")
+            ids[row] = np.frombuffer(chunk["id"].bytes, dtype=ID_DTYPE)[0]
+            langs[row] = LANGS.index(chunk["lang"])
+            row += 1
+    meta = {
+        "embedder": embedder.name, "dim": embedder.dim, "count": count, "rows": row,
+        "updatedAt": updated_at, "builtAt": datetime.now().isoformat(),
+    }
+    return VectorIndex(vectors[:row], ids[:row], langs[:row], meta)
+
+async def write_snapshot(conn: asyncpg.Connection, directory: Optional[str] = None) -> VectorIndex:
+    """Build an index from the database and save it as the current snapshot"""
+    index = await build_index(conn)
+    await asyncio.to_thread(index.save, directory or VECTOR_INDEX_DIR)
+    return index
+
+def empty_index(embedder: Embedder) -> VectorIndex:
+    """An index of no chunks, served until the first snapshot is written"""
+    meta = {"embedder": embedder.name, "dim": embedder.dim, "count": 0, "rows": 0,
+            "updatedAt": None, "builtAt": datetime.now().isoformat()}
+    return VectorIndex(np.zeros((0, embedder.dim), dtype=np.float32), np.zeros(0, dtype=ID_DTYPE),
+                       np.zeros(0, dtype=np.uint8), meta)
+
+def ann_directory(directory: str) -> str:
+    return os.path.join(directory, "ivf")
+
+def train_ann(index: VectorIndex) -> IVFIndex:
+    """A new IVF index over every chunk in index, with about 4 * sqrt(n) lists"""
+    ann = IVFIndex.train(index.vectors, max(1, int(4 * math.sqrt(len(index)))), ANN_PQ_M)
+    ann.add(index.ids, index.vectors, index.langs)
+    return ann
+
+async def update_ann_snapshot(conn: asyncpg.Connection, index: VectorIndex, directory: str = VECTOR_INDEX_DIR) -> IVFIndex:
+    """
+    Bring the saved IVF index up to the state of index (freshly built from
+    the database): remove and re-add the chunks changed in between, or train
+    a new one if there is none, the embedder or PQ setting changed, or the
+    chunk count has grown past four times what it was trained on.
+    """
+    ann = IVFIndex.load(ann_directory(directory))
+    if ann is not None and (
+        ann.meta.get("embedder") != index.meta["embedder"] or ann.meta.get("pqM") != ANN_PQ_M
+        or len(index) > 4 * ann.meta["trainedOn"] or ann.meta.get("updatedAt") is None
+    ):
+        ann = None
+    if ann is not None and (ann.meta["count"], ann.meta["updatedAt"]) == index.state:
+        return ann
+    if ann is not None:
+        changed = await conn.fetch('''
+            SELECT id, lang, embedding, deleted_at IS NULL AND embedding IS NOT NULL AS live
+            FROM core.knowledge_chunk
+            WHERE updated_at >= $1 AND updated_at <= $2
+        ''', datetime.fromisoformat(ann.meta["updatedAt"]), datetime.fromisoformat(index.meta["updatedAt"]))
+        live = [chunk for chunk in changed if chunk["live"] and len(chunk["embedding"]) == index.meta["dim"] * 4]
+        ann.remove(np.array([np.frombuffer(chunk["id"].bytes, dtype=ID_DTYPE)[0] for chunk in changed], dtype=ID_DTYPE))
+        if live:
+            ann.add(
+                np.array([np.frombuffer(chunk["id"].bytes, dtype=ID_DTYPE)[0] for chunk in live], dtype=ID_DTYPE),
+                np.stack([decode_embedding(chunk["embedding"]) for chunk in live]),
+                np.array([LANGS.index(chunk["lang"]) for chunk in live], dtype=np.uint8),
+            )
+        if len(ann) != len(index):
+            ann = None  # hard deletes, or writes that raced the snapshot: start over
+    if ann is None:
+        ann = await asyncio.to_thread(train_ann, index)
+    ann.meta.update(embedder=index.meta["embedder"], count=index.meta["count"], updatedAt=index.meta["updatedAt"])
+    await asyncio.to_thread(ann.save, ann_directory(directory))
+    return ann
+
+def load_ann(directory: str, index: VectorIndex) -> Optional[IVFIndex]:
+    """The saved IVF index if it was written for exactly the chunks in index"""
+    ann = IVFIndex.load(ann_directory(directory))
+    if ann is None or (ann.meta.get("count"), ann.meta.get("updatedAt")) != index.state \
+            or ann.meta.get("embedder") != index.meta["embedder"]:
+        return None
+    return ann
+
+_index: Optional[VectorIndex] = None
+_checked_at = 0.0
+_index_lock = asyncio.Lock()
+
+# Keeps the workers that find the snapshot stale from queueing more than one job
+SNAPSHOT_DEDUPE_KEY = "stale-snapshot"
+
+async def request_snapshot(conn: asyncpg.Connection) -> None:
+    """Have the knowledge.embed job write a snapshot of the chunks as they are now"""
+    # Imported here: workers.knowledge imports this module
+    from workers.knowledge import EMBED_JOB
+    from workers.queue import enqueue
+    try:
+        await enqueue(conn, EMBED_JOB, {}, dedupe_key=SNAPSHOT_DEDUPE_KEY)
+    except asyncpg.PostgresError as e:
+        print(f"Could not enqueue {EMBED_JOB}: {e}")
+
+async def get_vector_index(conn: asyncpg.Connection, directory: Optional[str] = None) -> VectorIndex:
+    """The process-wide index: the latest snapshot, which the knowledge.embed job is asked to refresh when stale"""
+    global _index, _checked_at
+    if _index is not None and time.monotonic() - _checked_at < VECTOR_INDEX_CHECK_INTERVAL:
+        return _index
+    async with _index_lock:
+        if _index is not None and time.monotonic() - _checked_at < VECTOR_INDEX_CHECK_INTERVAL:
+            return _index
+        directory = directory or VECTOR_INDEX_DIR
+        state = await index_state(conn)
+        embedder = get_embedder()
+        if _index is None or _index.state != state:
+            snapshot = VectorIndex.load(directory)
+            if snapshot is not None and (snapshot.meta["embedder"] != embedder.name
+                                         or (_index is not None and snapshot.state == _index.state)):
+                snapshot = None
+            if snapshot is not None and len(snapshot) >= ANN_MIN_CHUNKS:
+                snapshot.ann = load_ann(directory, snapshot)
+                if snapshot.ann is None and _index is not None and _index.ann is not None:
+                    # The job writes the IVF index right after the snapshot; until it
+                    # has, the current index answers in milliseconds instead of a full scan
+                    snapshot = None
+            if snapshot is not None:
+                if _index is not None:
+                    # Retrieval results and replies cached against the previous index are stale now
+                    invalidation_bus.invalidate_locally("knowledge", None)
+                _index = snapshot
+            elif _index is None:
+                _index = empty_index(embedder)
+            if _index.state != state:
+                # Reading every embedding here would hold up requests and give each
+                # worker a private copy; keep serving this one until the job writes a new one
+                await request_snapshot(conn)
+        _checked_at = time.monotonic()
+        return _index
+
+async def semantic_search(
+    conn: asyncpg.Connection,
+    queries: Sequence[str],
+    k: int = 10,
+    lang: Optional[str] = None,
+) -> List[List[Hit]]:
+    """Top-k (chunk id, similarity) for each query text"""
+    index = await get_vector_index(conn)
+    if not len(index):
+        return [[] for _ in queries]
+    vectors = get_embedder().embed(list(queries))
+    if index.ann is not None:
+        results = await asyncio.to_thread(
+            index.ann.search, vectors, k, ANN_NPROBE, lang_filter(lang), index.vectors_for, ANN_REFINE
+        )
+    else:
+        results = await asyncio.to_thread(index.search, vectors, k, lang)
+    # A query with no usable words embeds to zeros and is equally far from everything
+    return [hits if vector.any() else [] for vector, hits in zip(vectors, results)]
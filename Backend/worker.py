@@ -0,0 +1,18 @@
+import asyncio
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from workers.runtime import run_worker
+
+# Importing a job module registers its handlers
+import workers.crop_calendar
+import workers.knowledge
+import workers.reminders
+import workers.user_stats
+
+if __name__ == "__main__":
+    # Optional arguments restrict the worker to specific job types
+    asyncio.run(run_worker(sys.argv[1:]))
@@ -0,0 +1 @@
+# Workers package initialization
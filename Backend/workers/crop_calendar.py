@@ -0,0 +1,22 @@
+"""
+Batch crop calendar generation.
+
+Enqueue a crop_calendar.generate job with {"plotIds": [...]} to generate those
+plots' season tasks, or with an empty payload to fill in every plot that has a
+planting date.
+"""
+
+from typing import Any, Dict
+
+import asyncpg
+
+from utils.crop_calendar import generate_calendars
+from workers.runtime import job_handler
+
+GENERATE_JOB = "crop_calendar.generate"
+
+@job_handler(GENERATE_JOB, timeout=600)
+async def generate_calendars_job(pool: asyncpg.Pool, payload: Dict[str, Any]) -> None:
+    async with pool.acquire() as conn:
+        created = await generate_calendars(conn, payload.get("plotIds"))
+    print(f"Generated {created} crop calendar task(s)")
@@ -0,0 +1,51 @@
+"""
+Knowledge chunk embedding and bulk ingestion.
+
+Every EMBED_INTERVAL_SECONDS (or when enqueued with {"chunkIds": [...]}) this
+job embeds the live chunks that have no embedding yet - new chunks and chunks
+whose title or content changed. Whenever the embedded chunks differ from the
+ones in the vector index snapshot (new embeddings, deletes), it writes a
+fresh snapshot for the API workers to memory-map. From ANN_MIN_CHUNKS chunks
+on it then brings the IVF index up to date with the snapshot, applying just
+the chunks changed since it was last written.
+
+knowledge.ingest loads a directory of documents on the server (see
+utils/ingest.py and ingest_knowledge.py), with the payload
+{"directory": ..., "lang": "vi", "tags": [...], "prune": false}.
+"""
+
+from typing import Any, Dict
+
+import asyncpg
+
+from utils.embeddings import embed_chunks
+from utils.ingest import ingest_directory
+from utils.vector_index import (
+    ANN_MIN_CHUNKS, VECTOR_INDEX_DIR, VectorIndex, index_state, update_ann_snapshot, write_snapshot,
+)
+from workers.runtime import job_handler
+
+EMBED_JOB = "knowledge.embed"
+INGEST_JOB = "knowledge.ingest"
+
+EMBED_INTERVAL_SECONDS = 600
+
+@job_handler(EMBED_JOB, every=EMBED_INTERVAL_SECONDS, timeout=3600)
+async def embed_chunks_job(pool: asyncpg.Pool, payload: Dict[str, Any]) -> None:
+    async with pool.acquire() as conn:
+        embedded = await embed_chunks(conn, payload.get("chunkIds"))
+        index = VectorIndex.load(VECTOR_INDEX_DIR)
+        if index is None or index.state != await index_state(conn):
+            index = await write_snapshot(conn)
+            print(f"Embedded {embedded} knowledge chunk(s); vector index has {len(index)} chunk(s)")
+        if len(index) >= ANN_MIN_CHUNKS:
+            ann = await update_ann_snapshot(conn, index)
+            print(f"IVF index: {len(ann)} chunk(s) in {ann.nlist} lists")
+
+@job_handler(INGEST_JOB, timeout=3600)
+async def ingest_documents_job(pool: asyncpg.Pool, payload: Dict[str, Any]) -> None:
+    async with pool.acquire() as conn:
+        stats = await ingest_directory(
+            conn, payload["directory"], payload.get("lang", "vi"), payload.get("tags"), payload.get("prune", False)
+        )
+        print(f"Ingested {payload['directory']}: {stats}")
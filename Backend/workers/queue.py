@@ -0,0 +1,217 @@
+"""
+Postgres-backed job queue on sys.job_queue.
+
+Jobs move queued -> running -> done. A failed job goes back to queued with an
+exponential backoff on run_at until it has used max_attempts, after which it is
+dead-lettered with status 'failed' and its last error kept for inspection.
+"""
+
+import json
+import random
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+# Channel the notify_job_queue trigger publishes job types on
+NOTIFY_CHANNEL = "job_queue"
+
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 5.0
+RETRY_MAX_SECONDS = 3600.0
+
+# Rows per multi-row INSERT in enqueue_many
+ENQUEUE_CHUNK_SIZE = 5000
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before the next attempt (exponential backoff with jitter)"""
+    delay = min(RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+def _job_from_row(row: asyncpg.Record) -> Dict[str, Any]:
+    payload = row["payload"]
+    return {
+        "id": row["id"],
+        "job_type": row["job_type"],
+        "payload": json.loads(payload) if isinstance(payload, str) else payload,
+        "attempts": row["attempts"],
+        "max_attempts": row["max_attempts"],
+    }
+
+async def enqueue(
+    conn: asyncpg.Connection,
+    job_type: str,
+    payload: Dict[str, Any],
+    run_at: Optional[datetime] = None,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    dedupe_key: Optional[str] = None,
+) -> Optional[int]:
+    """Add a job to the queue and return its id (None if an active job has the same dedupe_key)"""
+    return await conn.fetchval('''
+        INSERT INTO sys.job_queue (job_type, payload, run_at, max_attempts, dedupe_key)
+        VALUES ($1, $2::jsonb, COALESCE($3, NOW()), $4, $5)
+        ON CONFLICT (job_type, dedupe_key)
+            WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running')
+            DO NOTHING
+        RETURNING id
+    ''', job_type, json.dumps(payload), run_at, max_attempts, dedupe_key)
+
+async def enqueue_periodic(
+    conn: asyncpg.Connection,
+    job_type: str,
+    period: int,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> Optional[int]:
+    """
+    Enqueue the job for one period of a periodic job type, unless that period
+    was claimed before (by another worker, or before a restart). Returns the
+    job id, or None if the period was already claimed.
+
+    The period is claimed in sys.job_schedule, which outlives the job; older
+    claims of the job type are dropped at the same time.
+    """
+    return await conn.fetchval('''
+        WITH claimed AS (
+            INSERT INTO sys.job_schedule (job_type, period) VALUES ($1, $2)
+            ON CONFLICT DO NOTHING
+            RETURNING period
+        ), expired AS (
+            DELETE FROM sys.job_schedule WHERE job_type = $1 AND period < $2
+        )
+        INSERT INTO sys.job_queue (job_type, payload, max_attempts, dedupe_key)
+        SELECT $1, jsonb_build_object('period', period), $3, 'every:' || period
+        FROM claimed
+        ON CONFLICT (job_type, dedupe_key)
+            WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running')
+            DO NOTHING
+        RETURNING id
+    ''', job_type, period, max_attempts)
+
+async def enqueue_many(
+    conn: asyncpg.Connection,
+    job_type: str,
+    payloads: List[Dict[str, Any]],
+    dedupe_keys: Optional[List[Optional[str]]] = None,
+    run_at: Optional[datetime] = None,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> int:
+    """
+    Add many jobs of one type and return how many were inserted.
+
+    With dedupe_keys, each chunk is one multi-row INSERT that skips keys already
+    queued or running. Without them the rows are streamed in with COPY.
+    """
+    if dedupe_keys is not None and len(dedupe_keys) != len(payloads):
+        raise ValueError("dedupe_keys must have one entry per payload")
+
+    inserted = 0
+    async with conn.transaction():
+        if dedupe_keys is None:
+            due = run_at or await conn.fetchval("SELECT NOW()")
+            await conn.copy_records_to_table(
+                "job_queue", schema_name="sys",
+                columns=["job_type", "payload", "run_at", "max_attempts"],
+                records=((job_type, json.dumps(payload), due, max_attempts) for payload in payloads),
+            )
+            return len(payloads)
+
+        for start in range(0, len(payloads), ENQUEUE_CHUNK_SIZE):
+            chunk = payloads[start:start + ENQUEUE_CHUNK_SIZE]
+            result = await conn.execute('''
+                INSERT INTO sys.job_queue (job_type, payload, run_at, max_attempts, dedupe_key)
+                SELECT $1, j.payload::jsonb, COALESCE($4, NOW()), $5, j.dedupe_key
+                FROM unnest($2::text[], $3::text[]) AS j(payload, dedupe_key)
+                ON CONFLICT (job_type, dedupe_key)
+                    WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running')
+                    DO NOTHING
+            ''', job_type, [json.dumps(payload) for payload in chunk],
+                dedupe_keys[start:start + ENQUEUE_CHUNK_SIZE], run_at, max_attempts)
+            inserted += int(result.split()[-1])
+    return inserted
+
+async def claim_jobs(conn: asyncpg.Connection, job_type: str, worker_id: str, limit: int) -> List[Dict[str, Any]]:
+    """Claim up to limit due jobs of a type in one round trip, skipping rows other workers hold"""
+    rows = await conn.fetch('''
+        WITH next_jobs AS (
+            SELECT id FROM sys.job_queue
+            WHERE job_type = $1 AND status = 'queued' AND run_at <= NOW()
+            ORDER BY run_at, id
+            FOR UPDATE SKIP LOCKED
+            LIMIT $3
+        )
+        UPDATE sys.job_queue j
+        SET status = 'running', attempts = j.attempts + 1, started_at = NOW(),
+            finished_at = NULL, locked_by = $2
+        FROM next_jobs
+        WHERE j.id = next_jobs.id
+        RETURNING j.id, j.job_type, j.payload, j.attempts, j.max_attempts
+    ''', job_type, worker_id, limit)
+
+    return [_job_from_row(row) for row in rows]
+
+async def claim_job(conn: asyncpg.Connection, job_type: str, worker_id: str) -> Optional[Dict[str, Any]]:
+    """Claim the next due job of a type"""
+    jobs = await claim_jobs(conn, job_type, worker_id, 1)
+    return jobs[0] if jobs else None
+
+async def complete_jobs(conn: asyncpg.Connection, job_ids: List[int]) -> None:
+    """Mark running jobs as done in one statement"""
+    await conn.execute('''
+        UPDATE sys.job_queue
+        SET status = 'done', finished_at = NOW(), error = NULL, locked_by = NULL
+        WHERE id = ANY($1::bigint[]) AND status = 'running'
+    ''', job_ids)
+
+async def complete_job(conn: asyncpg.Connection, job_id: int) -> None:
+    """Mark a running job as done"""
+    await complete_jobs(conn, [job_id])
+
+async def fail_job(conn: asyncpg.Connection, job: Dict[str, Any], error: str) -> bool:
+    """Schedule a retry for a failed job, or dead-letter it. Returns True if dead-lettered."""
+    status = await conn.fetchval('''
+        UPDATE sys.job_queue
+        SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+            run_at = CASE WHEN attempts >= max_attempts THEN run_at
+                          ELSE NOW() + make_interval(secs => $3) END,
+            finished_at = CASE WHEN attempts >= max_attempts THEN NOW() ELSE NULL END,
+            error = $2, locked_by = NULL
+        WHERE id = $1 AND status = 'running'
+        RETURNING status
+    ''', job["id"], error, retry_delay(job["attempts"]))
+
+    return status == "failed"
+
+async def release_jobs(conn: asyncpg.Connection, job_ids: List[int]) -> None:
+    """Return interrupted jobs to the queue without charging them an attempt"""
+    await conn.execute('''
+        UPDATE sys.job_queue
+        SET status = 'queued', attempts = GREATEST(attempts - 1, 0), run_at = NOW(),
+            started_at = NULL, locked_by = NULL
+        WHERE id = ANY($1::bigint[]) AND status = 'running'
+    ''', job_ids)
+
+async def release_job(conn: asyncpg.Connection, job_id: int) -> None:
+    """Return an interrupted job to the queue without charging it an attempt"""
+    await release_jobs(conn, [job_id])
+
+async def requeue_stale_jobs(conn: asyncpg.Connection, job_types: List[str], stale_after: float) -> int:
+    """Recover jobs whose worker died mid-run. Returns the number of jobs recovered."""
+    rows = await conn.fetch('''
+        UPDATE sys.job_queue
+        SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+            finished_at = CASE WHEN attempts >= max_attempts THEN NOW() ELSE NULL END,
+            run_at = NOW(), locked_by = NULL,
+            error = 'Worker lease expired'
+        WHERE status = 'running' AND job_type = ANY($1::text[])
+        AND started_at < NOW() - make_interval(secs => $2)
+        RETURNING id
+    ''', job_types, stale_after)
+
+    return len(rows)
+
+async def next_run_at(conn: asyncpg.Connection, job_type: str) -> Optional[datetime]:
+    """When the earliest queued job of a type becomes due"""
+    return await conn.fetchval('''
+        SELECT MIN(run_at) FROM sys.job_queue
+        WHERE job_type = $1 AND status = 'queued'
+    ''', job_type)
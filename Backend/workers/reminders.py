@@ -0,0 +1,90 @@
+"""
+Task reminder dispatch for core.task.reminder.
+
+A periodic dispatch job walks task_reminder_due_idx (pending reminders only) in
+batches. Each batch claims its tasks with FOR UPDATE SKIP LOCKED, stamps
+reminder_sent_at and enqueues the notification jobs in the same statement, so a
+reminder is sent exactly once however many dispatchers run. Rescheduling a task
+or switching its reminder back on clears reminder_sent_at (reset_task_reminder
+trigger) and re-arms it.
+"""
+
+from typing import Any, Dict
+
+import asyncpg
+
+from workers.runtime import job_handler
+
+DISPATCH_JOB = "task_reminder.dispatch"
+NOTIFY_JOB = "task_reminder.notify"
+
+# Remind farmers the day before a task is due
+REMINDER_LEAD_DAYS = 1
+DISPATCH_BATCH_SIZE = 1000
+DISPATCH_INTERVAL_SECONDS = 300
+
+async def dispatch_due_reminders(
+    conn: asyncpg.Connection,
+    lead_days: int = REMINDER_LEAD_DAYS,
+    batch_size: int = DISPATCH_BATCH_SIZE,
+) -> int:
+    """Enqueue notification jobs for every reminder now due. Returns the number dispatched."""
+    dispatched = 0
+    while True:
+        # Count the tasks stamped, not the jobs inserted: a job still queued for
+        # the same task and date is skipped, and the walk must go on past it
+        count = await conn.fetchval('''
+            WITH due AS (
+                SELECT id FROM core.task
+                WHERE reminder AND status != 'done' AND deleted_at IS NULL
+                AND reminder_sent_at IS NULL
+                AND due_date <= CURRENT_DATE + $1::int
+                ORDER BY due_date
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            ), sent AS (
+                UPDATE core.task t SET reminder_sent_at = NOW()
+                FROM due
+                WHERE t.id = due.id
+                RETURNING t.id, t.user_id, t.plot_id, t.title, t.due_date
+            ), queued AS (
+                INSERT INTO sys.job_queue (job_type, payload, dedupe_key)
+                SELECT $3,
+                       jsonb_build_object(
+                           'taskId', id, 'userId', user_id, 'plotId', plot_id,
+                           'title', title, 'dueDate', due_date
+                       ),
+                       'task:' || id || ':' || due_date
+                FROM sent
+                ON CONFLICT (job_type, dedupe_key)
+                    WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running')
+                    DO NOTHING
+            )
+            SELECT count(*) FROM sent
+        ''', lead_days, batch_size, NOTIFY_JOB)
+
+        dispatched += count
+        if count < batch_size:
+            return dispatched
+
+async def deliver_reminder(reminder: Dict[str, Any]) -> None:
+    """Send a reminder to the farmer (push/SMS delivery plugs in here)"""
+    print(f"Reminder for user {reminder['userId']}: '{reminder['title']}' due {reminder['dueDate']}")
+
+@job_handler(DISPATCH_JOB, every=DISPATCH_INTERVAL_SECONDS)
+async def dispatch_reminders_job(pool: asyncpg.Pool, payload: Dict[str, Any]) -> None:
+    async with pool.acquire() as conn:
+        dispatched = await dispatch_due_reminders(conn)
+    if dispatched:
+        print(f"Dispatched {dispatched} task reminder(s)")
+
+@job_handler(NOTIFY_JOB, concurrency=4, batch_size=50)
+async def notify_reminder_job(pool: asyncpg.Pool, payload: Dict[str, Any]) -> None:
+    # Skip tasks finished or deleted since the reminder was dispatched
+    async with pool.acquire() as conn:
+        still_due = await conn.fetchval('''
+            SELECT 1 FROM core.task
+            WHERE id = $1 AND reminder AND status != 'done' AND deleted_at IS NULL
+        ''', payload["taskId"])
+    if still_due:
+        await deliver_reminder(payload)
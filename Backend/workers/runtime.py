@@ -0,0 +1,268 @@
+"""
+Asyncio worker runtime for sys.job_queue.
+
+Handlers register per job type with a concurrency limit. Each concurrency slot
+claims jobs with FOR UPDATE SKIP LOCKED, so any number of worker processes can
+share the queue. Idle slots sleep until a NOTIFY on the job_queue channel (or the
+next delayed retry) instead of polling.
+
+With batch_size > 1 a slot claims up to that many jobs per round trip, runs them
+concurrently and acknowledges the successful ones with a single UPDATE.
+
+Handlers registered with every=<seconds> are also enqueued periodically. Each
+period is claimed once in sys.job_schedule, so neither running several workers
+nor restarting one within a period multiplies the runs.
+
+Run with:
+    python worker.py [job_type ...]
+"""
+
+import asyncio
+import os
+import signal
+import socket
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import asyncpg
+
+from database.config import DATABASE_URL, create_pool
+from workers.queue import (
+    NOTIFY_CHANNEL, claim_jobs, complete_jobs, enqueue_periodic, fail_job, next_run_at,
+    release_jobs, requeue_stale_jobs
+)
+
+JobFunc = Callable[[asyncpg.Pool, Dict[str, Any]], Awaitable[None]]
+
+class JobHandler:
+    """A registered job type with its execution limits"""
+
+    def __init__(
+        self,
+        job_type: str,
+        func: JobFunc,
+        concurrency: int = 1,
+        timeout: Optional[float] = None,
+        batch_size: int = 1,
+        every: Optional[float] = None,
+    ):
+        self.job_type = job_type
+        self.func = func
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.every = every
+
+# Handlers registered with @job_handler
+handlers: Dict[str, JobHandler] = {}
+
+def job_handler(
+    job_type: str,
+    concurrency: int = 1,
+    timeout: Optional[float] = None,
+    batch_size: int = 1,
+    every: Optional[float] = None,
+):
+    """Register an async function(pool, payload) as the handler for a job type"""
+    def decorator(func: JobFunc) -> JobFunc:
+        handlers[job_type] = JobHandler(job_type, func, concurrency, timeout, batch_size, every)
+        return func
+    return decorator
+
+class Worker:
+    """Runs registered handlers until stop() is called"""
+
+    def __init__(
+        self,
+        job_handlers: Optional[Dict[str, JobHandler]] = None,
+        worker_id: Optional[str] = None,
+        idle_timeout: float = 60.0,
+        stale_after: float = 900.0,
+        shutdown_timeout: float = 30.0,
+    ):
+        self.handlers = dict(job_handlers if job_handlers is not None else handlers)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.idle_timeout = idle_timeout
+        self.stale_after = stale_after
+        self.shutdown_timeout = shutdown_timeout
+
+        self._pool: Optional[asyncpg.Pool] = None
+        self._listener: Optional[asyncpg.Connection] = None
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        """Stop claiming new jobs; in-flight jobs get shutdown_timeout to finish"""
+        self._stopping.set()
+
+    async def run(self) -> None:
+        if not self.handlers:
+            print("No job handlers registered - nothing to do")
+            return
+
+        slot_count = sum(handler.concurrency for handler in self.handlers.values())
+        self._pool = await create_pool(min_size=1, max_size=slot_count + 1)
+        self._wakeups = {job_type: asyncio.Event() for job_type in self.handlers}
+        try:
+            await self._listen()
+            await self._requeue_stale()
+
+            slots = [
+                asyncio.create_task(self._slot(handler))
+                for handler in self.handlers.values()
+                for _ in range(handler.concurrency)
+            ]
+            maintenance = [asyncio.create_task(self._maintenance())] + [
+                asyncio.create_task(self._schedule(handler))
+                for handler in self.handlers.values() if handler.every
+            ]
+            print(f"Worker {self.worker_id} started: {', '.join(sorted(self.handlers))}")
+
+            await self._stopping.wait()
+            print("Shutting down worker, waiting for running jobs...")
+
+            # Slots exit after their current job; cancel whatever overruns the grace period
+            done, pending = await asyncio.wait(slots, timeout=self.shutdown_timeout)
+            for task in pending:
+                task.cancel()
+            for task in maintenance:
+                task.cancel()
+            await asyncio.gather(*pending, *maintenance, return_exceptions=True)
+        finally:
+            if self._listener and not self._listener.is_closed():
+                await self._listener.close()
+            await self._pool.close()
+            print("Worker stopped")
+
+    async def _listen(self) -> None:
+        """Open the dedicated LISTEN connection (reconnects if it was lost)"""
+        if self._listener and not self._listener.is_closed():
+            return
+        self._listener = await asyncpg.connect(DATABASE_URL)
+        await self._listener.add_listener(NOTIFY_CHANNEL, self._on_notify)
+        # Jobs may have been enqueued while we were not listening
+        for event in self._wakeups.values():
+            event.set()
+
+    def _on_notify(self, conn, pid, channel, job_type) -> None:
+        event = self._wakeups.get(job_type)
+        if event:
+            event.set()
+
+    async def _requeue_stale(self) -> None:
+        async with self._pool.acquire() as conn:
+            recovered = await requeue_stale_jobs(conn, list(self.handlers), self.stale_after)
+        if recovered:
+            print(f"Recovered {recovered} stale job(s)")
+            for event in self._wakeups.values():
+                event.set()
+
+    async def _maintenance(self) -> None:
+        """Periodically recover stale jobs and keep the listener connected"""
+        while True:
+            await asyncio.sleep(min(self.stale_after / 3, self.idle_timeout))
+            try:
+                await self._listen()
+                await self._requeue_stale()
+            except (OSError, asyncpg.PostgresError) as e:
+                print(f"Worker maintenance failed: {e}")
+
+    async def _schedule(self, handler: JobHandler) -> None:
+        """Enqueue a periodic job once per period"""
+        while True:
+            period = int(time.time() // handler.every)
+            try:
+                async with self._pool.acquire() as conn:
+                    await enqueue_periodic(conn, handler.job_type, period)
+            except (OSError, asyncpg.PostgresError) as e:
+                print(f"Failed to schedule {handler.job_type}: {e}")
+            await asyncio.sleep((period + 1) * handler.every - time.time())
+
+    async def _slot(self, handler: JobHandler) -> None:
+        while not self._stopping.is_set():
+            try:
+                async with self._pool.acquire() as conn:
+                    jobs = await claim_jobs(conn, handler.job_type, self.worker_id, handler.batch_size)
+            except (OSError, asyncpg.PostgresError) as e:
+                print(f"Failed to claim {handler.job_type} jobs: {e}")
+                await self._wait_for_work(handler.job_type, self.idle_timeout)
+                continue
+
+            if not jobs:
+                await self._wait_for_work(handler.job_type)
+                continue
+
+            await self._execute(handler, jobs)
+
+    async def _call(self, handler: JobHandler, job: Dict[str, Any]) -> None:
+        if handler.timeout:
+            await asyncio.wait_for(handler.func(self._pool, job["payload"]), handler.timeout)
+        else:
+            await handler.func(self._pool, job["payload"])
+
+    async def _execute(self, handler: JobHandler, jobs: List[Dict[str, Any]]) -> None:
+        try:
+            results = await asyncio.gather(
+                *(self._call(handler, job) for job in jobs), return_exceptions=True
+            )
+        except asyncio.CancelledError:
+            # Shutdown overran the grace period: hand the jobs to another worker
+            await asyncio.shield(self._release([job["id"] for job in jobs]))
+            raise
+
+        completed = [job["id"] for job, result in zip(jobs, results) if result is None]
+        async with self._pool.acquire() as conn:
+            if completed:
+                await complete_jobs(conn, completed)
+            for job, result in zip(jobs, results):
+                if result is None:
+                    continue
+                error = f"{type(result).__name__}: {result}"
+                dead = await fail_job(conn, job, error)
+                if dead:
+                    print(f"Job {job['id']} ({job['job_type']}) dead-lettered after {job['attempts']} attempts: {error}")
+                else:
+                    print(f"Job {job['id']} ({job['job_type']}) failed, will retry: {error}")
+
+    async def _release(self, job_ids: List[int]) -> None:
+        async with self._pool.acquire() as conn:
+            await release_jobs(conn, job_ids)
+
+    async def _wait_for_work(self, job_type: str, timeout: Optional[float] = None) -> None:
+        """Sleep until notified, the next delayed job is due, or shutdown"""
+        event = self._wakeups[job_type]
+        if timeout is None:
+            timeout = self.idle_timeout
+            async with self._pool.acquire() as conn:
+                due = await next_run_at(conn, job_type)
+            if due is not None:
+                # A due job we could not claim is locked by another worker; back off briefly
+                timeout = min(timeout, max((due - datetime.now(timezone.utc)).total_seconds(), 0.5))
+
+        woken = asyncio.ensure_future(event.wait())
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        try:
+            await asyncio.wait({woken, stopping}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            woken.cancel()
+            stopping.cancel()
+        event.clear()
+
+async def run_worker(job_types: Optional[List[str]] = None) -> None:
+    """Run a worker for the given job types (all registered types by default)"""
+    selected = {
+        job_type: handler for job_type, handler in handlers.items()
+        if not job_types or job_type in job_types
+    }
+    worker = Worker(selected)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:
+            # Windows event loops do not support signal handlers; Ctrl+C still cancels run()
+            pass
+
+    await worker.run()
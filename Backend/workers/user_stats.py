@@ -0,0 +1,51 @@
+"""
+Nightly reconciliation of the per-user stats counters.
+
+The stats triggers keep core.user_stats exact for every write path that goes
+through the database, but hard deletes cascading from a farm, manual fixes or a
+trigger disabled during a restore can leave counters behind. This job recounts
+users in keyset-ordered batches, each batch in its own short transaction, and
+reports how many counter rows it had to correct. Enqueue a
+user_stats.reconcile job with {"userIds": [...]} to recount specific users now.
+"""
+
+from typing import Any, Dict
+
+import asyncpg
+
+from utils.user_stats import reconcile_user_stats
+from workers.runtime import job_handler
+
+RECONCILE_JOB = "user_stats.reconcile"
+
+RECONCILE_BATCH_SIZE = 500
+RECONCILE_INTERVAL_SECONDS = 24 * 3600
+
+async def reconcile_all_user_stats(conn: asyncpg.Connection, batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    """Recount every user's stats batch by batch. Returns the counter rows corrected."""
+    corrected = 0
+    last_id = None
+    while True:
+        user_ids = await conn.fetch('''
+            SELECT id FROM core.user
+            WHERE $1::uuid IS NULL OR id > $1::uuid
+            ORDER BY id
+            LIMIT $2
+        ''', last_id, batch_size)
+        if not user_ids:
+            return corrected
+
+        last_id = user_ids[-1]["id"]
+        async with conn.transaction():
+            corrected += await reconcile_user_stats(conn, [row["id"] for row in user_ids])
+
+@job_handler(RECONCILE_JOB, every=RECONCILE_INTERVAL_SECONDS, timeout=1800)
+async def reconcile_user_stats_job(pool: asyncpg.Pool, payload: Dict[str, Any]) -> None:
+    async with pool.acquire() as conn:
+        if payload.get("userIds"):
+            async with conn.transaction():
+                corrected = await reconcile_user_stats(conn, payload["userIds"])
+        else:
+            corrected = await reconcile_all_user_stats(conn)
+    if corrected:
+        print(f"Corrected stats counters for {corrected} user(s)")
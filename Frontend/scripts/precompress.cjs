@@ -0,0 +1,16 @@
+// Runs ../Backend/precompress.py on the build output after `vite build`.
+// It needs only Python's standard library; without a Python interpreter the
+// build still succeeds, and the variants can be written at deploy time instead.
+const { spawnSync } = require("child_process");
+const path = require("path");
+
+const script = path.join(__dirname, "..", "..", "Backend", "precompress.py");
+const build = path.join(__dirname, "..", "build");
+
+for (const python of ["python3", "python"]) {
+  const result = spawnSync(python, [script, build], { stdio: "inherit" });
+  if (result.error && result.error.code === "ENOENT") continue;
+  process.exit(result.status ?? 1);
+}
+
+console.warn("Python not found: skipping precompressed .br/.gz variants (run Backend/precompress.py when deploying)");
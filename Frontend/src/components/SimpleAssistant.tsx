@@ -27,6 +27,7 @@ import { Popover, PopoverContent, PopoverTrigger } from './ui/popover';
 import { irriChatFlows, type Citation, type ChatFlow } from '../data/irriChatFlows';
 import { getImageAnalysisResponse } from '../data/imageAnalysisResponses';
 import { SuggestedQuestions } from './SuggestedQuestions';
+import { assistantAPI } from '../services/api';
 import riceFieldPestImage from 'figma:asset/80df1cbebc908d5aefcfa12c7c2197861a3fe22b.png';
 
 interface Message {
@@ -51,6 +52,8 @@ export function SimpleAssistant() {
   const isGuest = !user;
   const chatEndRef = useRef<HTMLDivElement>(null);
   const fileInputRef = useRef<HTMLInputElement>(null);
+  // Backend conversation that streamed replies are saved in, created on first use
+  const conversationIdRef = useRef<string | null>(null);
   
   const [messages, setMessages] = useState<Message[]>([
     {
@@ -438,6 +441,67 @@ export function SimpleAssistant() {
     }, 30);
   };
 
+  // Stream a reply from the backend into a new assistant message as it is generated;
+  // false if no reply could be started (the caller falls back to a local answer)
+  const streamBackendReply = async (question: string): Promise<boolean> => {
+    const assistantMessageId = (Date.now() + 1).toString();
+    let started = false;
+    const start = (content: string) => {
+      started = true;
+      setIsLoading(false);
+      setTypingMessageId(assistantMessageId);
+      setMessages(prev => [...prev, {
+        id: assistantMessageId,
+        type: 'assistant',
+        content,
+        inputType: 'text',
+        timestamp: new Date(),
+        isTyping: true
+      }]);
+    };
+    const finish = (content?: string) => {
+      setMessages(prev =>
+        prev.map(msg =>
+          msg.id === assistantMessageId
+            ? { ...msg, content: content ?? msg.content, isTyping: false }
+            : msg
+        )
+      );
+    };
+
+    try {
+      if (!conversationIdRef.current) {
+        const conversation = await assistantAPI.createConversation();
+        conversationIdRef.current = conversation.id;
+      }
+      await assistantAPI.streamMessage(conversationIdRef.current!, question, {
+        onDelta: (piece) => {
+          if (!started) {
+            start(piece);
+            return;
+          }
+          setMessages(prev =>
+            prev.map(msg => (msg.id === assistantMessageId ? { ...msg, content: msg.content + piece } : msg))
+          );
+        },
+        onDone: (reply) => {
+          if (!started) start(reply.content);
+          finish(reply.content);
+        }
+      });
+      return true;
+    } catch (error) {
+      console.error('Assistant reply stream failed:', error);
+      if (!started) return false;
+      // Keep what arrived before the stream broke
+      finish();
+      toast.error(language === 'EN' ? 'The reply was interrupted' : 'Câu trả lời bị gián đoạn');
+      return true;
+    } finally {
+      setTypingMessageId(null);
+    }
+  };
+
   const handleSendMessage = async () => {
     if (!input.trim() || isLoading) return;
 
@@ -656,6 +720,8 @@ export function SimpleAssistant() {
           citation_vi: perfectMatch?.citation_vi,
           citations: citations
         });
+      } else if (!isGuest && await streamBackendReply(questionAsked)) {
+        // Answered by the assistant backend, streamed as it was generated
       } else {
         // No match found in IRRI knowledge base
         setIsLoading(false);
@@ -44,6 +44,30 @@ const apiRequest = async (endpoint: string, options: RequestInit = {}) => {
   }
 };
 
+// Export filters shared by the journal and task exports
+export interface ExportOptions {
+  format?: 'ndjson' | 'csv';
+  plotId?: string;
+  from?: string; // YYYY-MM-DD
+  to?: string;   // YYYY-MM-DD
+}
+
+// Download a streamed export as a Blob (save it with URL.createObjectURL)
+const downloadExport = async (endpoint: string, options: ExportOptions = {}) => {
+  const params = new URLSearchParams();
+  Object.entries(options).forEach(([key, value]) => {
+    if (value) params.append(key, value);
+  });
+  const response = await fetch(`${API_BASE_URL}${endpoint}?${params}`, {
+    headers: getAuthHeaders(),
+  });
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({ detail: 'Unknown error' }));
+    throw new Error(errorData.detail || `HTTP ${response.status}: ${response.statusText}`);
+  }
+  return response.blob();
+};
+
 // Authentication API
 export const authAPI = {
   // Request OTP for phone number
@@ -244,6 +268,11 @@ export const tasksAPI = {
     return apiRequest(`/api/tasks/${taskId}`, {
       method: 'DELETE',
     });
+  },
+
+  // Export tasks (NDJSON or CSV), optionally for one plot and a due date range
+  exportTasks: async (options: ExportOptions = {}) => {
+    return downloadExport('/api/tasks/export', options);
   }
 };
 
@@ -254,6 +283,11 @@ export const journalAPI = {
     return apiRequest('/api/journal');
   },
 
+  // Export journal entries (NDJSON or CSV), optionally for one plot and a date range
+  exportJournal: async (options: ExportOptions = {}) => {
+    return downloadExport('/api/journal/export', options);
+  },
+
   // Create new journal entry for current user
   createJournalEntry: async (entryData: {
     plotId: string;
@@ -326,6 +360,13 @@ export const weatherAPI = {
   }
 };
 
+// Callbacks for assistantAPI.streamMessage, in event order
+export interface AssistantStreamHandlers {
+  onUserMessage?: (message: any) => void;
+  onDelta: (content: string) => void;
+  onDone?: (message: any) => void;
+}
+
 // Assistant API
 export const assistantAPI = {
   // Get all conversations for current user
@@ -357,6 +398,53 @@ export const assistantAPI = {
     });
   },
 
+  // Send message and receive the reply as it is generated (Server-Sent Events);
+  // resolves with the saved reply. EventSource cannot POST, so the stream is read with fetch
+  streamMessage: async (
+    conversationId: string,
+    message: string,
+    handlers: AssistantStreamHandlers,
+    metadata?: any
+  ) => {
+    const response = await fetch(`${API_BASE_URL}/api/assistant/conversations/${conversationId}/messages/stream`, {
+      method: 'POST',
+      headers: { ...getAuthHeaders(), Accept: 'text/event-stream' },
+      body: JSON.stringify({ content: message, metadata }),
+    });
+    if (!response.ok || !response.body) {
+      const errorData = await response.json().catch(() => ({ detail: 'Unknown error' }));
+      throw new Error(errorData.detail || `HTTP ${response.status}: ${response.statusText}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let event = 'message';
+        let data = '';
+        for (const line of block.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        const payload = JSON.parse(data);
+        if (event === 'user') handlers.onUserMessage?.(payload);
+        else if (event === 'delta') handlers.onDelta(payload.content);
+        else if (event === 'done') {
+          handlers.onDone?.(payload);
+          return payload;
+        } else if (event === 'error') throw new Error(payload.detail);
+      }
+    }
+    throw new Error('The reply stream ended before the reply was complete');
+  },
+
   // Get suggested questions
   getSuggestedQuestions: async () => {
     return apiRequest('/api/assistant/suggestions');
@@ -423,6 +511,35 @@ export const usersAPI = {
   }
 };
 
+// Dashboard API
+export const dashboardAPI = {
+  // Get the home screen sections in one request (all sections unless fields are given)
+  getDashboard: async (fields?: string[]) => {
+    const params = new URLSearchParams();
+    if (fields && fields.length > 0) params.append('fields', fields.join(','));
+
+    return apiRequest(`/api/dashboard?${params.toString()}`);
+  }
+};
+
+// Batch API
+export interface BatchSubRequest {
+  id?: string;
+  method?: 'GET' | 'POST' | 'PUT' | 'DELETE';
+  path: string;
+  body?: any;
+}
+
+export const batchAPI = {
+  // Run several API calls in one request (writes need transactional = true)
+  batch: async (requests: BatchSubRequest[], transactional: boolean = false) => {
+    return apiRequest('/api/batch', {
+      method: 'POST',
+      body: JSON.stringify({ requests, transactional }),
+    });
+  }
+};
+
 // Health check
 export const healthAPI = {
   checkHealth: async () => {